@@ -3,6 +3,7 @@ import importlib
 from typing import Any
 
 from .ast_helpers import get_id
+from .visitor import NodeTransformer, NodeVisitor
 
 
 get_id  # quiten pyflakes; this should when code is updated to use ast_helpers
@@ -57,7 +58,7 @@ def is_ellipsis(node):
     )
 
 
-class ReturnFinder(ast.NodeVisitor):
+class ReturnFinder(NodeVisitor):
     returns = False
 
     def visit_Return(self, node):
@@ -65,7 +66,7 @@ class ReturnFinder(ast.NodeVisitor):
             self.returns = True
 
 
-class FunctionTransformer(ast.NodeTransformer):
+class FunctionTransformer(NodeTransformer):
     """Tracks defined functions in scope"""
 
     def visit_FunctionDef(self, node):
@@ -101,7 +102,7 @@ class FunctionTransformer(ast.NodeTransformer):
         return node
 
 
-class CalledWithTransformer(ast.NodeTransformer):
+class CalledWithTransformer(NodeTransformer):
     """
     Tracks whether variables or functions get
     used as arguments of other functions
@@ -126,7 +127,7 @@ class CalledWithTransformer(ast.NodeTransformer):
         return node
 
 
-class AttributeCallTransformer(ast.NodeTransformer):
+class AttributeCallTransformer(NodeTransformer):
     """Tracks attribute function calls on variables"""
 
     def visit_Assign(self, node):
@@ -141,7 +142,7 @@ class AttributeCallTransformer(ast.NodeTransformer):
         return node
 
 
-class ImportTransformer(ast.NodeTransformer):
+class ImportTransformer(NodeTransformer):
     """Adds imports to scope block"""
 
     def __init__(self) -> None:
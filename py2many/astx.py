@@ -24,6 +24,8 @@ class ASTxClassDef(ast.ClassDef):
 @dataclass
 class ASTxFunctionDef(ast.FunctionDef):
     mutable_vars: List[str] = field(default_factory=list)
+    mutable_args: List[str] = field(default_factory=list)
+    rebound_args: List[str] = field(default_factory=list)
     python_main: bool = False
 
 
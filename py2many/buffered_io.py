@@ -0,0 +1,164 @@
+import ast
+
+from typing import Dict, Optional, Set
+
+from py2many.ast_helpers import get_id
+from py2many.visitor import NodeVisitor
+
+
+def detect_buffered_output(node):
+    """Mark loops whose output can go through a buffered writer that is
+    flushed once the loop is done, and the print calls inside them"""
+    return BufferedOutputAnalysis().visit(node)
+
+
+# Calls that must see every line printed before them
+FLUSH_CALLS = frozenset(
+    [
+        "input",
+        "exit",
+        "quit",
+        "sys.exit",
+        "os._exit",
+        "os.write",
+        "sys.stdin.read",
+        "sys.stdin.readline",
+        "sys.stdin.readlines",
+        "sys.stdout.flush",
+        "sys.stdout.buffer.write",
+        "sys.stdout.buffer.flush",
+        "sys.stderr.write",
+    ]
+)
+
+OUTPUT_CALLS = frozenset(["print", "sys.stdout.write"])
+
+# Name of the buffered writer the loops print to
+OUTPUT_BUFFER = "__stdout"
+
+
+def is_buffered_output(node) -> bool:
+    return getattr(node, "buffered_output", False)
+
+
+class BufferedOutputAnalysis(NodeVisitor):
+    """Finds the outermost loops that print to stdout and do nothing that
+    would observe the order of that output against other I/O: reading
+    stdin, exiting, flushing, writing to stderr or yielding. Calls to
+    functions of the module are followed: their output would bypass the
+    loop's buffer, so a loop calling a function that does any I/O is
+    left alone."""
+
+    def __init__(self):
+        self._io_functions: Set[str] = set()
+
+    def visit_Module(self, node):
+        self._io_functions = _io_functions(node)
+        self.generic_visit(node)
+        return node
+
+    def visit_For(self, node):
+        if not self._mark_loop(node):
+            self.generic_visit(node)
+
+    visit_While = visit_For
+
+    def _mark_loop(self, node) -> bool:
+        # The analysis runs again after the language rewriters, which may
+        # hide the I/O of a function, so a loop stays unbuffered once it
+        # was found to need flushing
+        if getattr(node, "buffered_output", None) is False:
+            return False
+        calls = list(_output_calls(node))
+        if not calls:
+            return False
+        if self._must_flush(node):
+            node.buffered_output = False
+            return False
+        node.buffered_output = True
+        for call in calls:
+            call.buffered_output = True
+        return True
+
+    def _must_flush(self, node) -> bool:
+        for child in _walk(node):
+            if isinstance(child, (ast.Yield, ast.YieldFrom, ast.Await)):
+                return True
+            if isinstance(child, ast.Lambda):
+                return True
+            if isinstance(child, ast.Call) and self._call_flushes(child):
+                return True
+        return False
+
+    def _call_flushes(self, node: ast.Call) -> bool:
+        name = _call_name(node)
+        if name in FLUSH_CALLS:
+            return True
+        if name == "print":
+            return any(
+                kw.arg == "file"
+                or (
+                    kw.arg == "flush"
+                    and not (isinstance(kw.value, ast.Constant) and not kw.value.value)
+                )
+                for kw in node.keywords
+            )
+        # Output of called functions does not go through the loop's
+        # buffer, so it would be reordered
+        return _function_name(node) in self._io_functions
+
+
+def _io_functions(node) -> Set[str]:
+    """Names of the functions that do I/O, directly or through calls"""
+    calls: Dict[str, Set[str]] = {}
+    io_functions = set()
+    for func in ast.walk(node):
+        if not isinstance(func, (ast.FunctionDef, ast.AsyncFunctionDef)):
+            continue
+        callees = calls.setdefault(func.name, set())
+        for child in ast.walk(func):
+            if isinstance(child, (ast.Yield, ast.YieldFrom, ast.Await)):
+                io_functions.add(func.name)
+            elif isinstance(child, ast.Call):
+                name = _call_name(child)
+                if name in FLUSH_CALLS or name in OUTPUT_CALLS:
+                    io_functions.add(func.name)
+                callees.add(_function_name(child))
+    changed = True
+    while changed:
+        changed = False
+        for name, callees in calls.items():
+            if name not in io_functions and callees & io_functions:
+                io_functions.add(name)
+                changed = True
+    return io_functions
+
+
+def _walk(node):
+    """ast.walk that does not descend into nested functions and classes"""
+    todo = list(ast.iter_child_nodes(node))
+    while todo:
+        child = todo.pop()
+        yield child
+        if not isinstance(child, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+            todo.extend(ast.iter_child_nodes(child))
+
+
+def _output_calls(node):
+    for child in _walk(node):
+        if isinstance(child, ast.Call) and _call_name(child) in OUTPUT_CALLS:
+            if not any(kw.arg == "file" for kw in child.keywords):
+                yield child
+
+
+def _call_name(node: ast.Call) -> Optional[str]:
+    return get_id(node.func)
+
+
+def _function_name(node: ast.Call) -> Optional[str]:
+    """Name of the function or method a call may resolve to"""
+    if isinstance(node.func, ast.Name):
+        return node.func.id
+    if isinstance(node.func, ast.Attribute):
+        return node.func.attr
+    return None
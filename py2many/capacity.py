@@ -0,0 +1,417 @@
+import ast
+
+from dataclasses import dataclass, field
+from typing import List, NamedTuple, Optional, Tuple, Union
+
+from py2many.analysis import is_mutable
+from py2many.ast_helpers import get_id
+from py2many.inference import get_inferred_type
+from py2many.context import LIST_ADDITIONS
+from py2many.visitor import NodeVisitor
+
+
+def add_list_capacity(node):
+    """Estimate the final size of lists built with append/extend/insert.
+    Needs the calls recorded by ListCallTransformer"""
+    return ListCapacityAnalysis().visit(node)
+
+
+class LenFactor(NamedTuple):
+    """len() of a sequence that is not rebound after the list is created"""
+
+    seq: ast.expr
+
+
+class RangeFactor(NamedTuple):
+    """Trip count of range(start, stop). It is negative when stop < start,
+    so languages have to clamp it before using it as a capacity"""
+
+    start: Optional[ast.expr]
+    stop: ast.expr
+
+
+Factor = Union[int, LenFactor, RangeFactor]
+
+# Element types that have an unboxed array representation
+PRIMITIVE_TYPES = frozenset(
+    [
+        "bool",
+        "int",
+        "float",
+        "c_int8",
+        "c_int16",
+        "c_int32",
+        "c_int64",
+        "c_uint8",
+        "c_uint16",
+        "c_uint32",
+        "c_uint64",
+    ]
+)
+
+
+@dataclass
+class ListCapacity:
+    """Upper bound of the size of a list: constant + sum(coef * factors).
+    Integer factors from a runtime profile make it an estimate instead"""
+
+    constant: int = 0
+    terms: List[Tuple[int, Tuple[Factor, ...]]] = field(default_factory=list)
+
+    @property
+    def is_constant(self) -> bool:
+        return not self.terms
+
+    @property
+    def is_non_negative(self) -> bool:
+        return not any(
+            isinstance(f, RangeFactor) for _, factors in self.terms for f in factors
+        )
+
+    def add(self, coef: int, factors: Tuple[Factor, ...]):
+        for f in factors:
+            if isinstance(f, int):
+                coef *= f
+        factors = tuple(f for f in factors if not isinstance(f, int))
+        if coef == 0:
+            return
+        if factors:
+            for i, (other_coef, other_factors) in enumerate(self.terms):
+                if other_factors == factors:
+                    self.terms[i] = (other_coef + coef, factors)
+                    break
+            else:
+                self.terms.append((coef, factors))
+        else:
+            self.constant += coef
+
+
+# Nodes that may run the code they contain more than once, or at a
+# different time than the statement that contains them
+_UNKNOWN_TRIP_COUNT = (
+    ast.While,
+    ast.FunctionDef,
+    ast.AsyncFunctionDef,
+    ast.Lambda,
+    ast.ClassDef,
+    ast.ListComp,
+    ast.SetComp,
+    ast.DictComp,
+    ast.GeneratorExp,
+    ast.AsyncFor,
+)
+
+# Statements that may skip an append. Estimating a capacity from a
+# filtered loop could reserve much more than is ever used.
+_CONDITIONAL = (ast.If, ast.IfExp, ast.Try, ast.BoolOp)
+
+# Leave the loop early, so the trip count is only an upper bound
+_EARLY_EXITS = (ast.Break, ast.Continue, ast.Return, ast.Raise, ast.Yield)
+
+
+def _profiled_trip_count(loop, child) -> Optional[int]:
+    """The most iterations py2many record saw a run of the loop make.
+    Only a hint: other inputs may make more, but the capacity only
+    reserves memory, and lists still grow past it"""
+    if isinstance(loop, (ast.For, ast.While)) and child in loop.body:
+        return getattr(loop, "trip_count", None) or None
+    return None
+
+
+class ListCapacityAnalysis(NodeVisitor):
+    """Combines the append/extend/insert calls of a list with the trip
+    counts of the for loops around them. Loops whose trip count is not
+    known statically use the one of a runtime profile, if they have one.
+
+    Sets `capacity` (a ListCapacity) on the list literal that creates
+    the list when every call could be accounted for. Lists that are only
+    indexed, iterated over or passed to len() never change size: their
+    literal or [x] * n expression gets `fixed_length`, and list literals
+    also get `fixed_size`, so that they can be lowered to arrays"""
+
+    def __init__(self):
+        super().__init__()
+        self._parents = []
+        # list variable -> (definition, its ancestors, capacity)
+        self._lists = {}
+        # list variable -> (definition, list whose size never changes)
+        self._fixed = {}
+
+    def visit(self, node):
+        self._parents.append(node)
+        try:
+            return super().visit(node)
+        finally:
+            self._parents.pop()
+
+    def visit_Module(self, node):
+        self.generic_visit(node)
+        for target, (definition, _, capacity) in self._lists.items():
+            if capacity is not None and getattr(target, "calls", None):
+                definition.value.capacity = capacity
+        for _, value in self._fixed.values():
+            value.fixed_length = True
+            if isinstance(value, ast.List):
+                value.fixed_size = len(value.elts)
+        return node
+
+    def visit_Assign(self, node):
+        if len(node.targets) == 1:
+            self._add_list(node, node.targets[0])
+        self.generic_visit(node)
+
+    def visit_AnnAssign(self, node):
+        self._add_list(node, node.target)
+        self.generic_visit(node)
+
+    def _add_list(self, node, target):
+        repeated = get_repeated_list(node.value)
+        if not isinstance(node.value, ast.List) and repeated is None:
+            return
+        # Core transformers run more than once
+        node.value.capacity = None
+        node.value.fixed_size = None
+        node.value.fixed_length = False
+        if not isinstance(target, ast.Name):
+            return
+        elts = (repeated or node.value).elts
+        if any(isinstance(e, ast.Starred) for e in elts):
+            return
+        if node.scopes.find(target.id) is not target:
+            # Rebinding an existing list
+            return
+        if repeated is None:
+            self._lists[target] = (
+                node,
+                list(self._parents[:-1]),
+                ListCapacity(constant=len(elts)),
+            )
+        in_class = any(isinstance(s, ast.ClassDef) for s in node.scopes)
+        if elts and not in_class and not getattr(target, "calls", None):
+            self._fixed[target] = (node, node.value)
+
+    def visit_Name(self, node):
+        var = None
+        if node.id and (self._lists or self._fixed):
+            scopes = getattr(node, "scopes", None)
+            var = scopes.find(node.id) if scopes is not None else None
+        if var is not None and var in self._fixed:
+            parent = self._parents[-2]
+            definition, _ = self._fixed[var]
+            if parent is not definition and not self._is_fixed_size_use(node, parent):
+                del self._fixed[var]
+        self.generic_visit(node)
+
+    @staticmethod
+    def _is_fixed_size_use(node, parent) -> bool:
+        if isinstance(parent, ast.Subscript):
+            return (
+                parent.value is node
+                and not isinstance(parent.slice, ast.Slice)
+                and not isinstance(parent.ctx, ast.Del)
+            )
+        if isinstance(parent, ast.For):
+            return parent.iter is node
+        if isinstance(parent, ast.Call):
+            return get_id(parent.func) == "len" and parent.args == [node]
+        return False
+
+    def visit_Call(self, node):
+        self.generic_visit(node)
+        if (
+            isinstance(node.func, ast.Attribute)
+            and isinstance(node.func.value, ast.Name)
+            and node.func.attr in LIST_ADDITIONS
+        ):
+            method, args = node.func.attr, node.args
+            var = node.scopes.find(node.func.value.id)
+        elif get_id(node.func) in LIST_ADDITIONS and node.args:
+            # A backend lowered the call to xs = append(xs, x) before the
+            # core transformers ran again. The assignment hides the list
+            # definition from the scopes, but the call is still recorded
+            method, args = get_id(node.func), node.args[1:]
+            var = next(
+                (v for v in self._lists if node in getattr(v, "calls", ())), None
+            )
+        else:
+            return
+        if var not in self._lists:
+            return
+        definition, ancestors, capacity = self._lists[var]
+        if capacity is None:
+            return
+        count = self._added_count(method, args, var)
+        factors = self._trip_counts(definition, ancestors, var)
+        if count is None or factors is None:
+            self._lists[var] = (definition, ancestors, None)
+            return
+        capacity.add(1, factors + (count,))
+
+    def _added_count(self, method, args, var) -> Optional[Factor]:
+        if method in ("append", "insert"):
+            return 1
+        if len(args) != 1:
+            return None
+        arg = args[0]
+        if isinstance(arg, (ast.List, ast.Tuple)):
+            if any(isinstance(e, ast.Starred) for e in arg.elts):
+                return None
+            return len(arg.elts)
+        definition = self._lists[var][0]
+        if isinstance(arg, ast.Name) and self._is_stable(arg, definition, var):
+            return LenFactor(arg)
+        return None
+
+    def _trip_counts(self, definition, ancestors, var) -> Optional[Tuple[Factor]]:
+        """Number of times the current call runs per list creation"""
+        # The call must be in the same block as the list, or nested in it
+        call_parents = self._parents[:-1]
+        if len(call_parents) < len(ancestors) or any(
+            a is not b for a, b in zip(ancestors, call_parents)
+        ):
+            return None
+        factors = []
+        inner = call_parents[len(ancestors) :] + [self._parents[-1]]
+        for parent, child in zip(inner, inner[1:]):
+            profiled = _profiled_trip_count(parent, child)
+            if isinstance(parent, (_UNKNOWN_TRIP_COUNT, _CONDITIONAL)):
+                if profiled is None:
+                    return None
+                factors.append(profiled)
+                continue
+            if isinstance(parent, ast.For):
+                if child not in parent.body:
+                    # orelse runs at most once, iter once per loop
+                    continue
+                trip_count = None
+                if not any(
+                    isinstance(n, _EARLY_EXITS)
+                    for stmt in parent.body
+                    for n in ast.walk(stmt)
+                ):
+                    trip_count = self._trip_count(parent, definition, var)
+                if trip_count is None:
+                    trip_count = profiled
+                if trip_count is None:
+                    return None
+                factors.append(trip_count)
+        return tuple(factors)
+
+    def _trip_count(self, node: ast.For, definition, var) -> Optional[Factor]:
+        it = node.iter
+        if isinstance(it, (ast.List, ast.Tuple)):
+            if any(isinstance(e, ast.Starred) for e in it.elts):
+                return None
+            return len(it.elts)
+        if isinstance(it, ast.Call) and get_id(it.func) == "enumerate":
+            if len(it.args) != 1 or it.keywords:
+                return None
+            it = it.args[0]
+        if isinstance(it, ast.Name):
+            if self._is_stable(it, definition, var):
+                return LenFactor(it)
+            return None
+        if not (isinstance(it, ast.Call) and get_id(it.func) == "range"):
+            return None
+        if it.keywords or not 1 <= len(it.args) <= 3:
+            return None
+        constants = [_int_constant(a) for a in it.args]
+        if None not in constants:
+            return len(range(*constants))
+        if len(it.args) == 3 or not all(
+            self._is_stable(a, definition, var) for a in it.args
+        ):
+            return None
+        if len(it.args) == 1:
+            start, stop = None, it.args[0]
+        else:
+            start, stop = it.args
+        if constants[0] == 0:
+            start = None
+        if start is None and _is_len_call(stop):
+            return LenFactor(stop.args[0])
+        return RangeFactor(start, stop)
+
+    def _is_stable(self, node, definition, var) -> bool:
+        """Whether the expression can be evaluated where the list is
+        created and still has the same value where it is used"""
+        if _int_constant(node) is not None:
+            return True
+        if isinstance(node, ast.BinOp) and isinstance(
+            node.op, (ast.Add, ast.Sub, ast.Mult)
+        ):
+            return self._is_stable(node.left, definition, var) and self._is_stable(
+                node.right, definition, var
+            )
+        if _is_len_call(node):
+            return self._is_stable(node.args[0], definition, var)
+        if not isinstance(node, ast.Name):
+            return False
+        scopes = getattr(node, "scopes", None)
+        if scopes is None:
+            return False
+        name_def = scopes.find(node.id)
+        if name_def is None or name_def is var:
+            return False
+        if isinstance(name_def, ast.arg):
+            return True
+        name_scopes = getattr(name_def, "scopes", None)
+        assigned_from = getattr(name_def, "assigned_from", None)
+        if not name_scopes or assigned_from is None:
+            return False
+        if isinstance(assigned_from, ast.For):
+            # Loop variables are only stable in loops around the list
+            return any(assigned_from is p for p in self._lists[var][1])
+        return (
+            getattr(assigned_from, "lineno", definition.lineno) < definition.lineno
+            and any(name_scopes[-1] is s for s in definition.scopes)
+            and not is_mutable(definition.scopes, node.id)
+        )
+
+
+def get_repeated_list(node) -> Optional[ast.List]:
+    """Returns the list literal of [x] * n or n * [x]"""
+    if not isinstance(node, ast.BinOp) or not isinstance(node.op, ast.Mult):
+        return None
+    for lst, count in ((node.left, node.right), (node.right, node.left)):
+        if isinstance(lst, ast.List) and len(lst.elts) == 1:
+            if not isinstance(count, (ast.List, ast.Tuple, ast.Constant)):
+                return lst
+            if _int_constant(count) is not None:
+                return lst
+    return None
+
+
+def get_fixed_length_element_type(node) -> Optional[str]:
+    """Python type of the elements of a list whose size never changes,
+    if all of them have the same primitive type"""
+    if not getattr(node, "fixed_length", False):
+        return None
+    lst = node if isinstance(node, ast.List) else get_repeated_list(node)
+    elt_types = {get_id(get_inferred_type(e)) for e in lst.elts}
+    if len(elt_types) != 1:
+        return None
+    elt_type = elt_types.pop()
+    return elt_type if elt_type in PRIMITIVE_TYPES else None
+
+
+def _int_constant(node) -> Optional[int]:
+    if isinstance(node, ast.UnaryOp) and isinstance(node.op, ast.USub):
+        value = _int_constant(node.operand)
+        return -value if value is not None else None
+    if (
+        isinstance(node, ast.Constant)
+        and isinstance(node.value, int)
+        and not isinstance(node.value, bool)
+    ):
+        return node.value
+    return None
+
+
+def _is_len_call(node) -> bool:
+    return (
+        isinstance(node, ast.Call)
+        and get_id(node.func) == "len"
+        and len(node.args) == 1
+        and not node.keywords
+    )
@@ -3,12 +3,12 @@ import ast
 import builtins
 import os
 import functools
-import string
 
 import sys
 import tempfile
 
 
+from collections import Counter
 from distutils import spawn
 from functools import lru_cache
 from pathlib import Path, PosixPath, WindowsPath
@@ -17,17 +17,28 @@ from typing import List, Optional, Set, Tuple
 from unittest.mock import Mock
 
 from py2many.input_configuration import config_rewriters, parse_input_configurations
-from py2many.module_dependencies import analyse_module_dependencies
-from py2many.pytype_inference import pytype_annotate_and_merge
+from py2many.module_dependencies import (
+    AnalyseModuleDependencies,
+    analyse_module_dependencies,
+)
+from py2many.pytype_inference import (
+    pytype_annotate_and_merge_many,
+    pytype_infer_modules,
+    pytype_merge,
+)
 from pyjl.optimizations import AlgebraicSimplification, OperationOptimizer, PerformanceOptimizations
 from pynim.rewriters import WithToBlockRewriter
 
 
 from .analysis import add_imports
 
+from .buffered_io import detect_buffered_output
+from .capacity import add_list_capacity
+from .code_writer import CodeWriter
 from .context import add_assignment_context, add_variable_context, add_list_calls
 from .exceptions import AstErrorBase
-from .inference import add_is_annotation, infer_types, infer_types_typpete
+from .expected_output import ExpectedOutputs
+from .inference import add_is_annotation, infer_types
 from .language import LanguageSettings
 from .transformers import (
     add_annotation_flags,
@@ -35,8 +46,27 @@ from .transformers import (
     detect_mutable_vars,
     detect_nesting_levels,
 )
+from .module_summary import (
+    SummaryLoader,
+    load_summary,
+    summarize_module,
+    summary_key,
+    summary_path,
+    write_summary,
+)
+from .node_index import NodeIndex
+from .runtime_profile import main as record_main
+from .type_constraints import infer_constraint_types
+from .typpete_inference import TyppeteSession
 from .scope import add_scope_context
-from .toposort_modules import toposort
+from .ssa import add_ssa_context
+from .ssa_optimizations import SSAOptimizationRewriter
+from .toposort_modules import (
+    get_module_dependencies,
+    module_for_path,
+    toposort,
+    toposort_flatten,
+)
 
 from py2py.transpiler import PythonTranspiler
 from pycpp.transpiler import CppTranspiler, CppListComparisonRewriter
@@ -66,6 +96,7 @@ from pyjl.rewriters import (
     JuliaBoolOpRewriter,
     JuliaIndexingRewriter,
     JuliaMainRewriter,
+    JuliaGlobalScopeRewriter,
     JuliaMethodCallRewriter,
     JuliaModuleRewriter,
     JuliaOffsetArrayRewriter,
@@ -104,6 +135,7 @@ from pysmt.inference import infer_smt_types
 from py2many.rewriters import (
     ComplexDestructuringRewriter,
     FStringJoinRewriter,
+    StringBuilderRewriter,
     LoopElseRewriter,
     InferredAnnAssignRewriter,
     UnitTestRewriter,
@@ -129,6 +161,8 @@ def core_transformers(tree, trees, args):
     add_assignment_context(tree)
     add_list_calls(tree)
     detect_mutable_vars(tree)
+    add_list_capacity(tree)
+    detect_buffered_output(tree)
     detect_nesting_levels(tree)
     add_annotation_flags(tree)
     add_imports(tree)
@@ -152,62 +186,37 @@ def _transpile(
     transpiler = settings.transpiler
     inference = settings.inference \
         if settings.inference else infer_types
-    rewriters = settings.rewriters
     transformers = settings.transformers
-    post_rewriters = settings.post_rewriters
-    optimization_rewriters = settings.optimization_rewriters
+    optimization_rewriters = _get_optimization_rewriters(settings)
     tree_list = []
 
     if args.pytype:
         # Pytype only parses code as string at the moment
-        inferred_sources = []
-        for filename, source in zip(filenames, sources):
-            inferred_sources.append(pytype_annotate_and_merge(source, basedir, filename))
-        sources = inferred_sources
+        sources = pytype_annotate_and_merge_many(sources, basedir, filenames)
 
     for filename, source in zip(filenames, sources):
-        tree = ast.parse(source, type_comments=True)
-        tree.__file__ = filename
-        tree.__basedir__ = basedir
-        if args.import_basedir:
-            tree.import_basedir = WindowsPath(args.import_basedir) \
-                if sys.platform.startswith('win32') \
-                else PosixPath(args.import_basedir)
-        tree_list.append(tree)
+        tree_list.append(_parse_one(filename, source, basedir, args))
     # Analyse module dependencies
     trees = analyse_module_dependencies(tree_list)
     trees = toposort(tree_list)
     topo_filenames = [t.__file__ for t in trees]
-    language = transpiler.NAME
-    generic_rewriters = [
-        ComplexDestructuringRewriter(language),
-        DocStringToCommentRewriter(language),
-        IgnoredAssignRewriter(language),
-    ]
-
-    if settings.ext != ".jl":
-        generic_rewriters.append(FStringJoinRewriter(language))
-    if settings.ext != ".jl" and settings.ext != ".py":
-        generic_rewriters.append(
-            PythonMainRewriter(settings.transpiler._main_signature_arg_names)
-        )
-
-    # Language independent rewriters that run after type inference
-    generic_post_rewriters = [
-        PrintBoolRewriter(language),
-        StrStrRewriter(language),
-        UnpackScopeRewriter(language),
-        LoopElseRewriter(language),
-        UnitTestRewriter(language),
-    ]
-    rewriters = generic_rewriters + rewriters
-    post_rewriters = generic_post_rewriters + post_rewriters
+    rewriters, post_rewriters = _get_rewriters(settings)
 
     # Handle input configuration files
     config_handler = None
     if args.config:
         config_handler = parse_input_configurations(args.config)
 
+    session = None
+    if args.typpete:
+        # One solver for all the modules, which are visited in dependency order
+        session = TyppeteSession(
+            {module_for_path(f): src for f, src in zip(filenames, sources)},
+            basedir,
+            inference,
+        )
+        inference = session.infer
+
     outputs = {}
     successful = []
     for filename, tree in zip(topo_filenames, trees):
@@ -228,17 +237,11 @@ def _transpile(
             successful.append(filename)
             outputs[filename] = output
         except Exception as e:
-            import traceback
-
-            formatted_lines = traceback.format_exc().splitlines()
-            if isinstance(e, AstErrorBase):
-                print(f"{filename}:{e.lineno}:{e.col_offset}: {formatted_lines[-1]}")
-            else:
-                print(f"{filename}: {formatted_lines[-1]}")
-            if not _suppress_exceptions or not isinstance(e, _suppress_exceptions):
-                raise
+            _report_error(filename, e, _suppress_exceptions)
             outputs[filename] = "FAILED"
             # outputs[filename] = str(e)
+    if session is not None:
+        session.close()
 
     # return output in the same order as input
     output_list = [outputs[f] for f in filenames]
@@ -246,7 +249,232 @@ def _transpile(
     return output_list, successful
 
 
-def _transpile_one(
+def _transpile_streaming(
+    filenames: List[Path],
+    output_paths: List[Path],
+    settings: LanguageSettings,
+    args: Optional[argparse.Namespace] = None,
+    _suppress_exceptions=Exception,
+    basedir: PosixPath = None,
+    outdir: Path = None,
+):
+    """
+    Transpile many python modules one at a time, in dependency order.
+    Each output is written as soon as it is produced and the annotated
+    tree is then replaced by a compact interface summary, which is kept
+    until the last module importing it is transpiled. So memory use is
+    bounded by the largest module rather than the whole project.
+    Sources are parsed twice: once to find module dependencies and
+    once to transpile them.
+
+    With --summaries the interface summaries are also written next to
+    the outputs. Modules whose summary is up to date are not transpiled
+    again, and imports of modules outside of filenames are resolved
+    with the summaries in outdir instead of their sources.
+    """
+    transpiler = settings.transpiler
+    inference = settings.inference \
+        if settings.inference else infer_types
+    transformers = settings.transformers
+    optimization_rewriters = _get_optimization_rewriters(settings)
+
+    # Analyse module dependencies without keeping the trees
+    modules = {module_for_path(f): (f, p) for f, p in zip(filenames, output_paths)}
+    deps = {}
+    typpete_sources = {}
+    dependency_analysis = AnalyseModuleDependencies()
+    for filename in filenames:
+        source = _read_source(basedir / filename)
+        tree = _parse_one(filename, source, basedir, args)
+        deps[module_for_path(filename)] = get_module_dependencies(tree, modules)
+        dependency_analysis.visit(tree)
+        if args.typpete:
+            typpete_sources[module_for_path(filename)] = source
+    use_modules = dependency_analysis.USE_MODULES
+    pyi_srcs = None
+    if args.pytype:
+        # .pyi sources are small compared to the trees
+        pyi_srcs = pytype_infer_modules(
+            [_read_source(basedir / f) for f in filenames], basedir, filenames
+        )
+
+    rewriters, post_rewriters = _get_rewriters(settings)
+    config_handler = None
+    if args.config:
+        config_handler = parse_input_configurations(args.config)
+
+    session = None
+    if args.typpete:
+        session = TyppeteSession(typpete_sources, basedir, inference)
+        inference = session.infer
+
+    use_summaries = getattr(args, "summaries", False)
+    options = _summary_options(settings, args)
+    loader = None
+    if use_summaries and outdir is not None and output_paths:
+        loader = SummaryLoader(basedir, outdir, output_paths[0].suffix, options)
+
+    # Summaries of the transpiled modules still imported by the remaining ones
+    summaries = {}
+    dependents = Counter(dep for module_deps in deps.values() for dep in module_deps)
+    interface_hashes = {}
+    successful = []
+    for module in toposort_flatten(deps, sort=True):
+        filename, output_path = modules[module]
+        dep_summaries = [summaries[dep] for dep in sorted(deps[module])]
+        for dep in deps[module]:
+            dependents[dep] -= 1
+            if not dependents[dep]:
+                del summaries[dep]
+        source = _read_source(basedir / filename)
+        if pyi_srcs:
+            source = pytype_merge(source, pyi_srcs[module])
+        tree = _parse_one(filename, source, basedir, args)
+        if use_modules:
+            tree.use_modules = True
+        external = loader.dependencies(tree, exclude=modules) if loader else {}
+        dep_hashes = {dep: interface_hashes.get(dep) for dep in sorted(deps[module])}
+        dep_hashes.update({dep: s.interface_hash for dep, s in external.items()})
+        key = summary_key(source, options)
+        if use_summaries:
+            cached = load_summary(summary_path(output_path), key)
+            if (
+                cached is not None
+                and cached.dep_hashes == dep_hashes
+                and output_path.is_file()
+            ):
+                print(f"{filename} is up to date")
+                if dependents[module]:
+                    summaries[module] = cached.summary
+                interface_hashes[module] = cached.interface_hash
+                successful.append(filename)
+                continue
+        external_summaries = [s.summary for s in external.values()]
+        failed = False
+        try:
+            output = _emit_one(
+                dep_summaries + external_summaries + [tree],
+                tree,
+                transpiler,
+                rewriters,
+                transformers,
+                post_rewriters,
+                optimization_rewriters,
+                inference,
+                config_handler,
+                args,
+            )
+            successful.append(filename)
+        except Exception as e:
+            _report_error(filename, e, _suppress_exceptions)
+            output = CodeWriter()
+            output.write("FAILED")
+            failed = True
+        with open(output_path, "w", encoding="utf-8") as f:
+            output.write_to(f)
+        summary = summarize_module(tree)
+        if dependents[module]:
+            summaries[module] = summary
+        if use_summaries:
+            if failed:
+                # Dependent modules must not treat this one as up to date
+                summary_path(output_path).unlink(missing_ok=True)
+            else:
+                interface_hashes[module] = write_summary(
+                    summary_path(output_path), summary, key, dep_hashes
+                )
+        del tree, output
+    if session is not None:
+        session.close()
+
+    return successful
+
+
+def _summary_options(settings: LanguageSettings, args) -> str:
+    """Options that change the output, so summaries written
+    with other options are not up to date"""
+    options = [settings.transpiler.__class__.__name__]
+    for arg in ("typpete", "pytype", "config", "comment_unsupported", "extension"):
+        options.append(f"{arg}={getattr(args, arg, None)}")
+    return ",".join(options)
+
+
+def _read_source(path: Path) -> str:
+    with open(path, encoding="utf-8") as f:
+        return f.read()
+
+
+def _parse_one(filename: Path, source: str, basedir: PosixPath, args):
+    tree = ast.parse(source, type_comments=True)
+    tree.__file__ = filename
+    tree.__basedir__ = basedir
+    if args.import_basedir:
+        tree.import_basedir = WindowsPath(args.import_basedir) \
+            if sys.platform.startswith('win32') \
+            else PosixPath(args.import_basedir)
+    return tree
+
+
+def _report_error(filename, e, _suppress_exceptions):
+    import traceback
+
+    formatted_lines = traceback.format_exc().splitlines()
+    if isinstance(e, AstErrorBase):
+        print(f"{filename}:{e.lineno}:{e.col_offset}: {formatted_lines[-1]}")
+    else:
+        print(f"{filename}: {formatted_lines[-1]}")
+    if not _suppress_exceptions or not isinstance(e, _suppress_exceptions):
+        raise
+
+
+def _get_rewriters(settings: LanguageSettings):
+    """Returns the rewriters and post rewriters, including
+    the language independent ones"""
+    transpiler = settings.transpiler
+    language = transpiler.NAME
+    generic_rewriters = [
+        ComplexDestructuringRewriter(language),
+        DocStringToCommentRewriter(language),
+        IgnoredAssignRewriter(language),
+    ]
+
+    if settings.ext != ".jl":
+        generic_rewriters.append(FStringJoinRewriter(language))
+    if settings.ext != ".jl" and settings.ext != ".py":
+        generic_rewriters.append(
+            PythonMainRewriter(settings.transpiler._main_signature_arg_names)
+        )
+
+    # Language independent rewriters that run after type inference
+    generic_post_rewriters = [
+        PrintBoolRewriter(language),
+        StrStrRewriter(language),
+        StringBuilderRewriter(language),
+        UnpackScopeRewriter(language),
+        LoopElseRewriter(language),
+        UnitTestRewriter(language),
+    ]
+    rewriters = generic_rewriters + settings.rewriters
+    post_rewriters = generic_post_rewriters + settings.post_rewriters
+    return rewriters, post_rewriters
+
+
+def _get_optimization_rewriters(settings: LanguageSettings):
+    """Returns the optimization rewriters, including the language
+    independent ones"""
+    generic_optimization_rewriters = []
+    # The python backend writes the input back as it was
+    if settings.ext != ".py":
+        language = settings.transpiler.NAME
+        generic_optimization_rewriters.append(SSAOptimizationRewriter(language))
+    return generic_optimization_rewriters + settings.optimization_rewriters
+
+
+def _transpile_one(*args) -> str:
+    return _emit_one(*args).getvalue()
+
+
+def _emit_one(
     trees,
     tree,
     transpiler,
@@ -257,46 +485,50 @@ def _transpile_one(
     inference,
     config_handler,
     args,
-):
+) -> CodeWriter:
     # This is very basic and needs to be run before and after
     # rewrites. Revisit if running it twice becomes a perf issue
     add_scope_context(tree)
     # Configuration parser
     if config_handler:
         config_rewriters(config_handler, tree)
+    # Rewriters that declare interests are skipped on modules without them
+    index = NodeIndex(tree)
     # Language specific rewriters
     for rewriter in rewriters:
-        tree = rewriter.visit(tree)
+        tree = index.run(rewriter, tree)
     # Language independent core transformers
     tree = core_transformers(tree, trees, args)
     # Type inference
-    if args and args.typpete:
-        infer_meta = infer_types_typpete(tree)
-    else:
-        infer_meta = inference(tree)
+    infer_meta = inference(tree)
+    # Types the forward pass couldn't resolve
+    infer_constraint_types(tree)
     # Language specific transformers
     for tx in transformers:
         tx(tree)
     # Language specific rewriters that depend on previous steps
+    index.invalidate(tree)
     for rewriter in post_rewriters:
-        tree = rewriter.visit(tree)
+        tree = index.run(rewriter, tree)
     # Language specific optimizations
     for opt_rewriter in optimization_rewriters:
-        tree = opt_rewriter.visit(tree)
+        tree = index.run(opt_rewriter, tree)
 
     # Rerun core transformers
     tree = core_transformers(tree, trees, args)
-    out = []
-
+    # SSA form of the functions, for the backends
+    add_ssa_context(tree)
+    out = CodeWriter()
 
-    transpile_output = transpiler.visit(tree)
+    body = CodeWriter()
+    transpiler.emit(tree, body)
     headers = transpiler.headers(infer_meta)
     if headers:
-        out.append(headers)
-    out.append(transpile_output)
+        out.write(headers)
+    out.write(body)
     if transpiler.extension:
-        out.append(transpiler.extension_module(tree))
-    return "\n".join(out)
+        out.write(transpiler.extension_module(tree))
+    return out
 
 
 @lru_cache(maxsize=100)
@@ -314,56 +546,55 @@ def _create_cmd(parts, filename, **kw):
 def _parse_expected(outputs, settings, args):
     """Check if files match the expected results"""
 
-    file_out = args.expected
-    if os.path.isdir(file_out):
-        dir_files = []
-        for f in os.listdir(file_out):
-            dir_files.append(f.split(".")[0])
+    file_out = Path(args.expected)
+    if file_out.is_dir():
+        expected = _load_expected(file_out)
         for (f_name, path) in outputs:
             name: str = f_name.name.split(".")[0]
-            if name in dir_files:
-                comp_res = _compare_file_contents(
-                    f"{file_out}/{name}{settings.ext}", f"{path}"
-                )
-                if not comp_res:
+            if f"{name}{settings.ext}" in expected:
+                if not _compare_file_contents(file_out / f"{name}{settings.ext}", path):
                     print(f"{name} does not have expected result")
-    elif os.path.isfile(file_out):
-        file_name, file_ext = file_out.split(".")
-        if file_ext != settings.ext:
-            raise Exception("Attempting to parse a file with an incompatibel exception")
+    elif file_out.is_file():
+        if file_out.suffix != settings.ext:
+            raise Exception("Attempting to parse a file with an incompatible extension")
+        outputs = list(outputs)
         if len(outputs) > 1:
             raise Exception(
                 "Attempting to parse one expected file with multiple outputs"
             )
-
-        return _compare_file_contents(f"{file_out}", f"{path}")
+        _, path = outputs[0]
+        return _compare_file_contents(file_out, path)
     else:
         raise Exception(
             f"Could not parse expected files. {file_out} could not be found."
         )
 
 
+def _load_expected(directory: Path) -> ExpectedOutputs:
+    # Files added by a bulk update change the mtime of the directory
+    directory = Path(directory)
+    mtime = directory.stat().st_mtime_ns if directory.is_dir() else None
+    return _load_expected_listing(directory, mtime)
+
+
+@lru_cache()
+def _load_expected_listing(directory: Path, mtime) -> ExpectedOutputs:
+    return ExpectedOutputs(directory, ignore_whitespace=True)
+
+
 def _compare_file_contents(file1_path, file2_path):
-    """Compares file contents for equality"""
-
-    # Read data from files
-    expected_data = None
-    curr_file_data = None
-    with open(file1_path, encoding="utf-8") as f1, open(
-        file2_path, encoding="utf-8"
-    ) as f2:
-        expected_data = f1.read()
-        curr_file_data = f2.read()
-
-    if expected_data == None or curr_file_data == None:
+    """Compares file contents for equality, ignoring whitespace.
+    Prints a diff if they differ"""
+    file1_path = Path(file1_path)
+    expected = _load_expected(file1_path.parent)
+    if file1_path.name not in expected:
         raise Exception(f"File {file1_path} does not have an expected result file")
-
-    # Check if files match
-    remove = string.whitespace
-    mapping = {ord(c): None for c in remove}
-    data: str = expected_data.translate(mapping)
-    contents: str = curr_file_data.translate(mapping)
-    return contents == data
+    with open(file2_path, encoding="utf-8") as f:
+        contents = f.read()
+    diff = expected.compare(file1_path.name, contents)
+    if diff:
+        print(diff)
+    return diff is None
 
 
 def python_settings(args, env=os.environ):
@@ -456,6 +687,7 @@ def _julia_formatter_path():
         return str(Path(proc.stdout.decode("utf8")).parent.parent / "bin" / "format.jl")
 
 
+@lru_cache()
 def _find_julia_base_funcs():
     """Finds Julia base functions"""
     proc = run(
@@ -526,6 +758,7 @@ def julia_settings(args, env=os.environ):
             JuliaArbitraryPrecisionRewriter(),
             JuliaContextManagerRewriter(),
             JuliaExceptionRewriter(),
+            JuliaGlobalScopeRewriter(),
             JuliaModuleRewriter(),
         ],
         optimization_rewriters=[
@@ -705,9 +938,23 @@ def _process_one(settings: LanguageSettings, filename: Path, outdir: str, args,
     if dunder_init and not source_data:
         print("Detected empty __init__; skipping")
         return True
-    result = _transpile([filename], [source_data], settings, args, basedir=filename)
-    with open(output_path, "w", encoding="utf-8") as f:
-        f.write(result[0][0])
+    if getattr(args, "summaries", False):
+        # Dependencies are loaded from their summaries in outdir
+        _transpile_streaming(
+            [filename.relative_to(filename.parent)],
+            [output_path],
+            settings,
+            args,
+            _suppress_exceptions=None,
+            basedir=filename.parent,
+            outdir=Path(outdir),
+        )
+    else:
+        result = _transpile(
+            [filename], [source_data], settings, args, basedir=filename
+        )
+        with open(output_path, "w", encoding="utf-8") as f:
+            f.write(result[0][0])
 
     format_res = False
     if settings.formatter:
@@ -777,26 +1024,34 @@ def _process_many(
     # Try to flush out as many errors as possible
     settings.transpiler.set_continue_on_unimplemented()
 
-    source_data = []
-    for filename in filenames:
-        with open(basedir / filename, encoding="utf-8") as f:
-            source_data.append(f.read())
-
-    outputs, successful = _transpile(
-        filenames,
-        source_data,
-        settings,
-        args,
-        _suppress_exceptions=_suppress_exceptions,
-        basedir=basedir,
-    )
-
     output_paths = [
         _get_output_path(filename, settings.ext, outdir) for filename in filenames
     ]
-    for filename, output, output_path in zip(filenames, outputs, output_paths):
-        with open(output_path, "w", encoding="utf-8") as f:
-            f.write(output)
+    if getattr(args, "low_memory", False) or getattr(args, "summaries", False):
+        successful = _transpile_streaming(
+            filenames,
+            output_paths,
+            settings,
+            args,
+            _suppress_exceptions=_suppress_exceptions,
+            basedir=basedir,
+            outdir=outdir,
+        )
+    else:
+        source_data = [_read_source(basedir / filename) for filename in filenames]
+
+        outputs, successful = _transpile(
+            filenames,
+            source_data,
+            settings,
+            args,
+            _suppress_exceptions=_suppress_exceptions,
+            basedir=basedir,
+        )
+
+        for filename, output, output_path in zip(filenames, outputs, output_paths):
+            with open(output_path, "w", encoding="utf-8") as f:
+                f.write(output)
 
     successful = set(successful)
     format_errors = set()
@@ -869,7 +1124,7 @@ def _process_dir(
     return (successful, format_errors, failures)
 
 
-def main(args=None, env=os.environ):
+def _create_parser():
     parser = argparse.ArgumentParser()
     LANGS = _get_all_settings(Mock(indent=4))
     for lang, settings in LANGS.items():
@@ -926,6 +1181,20 @@ def main(args=None, env=os.environ):
     parser.add_argument(
         "--project", default=True, help="Create a project when using directory mode"
     )
+    parser.add_argument(
+        "--low-memory",
+        action="store_true",
+        default=False,
+        help="In directory mode, transpile and write one module at a time, "
+        "keeping only module interface summaries in memory",
+    )
+    parser.add_argument(
+        "--summaries",
+        action="store_true",
+        default=False,
+        help="Write a module interface summary next to each output and use "
+        "the up to date summaries of dependencies instead of their sources",
+    )
 
     # Configuration files.
     parser.add_argument(
@@ -946,7 +1215,16 @@ def main(args=None, env=os.environ):
         default=None,
         help="Import base directory",
     )
+    return parser
+
+
+def main(args=None, env=os.environ):
+    if args is None:
+        args = sys.argv[1:]
+    if args and args[0] == "record":
+        return record_main(args[1:])
 
+    parser = _create_parser()
     args, rest = parser.parse_known_args(args=args)
 
     # Validation of the args
@@ -39,6 +39,8 @@ c_uint64 = u64
 
 from py2many.analysis import get_id, IGNORED_MODULE_SET
 from py2many.astx import LifeTime
+from py2many.buffered_io import OUTPUT_BUFFER, is_buffered_output
+from py2many.code_writer import CodeWriter
 from py2many.exceptions import (
     AstCouldNotInfer,
     AstEmptyNodeFound,
@@ -47,7 +49,8 @@ from py2many.exceptions import (
     TypeNotSupported,
 )
 from py2many.result import Result
-from typing import List, Optional, Tuple, Union
+from typing import Callable, List, Optional, Tuple, Union
+from py2many.visitor import NodeVisitor
 
 os.path  # silence pyflakes
 math.pi  # silence pyflakes
@@ -121,7 +124,28 @@ def c_symbol(node):
     return symbols[symbol_type]
 
 
-class CLikeTranspiler(ast.NodeVisitor):
+_emitters: Dict[Tuple[type, type], Optional[Callable]] = {}
+
+
+def _find_emitter(transpiler: type, node) -> Optional[Callable]:
+    """emit_<Node> method of a transpiler class, unless a subclass
+    overrides the node's visit_<Node> method or visit itself"""
+    key = (transpiler, type(node))
+    if key not in _emitters:
+        name = type(node).__name__
+        _emitters[key] = None
+        for cls in transpiler.__mro__:
+            if f"emit_{name}" in cls.__dict__:
+                _emitters[key] = cls.__dict__[f"emit_{name}"]
+                break
+            if f"visit_{name}" in cls.__dict__ or (
+                cls is not CLikeTranspiler and "visit" in cls.__dict__
+            ):
+                break
+    return _emitters[key]
+
+
+class CLikeTranspiler(NodeVisitor):
     """Provides a base for C-like programming languages"""
 
     NAME: str
@@ -156,6 +180,7 @@ class CLikeTranspiler(ast.NodeVisitor):
         self._globals = set([])
         self._external_type_map = {}
         self._module_dispatch_table = {}
+        self._output_buffer = None
 
     def headers(self, meta=None):
         return "\n".join(self._headers)
@@ -234,15 +259,46 @@ class CLikeTranspiler(ast.NodeVisitor):
             raise AstEmptyNodeFound
         if type(node) in symbols:
             return c_symbol(node)
-        else:
-            try:
-                return super().visit(node)
-            except AstNotImplementedError:
-                raise
-            except Exception as e:
-                raise AstNotImplementedError(e, node) from e
+        if _find_emitter(type(self), node) is not None:
+            # String returning shim for nodes written to a CodeWriter
+            writer = CodeWriter()
+            self.emit(node, writer)
+            return writer.getvalue()
+        try:
+            return super().visit(node)
+        except AstNotImplementedError:
+            raise
+        except Exception as e:
+            raise AstNotImplementedError(e, node) from e
+
+    def emit(self, node, writer: CodeWriter, optional=False):
+        """Write the code of a node. Nodes with an emit_<Node> method
+        write straight into the writer, so nested blocks are not copied
+        into their parent's string. Other nodes go through visit, and
+        with optional set may generate nothing"""
+        emitter = _find_emitter(type(self), node)
+        if emitter is None:
+            code = self.visit(node)
+            if code is not None or not optional:
+                writer.write(code)
+            return
+        try:
+            emitter(self, node, writer)
+        except AstNotImplementedError:
+            raise
+        except Exception as e:
+            raise AstNotImplementedError(e, node) from e
+
+    def emit_body(self, nodes, writer: CodeWriter, optional=False):
+        for node in nodes:
+            self.emit(node, writer, optional)
 
     def visit_Module(self, node) -> str:
+        writer = CodeWriter()
+        self.emit_Module(node, writer)
+        return writer.getvalue()
+
+    def emit_Module(self, node, writer: CodeWriter):
         # Reset state
         self._usings.clear()
         self._globals.clear()
@@ -261,39 +317,43 @@ class CLikeTranspiler(ast.NodeVisitor):
         self._imports = list(map(get_id, getattr(node, "imports", [])))
         
         # Visit non-function nodes
-        body_dict: Dict[ast.AST, str] = OrderedDict()
+        body_dict: Dict[ast.AST, CodeWriter] = OrderedDict()
         for b in node.body:
             if not isinstance(b, ast.FunctionDef):
-                body_dict[b] = self.visit(b)
+                body_dict[b] = CodeWriter()
+                self.emit(b, body_dict[b])
 
         # Second pass to handle functiondefs whose body
         # may refer to other members of node.body
         for b in node.body:
             if isinstance(b, ast.FunctionDef):
-                body_dict[b] = self.visit(b)
+                body_dict[b] = CodeWriter()
+                self.emit(b, body_dict[b])
 
-        return self.join_module_body(node, body_dict)
+        self.join_module_body(node, body_dict, writer)
 
-    def join_module_body(self, node, body_dict: Dict[ast.AST, str]):
+    def join_module_body(
+        self, node, body_dict: Dict[ast.AST, CodeWriter], writer: CodeWriter
+    ):
         """Join the module's body"""
         docstring = self._get_docstring(node)
-        buf = [docstring] if docstring is not None else []
+        if docstring is not None:
+            writer.write(docstring)
 
         # Append code extras
         features = self.features()
         if features:
-            buf.append(features)
+            writer.write(features)
         usings = self.usings()
         if usings:
-            buf.append(usings)
+            writer.write(usings)
         globals = self.globals()
         if globals:
-            buf.append(globals)
+            writer.write(globals)
 
         # Add body contents
-        buf.extend([body_dict[b] for b in node.body])
-
-        return "\n".join(buf)
+        for b in node.body:
+            writer.write(body_dict[b])
 
     def visit_ClassDef(self, node):
         bases = [get_id(base) for base in node.bases]
@@ -309,10 +369,15 @@ class CLikeTranspiler(ast.NodeVisitor):
             return self.visit_IntFlag(node)
 
     def visit_FunctionDef(self, node: ast.FunctionDef) -> Any:
+        writer = CodeWriter()
+        self.emit_FunctionDef(node, writer)
+        return writer.getvalue()
+
+    def emit_FunctionDef(self, node: ast.FunctionDef, writer: CodeWriter):
         docstring = self._get_docstring(node)
-        buf = [docstring] if docstring else []
-        buf.extend([self.visit(n) for n in node.body])
-        return "\n".join(buf)
+        if docstring:
+            writer.write(docstring)
+        self.emit_body(node.body, writer)
 
     def visit_Pass(self, node) -> str:
         return self.comment("pass")
@@ -437,27 +502,47 @@ class CLikeTranspiler(ast.NodeVisitor):
         )
 
     def visit_If(self, node, use_parens=True) -> str:
-        buf = []
+        writer = CodeWriter()
+        self.emit_If(node, writer, use_parens)
+        return writer.getvalue()
+
+    def emit_If(self, node, writer: CodeWriter, use_parens=True):
         make_block = self.is_block(node)
         if make_block:
-            return self._make_block(node)
-        else:
-            if use_parens:
-                buf.append("if({0}) {{".format(self.visit(node.test)))
-            else:
-                buf.append("if {0} {{".format(self.visit(node.test)))
-        body = [self.visit(child) for child in node.body]
-        body = [b for b in body if b is not None]
-        buf.extend(body)
-
-        orelse = [self.visit(child) for child in node.orelse]
-        if orelse:
-            buf.append("} else {")
-            buf.extend(orelse)
-            buf.append("}")
+            writer.write(self._make_block(node))
+            return
+        if use_parens:
+            writer.write("if({0}) {{".format(self.visit(node.test)))
         else:
-            buf.append("}")
-        return "\n".join(buf)
+            writer.write("if {0} {{".format(self.visit(node.test)))
+        self.emit_body(node.body, writer, optional=True)
+
+        if node.orelse:
+            writer.write("} else {")
+            self.emit_body(node.orelse, writer)
+        writer.write("}")
+
+    def _starts_output_buffer(self, node) -> bool:
+        return is_buffered_output(node) and self._output_buffer is None
+
+    def _buffers_output(self, node) -> bool:
+        """Whether a print call goes to the writer of the enclosing loop"""
+        return self._output_buffer is not None and is_buffered_output(node)
+
+    def _visit_buffered_loop(self, node) -> str:
+        """Visits a loop marked by detect_buffered_output with its prints
+        going to a buffered writer, which is flushed after the loop"""
+        self._output_buffer = OUTPUT_BUFFER
+        try:
+            loop = self.visit(node)
+        finally:
+            self._output_buffer = None
+        return self._wrap_output_buffer(node, loop)
+
+    def _wrap_output_buffer(self, node, loop: str) -> str:
+        """Declares the writer before the loop and flushes it after.
+        Backends without buffered output leave the loop as it is"""
+        return loop
 
     def visit_Continue(self, node) -> str:
         return "continue;"
@@ -466,14 +551,17 @@ class CLikeTranspiler(ast.NodeVisitor):
         return "break;"
 
     def visit_While(self, node, use_parens=True) -> str:
-        buf = []
+        writer = CodeWriter()
+        self.emit_While(node, writer, use_parens)
+        return writer.getvalue()
+
+    def emit_While(self, node, writer: CodeWriter, use_parens=True):
         if use_parens:
-            buf.append("while ({0}) {{".format(self.visit(node.test)))
+            writer.write("while ({0}) {{".format(self.visit(node.test)))
         else:
-            buf.append("while {0} {{".format(self.visit(node.test)))
-        buf.extend([self.visit(n) for n in node.body])
-        buf.append("}")
-        return "\n".join(buf)
+            writer.write("while {0} {{".format(self.visit(node.test)))
+        self.emit_body(node.body, writer)
+        writer.write("}")
 
     def visit_Compare(self, node) -> str:
         if isinstance(node.ops[0], ast.In):
@@ -0,0 +1,71 @@
+from contextlib import contextmanager
+from typing import List, TextIO, Union
+
+
+class CodeWriter:
+    """Buffer that transpilers append generated lines to.
+
+    Nested blocks write into the same buffer as their parents, so the
+    text of a statement is copied once when the buffer is turned into a
+    string or written to a file, instead of once per enclosing block as
+    with "\\n".join() of the children's strings."""
+
+    def __init__(self, indent: str = ""):
+        self._lines: List[str] = []
+        self._indent = indent
+        self._level = 0
+
+    def __len__(self) -> int:
+        return len(self._lines)
+
+    def __str__(self) -> str:
+        return self.getvalue()
+
+    def write(self, code: Union[str, "CodeWriter"]):
+        """Append code, which may span several lines, or the lines of
+        another writer"""
+        if code is None:
+            # Same failure as "\n".join() of the visitors' output
+            raise TypeError("expected str instance, NoneType found")
+        if isinstance(code, CodeWriter):
+            if self._level and self._indent:
+                self.extend(code._lines)
+            else:
+                self._lines.extend(code._lines)
+            return
+        if self._level and self._indent:
+            prefix = self._indent * self._level
+            code = "\n".join(
+                prefix + line if line else line for line in code.split("\n")
+            )
+        self._lines.append(code)
+
+    def append(self, text: str):
+        """Append text to the last line"""
+        if self._lines:
+            self._lines[-1] += text
+        else:
+            self._lines.append(text)
+
+    def extend(self, lines):
+        for line in lines:
+            self.write(line)
+
+    @contextmanager
+    def indent(self, levels: int = 1):
+        """Indent the code written in the block"""
+        self._level += levels
+        try:
+            yield self
+        finally:
+            self._level -= levels
+
+    def getvalue(self) -> str:
+        return "\n".join(self._lines)
+
+    def write_to(self, stream: TextIO):
+        """Stream the code to a file without building the whole string"""
+        for i, line in enumerate(self._lines):
+            if i:
+                stream.write("\n")
+            stream.write(line)
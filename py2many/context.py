@@ -7,6 +7,11 @@ from py2many.ast_helpers import get_id
 from py2many.helpers import get_import_module_name, is_dir
 from py2many.tracer import is_list_assignment
 from .scope import ScopeMixin
+from py2many.visitor import NodeTransformer
+
+
+# List methods that grow a list
+LIST_ADDITIONS = ("append", "extend", "insert")
 
 
 def add_list_calls(node):
@@ -24,7 +29,7 @@ def add_assignment_context(node):
     return LHSAnnotationTransformer().visit(node)
 
 
-class ListCallTransformer(ast.NodeTransformer):
+class ListCallTransformer(NodeTransformer):
     """
     Adds all calls to list to scope block.
     You need to apply VariableTransformer before you use it.
@@ -33,26 +38,33 @@ class ListCallTransformer(ast.NodeTransformer):
     def visit_Call(self, node):
         if self.is_list_addition(node):
             var = node.scopes.find(node.func.value.id)
-            if var is not None and is_list_assignment(var.assigned_from):
+            if var is not None and self.is_list_definition(var):
                 if not hasattr(var, "calls"):
                     var.calls = []
-                var.calls.append(node)
+                # Core transformers run more than once
+                if node not in var.calls:
+                    var.calls.append(node)
         return node
 
+    def is_list_definition(self, var):
+        assigned_from = getattr(var, "assigned_from", None)
+        if isinstance(assigned_from, ast.AnnAssign):
+            return isinstance(assigned_from.value, ast.List)
+        return is_list_assignment(assigned_from)
+
     def is_list_addition(self, node):
         """Check if operation is adding something to a list"""
-        list_operations = ["append", "extend", "insert"]
         return (
             hasattr(node.func, "ctx")
             and isinstance(node.func.ctx, ast.Load)
             and hasattr(node.func, "value")
             and isinstance(node.func.value, ast.Name)
             and hasattr(node.func, "attr")
-            and node.func.attr in list_operations
+            and node.func.attr in LIST_ADDITIONS
         )
 
 
-class VariableTransformer(ast.NodeTransformer, ScopeMixin):
+class VariableTransformer(NodeTransformer, ScopeMixin):
     """Adds all defined variables to scope block"""
 
     def __init__(self, trees):
@@ -267,7 +279,7 @@ class VariableTransformer(ast.NodeTransformer, ScopeMixin):
             self.scope.vars.extend([t for t in target.elts])
 
 
-class LHSAnnotationTransformer(ast.NodeTransformer):
+class LHSAnnotationTransformer(NodeTransformer):
     def __init__(self):
         super().__init__()
         self._lhs = False
@@ -2,9 +2,10 @@ import ast
 from typing import Any, Dict, Tuple
 
 from py2many.ast_helpers import get_id
+from py2many.visitor import NodeVisitor
 
 
-class DeclarationExtractor(ast.NodeVisitor):
+class DeclarationExtractor(NodeVisitor):
     def __init__(self, transpiler):
         self.transpiler = transpiler
         # maps name -> (type, default_value)
@@ -0,0 +1,111 @@
+import difflib
+import hashlib
+import mmap
+import os
+import string
+import tempfile
+
+from pathlib import Path
+from typing import Dict, List, Optional
+
+WHITESPACE = string.whitespace.encode("ascii")
+
+
+class ExpectedOutputs:
+    """Golden files of a directory (e.g. tests/expected), indexed by file name.
+
+    The directory is listed once. Files are memory mapped and hashed on
+    first use, so comparing an output only hashes it. The expected file
+    is decoded and diffed only on mismatch"""
+
+    def __init__(self, directory, ignore_whitespace: bool = False):
+        self.directory = Path(directory)
+        self.ignore_whitespace = ignore_whitespace
+        self._names = set()
+        if self.directory.is_dir():
+            self._names = {p.name for p in self.directory.iterdir() if p.is_file()}
+        # name -> (mtime, size, digest)
+        self._digests = {}
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._names
+
+    def __len__(self) -> int:
+        return len(self._names)
+
+    def path(self, name: str) -> Path:
+        return self.directory / name
+
+    def read(self, name: str) -> str:
+        return self.path(name).read_text(encoding="utf-8")
+
+    def _hash(self, data) -> bytes:
+        if self.ignore_whitespace:
+            data = bytes(data).translate(None, WHITESPACE)
+        return hashlib.blake2b(data, digest_size=16).digest()
+
+    def digest(self, name: str) -> bytes:
+        if name not in self._names:
+            raise FileNotFoundError(self.path(name))
+        with open(self.path(name), "rb") as f:
+            stat = os.fstat(f.fileno())
+            cached = self._digests.get(name)
+            if cached and cached[:2] == (stat.st_mtime_ns, stat.st_size):
+                return cached[2]
+            if stat.st_size:
+                with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as m:
+                    digest = self._hash(m)
+            else:
+                digest = self._hash(b"")
+        self._digests[name] = (stat.st_mtime_ns, stat.st_size, digest)
+        return digest
+
+    def load(self) -> None:
+        """Hashes all the files upfront, e.g. before forking workers"""
+        for name in self._names:
+            self.digest(name)
+
+    def matches(self, name: str, generated: str) -> bool:
+        return self._hash(generated.encode("utf-8")) == self.digest(name)
+
+    def compare(self, name: str, generated: str) -> Optional[str]:
+        """Returns None if generated matches the expected file,
+        otherwise a unified diff"""
+        if self.matches(name, generated):
+            return None
+        diff = difflib.unified_diff(
+            self.read(name).splitlines(keepends=True),
+            generated.splitlines(keepends=True),
+            fromfile=f"expected/{name}",
+            tofile=f"generated/{name}",
+        )
+        return "".join(diff)
+
+    def update(self, outputs: Dict[str, str]) -> List[str]:
+        """Rewrites the expected files whose content changed. All the new
+        files are written before any of them replaces an expected file, so
+        a failure leaves the directory untouched. Returns the changed names"""
+        changed = {
+            name: text
+            for name, text in outputs.items()
+            if name not in self._names or self.read(name) != text
+        }
+        self.directory.mkdir(parents=True, exist_ok=True)
+        tmp_files = {}
+        try:
+            for name, text in changed.items():
+                fd, tmp_name = tempfile.mkstemp(
+                    dir=self.directory, prefix=f".{name}.", suffix=".tmp"
+                )
+                tmp_files[name] = tmp_name
+                with os.fdopen(fd, "w", encoding="utf-8", newline="") as f:
+                    f.write(text)
+        except BaseException:
+            for tmp_name in tmp_files.values():
+                os.unlink(tmp_name)
+            raise
+        for name, tmp_name in tmp_files.items():
+            os.replace(tmp_name, self.path(name))
+            self._names.add(name)
+            self._digests.pop(name, None)
+        return sorted(changed)
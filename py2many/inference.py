@@ -5,7 +5,6 @@ from ctypes import c_int8, c_int16, c_int32, c_int64
 from ctypes import c_uint8, c_uint16, c_uint32, c_uint64
 from dataclasses import dataclass
 import math
-import re
 from typing import Any, Dict, List, Tuple, cast, Set, Optional
 
 from py2many.analysis import get_id
@@ -14,16 +13,8 @@ from py2many.astx import LifeTime
 from py2many.clike import CLikeTranspiler, class_for_typename
 from py2many.exceptions import AstIncompatibleAssign
 from py2many.tracer import find_node_by_type, find_parent_of_type, is_enum
-
-try:
-    from typpete.inference_runner import infer as infer_types_ast
-    from typpete.src.context import Context
-    from typpete.src.z3_types import TypesSolver
-except ModuleNotFoundError:
-
-    def infer_types_ast(node):
-        return node
-
+from py2many.type_terms import from_annotation
+from py2many.visitor import NodeTransformer
 
 @dataclass
 class InferMeta:
@@ -40,17 +31,6 @@ def add_is_annotation(node):
     return AnnotationVisitor().visit(node)
 
 
-def infer_types_typpete(node) -> InferMeta:
-    solver = TypesSolver(node)
-    context = Context(node, node.body, solver)
-    for stmt in node.body:
-        infer_types_ast(stmt, context, solver)
-
-    solver.push()
-
-    return InferMeta(True)
-
-
 def get_inferred_type(node):
     if hasattr(node, "annotation"):
         return node.annotation
@@ -118,7 +98,10 @@ class FuncTypeDispatch():
                         ann = getattr(attr_node.target_node, 'annotation', None)
             else:
                 ann = getattr(node.scopes.find(arg_id), 'annotation', None)
-            if ann:
+            term = from_annotation(ann) if ann else None
+            if term:
+                ann_ids.append(str(term))
+            elif ann:
                 ann_ids.append(unparse(ann))
             else:
                 ann_ids.append("Any")
@@ -142,7 +125,7 @@ class FuncTypeDispatch():
             return ast.unparse(node_type.slice)
         return None
 
-class AnnotationVisitor(ast.NodeTransformer):
+class AnnotationVisitor(NodeTransformer):
     """Add is_annotation attribute to all annotations"""
     def __init__(self) -> None:
         super().__init__()
@@ -179,7 +162,7 @@ class AnnotationVisitor(ast.NodeTransformer):
 # TODO: Cross-Module support
 _class_attribute_types = {}
 
-class InferTypesTransformer(ast.NodeTransformer):
+class InferTypesTransformer(NodeTransformer):
     """
     Tries to infer types
     """
@@ -834,7 +817,7 @@ class InferTypesTransformer(ast.NodeTransformer):
                     isinstance(node.target, ast.Tuple):
                 for elt, ann in zip(node.target.elts, node.iter.annotation.elts):
                     if isinstance(ann, ast.Subscript) and \
-                            re.match(r"list|List|tuple|Tuple", get_id(ann.value)):
+                            getattr(from_annotation(ann.value), "name", None) in ("list", "tuple"):
                         elt.annotation = ann.slice
                     else:
                         elt.annotation = ann
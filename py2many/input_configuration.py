@@ -10,6 +10,7 @@ from py2many.ast_helpers import get_id
 
 import configparser
 import logging
+from py2many.visitor import NodeTransformer
 
 logger = logging.Logger("py2many")
 
@@ -119,18 +120,24 @@ class ParseAnnotations():
 
         # Get fields
         temp_dict = self._parsed_data
+        # Whether the innermost scope, the node itself, has an entry.
+        # Otherwise a nested function would get the fields of its parent
+        matched = False
 
         for scope in node.scopes[1:]:
+            matched = False
             if isinstance(scope, ast.ClassDef) and \
                     "classes" in temp_dict and \
                     get_id(scope) in temp_dict["classes"]:
                 temp_dict = temp_dict["classes"][get_id(scope)]
+                matched = True
             if isinstance(scope, ast.FunctionDef) and \
                     "functions" in temp_dict and \
                     get_id(scope) in temp_dict["functions"]:
                 temp_dict = temp_dict["functions"][get_id(scope)]
+                matched = True
 
-        if temp_dict and temp_dict != self._parsed_data:
+        if matched and temp_dict:
             node_field_map |= temp_dict
 
         return node_field_map
@@ -162,7 +169,7 @@ def config_rewriters(config_handler: ConfigFileHandler, tree):
         FlagRewriter(flags).visit(tree)
 
 
-class FlagRewriter(ast.NodeTransformer):
+class FlagRewriter(NodeTransformer):
     def __init__(self, flags):
         super().__init__()
         self._flags: Dict = flags
@@ -179,7 +186,7 @@ class FlagRewriter(ast.NodeTransformer):
         return node
 
 
-class AnnotationRewriter(ast.NodeTransformer):
+class AnnotationRewriter(NodeTransformer):
     def __init__(self, parser: ParseAnnotations):
         super().__init__()
         self._parser = parser
@@ -199,9 +206,26 @@ class AnnotationRewriter(ast.NodeTransformer):
             args_map = node_field_map["args"]
             for arg in node.args.args:
                 if arg.arg in args_map:
-                    arg.annotation = ast.Name(args_map[arg.arg])
+                    arg.annotation = _parse_type(args_map[arg.arg])
+
+        if "returns" in node_field_map:
+            node.returns = _parse_type(node_field_map["returns"])
+
+        if "hotness" in node_field_map:
+            self._set_hotness(node, node_field_map["hotness"])
         return node
 
+    def _set_hotness(self, node: ast.FunctionDef, hotness):
+        """Sets the counts recorded by py2many record: call_count on the
+        function, and iterations and trip_count (the most iterations of a
+        single run) on its loops"""
+        node.call_count = hotness.get("calls", 0)
+        loops = hotness.get("loops", {})
+        for loop in _function_loops(node):
+            if counts := loops.get(str(loop.lineno - node.lineno)):
+                loop.iterations = counts["iterations"]
+                loop.trip_count = counts["max_trips"]
+
     def visit_ClassDef(self, node):
         self.generic_visit(node)
         node_field_map = self._parser.get_attributes(node)
@@ -216,6 +240,29 @@ class AnnotationRewriter(ast.NodeTransformer):
         return node
 
 
+def _parse_type(type_str: str) -> ast.expr:
+    try:
+        return ast.parse(type_str, mode="eval").body
+    except SyntaxError:
+        return ast.Name(type_str)
+
+
+def _function_loops(node: ast.FunctionDef):
+    """The loops of a function, without those of nested functions"""
+    stack = list(node.body)
+    while stack:
+        stmt = stack.pop()
+        if isinstance(stmt, (ast.FunctionDef, ast.ClassDef, ast.AsyncFunctionDef)):
+            continue
+        if isinstance(stmt, (ast.For, ast.While)):
+            yield stmt
+        stack.extend(
+            child
+            for child in ast.iter_child_nodes(stmt)
+            if isinstance(child, (ast.stmt, ast.excepthandler))
+        )
+
+
 DEFAULTS_DISPATCH_MAP = {
     "annotations": lambda self, name, value: ParseAnnotations(value)
 }
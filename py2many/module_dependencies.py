@@ -2,9 +2,10 @@
 import ast
 
 from py2many.helpers import is_dir
+from py2many.visitor import NodeTransformer
 
 
-class AnalyseModuleDependencies(ast.NodeTransformer):
+class AnalyseModuleDependencies(NodeTransformer):
     USE_MODULES = False
 
     def __init__(self) -> None:
@@ -0,0 +1,300 @@
+import ast
+import hashlib
+import pickle
+
+from pathlib import Path
+from typing import Dict, NamedTuple, Optional
+
+from py2many.analysis import ReturnFinder
+from py2many.ast_helpers import get_id
+
+from .scope import add_scope_context
+from .toposort_modules import get_module_dependencies
+
+# Attributes added by analysis passes that dependent modules rely on
+# when they look up an imported definition
+FUNCTION_ATTRS = ["annotation", "self_type"]
+
+# Bump when the format of the summary files changes
+SUMMARY_VERSION = "1"
+SUMMARY_SUFFIX = ".summary"
+
+
+def summarize_module(tree: ast.Module) -> ast.Module:
+    """Builds a compact stub module that holds the interface of an
+    already transpiled module. The stub can replace the full tree in
+    cross module lookups (see VariableTransformer.visit_ImportFrom)"""
+    return ModuleSummaryBuilder(tree).build()
+
+
+def clone_node(node):
+    """Copies a node and its fields, dropping all attributes added
+    by analysis passes (scopes, assigned_from, ...), so that the copy
+    does not keep the original tree alive"""
+    if isinstance(node, list):
+        return [clone_node(n) for n in node]
+    if not isinstance(node, ast.AST):
+        return node
+    new_node = type(node)(
+        **{f: clone_node(getattr(node, f, None)) for f in node._fields}
+    )
+    lifetime = getattr(node, "lifetime", None)
+    if lifetime is not None:
+        new_node.lifetime = lifetime
+    return new_node
+
+
+class ModuleSummaryBuilder:
+    """Replaces function bodies with stubs and keeps only
+    the annotations of module and class level variables"""
+
+    def __init__(self, tree: ast.Module):
+        self._tree = tree
+
+    def build(self) -> ast.Module:
+        summary = ast.Module(body=[], type_ignores=[])
+        summary.__file__ = getattr(self._tree, "__file__", None)
+        summary.__basedir__ = getattr(self._tree, "__basedir__", None)
+        if hasattr(self._tree, "use_modules"):
+            summary.use_modules = self._tree.use_modules
+        imported = []
+        summary.vars = self._summarize_vars(
+            getattr(self._tree, "vars", []), summary.body, imported
+        )
+        add_scope_context(summary)
+        # Names re-exported from other modules are already summaries
+        summary.vars.extend(imported)
+        return summary
+
+    def _summarize_vars(self, vars, body, imported=None):
+        summarized = []
+        seen = set()
+        for var in vars:
+            var_id = get_id(var)
+            if var_id is None or var_id in seen:
+                continue
+            seen.add(var_id)
+            if imported is not None and self._is_imported(var):
+                imported.append(var)
+                continue
+            if isinstance(var, ast.FunctionDef):
+                stub = self._summarize_function(var)
+                body.append(stub)
+            elif isinstance(var, ast.ClassDef):
+                stub = self._summarize_class(var)
+                body.append(stub)
+            else:
+                stub = self._summarize_name(var_id, var)
+                body.append(stub.assigned_from)
+            summarized.append(stub)
+        return summarized
+
+    def _is_imported(self, var):
+        # Rewriters may replace the module node, so
+        # compare files rather than node identity
+        scopes = getattr(var, "scopes", None)
+        if not scopes:
+            return False
+        return getattr(scopes[0], "__file__", None) != self._tree.__file__
+
+    def _summarize_function(self, node: ast.FunctionDef):
+        finder = ReturnFinder()
+        finder.visit(node)
+        returns = clone_node(node.returns)
+        if finder.returns and returns is None:
+            # Keep is_void_function accurate for uninferred returns
+            body = [ast.Return(value=ast.Constant(value=...))]
+        else:
+            body = [ast.Expr(value=ast.Constant(value=...))]
+        stub = ast.FunctionDef(
+            name=node.name,
+            args=clone_node(node.args),
+            body=body,
+            decorator_list=clone_node(node.decorator_list),
+            returns=returns,
+            type_comment=None,
+        )
+        for attr in FUNCTION_ATTRS:
+            if (val := getattr(node, attr, None)) is not None:
+                setattr(stub, attr, clone_node(val))
+        if (decs := getattr(node, "parsed_decorators", None)) is not None:
+            stub.parsed_decorators = self._clone_decorators(decs)
+        stub.vars = []
+        for arg in stub.args.args:
+            arg.assigned_from = stub
+            stub.vars.append(arg)
+        return stub
+
+    def _summarize_class(self, node: ast.ClassDef):
+        stub = ast.ClassDef(
+            name=node.name,
+            bases=clone_node(node.bases),
+            keywords=clone_node(node.keywords),
+            body=[],
+            decorator_list=clone_node(node.decorator_list),
+        )
+        if (ann := getattr(node, "annotation", None)) is not None:
+            stub.annotation = clone_node(ann)
+        if (decs := getattr(node, "parsed_decorators", None)) is not None:
+            stub.parsed_decorators = self._clone_decorators(decs)
+        stub.vars = []
+        class_vars = getattr(node, "vars", [])
+        for var in class_vars:
+            if target := getattr(var, "target_node", None):
+                # Instance attributes (self.x = ...)
+                self_var = ast.Name(id=get_id(var))
+                self_var.target_node = clone_node(target)
+                if (ann := getattr(target, "annotation", None)) is not None:
+                    self_var.target_node.annotation = clone_node(ann)
+                stub.vars.append(self_var)
+        stub.vars = (
+            self._summarize_vars(
+                [v for v in class_vars if not hasattr(v, "target_node")], stub.body
+            )
+            + stub.vars
+        )
+        if not stub.body:
+            stub.body.append(ast.Pass())
+        return stub
+
+    def _clone_decorators(self, parsed_decorators):
+        return {
+            name: (
+                {k: clone_node(v) for k, v in keywords.items()}
+                if isinstance(keywords, dict)
+                else keywords
+            )
+            for name, keywords in parsed_decorators.items()
+        }
+
+    def _summarize_name(self, var_id, var):
+        name = ast.Name(id=var_id, ctx=ast.Store())
+        annotation = getattr(var, "annotation", None)
+        assigned_from = getattr(var, "assigned_from", None)
+        value = getattr(assigned_from, "value", None)
+        # Only constants are cheap enough to keep
+        value = (
+            clone_node(value)
+            if isinstance(value, ast.Constant)
+            else ast.Constant(value=...)
+        )
+        if annotation is not None:
+            name.annotation = clone_node(annotation)
+            name.assigned_from = ast.AnnAssign(
+                target=name,
+                annotation=clone_node(annotation),
+                value=value,
+                simple=1,
+            )
+        else:
+            name.assigned_from = ast.Assign(targets=[name], value=value)
+        return name
+
+
+class SummaryFile(NamedTuple):
+    summary: ast.Module
+    # Interface hashes of the dependencies the module was transpiled with
+    dep_hashes: Dict[str, Optional[str]]
+    interface_hash: str
+
+
+def summary_path(output_path: Path) -> Path:
+    """Summaries are written next to the output of their module"""
+    return output_path.with_name(output_path.name + SUMMARY_SUFFIX)
+
+
+def summary_key(source: str, options: str = "") -> str:
+    """Identifies a source transpiled with the given options"""
+    return _hashcontents("\0".join([SUMMARY_VERSION, options, source]).encode("utf-8"))
+
+
+def write_summary(path: Path, summary: ast.Module, key: str, dep_hashes) -> str:
+    """Writes the summary of a module and returns the hash of its
+    interface, which dependent modules record to detect changes"""
+    data = pickle.dumps(summary)
+    interface_hash = _hashcontents(data)
+    with open(path, "wb") as f:
+        # The header is read on its own to check if the summary is stale
+        pickle.dump((SUMMARY_VERSION, key, dep_hashes, interface_hash), f)
+        f.write(data)
+    return interface_hash
+
+
+def load_summary(path: Path, key: str) -> Optional[SummaryFile]:
+    """The summary at path if it was written for the source with the
+    given key, None if it is missing or stale"""
+    try:
+        with open(path, "rb") as f:
+            version, file_key, dep_hashes, interface_hash = pickle.load(f)
+            if version != SUMMARY_VERSION or file_key != key:
+                return None
+            summary = pickle.load(f)
+    except (OSError, EOFError, ValueError, TypeError, pickle.UnpicklingError):
+        return None
+    return SummaryFile(summary, dep_hashes, interface_hash)
+
+
+class SummaryLoader:
+    """Loads the summaries an earlier run wrote for modules that are not
+    transpiled now, so that a module can be transpiled without parsing
+    and analysing the sources of its dependencies. A summary is used only
+    if it is up to date with the source of its module and with the
+    summaries of the modules it depends on"""
+
+    def __init__(self, source_dir: Path, output_dir: Path, ext: str, options=""):
+        self._source_dir = source_dir
+        self._output_dir = output_dir
+        self._ext = ext
+        self._options = options
+        self._loaded: Dict[str, Optional[SummaryFile]] = {}
+
+    def __contains__(self, module: str) -> bool:
+        # Used as the set of known modules by get_module_dependencies
+        path = self._relative_path(module)
+        return path is not None and (self._source_dir / f"{path}.py").is_file()
+
+    def _relative_path(self, module: str) -> Optional[Path]:
+        parts = module.split(".")
+        if not all(parts):
+            return None
+        return Path(*parts)
+
+    def dependencies(self, tree: ast.Module, exclude=()) -> Dict[str, SummaryFile]:
+        """Up to date summaries of the modules tree imports from,
+        other than the ones in exclude"""
+        ret = {}
+        for module in sorted(get_module_dependencies(tree, self)):
+            if module in exclude:
+                continue
+            if (summary_file := self.load(module)) is not None:
+                ret[module] = summary_file
+        return ret
+
+    def load(self, module: str) -> Optional[SummaryFile]:
+        if module in self._loaded:
+            return self._loaded[module]
+        # Import cycles are not up to date
+        self._loaded[module] = None
+        path = self._relative_path(module)
+        if path is None:
+            return None
+        try:
+            with open(self._source_dir / f"{path}.py", encoding="utf-8") as f:
+                source = f.read()
+        except OSError:
+            return None
+        output_path = self._output_dir / f"{path}{self._ext}"
+        summary_file = load_summary(
+            summary_path(output_path), summary_key(source, self._options)
+        )
+        if summary_file is not None and all(
+            (dep := self.load(dep_module)) is not None
+            and dep.interface_hash == dep_hash
+            for dep_module, dep_hash in summary_file.dep_hashes.items()
+        ):
+            self._loaded[module] = summary_file
+        return self._loaded[module]
+
+
+def _hashcontents(contents: bytes) -> str:
+    return hashlib.sha256(contents).hexdigest()
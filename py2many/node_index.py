@@ -0,0 +1,171 @@
+import ast
+
+from collections import defaultdict
+from typing import Callable, Dict, Iterable, List, Optional, Set
+
+from py2many.visitor import child_fields
+
+
+class Interests:
+    """What a rewriter acts on: node types, calls to functions or methods
+    with one of the given names, and imports of the given top level
+    modules. A rewriter with an `interests` attribute is only run on
+    modules that contain one of them.
+
+    With prune set, the rewriter only changes the nodes of interest and
+    their ancestors, so generic_visit skips the subtrees that contain
+    none of them."""
+
+    def __init__(
+        self,
+        nodes: Iterable[type] = (),
+        calls: Iterable[str] = (),
+        imports: Iterable[str] = (),
+        prune: bool = False,
+    ):
+        self.nodes = tuple(nodes)
+        self.calls = frozenset(calls)
+        self.imports = frozenset(imports)
+        self.prune = prune
+
+
+class NodeIndex:
+    """Index of a module from node type, call name and imported module to
+    nodes, with the parent of every node.
+
+    Rewriters may change the tree in place anywhere, so the index is
+    rebuilt lazily once a rewriter has run. Skipped rewriters leave it
+    valid, so a run of rewriters that have nothing to do costs a single
+    walk of the tree."""
+
+    def __init__(self, tree: ast.AST):
+        self._tree = tree
+        self._built = False
+        self._by_type: Dict[type, List[ast.AST]] = {}
+        self._by_call: Dict[str, List[ast.Call]] = {}
+        self._by_import: Dict[str, List[ast.AST]] = {}
+        self._parents: Dict[int, ast.AST] = {}
+
+    def invalidate(self, tree: Optional[ast.AST] = None):
+        if tree is not None:
+            self._tree = tree
+        self._built = False
+
+    def _build(self):
+        by_type = defaultdict(list)
+        by_call = defaultdict(list)
+        by_import = defaultdict(list)
+        parents = {}
+        stack = [self._tree]
+        while stack:
+            node = stack.pop()
+            by_type[node.__class__].append(node)
+            if isinstance(node, ast.Call):
+                name = _call_name(node)
+                if name is not None:
+                    by_call[name].append(node)
+            elif isinstance(node, (ast.Import, ast.ImportFrom)):
+                for module in _imported_modules(node):
+                    by_import[module].append(node)
+            for field in child_fields(node.__class__):
+                value = getattr(node, field, None)
+                if isinstance(value, list):
+                    for child in value:
+                        if isinstance(child, ast.AST):
+                            parents[id(child)] = node
+                            stack.append(child)
+                elif isinstance(value, ast.AST):
+                    parents[id(value)] = node
+                    stack.append(value)
+        self._by_type = dict(by_type)
+        self._by_call = dict(by_call)
+        self._by_import = dict(by_import)
+        self._parents = parents
+        self._built = True
+
+    def nodes(self, interests: Interests) -> List[ast.AST]:
+        """Nodes of the module matching interests"""
+        if not self._built:
+            self._build()
+        found = []
+        if interests.nodes:
+            for node_type, nodes in self._by_type.items():
+                if issubclass(node_type, interests.nodes):
+                    found.extend(nodes)
+        for name in interests.calls:
+            found.extend(self._by_call.get(name, []))
+        for module in interests.imports:
+            found.extend(self._by_import.get(module, []))
+        return found
+
+    def parent(self, node: ast.AST) -> Optional[ast.AST]:
+        if not self._built:
+            self._build()
+        return self._parents.get(id(node))
+
+    def ancestors(self, node: ast.AST) -> Iterable[ast.AST]:
+        parent = self.parent(node)
+        while parent is not None:
+            yield parent
+            parent = self._parents.get(id(parent))
+
+    def relevant(self, interests: Interests) -> Set[int]:
+        """ids of the nodes matching interests and of their ancestors"""
+        relevant = set()
+        for node in self.nodes(interests):
+            if id(node) in relevant:
+                continue
+            relevant.add(id(node))
+            for ancestor in self.ancestors(node):
+                if id(ancestor) in relevant:
+                    break
+                relevant.add(id(ancestor))
+        return relevant
+
+    def run(self, rewriter, tree: ast.AST) -> ast.AST:
+        """Run a rewriter on the module, unless it declares interests
+        that the module doesn't match"""
+        interests = getattr(rewriter, "interests", None)
+        if interests is None:
+            tree = rewriter.visit(tree)
+            self.invalidate(tree)
+            return tree
+        relevant = self.relevant(interests)
+        if not relevant:
+            return tree
+        if interests.prune:
+            rewriter.prune = self._pruner(relevant)
+        try:
+            tree = rewriter.visit(tree)
+        finally:
+            if interests.prune:
+                rewriter.prune = None
+        self.invalidate(tree)
+        return tree
+
+    def _pruner(self, relevant: Set[int]) -> Callable[[ast.AST], bool]:
+        parents = self._parents
+
+        def prune(node):
+            # Nodes the rewriter created aren't indexed and are walked
+            key = id(node)
+            return key in parents and key not in relevant
+
+        return prune
+
+
+def _call_name(node: ast.Call) -> Optional[str]:
+    func = node.func
+    if isinstance(func, ast.Name):
+        return func.id
+    if isinstance(func, ast.Attribute):
+        return func.attr
+    return None
+
+
+def _imported_modules(node) -> List[str]:
+    if isinstance(node, ast.Import):
+        return [alias.name.split(".")[0] for alias in node.names]
+    if node.module and not node.level:
+        return [node.module.split(".")[0]]
+    return []
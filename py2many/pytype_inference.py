@@ -1,6 +1,12 @@
+import ast
 import os
-from pathlib import PosixPath
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path, PosixPath
 import hashlib
+import sqlite3
+from typing import Dict, List, Optional, Tuple
+
+from toposort import toposort as toposort_levels
 try:
     from pytype import analyze, errors, config, load_pytd
     from pytype.pytd import pytd_utils
@@ -9,10 +15,14 @@ try:
 except ModuleNotFoundError:
     import logging
     log_errors = logging.Logger("py2many")
-    def pytype_annotate_and_merge(source, basedir, filename):
-        return source
+    analyze = None
 
 from py2many.helpers import parse_path
+from py2many.toposort_modules import get_dependencies, module_for_path
+
+# Bump when the format of the cached .pyi changes
+CACHE_VERSION = "1"
+CACHE_FILE = "cache.sqlite"
 
 # Args class taken from pytd_utils
 class Args:
@@ -29,77 +39,180 @@ class Args:
     }
     return exts[int(self.as_comments)] + '.py'
 
+
+class PyiCache:
+    """Stores inferred .pyi sources in SQLite. Entries are keyed on the
+    module and on a hash of its source and of the interfaces of its
+    dependencies, so that a change in the types of a dependency
+    invalidates the modules that import it. Concurrent runs are
+    serialized by SQLite"""
+
+    def __init__(self, path: str):
+        self._conn = sqlite3.connect(path, timeout=60, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS pyi ("
+            "module TEXT NOT NULL, key TEXT NOT NULL, "
+            "interface_hash TEXT NOT NULL, pyi TEXT NOT NULL, "
+            "PRIMARY KEY (module, key))"
+        )
+
+    def get(self, module: str, key: str) -> Optional[Tuple[str, str]]:
+        """Returns the .pyi source and its hash"""
+        return self._conn.execute(
+            "SELECT pyi, interface_hash FROM pyi WHERE module = ? AND key = ?",
+            (module, key),
+        ).fetchone()
+
+    def put(self, module: str, key: str, pyi_src: str) -> str:
+        interface_hash = _hashcontents(pyi_src)
+        with self._conn:
+            self._conn.execute("BEGIN IMMEDIATE")
+            # Older entries can't be hit again once the module changed
+            self._conn.execute(
+                "DELETE FROM pyi WHERE module = ? AND key != ?", (module, key)
+            )
+            self._conn.execute(
+                "INSERT OR REPLACE INTO pyi VALUES (?, ?, ?, ?)",
+                (module, key, interface_hash, pyi_src),
+            )
+        return interface_hash
+
+    def close(self):
+        self._conn.close()
+
+
 def pytype_annotate_and_merge(src: str, basedir: PosixPath, filename: PosixPath):
+    return pytype_annotate_and_merge_many([src], basedir, [filename])[0]
+
+
+def pytype_annotate_and_merge_many(
+    sources: List[str],
+    basedir: PosixPath,
+    filenames: List[PosixPath],
+    jobs: Optional[int] = None,
+) -> List[str]:
+    """Annotates the sources with the types inferred by pytype"""
+    if analyze is None:
+        return list(sources)
+    pyi_srcs = pytype_infer_modules(sources, basedir, filenames, jobs)
+    return [
+        pytype_merge(src, pyi_srcs[module_for_path(filename)])
+        for src, filename in zip(sources, filenames)
+    ]
+
+
+def pytype_merge(src: str, pyi_src: str) -> str:
+    # Set as_comments to 0
+    args = Args(as_comments = 0)
+    return merge_pyi.annotate_string(args, src, pyi_src)
+
+
+def pytype_infer_modules(
+    sources: List[str],
+    basedir: PosixPath,
+    filenames: List[PosixPath],
+    jobs: Optional[int] = None,
+) -> Dict[str, str]:
+    """Infers the .pyi of each module, visiting the module graph one level
+    at a time. Modules of a level don't depend on each other, so their
+    cache misses are inferred in parallel. The .pyi of every module is
+    written to the pyi directory, which is on the pythonpath of pytype,
+    before its dependents are inferred"""
+    if analyze is None:
+        return {}
+    pyi_dir = _get_pyi_dir(basedir)
+    os.makedirs(pyi_dir, exist_ok=True)
+    # Create .gitignore to ignore .pyi data
+    _create_gitignore(pyi_dir)
+
+    module_sources = {
+        module_for_path(filename): src for src, filename in zip(sources, filenames)
+    }
+    deps = _get_module_graph(sources, basedir, filenames)
+    cache = PyiCache(os.path.join(pyi_dir, CACHE_FILE))
+    interface_hashes = {}
+    pyi_srcs = {}
+    pool = None
+    try:
+        for level in toposort_levels(deps):
+            misses = {}
+            for module in sorted(level):
+                key = _cache_key(module_sources[module], deps[module], interface_hashes)
+                cached = cache.get(module, key)
+                if cached:
+                    pyi_srcs[module], interface_hashes[module] = cached
+                else:
+                    misses[module] = key
+            if misses:
+                print(f"Infering Types: {', '.join(misses)}")
+            if len(misses) > 1:
+                if pool is None:
+                    pool = ProcessPoolExecutor(max_workers=jobs)
+                futures = {
+                    m: pool.submit(_infer_types, module_sources[m], m, pyi_dir)
+                    for m in misses
+                }
+                inferred = {m: f.result() for m, f in futures.items()}
+            else:
+                inferred = {
+                    m: _infer_types(module_sources[m], m, pyi_dir) for m in misses
+                }
+            for module, pyi_src in inferred.items():
+                interface_hashes[module] = cache.put(module, misses[module], pyi_src)
+                pyi_srcs[module] = pyi_src
+            for module in level:
+                _write_to_pyi_file(pyi_dir, module, pyi_srcs[module])
+    finally:
+        if pool is not None:
+            pool.shutdown()
+        cache.close()
+    return pyi_srcs
+
+
+def _get_module_graph(sources, basedir, filenames):
+    trees = []
+    for src, filename in zip(sources, filenames):
+        tree = ast.parse(src)
+        tree.__file__ = filename
+        tree.__basedir__ = basedir
+        trees.append(tree)
+    return get_dependencies(trees)
+
+
+def _cache_key(src: str, deps, interface_hashes: Dict[str, str]) -> str:
+    dep_hashes = [f"{dep}:{interface_hashes[dep]}" for dep in sorted(deps)]
+    return _hashcontents("\0".join([CACHE_VERSION, src] + dep_hashes))
+
+
+def _get_pyi_dir(basedir: PosixPath) -> str:
     pre_parsed_base_dir = f"{os.getcwd()}{os.sep}{basedir}" \
         if os.path.isdir(f"{os.getcwd()}{os.sep}{basedir}") \
         else f"{os.getcwd()}{os.sep}{basedir.parent}"
     base_dir = parse_path(pre_parsed_base_dir.split(os.sep), os.sep)
-    pyi_dir = f"{base_dir}_pyi"
-    pyi_file = f"{pyi_dir}{os.sep}{filename.stem}.pyi"
-    file_path = f"{base_dir}{os.sep}{filename}"
-    pyi_log_file = f"{pyi_dir}{os.sep}.log"
-    log_data: dict[str, str] = _read_log_file_contents(pyi_log_file)
-    hash = _hashcontents(src)
-    if file_path in log_data and \
-            hash == log_data[file_path]:
-        # If a file already exists and is up-to-date, 
-        # use that instead of infering the types again
-        print("Types already up-to-date")
-        with open(pyi_file, "r") as f:
-            pyi_src = f.read()
-    else:
-        # Otherwise, infer the types and create the .pyi file
-        print("Infering Types")
-        pyi_src = _infer_types(src)
-        _write_to_pyi_file(pyi_dir, pyi_file, pyi_src)
-        _append_to_log_file(pyi_log_file, (file_path, hash))
-    # Create .gitignore to ignore .pyi data
-    _create_gitignore(pyi_dir)
-    # Set as_comments to 0
-    args = Args(as_comments = 0)
-    annotated_src = merge_pyi.annotate_string(args, src, pyi_src)
-    return annotated_src
+    return f"{base_dir}_pyi"
 
-def _infer_types(src):
-    options = config.Options.create()
+def _infer_types(src, module_name=None, pyi_dir=None):
+    options = config.Options.create(module_name=module_name, pythonpath=pyi_dir)
     # typed_ast is an instance of TypeDeclUnit
-    typed_ast, _ = analyze.infer_types(src, log_errors, 
+    typed_ast, _ = analyze.infer_types(src, log_errors,
         options, load_pytd.Loader(options))
     return pytd_utils.Print(typed_ast)
 
-def _write_to_pyi_file(pyi_dir: str, pyi_file: str, pyi_src: str):
-    if not os.path.isdir(pyi_dir):
-        os.mkdir(pyi_dir)
-    with open(pyi_file, "w") as f:
-        f.write(pyi_src)
+def _write_to_pyi_file(pyi_dir: str, module: str, pyi_src: str):
+    pyi_file = Path(pyi_dir, *module.split(".")).with_suffix(".pyi")
+    pyi_file.parent.mkdir(parents=True, exist_ok=True)
+    if pyi_file.is_file() and pyi_file.read_text() == pyi_src:
+        return
+    # Concurrent runs may read the file while it is written
+    tmp_file = pyi_file.with_name(f"{pyi_file.name}.{os.getpid()}")
+    tmp_file.write_text(pyi_src)
+    os.replace(tmp_file, pyi_file)
 
 def _hashcontents(contents: str):
     hash_object = hashlib.sha256(bytes(contents, 'utf-8'))
     return hash_object.hexdigest()
 
-def _read_log_file_contents(pyi_log_file):
-    """Reads stored contents containing 
-    data about inferred python modules"""
-    log_data = {}
-    if os.path.isfile(pyi_log_file):
-        with open(pyi_log_file, "r") as log:
-            try:
-                line = log.readline()
-                while line:
-                    mod_name, hash = line.split("-")
-                    log_data[mod_name] = hash.strip()
-                    line = log.readline()
-            except:
-                raise Exception("Wrong format for pytype log data")
-    return log_data
-
-def _append_to_log_file(pyi_log_file, data: tuple[str, str]):
-    """Writes data of inferred python modules"""
-    mod_name, hash = data
-    with open(pyi_log_file, "a") as log:
-        log.write(f"{mod_name}-{hash}\n")
-        # log.writelines([f"{mod_name}-{hash}\n" for mod_name, hash in log_data.items()])
-
 def _create_gitignore(pyi_dir):
     """Create a .gitignore similarly to how pytype does it"""
     pyi_gitignore = f"{pyi_dir}{os.sep}.gitignore"
@@ -107,4 +220,3 @@ def _create_gitignore(pyi_dir):
         with open(pyi_gitignore, "w") as gitignore:
             gitignore.write("# Automatically generated by Py2Many\n")
             gitignore.write("*")
-
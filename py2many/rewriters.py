@@ -13,9 +13,11 @@ from typing import Any, cast, Optional
 
 from py2many.scope import ScopeList
 from py2many.tracer import find_node_by_name_and_type, find_node_by_type, find_parent_of_type
+from py2many.node_index import Interests
+from py2many.visitor import NodeTransformer
 
 
-class InferredAnnAssignRewriter(ast.NodeTransformer):
+class InferredAnnAssignRewriter(NodeTransformer):
     def visit_Assign(self, node):
         target = node.targets[0]  # Assumes all targets have same annotation
         if isinstance(target, ast.Subscript):
@@ -64,7 +66,7 @@ class InferredAnnAssignRewriter(ast.NodeTransformer):
         return create_ast_block(body=assigns, at_node=node)
 
 
-class ComplexDestructuringRewriter(ast.NodeTransformer):
+class ComplexDestructuringRewriter(NodeTransformer):
     def __init__(self, language):
         super().__init__()
         self._disable = False
@@ -102,7 +104,7 @@ class ComplexDestructuringRewriter(ast.NodeTransformer):
         return node
 
 
-class RenameTransformer(ast.NodeTransformer):
+class RenameTransformer(NodeTransformer):
     def __init__(self, old_name, new_name):
         super().__init__()
         self._old_name = old_name
@@ -142,7 +144,9 @@ def rename(scope, old_name, new_name):
     tx.visit(scope)
 
 
-class PythonMainRewriter(ast.NodeTransformer):
+class PythonMainRewriter(NodeTransformer):
+    interests = Interests(nodes=[ast.If], prune=True)
+
     def __init__(self, main_signature_arg_names):
         self.main_signature_arg_names = set(main_signature_arg_names)
         super().__init__()
@@ -180,7 +184,9 @@ class PythonMainRewriter(ast.NodeTransformer):
         return node
 
 
-class FStringJoinRewriter(ast.NodeTransformer):
+class FStringJoinRewriter(NodeTransformer):
+    interests = Interests(nodes=[ast.JoinedStr], prune=True)
+
     def __init__(self, language):
         super().__init__()
 
@@ -207,7 +213,191 @@ class FStringJoinRewriter(ast.NodeTransformer):
         return new_node
 
 
-class DocStringToCommentRewriter(ast.NodeTransformer):
+class StringBuilderRewriter(NodeTransformer):
+    """Concatenating immutable strings in a loop copies the string each time.
+    When a str variable is only appended to until it is first read, this
+    moves the appends to a builder variable and converts it once before
+    the first read:
+
+        s = init                ->  s_builder = init       (string_builder)
+        for x in xs:                for x in xs:
+            s += x                      s_builder += x     (string_builder)
+        print(s)                    s = s_builder          (on the Name only)
+                                    print(s)
+
+    Backends emit the nodes marked with string_builder using their
+    builder type"""
+
+    LANGUAGES = {"julia", "rust", "go", "kotlin"}
+
+    def __init__(self, language):
+        super().__init__()
+        self._language = language
+        # Enclosing module and functions
+        self._scopes = []
+
+    def generic_visit(self, node):
+        is_scope = isinstance(node, (ast.Module, ast.FunctionDef, ast.AsyncFunctionDef))
+        if is_scope:
+            self._scopes.append(node)
+        if self._language in self.LANGUAGES and self._scopes:
+            for field in ("body", "orelse", "finalbody"):
+                body = getattr(node, field, None)
+                if isinstance(body, list) and body and isinstance(body[0], ast.stmt):
+                    self._rewrite_body(body)
+        try:
+            return super().generic_visit(node)
+        finally:
+            if is_scope:
+                self._scopes.pop()
+
+    def _rewrite_body(self, body):
+        for i, stmt in enumerate(body):
+            name = self._string_init(stmt)
+            if not name:
+                continue
+            rest = body[i + 1 :]
+            appends, reads = self._find_uses(name, rest)
+            if appends is None or not any(in_loop for _, _, in_loop in appends):
+                continue
+            last_append = max(pos for pos, _, _ in appends)
+            first_read = min(reads, default=len(rest))
+            if first_read <= last_append:
+                continue
+            # The value is only converted back for the reads in rest. Reads
+            # after the enclosing block, or in the next iteration of an
+            # enclosing loop, would see the string before the appends
+            if self._read_outside(name, body[i:]):
+                continue
+
+            used = {get_id(n) for s in body for n in ast.walk(s)}
+            builder = f"{name}_builder"
+            while builder in used:
+                builder = f"_{builder}"
+            body[i] = self._builder_node(
+                ast.Assign(targets=[self._name(builder, stmt)], value=stmt.value),
+                stmt,
+            )
+            for _, append, _ in appends:
+                append.target = self._name(builder, append.target)
+                append.string_builder = True
+            if reads:
+                target = self._name(name, rest[first_read])
+                target.annotation = ast.Name(id="str", scopes=ScopeList())
+                value = self._builder_node(
+                    self._name(builder, rest[first_read]), rest[first_read]
+                )
+                assign = ast.Assign(targets=[target], value=value, scopes=stmt.scopes)
+                ast.copy_location(assign, rest[first_read])
+                body.insert(i + 1 + first_read, assign)
+
+    def _string_init(self, stmt) -> Optional[str]:
+        if isinstance(stmt, ast.Assign) and len(stmt.targets) == 1:
+            target = stmt.targets[0]
+        elif isinstance(stmt, ast.AnnAssign) and stmt.value is not None:
+            target = stmt.target
+        else:
+            return None
+        if not isinstance(target, ast.Name):
+            return None
+        if get_id(get_inferred_type(target)) != "str" and (
+            get_id(get_inferred_type(stmt.value)) != "str"
+        ):
+            return None
+        return get_id(target)
+
+    def _find_uses(self, name, body):
+        """Returns the appends to name as (statement index, AugAssign, in loop)
+        and the indices of the statements reading it. Appends is None if
+        the variable is used in any other way"""
+        appends, reads = [], set()
+        for pos, stmt in enumerate(body):
+            append_targets = set()
+            for node, in_loop in self._walk_statements(stmt, False):
+                if isinstance(node, ast.AugAssign) and get_id(node.target) == name:
+                    if not isinstance(node.op, ast.Add) or any(
+                        get_id(n) == name for n in ast.walk(node.value)
+                    ):
+                        return None, None
+                    appends.append((pos, node, in_loop))
+                    append_targets.add(id(node.target))
+                elif isinstance(
+                    node,
+                    (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef, ast.Lambda),
+                ):
+                    if any(get_id(n) == name for n in ast.walk(node)):
+                        return None, None
+                elif isinstance(node, (ast.Global, ast.Nonlocal)):
+                    if name in node.names:
+                        return None, None
+            for node in ast.walk(stmt):
+                if get_id(node) != name or id(node) in append_targets:
+                    continue
+                if not isinstance(node, ast.Name) or isinstance(
+                    getattr(node, "ctx", ast.Load()), (ast.Store, ast.Del)
+                ):
+                    return None, None
+                reads.add(pos)
+            if self._binds(stmt, name):
+                return None, None
+        return appends, reads
+
+    def _read_outside(self, name, stmts) -> bool:
+        inside = {id(n) for stmt in stmts for n in ast.walk(stmt)}
+        for node in ast.walk(self._scopes[-1]):
+            if (
+                isinstance(node, ast.Name)
+                and node.id == name
+                and id(node) not in inside
+                and not isinstance(getattr(node, "ctx", None), (ast.Store, ast.Del))
+            ):
+                return True
+        return False
+
+    def _walk_statements(self, node, in_loop):
+        yield node, in_loop
+        if isinstance(node, (ast.For, ast.While, ast.AsyncFor)):
+            in_loop = True
+        if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+            return
+        for child in ast.iter_child_nodes(node):
+            yield from self._walk_statements(child, in_loop)
+
+    def _binds(self, stmt, name):
+        # Names created by rewriters don't always have a ctx
+        for node in ast.walk(stmt):
+            targets = []
+            if isinstance(node, ast.Assign):
+                targets = node.targets
+            elif isinstance(node, (ast.AnnAssign, ast.For, ast.NamedExpr)):
+                targets = [node.target]
+            elif isinstance(node, ast.comprehension):
+                targets = [node.target]
+            elif isinstance(node, ast.With):
+                targets = [i.optional_vars for i in node.items if i.optional_vars]
+            elif isinstance(node, ast.ExceptHandler) and node.name == name:
+                return True
+            elif isinstance(node, ast.Delete):
+                targets = node.targets
+            if any(get_id(n) == name for t in targets for n in ast.walk(t)):
+                return True
+        return False
+
+    @staticmethod
+    def _name(name, node):
+        new_name = ast.Name(id=name, scopes=getattr(node, "scopes", ScopeList()))
+        return ast.copy_location(new_name, node)
+
+    @staticmethod
+    def _builder_node(new_node, node):
+        new_node.string_builder = True
+        new_node.scopes = getattr(node, "scopes", ScopeList())
+        ast.copy_location(new_node, node)
+        ast.fix_missing_locations(new_node)
+        return new_node
+
+
+class DocStringToCommentRewriter(NodeTransformer):
     def __init__(self, language):
         super().__init__()
         self._docstrings = set()
@@ -265,7 +455,9 @@ class DocStringToCommentRewriter(ast.NodeTransformer):
         return node
 
 
-class PrintBoolRewriter(ast.NodeTransformer):
+class PrintBoolRewriter(NodeTransformer):
+    interests = Interests(calls=["print"], prune=True)
+
     def __init__(self, language):
         super().__init__()
         self._language = language
@@ -314,7 +506,9 @@ class PrintBoolRewriter(ast.NodeTransformer):
         return node
 
 
-class StrStrRewriter(ast.NodeTransformer):
+class StrStrRewriter(NodeTransformer):
+    interests = Interests(nodes=[ast.Compare], prune=True)
+
     def __init__(self, language):
         super().__init__()
         self._language = language
@@ -356,7 +550,7 @@ class StrStrRewriter(ast.NodeTransformer):
         return node
 
 
-class IgnoredAssignRewriter(ast.NodeTransformer):
+class IgnoredAssignRewriter(NodeTransformer):
     def __init__(self, language):
         super().__init__()
         self._language = language
@@ -409,7 +603,7 @@ class IgnoredAssignRewriter(ast.NodeTransformer):
         return node
 
 
-class UnpackScopeRewriter(ast.NodeTransformer):
+class UnpackScopeRewriter(NodeTransformer):
     def __init__(self, language):
         super().__init__()
         self._language = language
@@ -444,7 +638,7 @@ class UnpackScopeRewriter(ast.NodeTransformer):
         return self._visit_assign_node_body(node)
 
 
-class UnitTestRewriter(ast.NodeTransformer):
+class UnitTestRewriter(NodeTransformer):
 
     TEST_MODULE_SET = set(["unittest.TestCase"])
     SETUP_METHODS = set(["setUp"])
@@ -576,7 +770,7 @@ class UnitTestRewriter(ast.NodeTransformer):
         return call_node
 
 
-class LoopElseRewriter(ast.NodeTransformer):
+class LoopElseRewriter(NodeTransformer):
     def __init__(self, language) -> None:
         super().__init__()
         self._language = language
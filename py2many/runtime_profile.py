@@ -0,0 +1,369 @@
+import argparse
+import ast
+import json
+import os
+import runpy
+import sys
+
+from dataclasses import dataclass, field
+from itertools import islice
+from inspect import CO_ASYNC_GENERATOR, CO_COROUTINE, CO_GENERATOR
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import yaml
+
+from py2many.type_terms import ANY, NONE, TypeTerm, join, type_term
+from py2many.visitor import NodeVisitor
+
+# Elements of a container looked at to find its element type
+SAMPLE_SIZE = 8
+# Depth of the nested containers whose element types are recorded
+MAX_DEPTH = 3
+# Tuples longer than this are recorded as tuple[T, ...]
+MAX_TUPLE_SIZE = 8
+
+_SCALARS = (bool, int, float, complex, str, bytes)
+_SKIPPED_CODE = CO_GENERATOR | CO_COROUTINE | CO_ASYNC_GENERATOR
+_IMPLICIT_ARGS = frozenset(["self", "cls"])
+
+
+def runtime_type(value, depth: int = MAX_DEPTH) -> Optional[TypeTerm]:
+    """The term for the type of value. Containers get their element types
+    from a sample of their elements. None for empty containers, whose
+    element types are only known from other values"""
+    if value is None:
+        return NONE
+    cls = type(value)
+    if cls in _SCALARS:
+        return type_term(cls.__name__)
+    if cls in (list, set, frozenset, dict, tuple) and not value:
+        return None
+    if cls in (list, set, frozenset, dict, tuple) and depth == 0:
+        return type_term(cls.__name__)
+    if cls in (list, set, frozenset):
+        return _container(cls.__name__, [_sample(value, depth)])
+    if cls is dict:
+        items = list(islice(value.items(), SAMPLE_SIZE))
+        keys = _join_all([k for k, _ in items], depth)
+        values = _join_all([v for _, v in items], depth)
+        return _container("dict", [keys, values])
+    if cls is tuple:
+        if len(value) > MAX_TUPLE_SIZE:
+            return _container("tuple", [_sample(value, depth), type_term("...")])
+        return _container("tuple", [runtime_type(v, depth - 1) for v in value])
+    return type_term(cls.__name__)
+
+
+def _sample(values, depth: int) -> TypeTerm:
+    return _join_all(islice(values, SAMPLE_SIZE), depth)
+
+
+def _join_all(values, depth: int) -> Optional[TypeTerm]:
+    ret = None
+    for value in values:
+        ret = _join(ret, runtime_type(value, depth - 1))
+    return ret
+
+
+def _container(name: str, args: List[Optional[TypeTerm]]) -> TypeTerm:
+    # A mix of element types says nothing that can be transpiled
+    if ANY in args or None in args:
+        return type_term(name)
+    return type_term(name, *args)
+
+
+def _join(a: Optional[TypeTerm], b: Optional[TypeTerm]) -> Optional[TypeTerm]:
+    if a is None or b is None:
+        return b if a is None else a
+    return join(a, b)
+
+
+@dataclass
+class LoopRecord:
+    """Runs of a loop and the iterations they made"""
+
+    entries: int = 0
+    iterations: int = 0
+    max_trips: int = 0
+    # Iterations of the current run
+    trips: int = 0
+
+    def enter(self):
+        self.leave()
+        self.entries += 1
+
+    def leave(self):
+        self.iterations += self.trips
+        self.max_trips = max(self.max_trips, self.trips)
+        self.trips = 0
+
+
+@dataclass
+class FunctionRecord:
+    """What was seen of a function: the types of its arguments and return
+    values, how often it was called and how often its loops ran"""
+
+    node: ast.FunctionDef
+    # Scopes of the function, as (kind, name) pairs
+    path: Tuple[Tuple[str, str], ...]
+    calls: int = 0
+    args: Dict[str, TypeTerm] = field(default_factory=dict)
+    returns: Optional[TypeTerm] = None
+    # Line of the loop header -> record
+    loops: Dict[int, LoopRecord] = field(default_factory=dict)
+
+
+class _FunctionCollector(NodeVisitor):
+    """Finds the functions of a module and the loops they contain"""
+
+    def __init__(self):
+        self.functions: Dict[int, FunctionRecord] = {}
+        self.loops: Dict[int, Tuple[FunctionRecord, ast.stmt]] = {}
+        self._path: List[Tuple[str, str]] = []
+        self._current: List[FunctionRecord] = []
+
+    def visit_ClassDef(self, node):
+        self._path.append(("classes", node.name))
+        self.generic_visit(node)
+        self._path.pop()
+
+    def visit_FunctionDef(self, node):
+        self._path.append(("functions", node.name))
+        record = FunctionRecord(node, tuple(self._path))
+        # The first line of the code object is that of its first decorator
+        first_line = min([node.lineno] + [d.lineno for d in node.decorator_list])
+        self.functions[first_line] = record
+        self._current.append(record)
+        self.generic_visit(node)
+        self._current.pop()
+        self._path.pop()
+
+    def visit_For(self, node):
+        if self._current:
+            self.loops[node.lineno] = (self._current[-1], node)
+        self.generic_visit(node)
+
+    visit_While = visit_For
+
+
+class RuntimeProfiler:
+    """Records the functions of the given source files while a program
+    runs. Uses a trace function, so calls to code of other files, such as
+    the standard library, only cost the check of their file name"""
+
+    def __init__(self, filenames: List[Path]):
+        self._modules: Dict[str, str] = {}
+        self._functions: Dict[str, Dict[int, FunctionRecord]] = {}
+        self._loops: Dict[str, Dict[int, Tuple[FunctionRecord, ast.stmt]]] = {}
+        for filename in filenames:
+            filename = os.path.abspath(filename)
+            collector = _FunctionCollector()
+            collector.visit(ast.parse(Path(filename).read_text()))
+            self._modules[filename] = Path(filename).stem
+            self._functions[filename] = collector.functions
+            self._loops[filename] = collector.loops
+
+    def start(self):
+        sys.settrace(self._trace)
+
+    def stop(self):
+        sys.settrace(None)
+
+    def _trace(self, frame, event, arg):
+        code = frame.f_code
+        functions = self._functions.get(code.co_filename)
+        if functions is None or code.co_flags & _SKIPPED_CODE:
+            return None
+        record = functions.get(code.co_firstlineno)
+        if record is None or record.node.name != code.co_name:
+            return None
+        record.calls += 1
+        args = record.node.args
+        for arg in args.posonlyargs + args.args + args.kwonlyargs:
+            if arg.arg in _IMPLICIT_ARGS or arg.annotation is not None:
+                continue
+            if arg.arg in frame.f_locals:
+                value_type = _join(
+                    record.args.get(arg.arg), runtime_type(frame.f_locals[arg.arg])
+                )
+                if value_type is not None:
+                    record.args[arg.arg] = value_type
+        return _FrameTracer(record, self._loops[code.co_filename])
+
+    def profile(self) -> Dict:
+        """The records as annotations for ParseAnnotations, with a hotness
+        section for each function that was called"""
+        modules: Dict = {}
+        for filename, functions in self._functions.items():
+            module = modules.setdefault(self._modules[filename], {})
+            for record in functions.values():
+                if record.calls:
+                    _insert(module, record.path, _annotations(record))
+        return {"modules": modules}
+
+
+class _FrameTracer:
+    """Local trace function of one call"""
+
+    def __init__(self, record: FunctionRecord, loops):
+        self._record = record
+        self._loops = loops
+        self._last_line = None
+        self._running: List[Tuple[LoopRecord, ast.stmt]] = []
+        self._raised = False
+
+    def __call__(self, frame, event, arg):
+        if event == "line":
+            self._line(frame.f_lineno)
+        elif event == "exception":
+            self._raised = True
+        elif event == "return":
+            for loop, _ in self._running:
+                loop.leave()
+            # An exception leaving the function returns None
+            if not self._raised and self._record.node.returns is None:
+                self._record.returns = _join(self._record.returns, runtime_type(arg))
+        return self
+
+    def _line(self, lineno):
+        self._raised = False
+        running = self._running
+        while running and not _contains(running[-1][1], lineno):
+            running.pop()[0].leave()
+        # An iteration starts on the first statement of the body, unless
+        # it comes from the statement itself, like the inner loop of a
+        # nested loop does
+        for loop, node in running:
+            first = node.body[0]
+            if lineno == first.lineno and not _contains(first, self._last_line):
+                loop.trips += 1
+        loop = self._loops.get(lineno)
+        if loop is not None and loop[0] is self._record:
+            loop_record = self._record.loops.setdefault(lineno, LoopRecord())
+            if not any(r is loop_record for r, _ in running):
+                loop_record.enter()
+                running.append((loop_record, loop[1]))
+        self._last_line = lineno
+
+
+def _contains(node: ast.stmt, lineno: Optional[int]) -> bool:
+    return lineno is not None and node.lineno <= lineno <= node.end_lineno
+
+
+def _annotations(record: FunctionRecord) -> Dict:
+    ret: Dict = {}
+    args = {name: str(t) for name, t in record.args.items() if _is_useful(t)}
+    if args:
+        ret["args"] = args
+    # Functions returning None are left for the transpilers to declare
+    if record.returns not in (None, NONE) and _is_useful(record.returns):
+        ret["returns"] = str(record.returns)
+    hotness: Dict = {"calls": record.calls}
+    loops = {}
+    for lineno, loop in sorted(record.loops.items()):
+        loop.leave()
+        if loop.entries:
+            # Relative to the function, so that edits above it are harmless
+            loops[str(lineno - record.node.lineno)] = {
+                "iterations": loop.iterations,
+                "max_trips": loop.max_trips,
+            }
+    if loops:
+        hotness["loops"] = loops
+    ret["hotness"] = hotness
+    return ret
+
+
+def _is_useful(term: TypeTerm) -> bool:
+    return term is not ANY and ANY not in term.args
+
+
+def _insert(module: Dict, path, annotations: Dict):
+    entry = module
+    for kind, name in path:
+        entry = entry.setdefault(kind, {}).setdefault(name, {})
+    entry.update(annotations)
+
+
+def write_profile(profile: Dict, output: Path):
+    with open(output, "w") as f:
+        if output.suffix == ".json":
+            json.dump(profile, f, indent=2)
+        else:
+            yaml.dump(profile, f, sort_keys=False)
+
+
+def record(
+    script: Path,
+    argv: List[str],
+    output: Path,
+    sources: Optional[List[Path]] = None,
+) -> Dict:
+    """Runs script with argv and writes the profile of the functions of
+    sources, by default the script itself, to output"""
+    sources = sources or [script]
+    profiler = RuntimeProfiler(sources)
+    # Run it like python would, so that code objects have the absolute
+    # file names the profiler looks for, and the sources are imported
+    # from their files rather than taken from modules loaded earlier
+    script = os.path.abspath(script)
+    saved_argv, saved_path = sys.argv, list(sys.path)
+    saved_modules = {
+        name: sys.modules.pop(name)
+        for name in {Path(source).stem for source in sources}
+        if name in sys.modules
+    }
+    sys.argv = [script] + list(argv)
+    sys.path.insert(0, os.path.dirname(script))
+    profiler.start()
+    try:
+        runpy.run_path(script, run_name="__main__")
+    except SystemExit:
+        pass
+    finally:
+        profiler.stop()
+        sys.argv, sys.path[:] = saved_argv, saved_path
+        sys.modules.update(saved_modules)
+    profile = profiler.profile()
+    write_profile(profile, output)
+    return profile
+
+
+def _create_parser():
+    parser = argparse.ArgumentParser(
+        prog="py2many record",
+        description="Run a python program and record the types and hot loops "
+        "of its functions, to be used as annotations with --config",
+    )
+    parser.add_argument(
+        "-o",
+        "--output",
+        default=None,
+        help="Profile to write, .json or .yaml (default: <script>.profile.yaml)",
+    )
+    parser.add_argument(
+        "--source",
+        action="append",
+        default=None,
+        help="Module whose functions to record (default: the script). "
+        "May be repeated",
+    )
+    parser.add_argument("script", help="Python program to run")
+    parser.add_argument("args", nargs=argparse.REMAINDER, help="Its arguments")
+    return parser
+
+
+def main(args=None):
+    args = _create_parser().parse_args(args=args)
+    script = Path(args.script)
+    output = args.output or script.with_suffix(".profile.yaml")
+    sources = [Path(s) for s in args.source] if args.source else None
+    profile = record(script, args.args, Path(output), sources)
+    print(f"Wrote profile to {output}", file=sys.stderr)
+    for module in profile["modules"]:
+        print(
+            f"Use it with --config and [ANNOTATIONS] {module} = {output}",
+            file=sys.stderr,
+        )
+    return 0
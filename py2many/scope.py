@@ -2,6 +2,12 @@ import ast
 from contextlib import contextmanager
 
 from py2many.analysis import get_id
+from py2many.visitor import NodeTransformer
+
+
+# The parser shares a single instance of these nodes between all trees.
+# Attaching scopes to them would keep the last visited tree alive.
+SHARED_NODE_TYPES = (ast.expr_context, ast.boolop, ast.operator, ast.unaryop, ast.cmpop)
 
 
 def add_scope_context(node):
@@ -15,14 +21,18 @@ class ScopeMixin(object):
     a node is part of.
     """
 
-    scopes = []
+    def __init__(self):
+        super().__init__()
+        self.scopes = []
 
     @contextmanager
     def enter_scope(self, node):
         if self._is_scopable_node(node):
             self.scopes.append(node)
-            yield
-            self.scopes.pop()
+            try:
+                yield
+            finally:
+                self.scopes.pop()
         else:
             yield
 
@@ -80,7 +90,7 @@ class ScopeList(list):
         return ScopeList(scopes)
 
 
-class ScopeTransformer(ast.NodeTransformer, ScopeMixin):
+class ScopeTransformer(NodeTransformer, ScopeMixin):
     """
     Adds a scope attribute to each node.
     The scope contains the current scope (function, module, for loop)
@@ -93,6 +103,8 @@ class ScopeTransformer(ast.NodeTransformer, ScopeMixin):
         self._named_expr = False
 
     def visit(self, node):
+        if isinstance(node, SHARED_NODE_TYPES):
+            return node
         with self.enter_scope(node):
             node.scopes = ScopeList(self.scopes)
             if self._scope_header and not self._named_expr and len(node.scopes) > 1:
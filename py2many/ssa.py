@@ -0,0 +1,591 @@
+import ast
+
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Set, Union
+
+from py2many.ast_helpers import get_id
+
+
+def add_ssa_context(node):
+    """Build the SSA form of every function and store it as its `ssa`
+    attribute. Names get the definition they read or write as
+    `ssa_definition`"""
+    for func in ast.walk(node):
+        if isinstance(func, (ast.FunctionDef, ast.AsyncFunctionDef)):
+            func.ssa = build_ssa(func)
+    return node
+
+
+def get_ssa_definition(node: ast.Name) -> Optional["Definition"]:
+    """Definition a name reads, or the one it writes when it's a target"""
+    return getattr(node, "ssa_definition", None)
+
+
+def is_load(node: ast.Name) -> bool:
+    # Names created by rewriters often have no ctx, they are reads
+    return not isinstance(getattr(node, "ctx", None), (ast.Store, ast.Del))
+
+
+# Functions that can read or write any local variable
+DYNAMIC_SCOPE_FUNCS = frozenset(["locals", "vars", "eval", "exec"])
+
+# Expressions with their own scope
+_OWN_SCOPE = (ast.ListComp, ast.SetComp, ast.DictComp, ast.GeneratorExp)
+_NESTED_SCOPES = (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef, ast.Lambda)
+
+
+@dataclass(eq=False)
+class Definition:
+    """A value in SSA form: one definition of a local variable.
+
+    kind is one of:
+      - "argument": a function argument
+      - "assign": `var = value`, `var: T = value` or `var := value`
+      - "augassign": `var op= value`, which also reads `operands[0]`
+      - "phi": merges `operands`, one per predecessor of `block`
+      - "unknown": for/with/except/import targets, tuple unpacking, ...
+    """
+
+    var: str
+    version: int
+    kind: str
+    block: "BasicBlock"
+    # Statement (or walrus expression) that makes the definition
+    node: Optional[ast.AST] = None
+    # Expression assigned by "assign" and "augassign" definitions
+    value: Optional[ast.expr] = None
+    operands: List["Definition"] = field(default_factory=list)
+    # Names that read the value, and phis that merge it
+    uses: List[ast.Name] = field(default_factory=list)
+    phi_uses: List["Definition"] = field(default_factory=list)
+    # The definition an augassign or phi is replaced with, see _remove_trivial_phi
+    replaced_by: Optional["Definition"] = None
+
+    def __repr__(self):
+        return f"{self.var}.{self.version}"
+
+    @property
+    def is_phi(self) -> bool:
+        return self.kind == "phi"
+
+    @property
+    def has_uses(self) -> bool:
+        return bool(self.uses or self.phi_uses)
+
+    @property
+    def annotation(self) -> Optional[ast.expr]:
+        """Type of the value, as found by type inference"""
+        annotation = self._annotation(set())
+        return None if annotation is _UNBOUND else annotation
+
+    def _annotation(self, seen) -> Optional[ast.expr]:
+        if self.kind == "argument" or isinstance(self.node, ast.AnnAssign):
+            return getattr(self.node, "annotation", None)
+        if self.kind == "assign":
+            return getattr(self.value, "annotation", None)
+        # Loops make cycles of phis and augmented assignments, which don't
+        # change the type of the other operands
+        if id(self) in seen:
+            return _UNBOUND
+        seen.add(id(self))
+        if self.kind == "augassign" and self.operands:
+            return _resolve(self.operands[0])._annotation(seen)
+        if self.kind == "phi":
+            types = [
+                _resolve(o)._annotation(seen)
+                for o in self.operands
+                if o is not _UNBOUND
+            ]
+            types = [t for t in types if t is not _UNBOUND]
+            if types and all(t is not None for t in types):
+                if len({ast.dump(t) for t in types}) == 1:
+                    return types[0]
+        return None
+
+
+@dataclass(eq=False)
+class BasicBlock:
+    id: int
+    statements: List[ast.stmt] = field(default_factory=list)
+    preds: List["BasicBlock"] = field(default_factory=list)
+    succs: List["BasicBlock"] = field(default_factory=list)
+    phis: Dict[str, Definition] = field(default_factory=dict)
+    sealed: bool = False
+    # Last definition of each variable in the block
+    defs: Dict[str, Definition] = field(default_factory=dict)
+    incomplete_phis: Dict[str, Definition] = field(default_factory=dict)
+
+    def __repr__(self):
+        return f"BasicBlock({self.id})"
+
+
+@dataclass(eq=False)
+class FunctionSSA:
+    """SSA form of a function: its control flow graph and definitions.
+
+    Variables in `escaping` are bound or read somewhere the analysis
+    can't follow (global/nonlocal, nested functions, del, exception
+    handlers), so their definitions must not be optimised"""
+
+    node: ast.AST
+    entry: BasicBlock
+    blocks: List[BasicBlock]
+    definitions: List[Definition]
+    escaping: Set[str]
+
+    def definitions_of(self, var: str) -> List[Definition]:
+        return [d for d in self.definitions if d.var == var and d.replaced_by is None]
+
+    def is_tracked(self, var: str) -> bool:
+        return var not in self.escaping
+
+
+class _Loop:
+    def __init__(self, header: BasicBlock, exit: BasicBlock):
+        self.header = header
+        self.exit = exit
+
+
+def build_ssa(
+    node: Union[ast.FunctionDef, ast.AsyncFunctionDef],
+) -> Optional[FunctionSSA]:
+    """SSA form of a function, or None when it uses constructs that make
+    the locals impossible to follow, like locals() or match"""
+    return SSABuilder().build(node)
+
+
+class SSABuilder:
+    """Builds the control flow graph of a function and puts its local
+    variables in SSA form on the fly, sealing blocks once all their
+    predecessors are known ("Simple and Efficient Construction of Static
+    Single Assignment Form", Braun et al.)"""
+
+    def __init__(self):
+        self._blocks: List[BasicBlock] = []
+        self._definitions: List[Definition] = []
+        self._versions: Dict[str, int] = {}
+        self._escaping: Set[str] = set()
+        self._loops: List[_Loop] = []
+        self._block: Optional[BasicBlock] = None
+
+    def build(self, node) -> Optional[FunctionSSA]:
+        if not self._supported(node):
+            return None
+        self._escaping = _escaping_names(node)
+        entry = self._new_block(sealed=True)
+        self._block = entry
+        args = node.args
+        # Arguments built by rewriters may lack posonlyargs and kwonlyargs
+        all_args = (
+            getattr(args, "posonlyargs", [])
+            + args.args
+            + getattr(args, "kwonlyargs", [])
+            + [args.vararg, args.kwarg]
+        )
+        for arg in all_args:
+            if arg is not None:
+                definition = self._define(arg.arg, "argument", arg)
+                arg.ssa_definition = definition
+        self._visit_body(node.body)
+        definitions = [d for d in self._definitions if d.replaced_by is None]
+        for definition in definitions:
+            definition.operands = [_resolve(o) for o in definition.operands]
+            phi_uses = {}
+            for user in definition.phi_uses:
+                user = _resolve(user)
+                if user is not definition and user.replaced_by is None:
+                    phi_uses[id(user)] = user
+            definition.phi_uses = list(phi_uses.values())
+        return FunctionSSA(node, entry, self._blocks, definitions, self._escaping)
+
+    @staticmethod
+    def _supported(node) -> bool:
+        for child in _walk_scope(node):
+            if isinstance(child, ast.Match if hasattr(ast, "Match") else ()):
+                return False
+            if (
+                isinstance(child, ast.Call)
+                and get_id(child.func) in DYNAMIC_SCOPE_FUNCS
+            ):
+                return False
+        return True
+
+    # Blocks
+
+    def _new_block(self, preds=(), sealed=False) -> BasicBlock:
+        block = BasicBlock(len(self._blocks))
+        self._blocks.append(block)
+        for pred in preds:
+            self._link(pred, block)
+        if sealed:
+            self._seal(block)
+        return block
+
+    def _link(self, pred: BasicBlock, succ: BasicBlock):
+        # Blocks after return/raise/break/continue are unreachable
+        if pred.preds or pred is self._blocks[0]:
+            pred.succs.append(succ)
+            succ.preds.append(pred)
+
+    def _seal(self, block: BasicBlock):
+        for var, phi in block.incomplete_phis.items():
+            self._add_phi_operands(var, phi)
+        block.incomplete_phis = {}
+        block.sealed = True
+
+    # Variables
+
+    def _define(self, var, kind, node=None, value=None, operands=None) -> Definition:
+        version = self._versions.get(var, 0)
+        self._versions[var] = version + 1
+        definition = Definition(
+            var, version, kind, self._block, node, value, operands or []
+        )
+        self._definitions.append(definition)
+        self._block.defs[var] = definition
+        return definition
+
+    def _read(self, var: str, block: BasicBlock) -> Optional[Definition]:
+        if var in block.defs:
+            return _resolve(block.defs[var])
+        return self._read_recursive(var, block)
+
+    def _read_recursive(self, var: str, block: BasicBlock) -> Optional[Definition]:
+        if not block.sealed:
+            phi = self._new_phi(var, block)
+            block.incomplete_phis[var] = phi
+            definition = phi
+        elif len(block.preds) == 1:
+            definition = self._read(var, block.preds[0])
+        elif not block.preds:
+            # Not defined on this path, or an unreachable block
+            return None
+        else:
+            phi = self._new_phi(var, block)
+            block.defs[var] = phi
+            definition = self._add_phi_operands(var, phi)
+        if definition is not None:
+            block.defs[var] = definition
+        return definition
+
+    def _new_phi(self, var, block) -> Definition:
+        version = self._versions.get(var, 0)
+        self._versions[var] = version + 1
+        phi = Definition(var, version, "phi", block)
+        block.phis[var] = phi
+        self._definitions.append(phi)
+        return phi
+
+    def _add_phi_operands(self, var, phi: Definition) -> Optional[Definition]:
+        for pred in phi.block.preds:
+            operand = self._read(var, pred)
+            if operand is None:
+                # Possibly unbound on some path, which python reports at
+                # runtime. Treat the value as unknown
+                operand = _UNBOUND
+            phi.operands.append(operand)
+            if operand is not _UNBOUND:
+                operand.phi_uses.append(phi)
+        return self._remove_trivial_phi(phi)
+
+    def _remove_trivial_phi(self, phi: Definition) -> Optional[Definition]:
+        same = None
+        for operand in phi.operands:
+            operand = _resolve(operand)
+            if operand is same or operand is phi:
+                continue
+            if same is not None:
+                return phi
+            same = operand
+        if same is None or same is _UNBOUND:
+            return phi
+        # Reads of the phi are resolved lazily through replaced_by
+        phi.replaced_by = same
+        del phi.block.phis[phi.var]
+        users = [u for u in phi.phi_uses if u is not phi]
+        same.phi_uses.extend(users)
+        for name in phi.uses:
+            name.ssa_definition = same
+            same.uses.append(name)
+        phi.uses = []
+        for user in users:
+            if user.is_phi and user.replaced_by is None and user.block.sealed:
+                self._remove_trivial_phi(user)
+        return same
+
+    # Statements
+
+    def _visit_body(self, body: List[ast.stmt]):
+        for stmt in body:
+            self._visit_stmt(stmt)
+
+    def _visit_stmt(self, node: ast.stmt):
+        self._block.statements.append(node)
+        method = getattr(self, f"_visit_{type(node).__name__}", None)
+        if method is not None:
+            method(node)
+        else:
+            self._uses(node)
+
+    def _visit_Assign(self, node: ast.Assign):
+        self._uses(node.value)
+        for target in node.targets:
+            self._bind_target(
+                target, node, node.value if len(node.targets) == 1 else None
+            )
+
+    def _visit_AnnAssign(self, node: ast.AnnAssign):
+        if node.value is None:
+            return
+        self._uses(node.value)
+        self._bind_target(node.target, node, node.value)
+
+    def _visit_AugAssign(self, node: ast.AugAssign):
+        self._uses(node.value)
+        if isinstance(node.target, ast.Name):
+            var = node.target.id
+            previous = self._read(var, self._block)
+            operands = [previous] if previous is not None else []
+            definition = self._define(var, "augassign", node, node.value, operands)
+            if previous is not None:
+                previous.uses.append(node.target)
+            node.target.ssa_definition = definition
+        else:
+            self._uses(node.target)
+
+    def _visit_Return(self, node: ast.Return):
+        if node.value is not None:
+            self._uses(node.value)
+        self._terminate()
+
+    def _visit_Raise(self, node: ast.Raise):
+        self._uses(node)
+        self._terminate()
+
+    def _visit_If(self, node: ast.If):
+        self._uses(node.test)
+        before = self._block
+        self._block = self._new_block([before], sealed=True)
+        self._visit_body(node.body)
+        then_end = self._block
+        self._block = self._new_block([before], sealed=True)
+        self._visit_body(node.orelse)
+        else_end = self._block
+        self._block = self._new_block([then_end, else_end], sealed=True)
+
+    def _visit_While(self, node: ast.While):
+        header = self._new_block([self._block])
+        self._block = header
+        self._uses(node.test)
+        exit = self._new_block()
+        self._block = self._new_block([header], sealed=True)
+        self._loops.append(_Loop(header, exit))
+        self._visit_body(node.body)
+        self._loops.pop()
+        self._link(self._block, header)
+        self._seal(header)
+        self._block = self._new_block([header], sealed=True)
+        self._visit_body(node.orelse)
+        self._link(self._block, exit)
+        self._seal(exit)
+        self._block = exit
+
+    def _visit_For(self, node: ast.For):
+        self._uses(node.iter)
+        header = self._new_block([self._block])
+        exit = self._new_block()
+        self._block = self._new_block([header], sealed=True)
+        self._bind_target(node.target, node, None)
+        self._loops.append(_Loop(header, exit))
+        self._visit_body(node.body)
+        self._loops.pop()
+        self._link(self._block, header)
+        self._seal(header)
+        self._block = self._new_block([header], sealed=True)
+        self._visit_body(node.orelse)
+        self._link(self._block, exit)
+        self._seal(exit)
+        self._block = exit
+
+    _visit_AsyncFor = _visit_For
+
+    def _visit_Break(self, node):
+        if self._loops:
+            self._link(self._block, self._loops[-1].exit)
+        self._terminate()
+
+    def _visit_Continue(self, node):
+        if self._loops:
+            self._link(self._block, self._loops[-1].header)
+        self._terminate()
+
+    def _visit_With(self, node: ast.With):
+        for item in node.items:
+            self._uses(item.context_expr)
+            if item.optional_vars is not None:
+                self._bind_target(item.optional_vars, node, None)
+        self._visit_body(node.body)
+
+    _visit_AsyncWith = _visit_With
+
+    def _visit_Try(self, node: ast.Try):
+        # Any statement of the body may jump to the handlers. Variables
+        # bound in the try statement are escaping, so approximating the
+        # edges from the start and the end of the body is safe
+        before = self._block
+        self._block = self._new_block([before], sealed=True)
+        self._visit_body(node.body)
+        self._visit_body(node.orelse)
+        ends = [self._block]
+        for handler in node.handlers:
+            self._block = self._new_block([before, ends[0]], sealed=True)
+            if handler.type is not None:
+                self._uses(handler.type)
+            if handler.name:
+                self._define(handler.name, "unknown", handler)
+            self._visit_body(handler.body)
+            ends.append(self._block)
+        self._block = self._new_block(ends, sealed=True)
+        self._visit_body(node.finalbody)
+
+    _visit_TryStar = _visit_Try
+
+    def _visit_FunctionDef(self, node):
+        for expr in node.decorator_list + node.args.defaults + node.args.kw_defaults:
+            if expr is not None:
+                self._uses(expr)
+        self._define(node.name, "unknown", node)
+
+    _visit_AsyncFunctionDef = _visit_FunctionDef
+
+    def _visit_ClassDef(self, node: ast.ClassDef):
+        for expr in node.decorator_list + node.bases:
+            self._uses(expr)
+        self._define(node.name, "unknown", node)
+
+    def _visit_Import(self, node):
+        for alias in node.names:
+            name = alias.asname or alias.name.split(".")[0]
+            self._define(name, "unknown", node)
+
+    _visit_ImportFrom = _visit_Import
+
+    def _visit_Global(self, node):
+        pass
+
+    _visit_Nonlocal = _visit_Global
+
+    def _visit_Delete(self, node: ast.Delete):
+        for target in node.targets:
+            if not isinstance(target, ast.Name):
+                self._uses(target)
+
+    def _terminate(self):
+        # Code after return/raise/break/continue is unreachable
+        self._block = self._new_block(sealed=True)
+
+    def _bind_target(self, target, node, value):
+        if isinstance(target, ast.Name):
+            operands = []
+            kind = "assign" if value is not None else "unknown"
+            definition = self._define(target.id, kind, node, value, operands)
+            target.ssa_definition = definition
+        elif isinstance(target, (ast.Tuple, ast.List)):
+            for elt in target.elts:
+                self._bind_target(elt, node, None)
+        elif isinstance(target, ast.Starred):
+            self._bind_target(target.value, node, None)
+        else:
+            self._uses(target)
+
+    # Expressions
+
+    def _uses(self, node, shadowed: Set[str] = frozenset()):
+        """Record the names node reads"""
+        if isinstance(node, ast.Name):
+            if is_load(node) and node.id not in shadowed:
+                definition = self._read(node.id, self._block)
+                if definition is not None:
+                    node.ssa_definition = definition
+                    definition.uses.append(node)
+                    self._record_copy(node, definition)
+            return
+        if isinstance(node, ast.NamedExpr):
+            self._uses(node.value, shadowed)
+            self._bind_target(node.target, node, node.value)
+            return
+        if isinstance(node, _OWN_SCOPE):
+            shadowed = set(shadowed)
+            for generator in node.generators:
+                self._uses(generator.iter, shadowed)
+                shadowed |= {
+                    get_id(n)
+                    for n in ast.walk(generator.target)
+                    if isinstance(n, ast.Name)
+                }
+                for condition in generator.ifs:
+                    self._uses(condition, shadowed)
+            elts = (
+                [node.key, node.value] if isinstance(node, ast.DictComp) else [node.elt]
+            )
+            for elt in elts:
+                self._uses(elt, shadowed)
+            return
+        if isinstance(node, _NESTED_SCOPES):
+            # Their free variables are escaping
+            return
+        for child in ast.iter_child_nodes(node):
+            self._uses(child, shadowed)
+
+    def _record_copy(self, node: ast.Name, definition: Definition):
+        # For copies `y = x`, remember which definition of x the read of
+        # y sees, so that copy elimination can check x wasn't reassigned
+        if definition.kind == "assign" and isinstance(definition.value, ast.Name):
+            source = self._read(definition.value.id, self._block)
+            if source is not None:
+                node.ssa_copy_source = source
+
+
+class _Unbound:
+    def __repr__(self):
+        return "<unbound>"
+
+
+# Operand of a phi for a path where the variable isn't bound
+_UNBOUND = _Unbound()
+
+
+def _resolve(definition):
+    while isinstance(definition, Definition) and definition.replaced_by is not None:
+        definition = definition.replaced_by
+    return definition
+
+
+def _walk_scope(node):
+    """Nodes of a function, without descending into nested scopes"""
+    todo = list(ast.iter_child_nodes(node))
+    while todo:
+        child = todo.pop()
+        yield child
+        if not isinstance(child, _NESTED_SCOPES):
+            todo.extend(ast.iter_child_nodes(child))
+
+
+def _escaping_names(node) -> Set[str]:
+    """Locals the SSA form can't follow: declared global or nonlocal,
+    deleted, bound in a try statement or used by a nested scope"""
+    escaping = set()
+    for child in _walk_scope(node):
+        if isinstance(child, (ast.Global, ast.Nonlocal)):
+            escaping.update(child.names)
+        elif isinstance(child, ast.Delete):
+            escaping.update(get_id(n) for n in child.targets if isinstance(n, ast.Name))
+        elif isinstance(child, (ast.Try, getattr(ast, "TryStar", ast.Try))):
+            for n in ast.walk(child):
+                if isinstance(n, ast.Name) and not is_load(n):
+                    escaping.add(n.id)
+                elif isinstance(n, ast.ExceptHandler) and n.name:
+                    escaping.add(n.name)
+        elif isinstance(child, _NESTED_SCOPES):
+            escaping.update(n.id for n in ast.walk(child) if isinstance(n, ast.Name))
+    return escaping
@@ -0,0 +1,454 @@
+import ast
+
+from typing import Dict, List, Set
+
+from py2many.ast_helpers import get_id
+from py2many.node_index import Interests
+from py2many.ssa import Definition, FunctionSSA, build_ssa, is_load, _UNBOUND, _resolve
+from py2many.visitor import NodeTransformer
+
+
+def optimize_ssa(node) -> bool:
+    """Run constant propagation, dead code elimination and copy
+    elimination on every function. Returns whether the tree changed"""
+    changed = False
+    for func in ast.walk(node):
+        if isinstance(func, (ast.FunctionDef, ast.AsyncFunctionDef)):
+            for _ in range(MAX_ROUNDS):
+                if not _optimize_function(func):
+                    break
+                changed = True
+    return changed
+
+
+class SSAOptimizationRewriter:
+    """Runs optimize_ssa as one of the optimization rewriters"""
+
+    interests = Interests(nodes=[ast.FunctionDef, ast.AsyncFunctionDef])
+
+    def __init__(self, language):
+        self._language = language
+
+    def visit(self, node):
+        optimize_ssa(node)
+        return node
+
+
+# Each round rebuilds the SSA form, as removing a statement can make the
+# definitions it read dead
+MAX_ROUNDS = 8
+
+# Types whose copies are plain values in every backend
+COPYABLE_TYPES = frozenset(
+    [
+        "int",
+        "float",
+        "bool",
+        "c_int8",
+        "c_int16",
+        "c_int32",
+        "c_int64",
+        "c_uint8",
+        "c_uint16",
+        "c_uint32",
+        "c_uint64",
+    ]
+)
+
+# Folded integers must fit the narrowest default int of the backends
+INT_MIN = -(2**31)
+INT_MAX = 2**31 - 1
+
+
+def _optimize_function(func) -> bool:
+    ssa = build_ssa(func)
+    if ssa is None:
+        return False
+    values = propagate_constants(ssa)
+    replace: Dict[int, List[ast.stmt]] = {}
+    renames: Dict[int, str] = {}
+    _fold_branches(ssa, values, replace)
+    _eliminate_copies(ssa, replace, renames)
+    _eliminate_dead_code(ssa, replace)
+    if not replace and not renames:
+        return False
+    _Rewriter(replace, renames).visit(func)
+    return True
+
+
+# Constant propagation
+#
+# Values form the usual lattice: _UNDEF (no information yet), a constant
+# stored as a 1-tuple, and _NAC (not a constant)
+
+_UNDEF = "undef"
+_NAC = "nac"
+
+
+def propagate_constants(ssa: FunctionSSA) -> Dict[Definition, object]:
+    """Value of each definition, iterated to a fixpoint. Definitions that
+    stay _UNDEF are only reachable through cycles without a constant"""
+    values: Dict[Definition, object] = {d: _UNDEF for d in ssa.definitions}
+    changed = True
+    while changed:
+        changed = False
+        for definition in ssa.definitions:
+            value = _definition_value(ssa, definition, values)
+            if value != values[definition]:
+                values[definition] = value
+                changed = True
+    return values
+
+
+def _definition_value(ssa, definition: Definition, values):
+    if not ssa.is_tracked(definition.var):
+        return _NAC
+    if definition.kind == "assign":
+        return _evaluate(ssa, definition.value, values)
+    if definition.kind == "augassign":
+        if not definition.operands or definition.node.op is None:
+            return _NAC
+        previous = _value_of(ssa, definition.operands[0], values)
+        right = _evaluate(ssa, definition.value, values)
+        return _binop(definition.node.op, previous, right)
+    if definition.kind == "phi":
+        result = _UNDEF
+        for operand in definition.operands:
+            result = _meet(result, _value_of(ssa, operand, values))
+        return result
+    return _NAC
+
+
+def _value_of(ssa, definition, values):
+    if definition is _UNBOUND:
+        return _NAC
+    definition = _resolve(definition)
+    if definition not in values or not ssa.is_tracked(definition.var):
+        return _NAC
+    return values[definition]
+
+
+def _meet(a, b):
+    if a == _UNDEF:
+        return b
+    if b == _UNDEF:
+        return a
+    if a == _NAC or b == _NAC:
+        return _NAC
+    return a if _same_constant(a[0], b[0]) else _NAC
+
+
+def _same_constant(a, b) -> bool:
+    # 1, 1.0 and True are equal in python but are different constants
+    return type(a) is type(b) and a == b
+
+
+def _evaluate(ssa, node, values):
+    if isinstance(node, ast.Constant):
+        if type(node.value) in (int, bool):
+            return (node.value,)
+        return _NAC
+    if isinstance(node, ast.Name):
+        definition = getattr(node, "ssa_definition", None)
+        if definition is None:
+            return _NAC
+        return _value_of(ssa, definition, values)
+    if isinstance(node, ast.UnaryOp):
+        operand = _evaluate(ssa, node.operand, values)
+        if operand in (_UNDEF, _NAC):
+            return operand
+        if isinstance(node.op, ast.Not):
+            return (not operand[0],)
+        if isinstance(node.op, ast.USub) and type(operand[0]) is int:
+            return _int(-operand[0])
+        return _NAC
+    if isinstance(node, ast.BinOp):
+        left = _evaluate(ssa, node.left, values)
+        right = _evaluate(ssa, node.right, values)
+        return _binop(node.op, left, right)
+    if isinstance(node, ast.BoolOp):
+        operands = [_evaluate(ssa, v, values) for v in node.values]
+        if _NAC in operands:
+            return _NAC
+        if _UNDEF in operands:
+            return _UNDEF
+        if not all(type(o[0]) is bool for o in operands):
+            return _NAC
+        if isinstance(node.op, ast.And):
+            return (all(o[0] for o in operands),)
+        return (any(o[0] for o in operands),)
+    if isinstance(node, ast.Compare):
+        operands = [_evaluate(ssa, node.left, values)] + [
+            _evaluate(ssa, c, values) for c in node.comparators
+        ]
+        if _NAC in operands:
+            return _NAC
+        if _UNDEF in operands:
+            return _UNDEF
+        result = True
+        for op, left, right in zip(node.ops, operands, operands[1:]):
+            compare = _COMPARE_OPS.get(type(op))
+            if compare is None:
+                return _NAC
+            result = result and compare(left[0], right[0])
+        return (result,)
+    return _NAC
+
+
+def _binop(op, left, right):
+    if _NAC in (left, right):
+        return _NAC
+    if _UNDEF in (left, right):
+        return _UNDEF
+    left, right = left[0], right[0]
+    if type(left) is not int or type(right) is not int:
+        return _NAC
+    if isinstance(op, (ast.FloorDiv, ast.Mod)):
+        # Backends truncate towards zero and fail on division by zero
+        if left < 0 or right <= 0:
+            return _NAC
+    compute = _BINARY_OPS.get(type(op))
+    if compute is None:
+        return _NAC
+    return _int(compute(left, right))
+
+
+def _int(value):
+    if INT_MIN <= value <= INT_MAX:
+        return (value,)
+    return _NAC
+
+
+_BINARY_OPS = {
+    ast.Add: lambda a, b: a + b,
+    ast.Sub: lambda a, b: a - b,
+    ast.Mult: lambda a, b: a * b,
+    ast.FloorDiv: lambda a, b: a // b,
+    ast.Mod: lambda a, b: a % b,
+    ast.BitAnd: lambda a, b: a & b,
+    ast.BitOr: lambda a, b: a | b,
+    ast.BitXor: lambda a, b: a ^ b,
+}
+
+_COMPARE_OPS = {
+    ast.Eq: lambda a, b: a == b,
+    ast.NotEq: lambda a, b: a != b,
+    ast.Lt: lambda a, b: a < b,
+    ast.LtE: lambda a, b: a <= b,
+    ast.Gt: lambda a, b: a > b,
+    ast.GtE: lambda a, b: a >= b,
+}
+
+
+def _fold_branches(ssa: FunctionSSA, values, replace):
+    """Replace if statements whose test is a constant computed from
+    variables by the branch taken, and drop `while` loops that never run.
+    Literal tests like `if True:` are left alone"""
+    for node in _statements(ssa.node.body):
+        if not isinstance(node, (ast.If, ast.While)):
+            continue
+        if not any(isinstance(n, ast.Name) for n in ast.walk(node.test)):
+            continue
+        value = _evaluate(ssa, node.test, values)
+        if value in (_UNDEF, _NAC):
+            continue
+        if isinstance(node, ast.If):
+            replace[id(node)] = node.body if value[0] else node.orelse
+        elif not value[0]:
+            replace[id(node)] = node.orelse
+
+
+def _statements(body):
+    """Statements of a function, without those of nested scopes"""
+    for node in body:
+        yield node
+        if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+            continue
+        for field in ("body", "orelse", "finalbody"):
+            yield from _statements(getattr(node, field, []))
+        for handler in getattr(node, "handlers", []):
+            yield from _statements(handler.body)
+
+
+# Dead code and copy elimination
+
+
+def _live_definitions(ssa: FunctionSSA) -> Set[Definition]:
+    live = set()
+    todo = [d for d in ssa.definitions if any(is_load(n) for n in d.uses)]
+    while todo:
+        definition = todo.pop()
+        if definition in live:
+            continue
+        live.add(definition)
+        if definition.kind in ("phi", "augassign"):
+            todo.extend(_resolve(o) for o in definition.operands if o is not _UNBOUND)
+    return live
+
+
+def _eliminate_dead_code(ssa: FunctionSSA, replace):
+    """Remove assignments of values that are overwritten before being
+    read. The first assignment of a variable is kept, as backends declare
+    the variable there, and so are variables that are never read"""
+    live = _live_definitions(ssa)
+    bindings = _first_bindings(ssa.node)
+    for definition in ssa.definitions:
+        if definition in live or not ssa.is_tracked(definition.var):
+            continue
+        node = definition.node
+        if definition.kind not in ("assign", "augassign") or id(node) in replace:
+            continue
+        if not isinstance(node, (ast.Assign, ast.AnnAssign, ast.AugAssign)):
+            continue
+        if isinstance(node, ast.Assign) and len(node.targets) != 1:
+            continue
+        if not _is_pure(node.value):
+            continue
+        if not any(d in live for d in ssa.definitions_of(definition.var)):
+            continue
+        if bindings[definition.var][0] is node:
+            continue
+        replace[id(node)] = []
+
+
+def _eliminate_copies(ssa: FunctionSSA, replace, renames):
+    """Replace the reads of `y` by `x` after `y = x`, when y isn't
+    assigned anywhere else and x keeps the same value for all of them"""
+    bindings = _first_bindings(ssa.node)
+    for definition in ssa.definitions:
+        node = definition.node
+        if definition.kind != "assign" or not isinstance(definition.value, ast.Name):
+            continue
+        if not isinstance(node, (ast.Assign, ast.AnnAssign)) or id(node) in replace:
+            continue
+        if isinstance(node, ast.Assign) and len(node.targets) != 1:
+            continue
+        var, source = definition.var, definition.value
+        source_definition = getattr(source, "ssa_definition", None)
+        if source_definition is None or var == source.id:
+            continue
+        if not ssa.is_tracked(var) or not ssa.is_tracked(source.id):
+            continue
+        if len(ssa.definitions_of(var)) != 1 or len(bindings.get(var, [])) != 1:
+            continue
+        if not _same_copyable_type(definition, _resolve(source_definition)):
+            continue
+        source_definition = _resolve(source_definition)
+        uses = definition.uses
+        if not all(
+            _resolve(getattr(use, "ssa_copy_source", None)) is source_definition
+            for use in uses
+        ):
+            continue
+        for use in uses:
+            renames[id(use)] = source.id
+        replace[id(node)] = []
+
+
+def _same_copyable_type(a: Definition, b: Definition) -> bool:
+    a, b = a.annotation, b.annotation
+    if a is None or b is None or get_id(a) not in COPYABLE_TYPES:
+        return False
+    return ast.dump(a) == ast.dump(b)
+
+
+def _is_pure(node) -> bool:
+    """Whether evaluating node can't fail or have side effects"""
+    for child in ast.walk(node):
+        if isinstance(child, ast.BinOp):
+            if isinstance(child.op, (ast.Div, ast.FloorDiv, ast.Mod)):
+                divisor = child.right
+                if not (isinstance(divisor, ast.Constant) and divisor.value):
+                    return False
+            elif isinstance(child.op, (ast.Pow, ast.LShift, ast.RShift, ast.MatMult)):
+                return False
+        elif isinstance(child, ast.Compare):
+            if any(isinstance(op, (ast.In, ast.NotIn)) for op in child.ops):
+                return False
+        elif not isinstance(child, _PURE_NODES):
+            return False
+    return True
+
+
+_PURE_NODES = (
+    ast.Constant,
+    ast.Name,
+    ast.Load,
+    ast.Tuple,
+    ast.UnaryOp,
+    ast.BoolOp,
+    ast.IfExp,
+    ast.unaryop,
+    ast.operator,
+    ast.boolop,
+    ast.cmpop,
+)
+
+
+def _first_bindings(func) -> Dict[str, List[ast.stmt]]:
+    """Statements that bind each variable, in source order"""
+    bindings: Dict[str, List[ast.stmt]] = {}
+    for stmt in _statements(func.body):
+        for var in _bound_names(stmt):
+            bindings.setdefault(var, []).append(stmt)
+    return bindings
+
+
+def _bound_names(stmt):
+    if isinstance(stmt, ast.Assign):
+        targets = stmt.targets
+    elif isinstance(stmt, (ast.AnnAssign, ast.AugAssign)):
+        targets = [stmt.target]
+    elif isinstance(stmt, (ast.For, ast.AsyncFor)):
+        targets = [stmt.target]
+    elif isinstance(stmt, (ast.With, ast.AsyncWith)):
+        targets = [i.optional_vars for i in stmt.items if i.optional_vars]
+    else:
+        targets = []
+    names = []
+    for target in targets:
+        names.extend(
+            n.id
+            for n in ast.walk(target)
+            if isinstance(n, ast.Name)
+            and not isinstance(getattr(n, "ctx", None), ast.Load)
+        )
+    # Walrus targets bind in the enclosing statement
+    if not isinstance(stmt, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+        for field in ("value", "test", "iter"):
+            expr = getattr(stmt, field, None)
+            if isinstance(expr, ast.AST):
+                names.extend(
+                    get_id(n.target)
+                    for n in ast.walk(expr)
+                    if isinstance(n, ast.NamedExpr)
+                )
+    return names
+
+
+class _Rewriter(NodeTransformer):
+    def __init__(self, replace, renames):
+        super().__init__()
+        self._replace = replace
+        self._renames = renames
+
+    def visit_Name(self, node):
+        new_id = self._renames.get(id(node))
+        if new_id is not None:
+            node.id = new_id
+        return node
+
+    def generic_visit(self, node):
+        if id(node) in self._replace:
+            new_nodes = []
+            for stmt in self._replace[id(node)]:
+                stmt = self.visit(stmt)
+                if isinstance(stmt, list):
+                    new_nodes.extend(stmt)
+                elif stmt is not None:
+                    new_nodes.append(stmt)
+            return new_nodes
+        node = super().generic_visit(node)
+        if isinstance(getattr(node, "body", None), list) and not node.body:
+            node.body = [ast.copy_location(ast.Pass(), node)]
+        return node
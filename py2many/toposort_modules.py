@@ -3,9 +3,10 @@ from pathlib import Path, PosixPath, WindowsPath
 import sys
 from toposort import toposort_flatten
 from collections import defaultdict
-from typing import Tuple
+from typing import Set, Tuple
 
 from py2many.helpers import get_import_module_name
+from py2many.visitor import NodeVisitor
 
 
 def module_for_path(path: Path) -> str:
@@ -14,7 +15,7 @@ def module_for_path(path: Path) -> str:
     return module.rsplit(".", 1)[0]
 
 
-class ImportDependencyVisitor(ast.NodeVisitor):
+class ImportDependencyVisitor(NodeVisitor):
     def __init__(self, modules):
         self.deps = defaultdict(set)
         self._modules = modules
@@ -61,6 +62,14 @@ def get_dependencies(trees):
     return visitor.deps
 
 
+def get_module_dependencies(tree, modules) -> Set[str]:
+    """Dependencies of a single module, so that the tree
+    can be discarded once its imports are known"""
+    visitor = ImportDependencyVisitor(modules)
+    visitor.visit(tree)
+    return visitor.deps[module_for_path(tree.__file__)]
+
+
 def toposort(trees) -> Tuple:
     deps = get_dependencies(trees)
     tree_dict = {module_for_path(node.__file__): node for node in trees}
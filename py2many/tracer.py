@@ -7,6 +7,7 @@ from py2many.clike import CLikeTranspiler
 from py2many.exceptions import AstNotImplementedError
 
 from typing import Optional
+from py2many.visitor import NodeVisitor
 
 
 def decltype(node):
@@ -269,7 +270,7 @@ def value_type(node):
     return ValueTypeVisitor().visit(node)
 
 
-class ValueExpressionVisitor(ast.NodeVisitor):
+class ValueExpressionVisitor(NodeVisitor):
     def __init__(self):
         super().__init__()
         self._stack = []
@@ -329,7 +330,7 @@ class ValueExpressionVisitor(ast.NodeVisitor):
         )
 
 
-class ValueTypeVisitor(ast.NodeVisitor):
+class ValueTypeVisitor(NodeVisitor):
     def generic_visit(self, node):
         return "auto"
 
@@ -413,7 +414,7 @@ def is_recursive(fun):
     return finder.recursive
 
 
-class RecursionFinder(ast.NodeVisitor):
+class RecursionFinder(NodeVisitor):
     function_name = None
     recursive = False
 
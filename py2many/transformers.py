@@ -2,6 +2,27 @@ import ast
 
 from py2many.ast_helpers import get_id
 from .scope import ScopeList
+from py2many.visitor import NodeTransformer
+
+
+# Methods that modify the object they are called on
+MUTATING_METHODS = frozenset(
+    [
+        "add",
+        "append",
+        "clear",
+        "discard",
+        "extend",
+        "insert",
+        "pop",
+        "popitem",
+        "remove",
+        "reverse",
+        "setdefault",
+        "sort",
+        "update",
+    ]
+)
 
 
 def add_annotation_flags(node):
@@ -20,7 +41,7 @@ def correct_node_attributes(node):
     return CorrectNodeAttributes().visit(node)
 
 
-class AnnotationTransformer(ast.NodeTransformer):
+class AnnotationTransformer(NodeTransformer):
     """
     Adds a flag for every type annotation and nested types so they can be differentiated from array
     """
@@ -74,7 +95,7 @@ class AnnotationTransformer(ast.NodeTransformer):
         return node
 
 
-class NestingTransformer(ast.NodeTransformer):
+class NestingTransformer(NodeTransformer):
     """
     Some languages are white space sensitive. This transformer
     annotates relevant nodes with the nesting level
@@ -111,14 +132,18 @@ class NestingTransformer(ast.NodeTransformer):
         return node
 
 
-class MutabilityTransformer(ast.NodeTransformer):
+class MutabilityTransformer(NodeTransformer):
     """
-    Analyzes every function for mutable variables and put them into FunctionDef node
+    Analyzes every function for mutable variables and put them into FunctionDef node.
+    Arguments modified in place (a[0] = x, a.x = y, a.append(x)) are put into
+    mutable_args and arguments bound to a new value (a = x) into rebound_args
     """
 
     def __init__(self):
         self.var_usage_count = {}
         self.lvalue = False
+        self._mutated = set()
+        self._rebound = set()
 
     def increase_use_count(self, name):
         if name not in self.var_usage_count:
@@ -145,10 +170,35 @@ class MutabilityTransformer(ast.NodeTransformer):
         return node
 
     def visit_FunctionDef(self, node):
+        mutated, rebound = self._mutated, self._rebound
+        self._mutated, self._rebound = set(), set()
         self.get_mutable_vars(node)
+        args = [arg.arg for arg in node.args.args]
+        node.mutable_args = [arg for arg in args if arg in self._mutated]
+        node.rebound_args = [arg for arg in args if arg in self._rebound]
+        # Nested functions can modify the variables of enclosing ones,
+        # but rebinding them creates a local variable
+        self._mutated |= mutated
+        self._rebound = rebound
         return node
 
+    def _mark_rebound(self, target):
+        if isinstance(target, ast.Name):
+            self._rebound.add(target.id)
+        elif isinstance(target, (ast.Tuple, ast.List)):
+            for e in target.elts:
+                self._mark_rebound(e)
+
+    def _mark_mutated(self, node):
+        # b.items.append(x) and b.items[0] = x mutate b
+        while isinstance(node, (ast.Attribute, ast.Subscript)):
+            node = node.value
+        if isinstance(node, ast.Name):
+            self._mutated.add(node.id)
+
     def visit_Assign(self, node):
+        for target in node.targets:
+            self._mark_rebound(target)
         old = self.lvalue
         self.lvalue = True
         target = node.targets[0]
@@ -161,6 +211,7 @@ class MutabilityTransformer(ast.NodeTransformer):
         return node
 
     def _visit_assign_target(self, node) -> ast.AST:
+        self._mark_rebound(node.target)
         old = self.lvalue
         self.lvalue = True
         self.visit(node.target)
@@ -175,10 +226,18 @@ class MutabilityTransformer(ast.NodeTransformer):
         return self._visit_assign_target(node)
 
     def visit_Subscript(self, node):
+        if self.lvalue:
+            self._mark_mutated(node.value)
         self.visit(node.value)
         self.visit(node.slice)
         return node
 
+    def visit_Attribute(self, node):
+        if self.lvalue:
+            self._mark_mutated(node.value)
+        self.generic_visit(node)
+        return node
+
     def visit_Name(self, node):
         if self.lvalue:
             self.increase_use_count(get_id(node))
@@ -191,14 +250,18 @@ class MutabilityTransformer(ast.NodeTransformer):
             for fnarg, node_arg in zip(fndef.args.args, node.args):
                 if hasattr(fndef, "mutable_vars") and fnarg.arg in fndef.mutable_vars:
                     self.increase_use_count(get_id(node_arg))
+                if fnarg.arg in getattr(fndef, "mutable_args", []):
+                    self._mark_mutated(node_arg)
         if hasattr(node.func, "attr"):
             if node.func.attr == "append":
                 self.increase_use_count(get_id(node.func.value))
+            if node.func.attr in MUTATING_METHODS:
+                self._mark_mutated(node.func.value)
         self.generic_visit(node)
         return node
 
 
-class CorrectNodeAttributes(ast.NodeTransformer):
+class CorrectNodeAttributes(NodeTransformer):
     """Avoid that newly created nodes are missing any attributes"""
     def __init__(self) -> None:
         super().__init__()
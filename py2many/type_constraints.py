@@ -0,0 +1,434 @@
+import ast
+
+from typing import Dict, List, Optional, Union
+
+from py2many.ast_helpers import get_id
+from py2many.type_terms import (
+    ANY,
+    BOOL,
+    FLOAT,
+    INT,
+    NONE,
+    STR,
+    TypeTerm,
+    from_annotation,
+    is_subtype,
+    join,
+    type_term,
+)
+
+# Component variables of the containers: the element type of a list or a
+# set, the key and value types of a dict
+COMPONENTS = {
+    "list": ("elem",),
+    "set": ("elem",),
+    "dict": ("key", "value"),
+}
+
+# Methods that add their argument to a container, by component
+_ADD_METHODS = {"append": "elem", "add": "elem", "insert": "elem"}
+
+# Type constructors that backends can't declare variables with
+_IMPRECISE = frozenset(["Any", "Union", "Optional", "None", "[]", "..."])
+
+
+class TypeVar:
+    """Type of a variable, function return or container component, in a
+    union-find forest. Only the root of a set is meaningful: its lower bound
+    is the join of the types flowing into any variable of the set"""
+
+    __slots__ = ("parent", "rank", "lower", "components", "nodes")
+
+    def __init__(self):
+        self.parent = self
+        self.rank = 0
+        self.lower: Optional[TypeTerm] = None
+        self.components: Dict[str, "TypeVar"] = {}
+        self.nodes: List[ast.AST] = []
+
+    def find(self) -> "TypeVar":
+        var = self
+        while var.parent is not var:
+            var.parent = var.parent.parent
+            var = var.parent
+        return var
+
+
+class ConstraintSolver:
+    """Solves equality constraints between type variables with union-find,
+    and lower bounds with joins.
+
+    Unifying two containers unifies their components, which is done with a
+    worklist instead of recursively. Each union merges two sets for good,
+    so solving takes near linear time in the number of constraints."""
+
+    def __init__(self):
+        self._pending = []
+
+    def unify(self, a: TypeVar, b: TypeVar):
+        self._pending.append((a, b))
+        while self._pending:
+            a, b = self._pending.pop()
+            a, b = a.find(), b.find()
+            if a is b:
+                continue
+            if a.rank < b.rank:
+                a, b = b, a
+            b.parent = a
+            if a.rank == b.rank:
+                a.rank += 1
+            if b.lower is not None:
+                self._add_lower(a, b.lower)
+            a.nodes.extend(b.nodes)
+            for name, component in b.components.items():
+                if name in a.components:
+                    self._pending.append((a.components[name], component))
+                else:
+                    a.components[name] = component
+            b.nodes = []
+            b.components = {}
+
+    def bound(self, var: TypeVar, term: TypeTerm):
+        """term is a subtype of var"""
+        root = var.find()
+        self._add_lower(root, term)
+        # A parameterized container bounds the components too
+        for name, arg in zip(COMPONENTS.get(term.name, ()), term.args):
+            self.bound(self.component(root, name), arg)
+
+    def component(self, var: TypeVar, name: str) -> TypeVar:
+        root = var.find()
+        component = root.components.get(name)
+        if component is None:
+            component = root.components[name] = TypeVar()
+        return component
+
+    @staticmethod
+    def _add_lower(root: TypeVar, term: TypeTerm):
+        if root.lower is None:
+            root.lower = term
+        elif root.lower is not term:
+            lower = join(root.lower, term)
+            # An unparameterized container and a parameterized one join to
+            # the latter, the components hold the rest
+            if lower is ANY and root.lower.name == term.name:
+                lower = type_term(term.name)
+            root.lower = lower
+
+    def solution(self, var: TypeVar, _seen=None) -> Optional[TypeTerm]:
+        root = var.find()
+        term = root.lower
+        if term is None:
+            return None
+        names = COMPONENTS.get(term.name)
+        if names and not term.args:
+            seen = _seen or set()
+            if id(root) in seen:
+                return None
+            seen.add(id(root))
+            args = []
+            for name in names:
+                component = root.components.get(name)
+                arg = self.solution(component, seen) if component else None
+                if not _is_precise(arg):
+                    return term
+                args.append(arg)
+            seen.discard(id(root))
+            return type_term(term.name, *args)
+        return term
+
+
+Operand = Union[TypeVar, TypeTerm, None]
+
+
+class ConstraintInference:
+    """Infers the types the forward pass of InferTypesTransformer leaves
+    unknown, like those of lists that start out empty and are appended to,
+    or of functions whose return type depends on a function defined later.
+
+    Constraints are generated in one walk of the module and solved at
+    once, then written to the annotation attributes that are missing or
+    unparameterized containers the forward pass inferred."""
+
+    def __init__(self):
+        self._solver = ConstraintSolver()
+        self._vars: Dict[int, TypeVar] = {}
+        self._returns: Dict[int, TypeVar] = {}
+        self._functions: List[ast.FunctionDef] = []
+        self._operations: List[tuple] = []
+
+    def run(self, tree: ast.Module):
+        self._collect(tree)
+        self._type_operations()
+        self._write_back()
+
+    def _var(self, definition: ast.AST) -> TypeVar:
+        var = self._vars.get(id(definition))
+        if var is None:
+            var = self._vars[id(definition)] = TypeVar()
+            var.nodes.append(definition)
+            if (ann := self._known(definition)) is not None:
+                self._solver.bound(var, ann)
+        return var
+
+    def _return_var(self, func: ast.FunctionDef) -> TypeVar:
+        var = self._returns.get(id(func))
+        if var is None:
+            var = self._returns[id(func)] = TypeVar()
+            self._functions.append(func)
+            if (returns := from_annotation(getattr(func, "returns", None))) is not None:
+                self._solver.bound(var, returns)
+        return var
+
+    @staticmethod
+    def _known(node) -> Optional[TypeTerm]:
+        term = from_annotation(getattr(node, "annotation", None))
+        if term is None or term is ANY:
+            return None
+        return term
+
+    def _definition(self, node: ast.Name) -> Optional[ast.AST]:
+        scopes = getattr(node, "scopes", None)
+        if scopes is None:
+            return None
+        definition = scopes.find(get_id(node))
+        if isinstance(definition, (ast.Name, ast.arg)):
+            return definition
+        return None
+
+    def _operand(self, node) -> Operand:
+        """The type of an expression, as a variable when it may still be
+        refined"""
+        if isinstance(node, ast.Name):
+            definition = self._definition(node)
+            if definition is None:
+                return self._known(node)
+            return self._var(definition)
+        if isinstance(node, (ast.List, ast.Set, ast.Dict)) and not _elements(node):
+            return self._empty_container(node, _CONTAINER_NAMES[type(node)])
+        if isinstance(node, ast.Call):
+            func = get_id(node.func)
+            if func in ("list", "set", "dict") and not node.args and not node.keywords:
+                return self._empty_container(node, func)
+            if func and (scopes := getattr(node, "scopes", None)):
+                fn = scopes.find(func)
+                if isinstance(fn, ast.FunctionDef):
+                    var = self._return_var(fn)
+                    var.find().nodes.append(node)
+                    return var
+        if isinstance(node, ast.BinOp) and self._known(node) is None:
+            result = TypeVar()
+            result.nodes.append(node)
+            left, right = self._operand(node.left), self._operand(node.right)
+            self._operations.append((result, node.op, left, right))
+            return result
+        if isinstance(node, ast.Subscript) and not isinstance(node.slice, ast.Slice):
+            container = self._operand(node.value)
+            if isinstance(container, TypeVar):
+                term = container.find().lower
+                if term is not None and term.name in ("list", "dict"):
+                    component = self._solver.component(
+                        container, "elem" if term.name == "list" else "value"
+                    )
+                    component.find().nodes.append(node)
+                    return component
+        return self._known(node)
+
+    def _empty_container(self, node, name: str) -> TypeVar:
+        var = TypeVar()
+        var.nodes.append(node)
+        self._solver.bound(var, type_term(name))
+        return var
+
+    def _flow(self, value: Operand, target: TypeVar):
+        if isinstance(value, TypeVar):
+            self._solver.unify(value, target)
+        elif value is not None:
+            self._solver.bound(target, value)
+
+    def _collect(self, tree):
+        for node in ast.walk(tree):
+            if isinstance(node, ast.Assign):
+                value = self._operand(node.value)
+                for target in node.targets:
+                    self._assign(target, value)
+            elif isinstance(node, (ast.AnnAssign, ast.AugAssign)):
+                if node.value is not None and isinstance(node.target, ast.Name):
+                    if (definition := self._definition(node.target)) is not None:
+                        self._flow(self._operand(node.value), self._var(definition))
+            elif isinstance(node, ast.Return):
+                func = _enclosing_function(node)
+                if func is not None:
+                    value = self._operand(node.value) if node.value else NONE
+                    self._flow(value, self._return_var(func))
+            elif isinstance(node, ast.Call):
+                self._call(node)
+            elif isinstance(node, ast.Name):
+                definition = self._definition(node)
+                if definition is not None and definition is not node:
+                    self._var(definition).find().nodes.append(node)
+
+    def _assign(self, target, value: Operand):
+        if isinstance(target, ast.Name):
+            if (definition := self._definition(target)) is not None:
+                self._flow(value, self._var(definition))
+        elif isinstance(target, ast.Subscript) and not isinstance(
+            target.slice, ast.Slice
+        ):
+            # Only used if the container turns out to be a dict
+            container = self._operand(target.value)
+            if isinstance(container, TypeVar):
+                self._flow(
+                    self._operand(target.slice),
+                    self._solver.component(container, "key"),
+                )
+                self._flow(value, self._solver.component(container, "value"))
+
+    def _call(self, node: ast.Call):
+        func = node.func
+        if isinstance(func, ast.Attribute) and func.attr in _ADD_METHODS and node.args:
+            container = self._operand(func.value)
+            if isinstance(container, TypeVar):
+                self._flow(
+                    self._operand(node.args[-1]),
+                    self._solver.component(container, _ADD_METHODS[func.attr]),
+                )
+        elif isinstance(func, ast.Name) and (scopes := getattr(node, "scopes", None)):
+            # Unannotated arguments of module functions get the types they
+            # are called with
+            fn = scopes.find(get_id(func))
+            if isinstance(fn, ast.FunctionDef) and not node.keywords:
+                params = fn.args.args
+                if len(params) == len(node.args):
+                    for param, arg in zip(params, node.args):
+                        if param.annotation is None and param.arg != "self":
+                            self._flow(self._operand(arg), self._var(param))
+
+    def _type_operations(self):
+        # An operation is typed once the types of its operands are known,
+        # which may take a few rounds when operands are operations too
+        pending = self._operations
+        while pending:
+            waiting = []
+            for operation in pending:
+                result, op, left, right = operation
+                left, right = self._solve(left), self._solve(right)
+                if left is None or right is None:
+                    waiting.append(operation)
+                elif (term := _operation_type(op, left, right)) is not None:
+                    self._solver.bound(result, term)
+            if len(waiting) == len(pending):
+                break
+            pending = waiting
+
+    def _solve(self, operand: Operand) -> Optional[TypeTerm]:
+        if isinstance(operand, TypeVar):
+            operand = self._solver.solution(operand)
+        return operand if _is_precise(operand) else None
+
+    def _write_back(self):
+        solver = self._solver
+        solutions = {}
+        for var in list(self._vars.values()) + list(self._returns.values()):
+            root = var.find()
+            if id(root) in solutions:
+                continue
+            term = solver.solution(root)
+            solutions[id(root)] = term if _is_precise(term) else None
+            if solutions[id(root)] is None:
+                continue
+            for node in root.nodes:
+                _refine(node, term)
+        for func in self._functions:
+            # Generators are annotated by the forward pass
+            if hasattr(func, "annotation"):
+                continue
+            term = solutions.get(id(self._returns[id(func)].find()))
+            if term is not None and (
+                func.returns is None or _is_refinable(func.returns, term)
+            ):
+                func.returns = _annotation(term)
+                func.returns.inferred = True
+
+
+_CONTAINER_NAMES = {ast.List: "list", ast.Set: "set", ast.Dict: "dict"}
+
+
+def _elements(node) -> list:
+    return node.keys if isinstance(node, ast.Dict) else node.elts
+
+
+def _enclosing_function(node) -> Optional[ast.FunctionDef]:
+    for scope in reversed(getattr(node, "scopes", [])):
+        if isinstance(scope, (ast.FunctionDef, ast.AsyncFunctionDef)):
+            return scope
+        if isinstance(scope, (ast.ClassDef, ast.Module)):
+            return None
+    return None
+
+
+def _is_precise(term: Optional[TypeTerm]) -> bool:
+    if term is None or term.name in _IMPRECISE:
+        return False
+    return all(_is_precise(arg) for arg in term.args)
+
+
+def _refine(node, term: TypeTerm):
+    """Annotate node with term, unless it already has a type the forward
+    pass inferred or the source declared"""
+    annotation = getattr(node, "annotation", None)
+    if annotation is not None:
+        if isinstance(node, ast.arg) or not _is_refinable(annotation, term):
+            return
+    node.annotation = _annotation(term)
+    node.annotation.inferred = True
+
+
+def _is_refinable(annotation, term: TypeTerm) -> bool:
+    """Whether annotation is an unparameterized container the forward
+    pass inferred, that term is a more precise version of"""
+    current = from_annotation(annotation)
+    return (
+        current is not None
+        and current.name == term.name
+        and current.name in COMPONENTS
+        and not current.args
+        and term.args
+        # Annotations in the source have a position
+        and (
+            getattr(annotation, "inferred", False) or not hasattr(annotation, "lineno")
+        )
+    )
+
+
+def _annotation(term: TypeTerm) -> ast.expr:
+    annotation = term.to_annotation()
+    for n in ast.walk(annotation):
+        n.is_annotation = True
+    return annotation
+
+
+_BOOL_OPERATORS = (ast.BitAnd, ast.BitOr, ast.BitXor)
+
+
+def _operation_type(op, left: TypeTerm, right: TypeTerm) -> Optional[TypeTerm]:
+    if is_subtype(left, FLOAT) and is_subtype(right, FLOAT):
+        term = join(left, right)
+        # Only the bitwise operators keep bools, the others give ints
+        if term is BOOL and not isinstance(op, _BOOL_OPERATORS):
+            term = INT
+        return join(term, FLOAT) if isinstance(op, ast.Div) else term
+    if isinstance(op, ast.Add) and left.name == right.name:
+        if left is STR or left.name in ("list", "tuple"):
+            term = join(left, right)
+            return term if term is not ANY else None
+    if isinstance(op, ast.Mult) and (left is STR or left.name == "list"):
+        return left if is_subtype(right, type_term("int")) else None
+    if isinstance(op, ast.Mod) and left is STR:
+        return STR
+    return None
+
+
+def infer_constraint_types(tree: ast.Module) -> ast.Module:
+    ConstraintInference().run(tree)
+    return tree
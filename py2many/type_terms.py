@@ -0,0 +1,273 @@
+import ast
+
+from functools import lru_cache
+from typing import Dict, Iterable, Optional, Tuple
+
+from py2many.ast_helpers import get_id
+
+# Spellings of the same type that are interned as one term
+ALIASES = {
+    "List": "list",
+    "Dict": "dict",
+    "Set": "set",
+    "FrozenSet": "frozenset",
+    "Tuple": "tuple",
+    "Type": "type",
+    "NoneType": "None",
+}
+
+_TYPING_NAMES = {v: k for k, v in ALIASES.items()}
+
+# bool <: int <: float <: complex
+NUMERIC_TOWER = ("bool", "int", "float", "complex")
+
+# Fixed width integers annotations may use, all of which are subtypes of int
+FIXED_WIDTH_INTS = frozenset(
+    [
+        "c_int8",
+        "c_int16",
+        "c_int32",
+        "c_int64",
+        "c_uint8",
+        "c_uint16",
+        "c_uint32",
+        "c_uint64",
+        "i8",
+        "i16",
+        "i32",
+        "i64",
+        "isize",
+        "ilong",
+        "u8",
+        "u16",
+        "u32",
+        "u64",
+        "usize",
+        "ulong",
+    ]
+)
+
+
+class TypeTerm:
+    """A type: a constructor name applied to argument types, for example
+    list[int] is TypeTerm("list", (TypeTerm("int"),)).
+
+    Terms are interned by type_term, so two terms are equal only if they
+    are the same object, and can be compared and hashed in O(1). They are
+    immutable."""
+
+    __slots__ = ("name", "args", "_str", "_renders")
+
+    def __init__(self, name: str, args: Tuple["TypeTerm", ...]):
+        self.name = name
+        self.args = args
+        self._str = None
+        self._renders = {}
+
+    def __repr__(self) -> str:
+        return f"TypeTerm({str(self)})"
+
+    def __str__(self) -> str:
+        # Python syntax, e.g. dict[str, list[int]]
+        if self._str is None:
+            args = ", ".join(str(a) for a in self.args)
+            if self.name == "[]":
+                self._str = f"[{args}]"
+            elif self.args:
+                self._str = f"{self.name}[{args}]"
+            else:
+                self._str = self.name
+        return self._str
+
+    def __reduce__(self):
+        return (type_term, (self.name,) + self.args)
+
+    def __copy__(self):
+        return self
+
+    def __deepcopy__(self, memo):
+        return self
+
+    def to_annotation(self) -> ast.expr:
+        """A new annotation node for the term"""
+        return ast.parse(str(self), mode="eval").body
+
+    def render(self, transpiler) -> str:
+        """The term in the type syntax of a backend.
+
+        Renderings are cached per transpiler class, so they must only depend
+        on the term and the type maps of the class."""
+        key = transpiler.__class__
+        ret = self._renders.get(key)
+        if ret is None:
+            ret = self._render(transpiler)
+            self._renders[key] = ret
+        return ret
+
+    def _render(self, transpiler) -> str:
+        if self is ANY:
+            return transpiler._default_type
+        if not self.args:
+            return transpiler._map_type(self.name)
+        args = [a.render(transpiler) for a in self.args]
+        if ANY in self.args:
+            return transpiler._default_type
+        # Container maps are keyed by the typing spelling in most backends
+        container_map = transpiler._container_type_map
+        head = container_map.get(self.name) or container_map.get(
+            _TYPING_NAMES.get(self.name)
+        )
+        if not head:
+            head = transpiler._map_type(self.name)
+        return transpiler._combine_value_index(head, ", ".join(args))
+
+
+_terms: Dict[Tuple, TypeTerm] = {}
+
+
+def type_term(name: str, *args: TypeTerm) -> TypeTerm:
+    """The interned term for name[args]"""
+    key = (name,) + args
+    term = _terms.get(key)
+    if term is None:
+        if name.startswith("typing."):
+            name = name[len("typing.") :]
+        name = ALIASES.get(name, name)
+        canonical = (name,) + args
+        term = _terms.get(canonical)
+        if term is None:
+            term = TypeTerm(name, args)
+            _terms[canonical] = term
+        _terms[key] = term
+    return term
+
+
+ANY = type_term("Any")
+NONE = type_term("None")
+BOOL = type_term("bool")
+INT = type_term("int")
+FLOAT = type_term("float")
+STR = type_term("str")
+
+
+def from_annotation(node) -> Optional[TypeTerm]:
+    """The term for an annotation node or string, None if it isn't one
+    that can be represented"""
+    if node is None:
+        return None
+    if isinstance(node, str):
+        return from_string(node)
+    if isinstance(node, (ast.Name, ast.Attribute)):
+        name = get_id(node)
+        return type_term(name) if name else None
+    if isinstance(node, ast.Constant):
+        if node.value is None:
+            return NONE
+        if node.value is Ellipsis:
+            return type_term("...")
+        if isinstance(node.value, str):
+            return from_string(node.value)
+        return None
+    if isinstance(node, ast.Subscript):
+        value = from_annotation(node.value)
+        if value is None or value.args:
+            return None
+        elts = node.slice.elts if isinstance(node.slice, ast.Tuple) else [node.slice]
+        args = _from_annotations(elts)
+        return type_term(value.name, *args) if args is not None else None
+    if isinstance(node, ast.List):
+        args = _from_annotations(node.elts)
+        return type_term("[]", *args) if args is not None else None
+    return None
+
+
+def _from_annotations(nodes: Iterable) -> Optional[Tuple[TypeTerm, ...]]:
+    terms = tuple(from_annotation(n) for n in nodes)
+    return None if None in terms else terms
+
+
+@lru_cache(maxsize=None)
+def from_string(annotation: str) -> Optional[TypeTerm]:
+    try:
+        node = ast.parse(annotation, mode="eval").body
+    except SyntaxError:
+        return None
+    return from_annotation(node)
+
+
+def _numeric_rank(term: TypeTerm) -> Optional[int]:
+    if term.args:
+        return None
+    if term.name in FIXED_WIDTH_INTS:
+        return NUMERIC_TOWER.index("int")
+    if term.name in NUMERIC_TOWER:
+        return NUMERIC_TOWER.index(term.name)
+    return None
+
+
+_subtypes: Dict[Tuple[TypeTerm, TypeTerm], bool] = {}
+
+
+def is_subtype(sub: TypeTerm, sup: TypeTerm) -> bool:
+    key = (sub, sup)
+    ret = _subtypes.get(key)
+    if ret is None:
+        ret = _is_subtype(sub, sup)
+        _subtypes[key] = ret
+    return ret
+
+
+def _is_subtype(sub: TypeTerm, sup: TypeTerm) -> bool:
+    if sub is sup or sup is ANY:
+        return True
+    if sup.name == "Optional" and len(sup.args) == 1:
+        return sub is NONE or is_subtype(sub, sup.args[0])
+    if sup.name == "Union":
+        return any(is_subtype(sub, a) for a in sup.args)
+    if sub.name == "Union":
+        return all(is_subtype(a, sup) for a in sub.args)
+    sub_rank, sup_rank = _numeric_rank(sub), _numeric_rank(sup)
+    if sub_rank is not None and sup_rank is not None:
+        # Different fixed width ints aren't subtypes of each other
+        if sub.name in FIXED_WIDTH_INTS and sup.name != "int":
+            return sup_rank > sub_rank
+        return sub_rank < sup_rank or (sub_rank == sup_rank and sup is INT)
+    if sub.name != sup.name:
+        return False
+    # An unparameterized container holds anything
+    if not sup.args:
+        return True
+    if len(sub.args) != len(sup.args):
+        return False
+    return all(is_subtype(a, b) for a, b in zip(sub.args, sup.args))
+
+
+_joins: Dict[Tuple[TypeTerm, TypeTerm], TypeTerm] = {}
+
+
+def join(a: TypeTerm, b: TypeTerm) -> TypeTerm:
+    """The least type both terms are subtypes of"""
+    key = (a, b)
+    ret = _joins.get(key)
+    if ret is None:
+        ret = _join(a, b)
+        _joins[key] = ret
+        _joins[(b, a)] = ret
+    return ret
+
+
+def _join(a: TypeTerm, b: TypeTerm) -> TypeTerm:
+    if is_subtype(a, b):
+        return b
+    if is_subtype(b, a):
+        return a
+    if a is NONE:
+        return type_term("Optional", b)
+    if b is NONE:
+        return type_term("Optional", a)
+    rank_a, rank_b = _numeric_rank(a), _numeric_rank(b)
+    if rank_a is not None and rank_b is not None:
+        return type_term(NUMERIC_TOWER[max(rank_a, rank_b, 1)])
+    if a.name == b.name and len(a.args) == len(b.args):
+        return type_term(a.name, *(join(x, y) for x, y in zip(a.args, b.args)))
+    return ANY
@@ -0,0 +1,198 @@
+import ast
+import os
+
+from pathlib import PosixPath
+from typing import Callable, Dict, Optional, Set
+
+try:
+    from typpete.inference_runner import infer as infer_types_ast
+    from typpete.src.context import Context
+    from typpete.src.z3_types import TypesSolver
+    from z3 import sat
+except ModuleNotFoundError:
+    TypesSolver = None
+
+from py2many.helpers import get_import_module_name
+from py2many.inference import InferMeta
+from py2many.pytype_inference import (
+    PyiCache,
+    _create_gitignore,
+    _get_pyi_dir,
+    _hashcontents,
+)
+from py2many.toposort_modules import module_for_path
+
+# Bump when the format of the cached signatures changes
+CACHE_VERSION = "1"
+CACHE_FILE = "typpete.sqlite"
+
+
+def infer_types_typpete(node) -> InferMeta:
+    """Infers the types of a single module"""
+    return TyppeteSession().infer(node)
+
+
+def _no_inference(node) -> InferMeta:
+    return InferMeta(True)
+
+
+class TyppeteSession:
+    """Infers the types of the modules of a run with typpete, sharing
+    one z3 solver between them. Setting up the solver (the sorts of all
+    the classes and the axioms) is done once, and the constraints of
+    each module are asserted in a push/pop scope.
+
+    Modules must be inferred in dependency order. A module sees its
+    dependencies through the stubs of their solved signatures rather
+    than through their sources, and the signatures are cached keyed on
+    the source of the module and the signatures of its dependencies, so
+    unchanged modules are not solved again. The types of the rest of
+    the module are then inferred from the signatures by inference"""
+
+    def __init__(
+        self,
+        sources: Optional[Dict[str, str]] = None,
+        basedir: Optional[PosixPath] = None,
+        inference: Callable[[ast.Module], InferMeta] = _no_inference,
+    ):
+        # Sources of all the modules of the run, keyed by module
+        self._sources = sources or {}
+        self._inference = inference
+        self._solver = None
+        self._stubs: Dict[str, str] = {}
+        self._interface_hashes: Dict[str, str] = {}
+        self._cache = None
+        # Nothing is solved, and so cached, without typpete
+        if basedir is not None and self._sources and self.available():
+            pyi_dir = _get_pyi_dir(basedir)
+            os.makedirs(pyi_dir, exist_ok=True)
+            _create_gitignore(pyi_dir)
+            self._cache = PyiCache(os.path.join(pyi_dir, CACHE_FILE))
+
+    @staticmethod
+    def available() -> bool:
+        return TypesSolver is not None
+
+    def close(self):
+        if self._cache is not None:
+            self._cache.close()
+            self._cache = None
+
+    def infer(self, node: ast.Module) -> InferMeta:
+        module = module_for_path(node.__file__)
+        deps = self._dependencies(node)
+        source = self._sources.get(module)
+        key = None
+        cached = None
+        if source is not None and self._cache is not None:
+            key = _cache_key(source, deps, self._interface_hashes)
+            cached = self._cache.get(module, key)
+        if cached:
+            stub_src, interface_hash = cached
+        else:
+            solved = self._solve(node, deps)
+            stub_src = signature_stubs(node)
+            if key is not None and solved:
+                interface_hash = self._cache.put(module, key, stub_src)
+            else:
+                interface_hash = _hashcontents(stub_src)
+        self._stubs[module] = stub_src
+        self._interface_hashes[module] = interface_hash
+        apply_signatures(node, stub_src)
+        return self._inference(node)
+
+    def _dependencies(self, node: ast.Module) -> Set[str]:
+        return {
+            dep
+            for stmt in node.body
+            if (dep := self._imported_module(stmt, node)) in self._stubs
+        }
+
+    def _imported_module(self, stmt, node) -> Optional[str]:
+        if not isinstance(stmt, ast.ImportFrom):
+            return None
+        return get_import_module_name(stmt, node.__file__, node.__basedir__)
+
+    def _get_solver(self, node: ast.Module):
+        if self._solver is None:
+            # The sorts of the solver are built from the classes of
+            # every module, so that it can be shared between them
+            trees = [ast.parse(src) for src in self._sources.values()] or [node]
+            program = ast.Module(
+                body=[stmt for tree in trees for stmt in tree.body], type_ignores=[]
+            )
+            self._solver = TypesSolver(program)
+        return self._solver
+
+    def _solve(self, node: ast.Module, deps: Set[str]) -> bool:
+        if not self.available():
+            return False
+        solver = self._get_solver(node)
+        # Dependencies are known by their signatures, not their sources
+        body = [
+            stmt for dep in sorted(deps) for stmt in ast.parse(self._stubs[dep]).body
+        ]
+        body += [
+            stmt for stmt in node.body if self._imported_module(stmt, node) not in deps
+        ]
+        solver.optimize.push()
+        try:
+            context = Context(node, body, solver)
+            for stmt in body:
+                infer_types_ast(stmt, context, solver)
+            if solver.optimize.check() == sat:
+                context.generate_typed_ast(solver.optimize.model(), solver)
+        finally:
+            solver.optimize.pop()
+        return True
+
+
+def signature_stubs(node: ast.Module) -> str:
+    """Stubs of the annotated module level functions"""
+    stubs = []
+    for stmt in node.body:
+        if not isinstance(stmt, ast.FunctionDef):
+            continue
+        args = [a for a in stmt.args.args if a.annotation is not None]
+        if not args and stmt.returns is None:
+            continue
+        stub = ast.FunctionDef(
+            name=stmt.name,
+            args=ast.arguments(
+                posonlyargs=[],
+                args=[ast.arg(arg=a.arg, annotation=a.annotation) for a in args],
+                kwonlyargs=[],
+                kw_defaults=[],
+                defaults=[],
+            ),
+            body=[ast.Expr(value=ast.Constant(value=...))],
+            decorator_list=[],
+            returns=stmt.returns,
+            type_comment=None,
+        )
+        stubs.append(stub)
+    stubs = ast.fix_missing_locations(ast.Module(body=stubs, type_ignores=[]))
+    return ast.unparse(stubs)
+
+
+def apply_signatures(node: ast.Module, stub_src: str):
+    """Annotates the module level functions of node with the
+    signatures of the stubs, where they have no annotation"""
+    functions = {
+        stmt.name: stmt for stmt in node.body if isinstance(stmt, ast.FunctionDef)
+    }
+    for stub in ast.parse(stub_src).body:
+        func = functions.get(stub.name)
+        if func is None:
+            continue
+        annotations = {a.arg: a.annotation for a in stub.args.args}
+        for arg in func.args.args:
+            if arg.annotation is None and arg.arg in annotations:
+                arg.annotation = annotations[arg.arg]
+        if func.returns is None:
+            func.returns = stub.returns
+
+
+def _cache_key(src: str, deps, interface_hashes: Dict[str, str]) -> str:
+    dep_hashes = [f"{dep}:{interface_hashes[dep]}" for dep in sorted(deps)]
+    return _hashcontents("\0".join([CACHE_VERSION, src] + dep_hashes))
@@ -0,0 +1,627 @@
+import ast
+import math
+
+from collections import deque
+from dataclasses import dataclass
+from typing import Dict, List, NamedTuple, Optional, Set, Tuple
+
+from py2many.ast_helpers import get_id
+
+INT64_MIN = -(2**63)
+INT64_MAX = 2**63 - 1
+
+# Rounds in which a variable may keep growing before its bounds are widened
+WIDEN_AFTER = 3
+MAX_ROUNDS = 100
+
+# Results with more bits than this are treated as unbounded instead of
+# being computed
+MAX_BITS = 4096
+
+# Operators that make a variable grow geometrically when it depends on itself
+_GEOMETRIC_OPS = (ast.Mult, ast.Pow, ast.LShift)
+
+_RETURN = "<return>"
+
+# Expressions with their own scope, which isn't analysed
+_OWN_SCOPE = (ast.Lambda, ast.ListComp, ast.SetComp, ast.DictComp, ast.GeneratorExp)
+
+
+@dataclass(frozen=True)
+class Interval:
+    """Closed interval of integers, bounds may be -inf/inf.
+
+    `assumed` intervals are derived from values the analysis can't see,
+    like arguments, len() or int(str). They are trusted to fit in 64 bits,
+    as they would be without arbitrary precision"""
+
+    lo: float
+    hi: float
+    assumed: bool = False
+
+    @property
+    def is_bounded(self) -> bool:
+        return not (math.isinf(self.lo) or math.isinf(self.hi))
+
+    @property
+    def fits_int64(self) -> bool:
+        return INT64_MIN <= self.lo and self.hi <= INT64_MAX
+
+    def join(self, other: Optional["Interval"]) -> "Interval":
+        if other is None:
+            return self
+        return Interval(
+            min(self.lo, other.lo),
+            max(self.hi, other.hi),
+            self.assumed or other.assumed,
+        )
+
+    def clamp(self) -> "Interval":
+        return Interval(max(self.lo, INT64_MIN), min(self.hi, INT64_MAX), True)
+
+
+INT64 = Interval(INT64_MIN, INT64_MAX, assumed=True)
+BOOL = Interval(0, 1)
+
+
+class Promotion(NamedTuple):
+    """A variable that needs arbitrary precision, and why"""
+
+    name: str
+    lineno: int
+    reason: str
+
+    def __str__(self):
+        return f"{self.name} (line {self.lineno}): {self.reason}"
+
+
+def find_arbitrary_precision_vars(node: ast.Module) -> List[Promotion]:
+    """Value range analysis of integer variables.
+
+    Sets `needs_arbitrary_precision` on the names, arguments and function
+    definitions (for their return value) that can hold values outside of
+    the 64 bit range, and returns why they were promoted"""
+    return IntegerRangeAnalysis().analyse(node)
+
+
+class _Update(NamedTuple):
+    """One way a variable gets a value"""
+
+    expr: ast.AST
+    scope: Tuple[ast.AST, ...]
+    lineno: int
+    # Range of a for loop variable, instead of the value itself
+    is_iter: bool = False
+    # Augmented assignment operator, applied to the variable itself
+    op: Optional[ast.operator] = None
+
+
+class IntegerRangeAnalysis:
+    """Flow insensitive interval analysis over assignments, for loops,
+    call arguments and return values, iterated to a fixed point.
+
+    Variables that keep growing are widened after a few rounds. If they
+    depend on themselves through *, ** or << they grow geometrically and
+    become unbounded. Otherwise they are counters, which can't realistically
+    exceed 64 bits, and are widened to the 64 bit range."""
+
+    def __init__(self):
+        self._module = None
+        # scope node -> names that are local to it
+        self._locals: Dict[ast.AST, Set[str]] = {}
+        self._globals: Dict[ast.AST, Set[str]] = {}
+        # variable -> ways it gets a value
+        self._updates: Dict[Tuple, List[_Update]] = {}
+        # variable -> nodes that refer to it
+        self._refs: Dict[Tuple, List[ast.AST]] = {}
+        self._functions: Dict[str, ast.FunctionDef] = {}
+        self._env: Dict[Tuple, Optional[Interval]] = {}
+        self._widened: Dict[Tuple, int] = {}
+        self._geometric: Set[Tuple] = set()
+
+    def analyse(self, node: ast.Module) -> List[Promotion]:
+        self._module = node
+        self._functions = {
+            n.name: n for n in node.body if isinstance(n, ast.FunctionDef)
+        }
+        self._collect_scope(node, ())
+        self._geometric = self._find_geometric()
+        self._solve()
+        return self._promote()
+
+    # Collecting the variables
+
+    def _collect_scope(self, node, scope):
+        scope = scope + (node,)
+        local_names, global_names = set(), set()
+        if isinstance(node, ast.FunctionDef):
+            for arg in node.args.args:
+                local_names.add(arg.arg)
+                self._add_ref((node, arg.arg), arg)
+        for child in _scope_nodes(node):
+            if isinstance(child, (ast.Global, ast.Nonlocal)):
+                global_names.update(child.names)
+            elif isinstance(child, ast.Name):
+                # Rewriters don't always set ctx
+                if isinstance(getattr(child, "ctx", None), ast.Store):
+                    local_names.add(child.id)
+            elif isinstance(child, (ast.Assign, ast.AnnAssign, ast.AugAssign, ast.For)):
+                for target in _targets(child):
+                    local_names.update(
+                        n.id for n in ast.walk(target) if isinstance(n, ast.Name)
+                    )
+            elif isinstance(child, (ast.FunctionDef, ast.ClassDef)):
+                local_names.add(child.name)
+        self._locals[node] = local_names - global_names
+        self._globals[node] = global_names
+
+        for child in _scope_nodes(node):
+            if isinstance(child, (ast.FunctionDef, ast.ClassDef)):
+                self._collect_scope(child, scope)
+            elif isinstance(child, ast.Name):
+                self._add_ref(self._resolve(child.id, scope), child)
+            elif isinstance(child, (ast.Assign, ast.AnnAssign)):
+                if child.value is not None:
+                    for target in _targets(child):
+                        self._add_target(target, child.value, scope, child)
+            elif isinstance(child, ast.AugAssign):
+                if isinstance(child.target, ast.Name):
+                    key = self._resolve(child.target.id, scope)
+                    update = _Update(child.value, scope, child.lineno, op=child.op)
+                    self._add_update(key, update)
+            elif isinstance(child, ast.For):
+                self._add_target(child.target, child.iter, scope, child, is_iter=True)
+            elif isinstance(child, ast.Return) and isinstance(node, ast.FunctionDef):
+                if child.value is not None:
+                    update = _Update(child.value, scope, child.lineno)
+                    self._add_update((node, _RETURN), update)
+            elif isinstance(child, ast.Call):
+                self._add_call(child, scope)
+
+    def _add_target(self, target, value, scope, node, is_iter=False):
+        if isinstance(target, ast.Name):
+            key = self._resolve(target.id, scope)
+            self._add_update(key, _Update(value, scope, node.lineno, is_iter=is_iter))
+        elif isinstance(target, (ast.Tuple, ast.List)):
+            # Elements of unpacked values aren't tracked
+            for elt in target.elts:
+                if isinstance(elt, ast.Name):
+                    key = self._resolve(elt.id, scope)
+                    self._add_update(key, _Update(None, scope, node.lineno))
+
+    def _add_call(self, node, scope):
+        fndef = self._module_function(node, scope)
+        if fndef is None:
+            return
+        if node.keywords or any(isinstance(a, ast.Starred) for a in node.args):
+            return
+        for arg, value in zip(fndef.args.args, node.args):
+            self._add_update((fndef, arg.arg), _Update(value, scope, node.lineno))
+
+    def _module_function(self, node: ast.Call, scope) -> Optional[ast.FunctionDef]:
+        fname = get_id(node.func)
+        fndef = self._functions.get(fname)
+        if fndef is None or self._resolve(fname, scope) != (self._module, fname):
+            return None
+        return fndef
+
+    def _add_update(self, key, update):
+        self._updates.setdefault(key, []).append(update)
+
+    def _add_ref(self, key, node):
+        self._refs.setdefault(key, []).append(node)
+
+    def _resolve(self, name, scope) -> Tuple:
+        for i, s in enumerate(reversed(scope)):
+            if i > 0 and isinstance(s, ast.ClassDef):
+                # Class bodies are not visible from their methods
+                continue
+            if name in self._globals.get(s, ()):
+                break
+            if name in self._locals.get(s, ()):
+                return (s, name)
+        return (self._module, name)
+
+    def _expr_keys(self, expr, scope, geometric=False) -> Set[Tuple]:
+        """Variables an expression depends on. With geometric set, only
+        those that are operands of *, ** or <<"""
+        keys = set()
+        if expr is None:
+            return keys
+        for n in ast.walk(expr):
+            if geometric and not (
+                isinstance(n, ast.BinOp) and isinstance(n.op, _GEOMETRIC_OPS)
+            ):
+                continue
+            for m in ast.walk(n):
+                if isinstance(m, ast.Name):
+                    keys.add(self._resolve(m.id, scope))
+                elif isinstance(m, ast.Call):
+                    fndef = self._module_function(m, scope)
+                    if fndef is not None:
+                        keys.add((fndef, _RETURN))
+        return keys
+
+    def _find_geometric(self) -> Set[Tuple]:
+        deps = {
+            key: set().union(*(self._expr_keys(u.expr, u.scope) for u in updates))
+            for key, updates in self._updates.items()
+        }
+        for key, updates in self._updates.items():
+            if any(u.op is not None for u in updates):
+                deps[key].add(key)
+
+        def reaches(start, goal):
+            seen, todo = set(), [start]
+            while todo:
+                key = todo.pop()
+                if key == goal:
+                    return True
+                if key not in seen:
+                    seen.add(key)
+                    todo.extend(deps.get(key, ()))
+            return False
+
+        geometric = set()
+        for key, updates in self._updates.items():
+            for u in updates:
+                sources = self._expr_keys(u.expr, u.scope, geometric=True)
+                if isinstance(u.op, _GEOMETRIC_OPS):
+                    sources |= {key} | self._expr_keys(u.expr, u.scope)
+                if any(reaches(s, key) for s in sources):
+                    geometric.add(key)
+                    break
+        return geometric
+
+    # Fixed point
+
+    def _solve(self):
+        for key in self._updates:
+            if self._is_argument(key):
+                # Arguments can also come from other modules
+                self._env[key] = INT64
+        changes = {}
+        for _ in range(MAX_ROUNDS):
+            changed = False
+            for key, updates in self._updates.items():
+                for u in updates:
+                    value = self._update_value(key, u)
+                    if value is None:
+                        continue
+                    old = self._env.get(key)
+                    new = value.join(old)
+                    if new == old:
+                        continue
+                    changes[key] = changes.get(key, 0) + 1
+                    if old is not None and changes[key] > WIDEN_AFTER:
+                        new = self._widen(key, old, new, u.lineno)
+                    self._env[key] = new
+                    changed = True
+            if not changed:
+                break
+        else:
+            # Give up on whatever still changes
+            for key in changes:
+                self._widened.setdefault(key, 0)
+                self._env[key] = Interval(-math.inf, math.inf)
+        self._narrow()
+
+    def _narrow(self):
+        """Widening overshoots when the growth is bounded by something else,
+        like the mask in h = (h * 31 + c) & 0xFFFFFFFF. Recompute the widened
+        variables from their updates to recover those bounds."""
+        for _ in range(WIDEN_AFTER):
+            changed = False
+            for key in self._widened:
+                value = INT64 if self._is_argument(key) else None
+                for u in self._updates[key]:
+                    update_value = self._update_value(key, u)
+                    if update_value is not None:
+                        value = update_value.join(value)
+                if value is not None and value != self._env[key]:
+                    self._env[key] = value
+                    changed = True
+            if not changed:
+                return
+
+    def _update_value(self, key, u: _Update) -> Optional[Interval]:
+        value = self._eval_update(key, u)
+        if (
+            value is not None
+            and value.assumed
+            and value.is_bounded
+            and not value.fits_int64
+            and key not in self._geometric
+        ):
+            return value.clamp()
+        return value
+
+    @staticmethod
+    def _is_argument(key) -> bool:
+        scope, name = key
+        return isinstance(scope, ast.FunctionDef) and name != _RETURN
+
+    def _widen(self, key, old, new, lineno) -> Interval:
+        self._widened.setdefault(key, lineno)
+        if key in self._geometric:
+            return Interval(
+                -math.inf if new.lo < old.lo else new.lo,
+                math.inf if new.hi > old.hi else new.hi,
+                new.assumed,
+            )
+        return Interval(
+            INT64_MIN if new.lo < old.lo else new.lo,
+            INT64_MAX if new.hi > old.hi else new.hi,
+            True,
+        )
+
+    def _eval_update(self, key, u: _Update) -> Optional[Interval]:
+        if u.expr is None:
+            return INT64
+        if u.is_iter:
+            return self._eval_iter(u.expr, u.scope)
+        value = self._eval(u.expr, u.scope)
+        if u.op is not None:
+            current = self._env.get(key)
+            if current is None or value is None:
+                return None
+            return _binop(u.op, current, value)
+        return value
+
+    def _eval_iter(self, node, scope) -> Optional[Interval]:
+        if isinstance(node, ast.Call) and get_id(node.func) == "range":
+            args = [self._eval(a, scope) for a in node.args]
+            if not args or None in args or node.keywords:
+                return INT64
+            if len(args) == 1:
+                start, stop, step = Interval(0, 0), args[0], Interval(1, 1)
+            else:
+                start, stop = args[:2]
+                step = args[2] if len(args) == 3 else Interval(1, 1)
+            assumed = start.assumed or stop.assumed or step.assumed
+            if step.lo > 0:
+                return Interval(start.lo, max(start.lo, stop.hi - 1), assumed)
+            if step.hi < 0:
+                return Interval(min(start.hi, stop.lo + 1), start.hi, assumed)
+            return start.join(stop)
+        if isinstance(node, (ast.List, ast.Tuple, ast.Set)):
+            values = [self._eval(e, scope) for e in node.elts]
+            if not values or None in values:
+                return INT64
+            result = values[0]
+            for value in values[1:]:
+                result = result.join(value)
+            return result
+        return INT64
+
+    def _eval(self, node, scope) -> Optional[Interval]:
+        """Range of an integer expression, None if it is not an integer
+        or its value isn't known yet"""
+        if isinstance(node, ast.Constant):
+            if isinstance(node.value, bool):
+                return Interval(int(node.value), int(node.value))
+            if isinstance(node.value, int):
+                return Interval(node.value, node.value)
+            return None
+        if isinstance(node, ast.Name):
+            key = self._resolve(node.id, scope)
+            if key not in self._updates:
+                return INT64
+            return self._env.get(key)
+        if isinstance(node, ast.BinOp):
+            left = self._eval(node.left, scope)
+            right = self._eval(node.right, scope)
+            if left is None or right is None:
+                return None
+            return _binop(node.op, left, right)
+        if isinstance(node, ast.UnaryOp):
+            if isinstance(node.op, ast.Not):
+                return BOOL
+            operand = self._eval(node.operand, scope)
+            if operand is None:
+                return None
+            if isinstance(node.op, ast.USub):
+                return Interval(-operand.hi, -operand.lo, operand.assumed)
+            if isinstance(node.op, ast.Invert):
+                return Interval(-operand.hi - 1, -operand.lo - 1, operand.assumed)
+            return operand
+        if isinstance(node, (ast.IfExp, ast.BoolOp)):
+            values = (
+                [node.body, node.orelse] if isinstance(node, ast.IfExp) else node.values
+            )
+            values = [self._eval(v, scope) for v in values]
+            if None in values:
+                return None
+            result = values[0]
+            for value in values[1:]:
+                result = result.join(value)
+            return result
+        if isinstance(node, ast.Compare):
+            return BOOL
+        if isinstance(node, ast.NamedExpr):
+            return self._eval(node.value, scope)
+        if isinstance(node, ast.Call):
+            return self._eval_call(node, scope)
+        return INT64
+
+    def _eval_call(self, node, scope) -> Optional[Interval]:
+        fndef = self._module_function(node, scope)
+        if fndef is not None:
+            key = (fndef, _RETURN)
+            if key not in self._updates:
+                return INT64
+            return self._env.get(key)
+        args = [self._eval(a, scope) for a in node.args]
+        if None in args or node.keywords:
+            return INT64
+        fname = get_id(node.func)
+        if fname == "int" and len(args) == 1:
+            return args[0]
+        if fname == "abs" and len(args) == 1:
+            (arg,) = args
+            hi = max(abs(arg.lo), abs(arg.hi))
+            lo = 0 if arg.lo <= 0 <= arg.hi else min(abs(arg.lo), abs(arg.hi))
+            return Interval(lo, hi, arg.assumed)
+        if fname in ("min", "max") and len(args) > 1:
+            pick = min if fname == "min" else max
+            return Interval(
+                pick(a.lo for a in args),
+                pick(a.hi for a in args),
+                any(a.assumed for a in args),
+            )
+        if fname == "pow" and len(args) == 2:
+            return _binop(ast.Pow(), *args)
+        if fname == "len":
+            return Interval(0, INT64_MAX, assumed=True)
+        return INT64
+
+    # Results
+
+    def _promote(self) -> List[Promotion]:
+        promotions = []
+        promoted = {
+            key
+            for key, value in self._env.items()
+            if value is not None and not value.fits_int64
+        }
+        for key in sorted(promoted, key=self._lineno):
+            scope, name = key
+            for ref in self._refs.get(key, []):
+                ref.needs_arbitrary_precision = True
+            if name == _RETURN:
+                scope.needs_arbitrary_precision = True
+            promotions.append(
+                Promotion(_display_name(key), self._lineno(key), self._reason(key))
+            )
+        return promotions
+
+    def _reason(self, key) -> str:
+        value = self._env[key]
+        if key in self._widened and key in self._geometric:
+            lineno = self._widened[key]
+            return f"grows geometrically in a loop or recursion (line {lineno})"
+        if value.is_bounded:
+            bound = value.hi if value.hi > INT64_MAX else value.lo
+            return f"can reach {bound}"
+        sources = set()
+        for u in self._updates[key]:
+            for source in self._expr_keys(u.expr, u.scope):
+                if source != key and not (self._env.get(source) or INT64).is_bounded:
+                    sources.add(source)
+        if sources:
+            names = sorted(_display_name(s) for s in sources)
+            return f"assigned from {', '.join(names)}"
+        return "unbounded"
+
+    def _lineno(self, key) -> int:
+        scope, name = key
+        if isinstance(scope, ast.FunctionDef):
+            for arg in scope.args.args:
+                if arg.arg == name:
+                    return arg.lineno
+        updates = self._updates.get(key)
+        if updates:
+            return min(u.lineno for u in updates)
+        return 0
+
+
+def _display_name(key) -> str:
+    scope, name = key
+    if name == _RETURN:
+        return f"{scope.name}()"
+    if isinstance(scope, (ast.FunctionDef, ast.ClassDef)):
+        return f"{scope.name}.{name}"
+    return name
+
+
+def _targets(node):
+    return node.targets if isinstance(node, ast.Assign) else [node.target]
+
+
+def _scope_nodes(node):
+    """Nodes that belong to the scope of a module, class or function,
+    including nested definitions but not their contents"""
+    if isinstance(node, ast.FunctionDef):
+        todo = deque(node.body)
+    else:
+        todo = deque(ast.iter_child_nodes(node))
+    while todo:
+        child = todo.popleft()
+        yield child
+        if isinstance(child, (ast.FunctionDef, ast.ClassDef)):
+            continue
+        if isinstance(child, _OWN_SCOPE):
+            continue
+        todo.extend(ast.iter_child_nodes(child))
+
+
+def _mul(a, b):
+    # inf * 0 is nan
+    return 0 if a == 0 or b == 0 else a * b
+
+
+def _magnitude(i: Interval):
+    return max(abs(i.lo), abs(i.hi))
+
+
+def _too_big(bits) -> bool:
+    return bits > MAX_BITS
+
+
+def _binop(op, left: Interval, right: Interval) -> Optional[Interval]:
+    assumed = left.assumed or right.assumed
+    if isinstance(op, ast.Add):
+        return Interval(left.lo + right.lo, left.hi + right.hi, assumed)
+    if isinstance(op, ast.Sub):
+        return Interval(left.lo - right.hi, left.hi - right.lo, assumed)
+    if isinstance(op, ast.Mult):
+        corners = [_mul(a, b) for a in (left.lo, left.hi) for b in (right.lo, right.hi)]
+        return Interval(min(corners), max(corners), assumed)
+    if isinstance(op, (ast.FloorDiv, ast.RShift)):
+        if left.lo >= 0 and right.lo >= 0:
+            return Interval(0, left.hi, assumed)
+        m = _magnitude(left)
+        return Interval(-m, m, assumed)
+    if isinstance(op, ast.Mod):
+        if right.lo > 0:
+            hi = right.hi - 1
+            if left.lo >= 0:
+                hi = min(hi, left.hi)
+            return Interval(0, hi, assumed)
+        if right.hi < 0:
+            return Interval(right.lo + 1, 0, assumed)
+        m = _magnitude(right)
+        return Interval(-m, m, assumed)
+    if isinstance(op, (ast.Pow, ast.LShift)):
+        if isinstance(op, ast.Pow) and right.lo < 0:
+            # float result
+            return None
+        if not (left.is_bounded and right.is_bounded):
+            return Interval(-math.inf, math.inf, assumed)
+        if isinstance(op, ast.Pow):
+            base_bits = int(_magnitude(left)).bit_length()
+            if _too_big(base_bits * right.hi):
+                return Interval(-math.inf, math.inf, assumed)
+            m = int(_magnitude(left)) ** int(right.hi)
+            if left.lo >= 0:
+                return Interval(int(left.lo) ** int(right.lo), m, assumed)
+            return Interval(-m, m, assumed)
+        if _too_big(int(_magnitude(left)).bit_length() + right.hi):
+            return Interval(-math.inf, math.inf, assumed)
+        shift = max(int(right.hi), 0)
+        return Interval(
+            min(left.lo << shift, left.lo), max(left.hi << shift, left.hi), assumed
+        )
+    if isinstance(op, (ast.BitAnd, ast.BitOr, ast.BitXor)):
+        if isinstance(op, ast.BitAnd) and (left.lo >= 0 or right.lo >= 0):
+            # Masking with a non-negative value
+            his = [i.hi for i in (left, right) if i.lo >= 0]
+            return Interval(0, min(his), assumed)
+        if not (left.is_bounded and right.is_bounded):
+            return Interval(-math.inf, math.inf, assumed)
+        bits = max(int(_magnitude(i)).bit_length() for i in (left, right))
+        if left.lo >= 0 and right.lo >= 0:
+            return Interval(0, 2**bits - 1, assumed)
+        return Interval(-(2**bits), 2**bits - 1, assumed)
+    # / and @ don't produce integers
+    return None
@@ -0,0 +1,203 @@
+import ast
+
+from typing import Any, Callable, Dict, Optional, Tuple
+
+# Fields of the python grammar that never hold nodes
+SCALAR_FIELDS = frozenset(
+    [
+        "id",
+        "attr",
+        "arg",
+        "name",
+        "module",
+        "level",
+        "asname",
+        "type_comment",
+        "kind",
+        "conversion",
+        "is_async",
+        "simple",
+        "rest",
+        "tag",
+    ]
+)
+
+# Deprecated visit_<Node> methods that ast.NodeVisitor.visit_Constant
+# dispatches to
+_LEGACY_CONSTANT_METHODS = (
+    "visit_Num",
+    "visit_Str",
+    "visit_Bytes",
+    "visit_NameConstant",
+    "visit_Ellipsis",
+)
+
+_child_fields: Dict[type, Tuple[str, ...]] = {}
+
+
+def child_fields(node_type: type) -> Tuple[str, ...]:
+    """Fields of a node type that may hold child nodes"""
+    fields = _child_fields.get(node_type)
+    if fields is None:
+        fields = tuple(
+            f
+            for f in node_type._fields
+            if f not in SCALAR_FIELDS
+            and not (issubclass(node_type, ast.Constant) and f == "value")
+        )
+        _child_fields[node_type] = fields
+    return fields
+
+
+_UNRESOLVED = object()
+
+
+class NodeVisitor(ast.NodeVisitor):
+    """Drop-in replacement for ast.NodeVisitor.
+
+    The visit_<Node> method of each node type is looked up once per
+    visitor class instead of once per node, and generic_visit walks the
+    nodes without a visit_<Node> method with an explicit stack, so deeply
+    nested expressions don't hit the recursion limit unless a visitor
+    method recurses into them itself. Visitors that override visit see
+    every node go through it, as with ast.NodeVisitor."""
+
+    # Per class: method visit calls for each node type, and the one
+    # generic_visit calls for a child (None to walk it in place)
+    _visit_methods: Dict[type, Callable] = {}
+    _child_methods: Dict[type, Optional[Callable]] = {}
+
+    # Children for which prune returns True are not walked by
+    # generic_visit, see node_index.Interests
+    prune: Optional[Callable[[ast.AST], bool]] = None
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        cls._visit_methods = {}
+        cls._child_methods = {}
+
+    def visit(self, node):
+        method = self._visit_methods.get(node.__class__)
+        if method is None:
+            method = _resolve_visit_method(type(self), node.__class__)
+        return method(self, node)
+
+    def generic_visit(self, node):
+        # Children are pushed in reverse so they are popped in order, and
+        # the children of a node walked here come before its siblings
+        child_method = self._child_methods.get
+        prune = self.prune
+        visitor = type(self)
+        stack = [(None, node)]
+        pop, push = stack.pop, stack.append
+        while stack:
+            method, node = pop()
+            if method is not None:
+                method(self, node)
+                continue
+            for field in reversed(child_fields(node.__class__)):
+                value = getattr(node, field, None)
+                if isinstance(value, list):
+                    for child in reversed(value):
+                        if isinstance(child, ast.AST):
+                            if prune is not None and prune(child):
+                                continue
+                            method = child_method(child.__class__, _UNRESOLVED)
+                            if method is _UNRESOLVED:
+                                method = _resolve_child_method(visitor, child.__class__)
+                            push((method, child))
+                elif isinstance(value, ast.AST):
+                    if prune is not None and prune(value):
+                        continue
+                    method = child_method(value.__class__, _UNRESOLVED)
+                    if method is _UNRESOLVED:
+                        method = _resolve_child_method(visitor, value.__class__)
+                    push((method, value))
+        return None
+
+
+class NodeTransformer(NodeVisitor, ast.NodeTransformer):
+    """Drop-in replacement for ast.NodeTransformer, see NodeVisitor"""
+
+    def generic_visit(self, node):
+        stack = [self._transform_children(node)]
+        while stack:
+            child = next(stack[-1], None)
+            if child is None:
+                stack.pop()
+            else:
+                stack.append(self._transform_children(child))
+        return node
+
+    def _transform_children(self, node):
+        # Nodes walked by generic_visit are returned as they are, so
+        # their parent doesn't wait for their subtree to be done
+        child_method = self._child_methods.get
+        prune = self.prune
+        for field in child_fields(node.__class__):
+            old_value = getattr(node, field, None)
+            if isinstance(old_value, list):
+                new_values = []
+                for value in old_value:
+                    if isinstance(value, ast.AST) and not (
+                        prune is not None and prune(value)
+                    ):
+                        method = child_method(value.__class__, _UNRESOLVED)
+                        if method is _UNRESOLVED:
+                            method = _resolve_child_method(type(self), value.__class__)
+                        if method is None:
+                            yield value
+                        else:
+                            value = method(self, value)
+                            if value is None:
+                                continue
+                            elif not isinstance(value, ast.AST):
+                                new_values.extend(value)
+                                continue
+                    new_values.append(value)
+                old_value[:] = new_values
+            elif isinstance(old_value, ast.AST):
+                if prune is not None and prune(old_value):
+                    continue
+                method = child_method(old_value.__class__, _UNRESOLVED)
+                if method is _UNRESOLVED:
+                    method = _resolve_child_method(type(self), old_value.__class__)
+                if method is None:
+                    yield old_value
+                else:
+                    new_node = method(self, old_value)
+                    if new_node is None:
+                        delattr(node, field)
+                    else:
+                        setattr(node, field, new_node)
+
+
+_BASE_VISITS = (NodeVisitor.visit,)
+_BASE_GENERIC_VISITS = (NodeVisitor.generic_visit, NodeTransformer.generic_visit)
+
+
+def _resolve_visit_method(
+    visitor: type, node_type: type
+) -> Callable[[Any, ast.AST], Any]:
+    method = getattr(visitor, f"visit_{node_type.__name__}", None)
+    if method is ast.NodeVisitor.visit_Constant and not any(
+        hasattr(visitor, name) for name in _LEGACY_CONSTANT_METHODS
+    ):
+        method = None
+    if method is None:
+        method = visitor.generic_visit
+    visitor._visit_methods[node_type] = method
+    return method
+
+
+def _resolve_child_method(visitor: type, node_type: type) -> Optional[Callable]:
+    """Method generic_visit calls for a child, or None when the child's
+    own children can be walked by the same generic_visit"""
+    if visitor.visit not in _BASE_VISITS:
+        method = visitor.visit
+    else:
+        method = _resolve_visit_method(visitor, node_type)
+        if method in _BASE_GENERIC_VISITS:
+            method = None
+    visitor._child_methods[node_type] = method
+    return method
@@ -84,6 +84,8 @@ class CppTranspilerPlugins:
                 buf.append("std::cout << {0};".format(value))
             buf.append('std::cout << " ";')
         buf.pop()
+        if self._buffers_output(node):
+            return "\n".join(buf) + '\nstd::cout << "\\n";'
         return "\n".join(buf) + "\nstd::cout << std::endl;"
 
     def visit_min_max(self, node, vargs, is_max: bool) -> str:
@@ -2,7 +2,7 @@ import ast
 import textwrap
 
 from .tracer import decltype
-from .clike import CLikeTranspiler
+from .clike import CLikeTranspiler, pycpp_type_map
 from .plugins import (
     ATTR_DISPATCH_TABLE,
     CLASS_DISPATCH_TABLE,
@@ -16,7 +16,9 @@ from .plugins import (
 
 from py2many.analysis import add_imports, is_global, is_void_function, get_id
 from py2many.ast_helpers import create_ast_block
+from py2many.capacity import LenFactor, RangeFactor
 from py2many.clike import _AUTO_INVOKED, class_for_typename
+from py2many.code_writer import CodeWriter
 from py2many.context import add_variable_context, add_list_calls
 from py2many.declaration_extractor import DeclarationExtractor
 from py2many.exceptions import AstNotImplementedError
@@ -31,10 +33,37 @@ from py2many.tracer import (
     is_self_arg,
 )
 
-from typing import List, Tuple
+from typing import Dict, List, Tuple
+from py2many.visitor import NodeTransformer
 
 _AUTO = "auto()"
 
+# Python types that map to C++ types that are cheap to copy
+SCALAR_TYPES = frozenset(
+    [
+        "bool",
+        "int",
+        "float",
+        "c_int8",
+        "c_int16",
+        "c_int32",
+        "c_int64",
+        "c_uint8",
+        "c_uint16",
+        "c_uint32",
+        "c_uint64",
+    ]
+)
+
+SCALAR_CPP_TYPES = SCALAR_TYPES | {
+    v for k, v in pycpp_type_map.items() if k not in {bytes, str}
+}
+
+# How non scalar arguments are passed
+PASS_BY_REF = "ref"
+PASS_BY_CONST_REF = "const_ref"
+PASS_BY_VALUE = "value"
+
 
 # TODO: merge this into py2many.cli.transpiler and fixup the tests
 def transpile(source, headers=False, testing=False):
@@ -79,7 +108,7 @@ def generate_lambda_fun(node, body):
     return funcdef + " {\n" + body + "\n};"
 
 
-class CppListComparisonRewriter(ast.NodeTransformer):
+class CppListComparisonRewriter(NodeTransformer):
     def __init__(self):
         super().__init__()
         self._temp = 0
@@ -107,6 +136,103 @@ class CppListComparisonRewriter(ast.NodeTransformer):
         return node
 
 
+def _is_scalar_arg(node: ast.arg) -> bool:
+    type_id = get_id(node.annotation)
+    return type_id in SCALAR_TYPES or bool(is_enum(type_id, node.scopes))
+
+
+def _container_type_id(node: ast.arg):
+    annotation = node.annotation
+    if isinstance(annotation, ast.Subscript):
+        return get_id(annotation.value)
+    type_id = get_id(annotation)
+    return type_id if type_id in {"list", "dict", "set", "bytearray"} else None
+
+
+def _find_sink_args(node: ast.FunctionDef, names) -> Dict[str, Tuple]:
+    """Finds the arguments that are read only once, by a statement that
+    stores or returns them. Taking them by value lets the caller move
+    into them, and the single use can then move from them"""
+    loads = {name: [] for name in names}
+
+    def visit(parent, repeated):
+        for child in ast.iter_child_nodes(parent):
+            if isinstance(child, ast.Name) and child.id in loads:
+                loads[child.id].append((child, parent, repeated))
+            # Values used in loops, comprehensions or closures
+            # can't be moved from
+            visit(
+                child,
+                repeated
+                or isinstance(
+                    child,
+                    (ast.For, ast.While, ast.comprehension, ast.Lambda, ast.FunctionDef),
+                ),
+            )
+
+    for stmt in node.body:
+        visit(stmt, isinstance(stmt, (ast.For, ast.While, ast.FunctionDef)))
+
+    sinks = {}
+    for name, uses in loads.items():
+        if len(uses) != 1:
+            continue
+        use, parent, repeated = uses[0]
+        if repeated or not isinstance(use.ctx, ast.Load):
+            continue
+        if isinstance(parent, (ast.Assign, ast.AnnAssign, ast.Return)):
+            if parent.value is use:
+                sinks[name] = (use, parent)
+        elif isinstance(parent, ast.Call) and isinstance(parent.func, ast.Attribute):
+            if parent.func.attr == "append" and parent.args == [use]:
+                sinks[name] = (use, parent)
+    return sinks
+
+
+def _analyse_arg_passing(node: ast.FunctionDef):
+    """Decides how to pass every non scalar argument, using the results of
+    MutabilityTransformer:
+      * T& if the function modifies it, so the caller sees the changes
+      * T if it is bound to a new value, or stored or returned by
+        its only use, which then moves from it
+      * const T& otherwise
+    """
+    if not hasattr(node, "mutable_args"):
+        return
+    args = [
+        arg
+        for arg in node.args.args
+        if arg.annotation is not None and arg.arg != "self" and not _is_scalar_arg(arg)
+    ]
+    rebound = set(node.rebound_args)
+    mutated = set(node.mutable_args)
+    for arg in args:
+        if _container_type_id(arg) in {"Dict", "dict"}:
+            # operator[] is not const, it inserts missing keys
+            if any(
+                isinstance(n, ast.Subscript) and get_id(n.value) == arg.arg
+                for n in ast.walk(node)
+            ):
+                mutated.add(arg.arg)
+    sinks = _find_sink_args(
+        node, [arg.arg for arg in args if arg.arg not in mutated | rebound]
+    )
+    for arg in args:
+        if arg.arg in mutated or (arg.arg in rebound and _container_type_id(arg)):
+            # Containers rebound by += are modified in place
+            arg.cpp_passing = PASS_BY_REF
+        elif arg.arg in rebound:
+            arg.cpp_passing = PASS_BY_VALUE
+        elif arg.arg in sinks:
+            arg.cpp_passing = PASS_BY_VALUE
+            use, parent = sinks[arg.arg]
+            # Returning an argument by name already moves it
+            if not isinstance(parent, ast.Return):
+                use.cpp_move = True
+        else:
+            arg.cpp_passing = PASS_BY_CONST_REF
+
+
 class CppTranspiler(CLikeTranspiler):
     NAME = "cpp"
 
@@ -154,6 +280,7 @@ class CppTranspiler(CLikeTranspiler):
         return "\n".join([f"{line}{lint_exception}" for line in self._headers])
 
     def visit_FunctionDef(self, node) -> str:
+        _analyse_arg_passing(node)
         body = "\n".join([self.visit(n) for n in node.body])
         # If rewriter inserted a block, we need to terminate it with a semicolon
         if len(node.body):
@@ -274,9 +401,15 @@ class CppTranspiler(CLikeTranspiler):
         if node.is_dataclass:
             field_names = [arg for arg in declarations.keys()]
             args = ", ".join(fields)
-            assignments = "; ".join(
-                [f"this->{field} = {field}" for field in field_names]
-            )
+            assignments = []
+            for field in field_names:
+                if declarations[field] in SCALAR_CPP_TYPES:
+                    assignments.append(f"this->{field} = {field}")
+                else:
+                    # Fields are taken by value and moved into place
+                    self._usings.add("<utility>")
+                    assignments.append(f"this->{field} = std::move({field})")
+            assignments = "; ".join(assignments)
             constructor = f"{node.name}({args}) {{{assignments};}}"
             body = [constructor] + body
         buf += body
@@ -357,14 +490,25 @@ class CppTranspiler(CLikeTranspiler):
         args = ", ".join(vargs)
         return f"{fname}({args})"
 
-    def visit_For(self, node) -> str:
+    def emit_For(self, node, writer: CodeWriter):
+        if self._starts_output_buffer(node):
+            writer.write(self._visit_buffered_loop(node))
+            return
         target = self.visit(node.target)
         it = self.visit(node.iter)
-        buf = []
-        buf.append("for(auto {0} : {1}) {{".format(target, it))
-        buf.extend([self.visit(c) for c in node.body])
-        buf.append("}")
-        return "\n".join(buf)
+        writer.write("for(auto {0} : {1}) {{".format(target, it))
+        self.emit_body(node.body, writer)
+        writer.write("}")
+
+    def emit_While(self, node, writer: CodeWriter):
+        if self._starts_output_buffer(node):
+            writer.write(self._visit_buffered_loop(node))
+            return
+        super().emit_While(node, writer)
+
+    def _wrap_output_buffer(self, node, loop: str) -> str:
+        # Lines in the loop end with "\n" instead of std::endl
+        return f"{loop}\nstd::cout << std::flush;"
 
     def visit_arg(self, node):
         node_id = get_id(node)
@@ -374,9 +518,12 @@ class CppTranspiler(CLikeTranspiler):
         typename = "T"
         if node.annotation:
             typename = self._typename_from_annotation(node)
-            # TODO: Should we make this if not primitive instead of checking
-            # for container types? That way we cover user defined structs too.
-            if hasattr(node, "container_type"):
+            passing = getattr(node, "cpp_passing", None)
+            if passing == PASS_BY_CONST_REF:
+                typename = f"const {typename}&"
+            elif passing == PASS_BY_REF or (
+                passing is None and hasattr(node, "container_type")
+            ):
                 # Python passes by reference by default.
                 typename = f"{typename}&"
             # TODO: Generalize this to other types
@@ -403,6 +550,9 @@ class CppTranspiler(CLikeTranspiler):
     def visit_Name(self, node) -> str:
         if node.id == "None":
             return "nullptr"
+        elif getattr(node, "cpp_move", False):
+            self._usings.add("<utility>")
+            return f"std::move({super().visit_Name(node)})"
         else:
             return super().visit_Name(node)
 
@@ -432,20 +582,19 @@ class CppTranspiler(CLikeTranspiler):
         node.make_block = True
         return "\n".join(buf)
 
-    def visit_If(self, node) -> str:
+    def emit_If(self, node, writer: CodeWriter, use_parens=True):
         body_vars = set([get_id(v) for v in node.scopes[-1].body_vars])
         orelse_vars = set([get_id(v) for v in node.scopes[-1].orelse_vars])
         node.common_vars = body_vars.intersection(orelse_vars)
 
-        var_definitions = []
         for cv in node.common_vars:
             definition = node.scopes.find(cv)
             var_type = self._typename_from_annotation(definition)
             if var_type == self._default_type:
                 var_type = decltype(definition)
-            var_definitions.append("{0} {1};\n".format(var_type, cv))
+            writer.write("{0} {1};".format(var_type, cv))
 
-        return "".join(var_definitions) + super().visit_If(node)
+        super().emit_If(node, writer, use_parens)
 
     def visit_UnaryOp(self, node) -> str:
         if isinstance(node.op, ast.USub):
@@ -616,6 +765,8 @@ class CppTranspiler(CLikeTranspiler):
             element_type = self._get_element_type(node.value)
             if element_type == self._default_type:
                 typename = decltype(node)
+            elif getattr(node.value, "fixed_size", None):
+                typename = self._array_typename(node.value, element_type)
             else:
                 typename = f"std::vector<{element_type}>"
         else:
@@ -626,11 +777,45 @@ class CppTranspiler(CLikeTranspiler):
         if typename == "std::string" and is_global(node):
             return f"{typename} {target} = {value};{lint_exception}"
 
-        return f"{typename} {target} = {value};"
+        return f"{typename} {target} = {value};" + self._reserve(target, node.value)
 
     def visit_AnnAssign(self, node) -> str:
         target, type_str, val = super().visit_AnnAssign(node)
-        return f"{type_str} {target} = {val};"
+        if getattr(node.value, "fixed_size", None):
+            element_type = self._get_element_type(node.value)
+            if element_type != self._default_type:
+                type_str = self._array_typename(node.value, element_type)
+        return f"{type_str} {target} = {val};" + self._reserve(target, node.value)
+
+    def _array_typename(self, node, element_type) -> str:
+        self._usings.add("<array>")
+        return f"std::array<{element_type}, {node.fixed_size}>"
+
+    def _reserve(self, target: str, node) -> str:
+        capacity = getattr(node, "capacity", None)
+        if capacity is None:
+            return ""
+        if capacity.is_constant and capacity.constant <= len(node.elts):
+            return ""
+        terms = [str(capacity.constant)] if capacity.constant else []
+        for coef, factors in capacity.terms:
+            term = [self._visit_capacity_factor(f) for f in factors]
+            if coef != 1:
+                term.insert(0, str(coef))
+            terms.append(" * ".join(term))
+        return f"\n{target}.reserve({' + '.join(terms)});"
+
+    def _visit_capacity_factor(self, factor) -> str:
+        if isinstance(factor, LenFactor):
+            return f"{self.visit(factor.seq)}.size()"
+        assert isinstance(factor, RangeFactor)
+        count = self.visit(factor.stop)
+        if factor.start is not None:
+            count = f"{count} - {self.visit(factor.start)}"
+        # range() with stop < start is empty
+        self._usings.add("<algorithm>")
+        self._usings.add("<cstddef>")
+        return f"std::max<std::ptrdiff_t>(0, {count})"
 
     def visit_Print(self, node) -> str:
         buf = []
@@ -15,13 +15,15 @@ from .plugins import (
 )
 
 from py2many.analysis import get_id, is_mutable, is_void_function
+from py2many.capacity import get_fixed_length_element_type, get_repeated_list
 from py2many.clike import class_for_typename
 from py2many.declaration_extractor import DeclarationExtractor
 from py2many.inference import get_inferred_type
 from py2many.tracer import is_list, defined_before, is_class_or_module, is_self_arg
+from py2many.visitor import NodeTransformer
 
 
-class DartIntegerDivRewriter(ast.NodeTransformer):
+class DartIntegerDivRewriter(NodeTransformer):
     def visit_BinOp(self, node):
         self.generic_visit(node)
         if isinstance(node.op, ast.Div):
@@ -35,6 +37,21 @@ class DartIntegerDivRewriter(ast.NodeTransformer):
         return node
 
 
+# dart:typed_data lists. Dart ints are 64 bit, so python ints use Int64List
+TYPED_LIST_TYPES = {
+    "int": "Int64List",
+    "float": "Float64List",
+    "c_int8": "Int8List",
+    "c_int16": "Int16List",
+    "c_int32": "Int32List",
+    "c_int64": "Int64List",
+    "c_uint8": "Uint8List",
+    "c_uint16": "Uint16List",
+    "c_uint32": "Uint32List",
+    "c_uint64": "Uint64List",
+}
+
+
 class DartTranspiler(CLikeTranspiler):
     NAME = "dart"
 
@@ -270,6 +287,19 @@ class DartTranspiler(CLikeTranspiler):
             return super().visit_UnaryOp(node)
 
     def visit_BinOp(self, node) -> str:
+        list_type = self._typed_list_type(node)
+        if list_type is not None:
+            lst = get_repeated_list(node)
+            count = node.right if lst is node.left else node.left
+            num = self.visit(count)
+            elt = lst.elts[0]
+            if isinstance(elt, ast.Constant) and not elt.value:
+                # Already zero initialized
+                return f"{list_type}({num})"
+            elt = self.visit(elt)
+            if isinstance(count, (ast.Name, ast.Constant)):
+                return f"({list_type}({num})..fillRange(0, {num}, {elt}))"
+            return f"{list_type}.fromList(List.filled({num}, {elt}))"
         if (
             isinstance(node.left, ast.List)
             and isinstance(node.op, ast.Mult)
@@ -400,11 +430,20 @@ class DartTranspiler(CLikeTranspiler):
     def visit_List(self, node) -> str:
         if len(node.elts) > 0:
             elements = [self.visit(e) for e in node.elts]
+            list_type = self._typed_list_type(node)
+            if list_type is not None:
+                return "{0}.fromList([{1}])".format(list_type, ", ".join(elements))
             return "[{0}]".format(", ".join(elements))
 
         else:
             return "[]"
 
+    def _typed_list_type(self, node):
+        list_type = TYPED_LIST_TYPES.get(get_fixed_length_element_type(node))
+        if list_type is not None:
+            self._usings.add("dart:typed_data")
+        return list_type
+
     def visit_Dict(self, node) -> str:
         keys = [self.visit(k) for k in node.keys]
         values = [self.visit(k) for k in node.values]
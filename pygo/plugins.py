@@ -111,6 +111,8 @@ class GoTranspilerPlugins:
         self._usings.add('"fmt"')
         placeholders_str = " ".join(placeholders)
         vargs_str = ", ".join(vargs)
+        if self._buffers_output(node):
+            return f'fmt.Fprintf({self._output_buffer}, "{placeholders_str}\\n",{vargs_str})'
         return f'fmt.Printf("{placeholders_str}\\n",{vargs_str})'
 
     def visit_min_max(self, node, vargs, is_max: bool) -> str:
@@ -1,10 +1,10 @@
 import ast
 import textwrap
 
-from typing import List
+from typing import List, Optional
 
 from .clike import CLikeTranspiler
-from .inference import get_inferred_go_type
+from .inference import GO_TYPE_MAP, get_inferred_go_type
 from .plugins import (
     ATTR_DISPATCH_TABLE,
     CLASS_DISPATCH_TABLE,
@@ -15,15 +15,43 @@ from .plugins import (
     SMALL_USINGS_MAP,
 )
 
-from py2many.analysis import IGNORED_MODULE_SET, get_id, is_global, is_void_function
+from py2many.analysis import (
+    IGNORED_MODULE_SET,
+    get_id,
+    is_global,
+    is_void_function,
+)
+from py2many.buffered_io import OUTPUT_BUFFER
+from py2many.capacity import LenFactor
 from py2many.clike import _AUTO_INVOKED, class_for_typename
+from py2many.code_writer import CodeWriter
 from py2many.declaration_extractor import DeclarationExtractor
 from py2many.exceptions import AstClassUsedBeforeDeclaration, AstCouldNotInfer
 from py2many.rewriters import capitalize_first, rename, camel_case
 from py2many.tracer import is_list, defined_before, is_class_or_module, is_enum
+from py2many.visitor import NodeTransformer
+
+
+def _find_returns(body):
+    """Return statements of a function, excluding nested functions"""
+    for stmt in body:
+        for node in _walk_function_body(stmt):
+            if isinstance(node, ast.Return):
+                yield node
+
+
+def _walk_function_body(node):
+    yield node
+    for child in ast.iter_child_nodes(node):
+        if not isinstance(child, (ast.FunctionDef, ast.Lambda, ast.ClassDef)):
+            yield from _walk_function_body(child)
 
 
-class GoMethodCallRewriter(ast.NodeTransformer):
+def _is_exported(name: str) -> bool:
+    return name[:1].isupper()
+
+
+class GoMethodCallRewriter(NodeTransformer):
     def visit_Call(self, node):
         needs_assign = False
         fname = node.func
@@ -49,7 +77,7 @@ class GoMethodCallRewriter(ast.NodeTransformer):
         return node
 
 
-class GoNoneCompareRewriter(ast.NodeTransformer):
+class GoNoneCompareRewriter(NodeTransformer):
     def visit_Compare(self, node):
         left = self.visit(node.left)
         right = self.visit(node.comparators[0])
@@ -64,7 +92,7 @@ class GoNoneCompareRewriter(ast.NodeTransformer):
         return node
 
 
-class GoPropagateTypeAnnotation(ast.NodeTransformer):
+class GoPropagateTypeAnnotation(NodeTransformer):
     def _visit_assign(self, node, target):
         if hasattr(node, "annotation") and isinstance(
             node.value, (ast.List, ast.Set, ast.Dict)
@@ -81,7 +109,7 @@ class GoPropagateTypeAnnotation(ast.NodeTransformer):
         return self._visit_assign(node, target)
 
 
-class GoVisibilityRewriter(ast.NodeTransformer):
+class GoVisibilityRewriter(NodeTransformer):
     def visit_Name(self, node):
         if hasattr(node, "scopes") and is_global(node):
             old_name = get_id(node)
@@ -103,7 +131,7 @@ class GoVisibilityRewriter(ast.NodeTransformer):
         return node
 
 
-class GoIfExpRewriter(ast.NodeTransformer):
+class GoIfExpRewriter(NodeTransformer):
     def visit_Assign(self, node):
         if isinstance(node.value, ast.IfExp):
             if_stmt = ast.parse(
@@ -128,6 +156,10 @@ class GoIfExpRewriter(ast.NodeTransformer):
         return node
 
 
+# Element types that can be compared with ==
+GO_COMPARABLE_TYPES = frozenset(t.__name__ for t in GO_TYPE_MAP if t is not bytes)
+
+
 class GoTranspiler(CLikeTranspiler):
     NAME = "go"
 
@@ -163,13 +195,24 @@ class GoTranspiler(CLikeTranspiler):
     def comment(self, text):
         return f"// {text}\n"
 
-    def visit_FunctionDef(self, node) -> str:
-        body = "\n".join([self.visit(n) for n in node.body])
+    def emit_FunctionDef(self, node, writer: CodeWriter):
+        body = CodeWriter()
+        self.emit_body(node.body, body)
         typenames, args = self.visit(node.args)
 
         if len(typenames) and typenames[0] == None and hasattr(node, "self_type"):
             typenames[0] = node.self_type
 
+        call_site_types = self._call_site_types(node)
+        returns = node.returns
+        if _is_exported(node.name):
+            # Types inferred from the call sites in this module
+            for i, arg in enumerate(node.args.args):
+                if getattr(arg.annotation, "inferred", False):
+                    typenames[i] = "T"
+                    # So is the return type derived from them
+                    if getattr(returns, "inferred", False):
+                        returns = None
         args_list = []
         typedecls = []
         index = 0
@@ -178,21 +221,28 @@ class GoTranspiler(CLikeTranspiler):
             arg = args[i]
 
             if typename == "T":
-                typename = "T{0} any".format(index)
-                typedecls.append(typename)
-                index += 1
+                if call_site_types and call_site_types[i] is not None:
+                    # Monomorphize: every caller passes the same type
+                    typename = call_site_types[i]
+                else:
+                    typename = "T{0}".format(index)
+                    typedecls.append(f"{typename} any")
+                    index += 1
+            typenames[i] = typename
             args_list.append(f"{arg} {typename}")
 
         return_type = ""
         if not is_void_function(node):
-            if node.returns:
+            if returns:
                 try:
                     typename = self._typename_from_annotation(node, attr="returns")
                     return_type = f" {typename}"
                 except AstCouldNotInfer:
                     pass
             else:
-                return_type = " interface{}"
+                arg_types = dict(zip(args, typenames))
+                typename = self._infer_return_type(node, arg_types)
+                return_type = f" {typename or 'interface{}'}"
 
         template = ""
         if len(typedecls) > 0:
@@ -200,9 +250,84 @@ class GoTranspiler(CLikeTranspiler):
 
         args = ", ".join(args_list)
         funcdef = f"func {node.name}{template}({args}){return_type} {{"
-        return f"{funcdef}\n{body}}}\n\n"
+        writer.write(funcdef)
+        writer.write(body)
+        writer.append("}\n\n")
+
+    def _call_site_types(self, node) -> Optional[List[Optional[str]]]:
+        """Go types of the arguments of an unexported module level function,
+        for the arguments that get the same primitive type at all of its
+        call sites in the module. Exported functions keep their generic
+        signature, since other packages may call them with other types"""
+        if _is_exported(node.name):
+            return None
+        # Async functions are not scopes, so they are not in their scopes
+        scopes = node.scopes
+        parent = scopes[-2] if scopes[-1] is node and len(scopes) > 1 else scopes[-1]
+        if not isinstance(parent, ast.Module):
+            return None
+        calls = self._get_call_sites(parent).get(node.name)
+        if not calls:
+            return None
+        nargs = len(node.args.args)
+        types = [None] * nargs
+        for i in range(nargs):
+            arg_types = {
+                get_inferred_go_type(call.args[i])
+                if len(call.args) == nargs and not call.keywords
+                else None
+                for call in calls
+            }
+            if len(arg_types) == 1:
+                arg_type = arg_types.pop()
+                if arg_type in GO_TYPE_MAP.values():
+                    types[i] = arg_type
+        return types
+
+    def _get_call_sites(self, module):
+        """Calls of each function name in the module. Names that are also
+        used other than by calling them have no entry"""
+        if getattr(self, "_call_sites_module", None) is not module:
+            call_sites = {}
+            escaped = set()
+            funcs = set()
+            for n in ast.walk(module):
+                if isinstance(n, ast.Call) and isinstance(n.func, ast.Name):
+                    call_sites.setdefault(n.func.id, []).append(n)
+                    funcs.add(id(n.func))
+            for n in ast.walk(module):
+                if isinstance(n, ast.Name) and id(n) not in funcs:
+                    escaped.add(n.id)
+            self._call_sites = {
+                k: v for k, v in call_sites.items() if k not in escaped
+            }
+            self._call_sites_module = module
+        return self._call_sites
+
+    def _infer_return_type(self, node, arg_types) -> Optional[str]:
+        return_types = set()
+        for ret in _find_returns(node.body):
+            if ret.value is None:
+                return None
+            ret_id = get_id(ret.value)
+            scopes = getattr(ret.value, "scopes", None)
+            if ret_id in arg_types and scopes and isinstance(
+                scopes.find(ret_id), ast.arg
+            ):
+                return_types.add(arg_types[ret_id])
+            else:
+                return_types.add(get_inferred_go_type(ret.value))
+        if len(return_types) == 1:
+            return return_types.pop()
+        return None
 
     def visit_Return(self, node) -> str:
+        ret = self._visit_return(node)
+        if self._output_buffer is not None:
+            return f"{self._output_buffer}.Flush()\n{ret}"
+        return ret
+
+    def _visit_return(self, node) -> str:
         if node.value:
             ret = self.visit(node.value)
             fndef = None
@@ -301,26 +426,43 @@ class GoTranspiler(CLikeTranspiler):
             args = ""
         return f"{fname}({args})"
 
-    def visit_For(self, node) -> str:
+    def emit_For(self, node, writer: CodeWriter):
+        if self._starts_output_buffer(node):
+            writer.write(self._visit_buffered_loop(node))
+            return
         target = self.visit(node.target)
         it = self.visit(node.iter)
-        buf = []
         if target == "_":
-            buf.append(f"for range {it} {{")
+            writer.write(f"for range {it} {{")
         else:
-            buf.append(f"for _, {target} := range {it} {{")
+            writer.write(f"for _, {target} := range {it} {{")
             # Dummy assign to silence the compiler on unused vars
             if target.startswith("_"):
-                buf.append(f"_ = {target}")
-        buf.extend([self.visit(c) for c in node.body])
-        buf.append("}")
-        return "\n".join(buf)
-
-    def visit_While(self, node) -> str:
-        buf = []
-        buf.append("for {0} {{".format(self.visit(node.test)))
-        buf.extend([self.visit(c) for c in node.body])
-        buf.append("}")
+                writer.write(f"_ = {target}")
+        self.emit_body(node.body, writer)
+        writer.write("}")
+
+    def emit_While(self, node, writer: CodeWriter):
+        if self._starts_output_buffer(node):
+            writer.write(self._visit_buffered_loop(node))
+            return
+        writer.write("for {0} {{".format(self.visit(node.test)))
+        self.emit_body(node.body, writer)
+        writer.write("}")
+
+    def _wrap_output_buffer(self, node, loop: str) -> str:
+        # Returns from inside the loop flush the writer themselves. A
+        # defer would only run when the function returns, and would pile
+        # up when the block is inside another loop
+        self._usings.add('"bufio"')
+        self._usings.add('"os"')
+        buf = [
+            "{",
+            f"{OUTPUT_BUFFER} := bufio.NewWriter(os.Stdout)",
+            loop,
+            f"{OUTPUT_BUFFER}.Flush()",
+            "}",
+        ]
         return "\n".join(buf)
 
     def visit_Str(self, node) -> str:
@@ -335,9 +477,43 @@ class GoTranspiler(CLikeTranspiler):
         op = self.visit(node.ops[0])
         right = self.visit(node.comparators[0])
         if op == "==":
+            package = self._container_equal_package(node)
+            if package:
+                self._usings.add(f'"{package}"')
+                return f"{package}.Equal({left}, {right})"
+            self._usings.add('"github.com/google/go-cmp/cmp"')
             return f"cmp.Equal({left}, {right})"
         return super().visit_Compare(node)
 
+    @staticmethod
+    def _container_equal_package(node) -> Optional[str]:
+        """slices or maps when both sides are containers of comparable
+        types, so that the generic std helper can be used instead of
+        reflection based cmp.Equal"""
+        packages = set()
+        for operand in (node.left, node.comparators[0]):
+            annotation = getattr(operand, "annotation", None)
+            if annotation is None:
+                continue
+            if not isinstance(annotation, ast.Subscript):
+                return None
+            container = get_id(annotation.value)
+            if isinstance(annotation.slice, ast.Tuple):
+                elts = annotation.slice.elts
+            else:
+                elts = [annotation.slice]
+            if not all(get_id(e) in GO_COMPARABLE_TYPES for e in elts):
+                return None
+            if container in ("List", "list") and len(elts) == 1:
+                packages.add("slices")
+            elif container in ("Set", "set") and len(elts) == 1:
+                packages.add("maps")
+            elif container in ("Dict", "dict") and len(elts) == 2:
+                packages.add("maps")
+            else:
+                return None
+        return packages.pop() if len(packages) == 1 else None
+
     def visit_Compare(self, node) -> str:
         left = node.left
         right = node.comparators[0]
@@ -346,11 +522,8 @@ class GoTranspiler(CLikeTranspiler):
             self._typename_from_annotation(right)
             op = self.visit(node.ops[0])
             if (
-                hasattr(left, "container_type")
-                or hasattr(right, "container_type")
-                and op != "in"
-            ):
-                self._usings.add('"github.com/google/go-cmp/cmp"')
+                hasattr(left, "container_type") or hasattr(right, "container_type")
+            ) and op != "in":
                 return self._visit_container_compare(node)
         left = self.visit(node.left)
         right = self.visit(node.comparators[0])
@@ -359,6 +532,8 @@ class GoTranspiler(CLikeTranspiler):
     def visit_Name(self, node) -> str:
         if node.id == "None":
             return "None"
+        elif getattr(node, "string_builder", False):
+            return f"{node.id}.String()"
         elif node.id == "StringsContains":
             # TODO: move to plugins
             self._usings.add('"strings"')
@@ -379,18 +554,13 @@ class GoTranspiler(CLikeTranspiler):
         buf.append("}")
         return "\n".join(buf)
 
-    def visit_If(self, node) -> str:
+    def emit_If(self, node, writer: CodeWriter, use_parens=True):
         body_vars = {get_id(v): v for v in node.scopes[-1].body_vars}
         orelse_vars = {get_id(v): v for v in node.scopes[-1].orelse_vars}
         node.common_vars = set(body_vars.keys()).intersection(set(orelse_vars.keys()))
         types = [self._typename_from_annotation(body_vars[v]) for v in node.common_vars]
-        common_vars = "\n".join(
-            [f"var {v} {t}" for v, t in zip(node.common_vars, types)]
-        )
-        if common_vars:
-            return common_vars + "\n" + super().visit_If(node)
-        else:
-            return super().visit_If(node)
+        writer.extend([f"var {v} {t}" for v, t in zip(node.common_vars, types)])
+        super().emit_If(node, writer, use_parens)
 
     def visit_UnaryOp(self, node) -> str:
         if isinstance(node.op, ast.USub):
@@ -507,8 +677,50 @@ class GoTranspiler(CLikeTranspiler):
             _, element_type = node.container_type
         elements = [self.visit(e) for e in node.elts]
         elements_str = ", ".join(elements)
+        array_type = self._array_typename(node)
+        if array_type is not None:
+            return f"{array_type}{{{elements_str}}}"
+        capacity = self._visit_capacity(node)
+        if capacity is not None:
+            make = f"make([]{element_type}, 0, {capacity})"
+            if elements:
+                return f"append({make}, {elements_str})"
+            return make
         return f"[]{element_type}{{{elements_str}}}"
 
+    def _array_typename(self, node) -> Optional[str]:
+        fixed_size = getattr(node, "fixed_size", None)
+        if not fixed_size or not hasattr(node, "container_type"):
+            return None
+        _, element_type = node.container_type
+        if element_type is self._default_type:
+            return None
+        return f"[{fixed_size}]{element_type}"
+
+    def _visit_capacity(self, node) -> Optional[str]:
+        capacity = getattr(node, "capacity", None)
+        if capacity is None or not hasattr(node, "container_type"):
+            return None
+        if capacity.is_constant and capacity.constant <= len(node.elts):
+            return None
+        terms = [str(capacity.constant)] if capacity.constant else []
+        for coef, factors in capacity.terms:
+            term = [self._visit_capacity_factor(f) for f in factors]
+            if coef != 1:
+                term.insert(0, str(coef))
+            terms.append(" * ".join(term))
+        return " + ".join(terms)
+
+    def _visit_capacity_factor(self, factor) -> str:
+        if isinstance(factor, LenFactor):
+            return f"len({self.visit(factor.seq)})"
+        count = self.visit(factor.stop)
+        if factor.start is not None:
+            count = f"{count} - {self.visit(factor.start)}"
+        # range() with stop < start is empty, and make() panics on a
+        # negative capacity. max is a builtin since Go 1.21
+        return f"max(0, {count})"
+
     def visit_Set(self, node) -> str:
         _ = self._typename_from_annotation(node)
         element_type = self._default_type
@@ -590,6 +802,8 @@ class GoTranspiler(CLikeTranspiler):
         target = self.visit(node.target)
         type_str = self._typename_from_annotation(node)
         val = self.visit(node.value) if node.value is not None else None
+        if isinstance(node.value, ast.List):
+            type_str = self._array_typename(node.value) or type_str
         if type_str is not self._default_type:
             return f"var {target} {type_str} = {val}"
         else:
@@ -610,12 +824,26 @@ class GoTranspiler(CLikeTranspiler):
         # python/rust annotations provided to customize the cast if necessary
         return f"{cast_to}({value_str})"
 
+    def visit_AugAssign(self, node) -> str:
+        if getattr(node, "string_builder", False):
+            target = self.visit(node.target)
+            return f"{target}.WriteString({self.visit(node.value)})"
+        return super().visit_AugAssign(node)
+
     def _visit_AssignOne(self, node, target) -> str:
         if isinstance(target, ast.Tuple):
             elts = [self.visit(e) for e in target.elts]
             value = self.visit(node.value)
             return "var {0} = {1}".format(", ".join(elts), value)
 
+        if getattr(node, "string_builder", False):
+            self._usings.add('"strings"')
+            target = self.visit(target)
+            if isinstance(node.value, ast.Constant) and not node.value.value:
+                return f"var {target} strings.Builder"
+            value = self.visit(node.value)
+            return f"var {target} strings.Builder\n{target}.WriteString({value})"
+
         if isinstance(node.scopes[-1], ast.If):
             outer_if = node.scopes[-1]
             target_id = self.visit(target)
@@ -634,6 +862,8 @@ class GoTranspiler(CLikeTranspiler):
         needs_cast = self._needs_cast(target, node.value)
         target_str = self.visit(target)
         value = self.visit(node.value)
+        if isinstance(node.value, ast.List):
+            typename = self._array_typename(node.value) or typename
         if needs_cast:
             left_annotation = target.annotation
             right_annotation = getattr(node.value, "annotation", None)
@@ -676,8 +906,9 @@ class GoTranspiler(CLikeTranspiler):
     def visit_Await(self, node) -> str:
         return "await!({0})".format(self.visit(node.value))
 
-    def visit_AsyncFunctionDef(self, node) -> str:
-        return "#[async]\n{0}".format(self.visit_FunctionDef(node))
+    def emit_AsyncFunctionDef(self, node, writer: CodeWriter):
+        writer.write("#[async]")
+        self.emit_FunctionDef(node, writer)
 
     def visit_Yield(self, node) -> str:
         return "//yield is unimplemented"
@@ -1,11 +1,12 @@
 import ast
 import logging
-import re
 from typing import Any
 
 from py2many.ast_helpers import get_id
-from py2many.helpers import get_ann_repr
+from py2many.type_terms import from_annotation
 from pyjl.global_vars import FIX_SCOPE_BOUNDS, FLAG_DEFAULTS, LOOP_SCOPE_WARNING, OPTIMIZE_LOOP_RANGES
+from py2many.visitor import NodeTransformer
+from pyjl.helpers import is_matrix_type, is_scalar_type, is_sequence_type
 
 logger = logging.Logger("pyjl")
 
@@ -42,7 +43,7 @@ def get_target(target):
     return set()
 
 
-class JuliaVariableScopeAnalysis(ast.NodeTransformer):
+class JuliaVariableScopeAnalysis(NodeTransformer):
     def __init__(self) -> None:
         super().__init__()
         self._nested_vars = {}
@@ -187,7 +188,7 @@ class JuliaVariableScopeAnalysis(ast.NodeTransformer):
         return node
 
 
-class JuliaLoopRangesOptimizationAnalysis(ast.NodeTransformer):
+class JuliaLoopRangesOptimizationAnalysis(NodeTransformer):
     def __init__(self) -> None:
         super().__init__()
         self._is_subscript = False
@@ -298,56 +299,44 @@ class JuliaLoopRangesOptimizationAnalysis(ast.NodeTransformer):
         return node
 
 
-class JuliaBroadcastTransformer(ast.NodeTransformer):
+class JuliaBroadcastTransformer(NodeTransformer):
     def __init__(self) -> None:
         super().__init__()
-        self._match_list = (
-            lambda x: re.match(r"^list|^List|^tuple|^Tuple", x) is not None
-            if x
-            else None
-        )
-        self._match_matrix = (
-            lambda x: re.match(r"^Matrix|^np.ndarray", x) is not None if x else None
-        )
-        self._match_scalar = (
-            lambda x: re.match(r"^int|^float|^bool", x) is not None if x else None
-        )
 
     def visit_BinOp(self, node: ast.BinOp) -> Any:
         self.generic_visit(node)
-        left_ann = get_ann_repr(getattr(node.left, "annotation", None))
-        right_ann = get_ann_repr(getattr(node.right, "annotation", None))
+        left_ann = from_annotation(getattr(node.left, "annotation", None))
+        right_ann = from_annotation(getattr(node.right, "annotation", None))
         node.broadcast = (
-            (self._match_matrix(left_ann) or self._match_matrix(right_ann))
+            (is_matrix_type(left_ann) or is_matrix_type(right_ann))
             or (
-                (self._match_list(left_ann) or self._match_matrix(left_ann))
-                and self._match_scalar(right_ann)
+                (is_sequence_type(left_ann) or is_matrix_type(left_ann))
+                and is_scalar_type(right_ann)
             )
             or (
-                (self._match_list(right_ann) or self._match_matrix(right_ann))
-                and self._match_scalar(left_ann)
+                (is_sequence_type(right_ann) or is_matrix_type(right_ann))
+                and is_scalar_type(left_ann)
             )
-            or (getattr(node.left, "broadcast", None) and self._match_scalar(right_ann))
-            or (getattr(node.right, "broadcast", None) and self._match_scalar(left_ann))
+            or (getattr(node.left, "broadcast", None) and is_scalar_type(right_ann))
+            or (getattr(node.right, "broadcast", None) and is_scalar_type(left_ann))
         )
         return node
 
     def visit_Assign(self, node: ast.Assign) -> Any:
         self.generic_visit(node)
         target = node.targets[0]
-        ann = getattr(node.value, "annotation", None)
-        ann_id = get_id(ann.value) if isinstance(ann, ast.Subscript) else get_id(ann)
+        ann = from_annotation(getattr(node.value, "annotation", None))
         # cont_type = getattr(node, "container_type", None)
-        if ann_id:
+        if ann:
             node.broadcast = (
                 isinstance(target, ast.Subscript)
                 and isinstance(target.slice, ast.Slice)
-                and not self._match_list(ann_id)
+                and not is_sequence_type(ann)
             )
         return node
 
 
-class DetectCtypesCallbacks(ast.NodeTransformer):
+class DetectCtypesCallbacks(NodeTransformer):
     CTYPES_CALLBACK_FACTORIES = {
         "ctypes.WINFUNCTYPE",
         "WINFUNCTYPE",
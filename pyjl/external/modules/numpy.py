@@ -6,6 +6,8 @@ import numpy as np
 
 from py2many.ast_helpers import get_id
 from py2many.tracer import is_list
+from py2many.type_terms import from_annotation
+from pyjl.helpers import is_matrix_type, is_scalar_type, is_sequence_type
 
 
 class JuliaExternalModulePlugins:
@@ -218,22 +220,14 @@ class FuncTypeDispatch():
         #   over the last axis of a and b.
         # - If a is an N-D array and b is an M-D array (where M>=2), it is a 
         #   sum product over the last axis of a and the second-to-last axis of b.
-        match_list = lambda x: re.match(r"^list|^List|^tuple|^Tuple", x) is not None \
-            if x else False
-        match_scalar = lambda x: re.match(r"^int|^float|^bool", x) is not None \
-            if x else None
-        match_matrix = lambda x: re.match(r"^Matrix|^np.ndarray", x) is not None \
-            if x else None
-        types_0 = getattr(vargs[0], "annotation", None)
-        types_1 = getattr(vargs[1], "annotation", None)
-        types_0_str = ast.unparse(types_0) if types_0 else ""
-        types_1_str = ast.unparse(types_1) if types_1 else ""
-        if match_list(types_0_str) and match_list(types_1_str):
+        types_0 = from_annotation(getattr(vargs[0], "annotation", None))
+        types_1 = from_annotation(getattr(vargs[1], "annotation", None))
+        if is_sequence_type(types_0) and is_sequence_type(types_1):
             return "list"
-        elif (m0 := match_scalar(types_0_str)) or (m1 := match_scalar(types_1_str)):
-            return types_0_str if m0 else types_1_str
-        elif (match_matrix(types_0_str) and match_list(types_1_str)) or \
-                (match_matrix(types_1_str) and match_list(types_0_str)):
+        elif is_scalar_type(types_0) or is_scalar_type(types_1):
+            return str(types_0) if is_scalar_type(types_0) else str(types_1)
+        elif (is_matrix_type(types_0) and is_sequence_type(types_1)) or \
+                (is_matrix_type(types_1) and is_sequence_type(types_0)):
             return "list"
         return "np.ndarray"
 
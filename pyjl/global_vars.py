@@ -18,6 +18,7 @@ USE_GLOBAL_CONSTANTS = "use_global_constants"
 ALLOW_ANNOTATIONS_ON_GLOBALS = "allow_annotations_on_globals"
 REMOVE_NESTED_RESUMABLES = "remove_nested_resumables"
 OPTIMIZE_LOOP_RANGES = "optimize_loop_ranges"
+OPTIMIZE_GLOBAL_SCOPE = "optimize_global_scope"
 
 # Decorators and Flags
 REMOVE_NESTED = "remove_nested"
@@ -35,6 +36,7 @@ GLOBAL_FLAGS = [
     USE_GLOBAL_CONSTANTS,
     REMOVE_NESTED_RESUMABLES,
     OPTIMIZE_LOOP_RANGES,
+    OPTIMIZE_GLOBAL_SCOPE,
 ]
 
 FLAG_DEFAULTS = {
@@ -49,6 +51,7 @@ FLAG_DEFAULTS = {
     ALLOW_ANNOTATIONS_ON_GLOBALS: False,
     REMOVE_NESTED_RESUMABLES: False,
     OPTIMIZE_LOOP_RANGES: False,
+    OPTIMIZE_GLOBAL_SCOPE: True,
 }
 
 ###################################
@@ -7,6 +7,7 @@ from py2many.helpers import get_ann_repr
 from py2many.scope import ScopeList
 
 from py2many.tracer import find_node_by_name_and_type
+from py2many.type_terms import FLOAT, TypeTerm, is_subtype
 from pyjl.global_vars import SEP
 
 # TODO: Currently not in use
@@ -172,3 +173,15 @@ def verify_types(annotation: ast.AST, t: str):
             type_checks.append(verify_types(elt, t))
         return any(type_checks)
     return False
+
+
+def is_sequence_type(term: Optional[TypeTerm]) -> bool:
+    return term is not None and term.name in ("list", "tuple")
+
+
+def is_matrix_type(term: Optional[TypeTerm]) -> bool:
+    return term is not None and term.name in ("Matrix", "np.ndarray")
+
+
+def is_scalar_type(term: Optional[TypeTerm]) -> bool:
+    return term is not None and is_subtype(term, FLOAT)
@@ -5,6 +5,7 @@
 """
 import ast
 from typing import Any, Optional
+from py2many.visitor import NodeVisitor
 
 ######################################
 ############### Types ################
@@ -86,7 +87,7 @@ class InlineFunction(ast.FunctionDef):
 ######################################
 
 
-class JuliaNodeVisitor(ast.NodeVisitor):
+class JuliaNodeVisitor(NodeVisitor):
     def visit_AbstractType(self, node: AbstractType) -> Any:
         """Visit abstract type node."""
         self.visit(node.value)
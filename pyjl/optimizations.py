@@ -1,12 +1,13 @@
 import ast
-import re
 from typing import Any
 
 from py2many.ast_helpers import get_id
+from py2many.type_terms import INT, FLOAT, STR, from_annotation
 from pyjl.global_vars import FLAG_DEFAULTS, USE_GLOBAL_CONSTANTS
+from py2many.visitor import NodeTransformer
 
 
-class AlgebraicSimplification(ast.NodeTransformer):
+class AlgebraicSimplification(NodeTransformer):
     def __init__(self) -> None:
         super().__init__()
         self._optimize = False
@@ -89,7 +90,7 @@ class AlgebraicSimplification(ast.NodeTransformer):
         self.visit(node.right)
         return node
 
-class OperationOptimizer(ast.NodeTransformer):
+class OperationOptimizer(NodeTransformer):
     def __init__(self) -> None:
         super().__init__()
 
@@ -97,9 +98,9 @@ class OperationOptimizer(ast.NodeTransformer):
         # Visit call node, as JuliaAugAssignRewirter translates
         # augmented assignments into the corresponding Julia
         # functions
-        primitive_type = lambda n: \
-            re.match(r"^int|^float|^str", 
-            ast.unparse(getattr(node.scopes.find(get_id(n)), "annotation", ast.Name("")))) is not None
+        primitive_type = lambda n: from_annotation(
+            getattr(node.scopes.find(get_id(n)), "annotation", None)
+        ) in (INT, FLOAT, STR)
         if isinstance(node.func, ast.Name) and \
                 get_id(node.func) == "append!" and \
                 isinstance(node.args[1], ast.List) and \
@@ -109,7 +110,7 @@ class OperationOptimizer(ast.NodeTransformer):
             node.args[1] = node.args[1].elts[0]
         return node
 
-class PerformanceOptimizations(ast.NodeTransformer):
+class PerformanceOptimizations(NodeTransformer):
     def __init__(self) -> None:
         super().__init__()
         self._use_global_constants = False
@@ -36,6 +36,7 @@ from py2many.tracer import (
 )
 
 from pyjl import juliaAst
+from py2many.visitor import NodeTransformer
 
 try:
     from dataclasses import dataclass
@@ -806,10 +807,11 @@ class JuliaTranspilerPlugins:
     # IO
     # =====================================
     def visit_print(self, node: ast.Call, vargs: List[str], kwargs: list[tuple[str,str]]) -> str:
+        io = f"{self._output_buffer}, " if self._buffers_output(node) else ""
         if len(vargs) == 0:
-            return "println()"
+            return f"println({io[:-2]})"
         if len(vargs) == 1 and not kwargs and not isinstance(node.args[0], ast.BinOp):
-            return f"println({vargs[0]})"
+            return f"println({io}{vargs[0]})"
         parsed_args = []
         args_str, args_vals = [], []
         for node_arg in node.args:
@@ -847,9 +849,11 @@ class JuliaTranspilerPlugins:
 
         if args_str and not print_repr:
             self._usings.add("Printf")
-            return f'@printf("{sep.join(args_str)}{end}", {", ".join(args_vals)})'
+            return f'@printf({io}"{sep.join(args_str)}{end}", {", ".join(args_vals)})'
 
         # Append parsed arguments
+        if io:
+            print_repr.append(self._output_buffer)
         print_repr.append(f'"{sep.join(parsed_args)}"')
 
         maybe_flush = ""
@@ -889,7 +893,10 @@ class JuliaTranspilerPlugins:
     def visit_write(self, node: ast.Call, vargs: list[str], kwargs: list[tuple[str,str]]) -> str:
         if not vargs or getattr(node, "is_attr", False):
             return f"x -> write(stdout, x)"
-        return f"write(stdout, {vargs[0]})"
+        # The first argument is the stream the method is called on
+        if self._buffers_output(node):
+            return f"write({self._output_buffer}, {vargs[-1]})"
+        return f"write(stdout, {vargs[-1]})"
 
     def visit_flush(self, node: ast.Call, vargs: list[str], kwargs: list[tuple[str,str]]) -> str:
         if not vargs or getattr(node, "is_attr", False):
@@ -1234,7 +1241,7 @@ class SpecialFunctionsPlugins:
         body.extend([self.visit(n) for n in node.body])
         return "\n".join(body)
 
-class InitRewriter(ast.NodeTransformer):
+class InitRewriter(NodeTransformer):
     constructor_calls = []
 
     def __init__(self, arg_ids, is_oop) -> None:
@@ -1491,6 +1498,7 @@ FUNC_DISPATCH_TABLE: Dict[FuncType, Tuple[Callable, bool]] = {
     sys.stdin.close: (lambda self, node, vargs, kwargs: f"close({vargs[0]})", True),
     sys.exit: (lambda self, node, vargs, kwargs: f"quit({vargs[0]})", True),
     sys.stdout: (lambda self, node, vargs, kwargs: f"stdout", True),
+    sys.stdout.write: (JuliaTranspilerPlugins.visit_write, True),
     sys.stdout.buffer.write: (JuliaTranspilerPlugins.visit_write, True),
     sys.stdout.buffer.flush: (JuliaTranspilerPlugins.visit_flush, True),
     open: (JuliaTranspilerPlugins.visit_open, True),
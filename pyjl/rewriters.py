@@ -1,6 +1,7 @@
 import ast
 import copy
 import ctypes
+import logging
 from pathlib import Path
 from pyclbr import Function
 import re
@@ -11,20 +12,26 @@ from py2many.clike import class_for_typename
 
 from py2many.exceptions import AstUnsupportedOperation
 from py2many.helpers import get_ann_repr
-from py2many.inference import InferTypesTransformer
+from py2many.inference import InferTypesTransformer, get_inferred_type
 from py2many.scope import ScopeList
+from py2many.value_range import find_arbitrary_precision_vars
+from py2many.type_terms import BOOL, FLOAT, INT, from_annotation
 from py2many.tracer import find_closest_scope, find_in_body, find_node_by_name_and_type, find_node_by_type, is_class_or_module, is_class_type, is_list
 from py2many.analysis import IGNORED_MODULE_SET
 
 from py2many.ast_helpers import copy_attributes, create_ast_node, get_id
 from pyjl.clike import JL_IGNORED_MODULE_SET
-from pyjl.global_vars import CHANNELS, COMMON_LOOP_VARS, FIX_SCOPE_BOUNDS, FLAG_DEFAULTS, JL_CLASS, LOWER_YIELD_FROM, OBJECT_ORIENTED, OFFSET_ARRAYS, OOP_CLASS, OOP_NESTED_FUNCS, REMOVE_NESTED, REMOVE_NESTED_RESUMABLES, RESUMABLE, SEP, USE_MODULES, USE_RESUMABLES
+from pyjl.global_vars import CHANNELS, COMMON_LOOP_VARS, FIX_SCOPE_BOUNDS, FLAG_DEFAULTS, JL_CLASS, LOWER_YIELD_FROM, OBJECT_ORIENTED, OFFSET_ARRAYS, OOP_CLASS, OPTIMIZE_GLOBAL_SCOPE, OOP_NESTED_FUNCS, REMOVE_NESTED, REMOVE_NESTED_RESUMABLES, RESUMABLE, USE_MODULES, USE_RESUMABLES
 from pyjl.helpers import fill_attributes, generate_var_name, get_default_val, get_func_def, obj_id
 from py2many.helpers import is_dir, is_file
 import pyjl.juliaAst as juliaAst
+from py2many.node_index import Interests
+from py2many.visitor import NodeTransformer
 
+logger = logging.getLogger(__name__)
 
-class JuliaMethodCallRewriter(ast.NodeTransformer):
+
+class JuliaMethodCallRewriter(NodeTransformer):
     """Converts Python calls and attribute calls to Julia compatible ones"""
     def __init__(self) -> None:
         super().__init__()
@@ -125,9 +132,11 @@ class JuliaMethodCallRewriter(ast.NodeTransformer):
         return node
 
 
-class JuliaAugAssignRewriter(ast.NodeTransformer):
+class JuliaAugAssignRewriter(NodeTransformer):
     """Rewrites augmented assignments into compatible 
     Julia operations"""
+    interests = Interests(nodes=[ast.AugAssign], prune=True)
+
     def __init__(self) -> None:
         super().__init__()
 
@@ -226,15 +235,13 @@ class JuliaAugAssignRewriter(ast.NodeTransformer):
 
     @staticmethod
     def _is_collection(node):
-        ann = getattr(node.scopes.find(get_id(node)), "annotation", None)
-        if ann:
-            ann_str = ast.unparse(ann)
-            return re.match(r"^List|^list|^Dict|^dict|^Set|^set", ann_str) is not None
-        return False
+        ann = from_annotation(getattr(node.scopes.find(get_id(node)), "annotation", None))
+        return ann is not None and ann.name in ("list", "dict", "set")
 
 
-class JuliaGeneratorRewriter(ast.NodeTransformer):
+class JuliaGeneratorRewriter(NodeTransformer):
     """A Rewriter for Generator functions"""
+    interests = Interests(nodes=[ast.Yield, ast.YieldFrom])
     SPECIAL_FUNCTIONS = set([
         "islice"
     ])
@@ -393,10 +400,11 @@ class JuliaGeneratorRewriter(ast.NodeTransformer):
         return node
 
 
-class JuliaBoolOpRewriter(ast.NodeTransformer):
+class JuliaBoolOpRewriter(NodeTransformer):
     """Rewrites condition checks to Julia compatible ones
     All checks that perform equality checks with the literal '1'
     have to be converted to equality checks with true"""
+    interests = Interests(nodes=[ast.If, ast.While, ast.Compare], prune=True)
 
     def __init__(self) -> None:
         super().__init__()
@@ -421,28 +429,27 @@ class JuliaBoolOpRewriter(ast.NodeTransformer):
                 node.test.value = False
                 return node
 
-        annotation = getattr(node.test, "annotation", None)
-        ann_id = get_ann_repr(annotation, sep=SEP)
+        ann = from_annotation(getattr(node.test, "annotation", None))
         if not isinstance(node.test, ast.Compare) and \
                 not isinstance(node.test, ast.UnaryOp):
-            if ann_id:
-                if ann_id != "bool":
-                    if ann_id == "int" or ann_id == "float":
+            if ann:
+                if ann is not BOOL:
+                    if ann is INT or ann is FLOAT:
                         node.test = self._build_compare(node.test, 
                             [ast.NotEq()], [ast.Constant(value=0)])
-                    elif re.match(r"^list|^List", ann_id):
+                    elif ann.name == "list":
                         # Compare with empty list
                         node.test = self._build_compare(node.test, 
                             [ast.IsNot()], [ast.List(elts=[])])
-                    elif re.match(r"^tuple|^Tuple", ann_id):
+                    elif ann.name == "tuple":
                         # Compare with empty tuple
                         node.test = self._build_compare(node.test, 
                             [ast.IsNot()], [ast.Tuple(elts=[])])
-                    elif re.match(r"^set|^Set", ann_id):
+                    elif ann.name == "set":
                         # Compare with empty tuple
                         node.test = self._build_compare(node.test, 
                             [ast.IsNot()], [ast.Set(elts=[])])
-                    elif re.match(r"^Optional", ann_id):
+                    elif ann.name == "Optional":
                         # Compare with type None
                         node.test = self._build_compare(node.test, 
                             [ast.IsNot()], [ast.Constant(value=None)])
@@ -517,7 +524,7 @@ class JuliaBoolOpRewriter(ast.NodeTransformer):
         return node
 
 
-class JuliaIndexingRewriter(ast.NodeTransformer):
+class JuliaIndexingRewriter(NodeTransformer):
     """Translates Python's 0-based indexing to Julia's 
     1-based indexing for lists"""
 
@@ -841,8 +848,10 @@ class JuliaIndexingRewriter(ast.NodeTransformer):
         return ann == "Dict" or ann == "dict"
 
 
-class JuliaIORewriter(ast.NodeTransformer):
+class JuliaIORewriter(NodeTransformer):
     """Rewrites IO operations into Julia compatible ones"""
+    interests = Interests(nodes=[ast.For, ast.Subscript], prune=True)
+
     def __init__(self) -> None:
         super().__init__()
 
@@ -880,9 +889,13 @@ class JuliaIORewriter(ast.NodeTransformer):
             ast.fix_missing_locations(node.value)
         return node
 
-class JuliaOrderedCollectionRewriter(ast.NodeTransformer):
+class JuliaOrderedCollectionRewriter(NodeTransformer):
     """Rewrites normal collections into ordered collections. 
-    This depends on the JuliaOrderedCollectionTransformer"""
+    This depends on the JuliaOrderedCollectionTransformer. 
+    With use_ordered_collections, collections whose order is never 
+    observed (see JuliaOrderObservationAnalysis) stay unordered"""
+    interests = Interests(nodes=[ast.Dict, ast.DictComp, ast.Set], prune=True)
+
     def __init__(self) -> None:
         super().__init__()
         self._use_ordered_collections = False
@@ -892,10 +905,13 @@ class JuliaOrderedCollectionRewriter(ast.NodeTransformer):
         self.generic_visit(node)
         return node
 
+    def _is_ordered(self, node) -> bool:
+        return getattr(node, "use_ordered_collection", None) or \
+            (self._use_ordered_collections and getattr(node, "order_observed", True))
+
     def visit_Dict(self, node: ast.Dict) -> Any:
         self.generic_visit(node)
-        if getattr(node, "use_ordered_collection", None) or \
-                self._use_ordered_collections:
+        if self._is_ordered(node):
             return juliaAst.OrderedDict(
                 keys = node.keys,
                 values = node.values,
@@ -905,8 +921,7 @@ class JuliaOrderedCollectionRewriter(ast.NodeTransformer):
 
     def visit_DictComp(self, node: ast.DictComp) -> Any:
         self.generic_visit(node)
-        if getattr(node, "use_ordered_collection", None) or \
-                self._use_ordered_collections:
+        if self._is_ordered(node):
             return juliaAst.OrderedDictComp(
                 key = node.key,
                 value = node.value,
@@ -917,8 +932,7 @@ class JuliaOrderedCollectionRewriter(ast.NodeTransformer):
 
     def visit_Set(self, node: ast.Set) -> Any:
         self.generic_visit(node)
-        if getattr(node, "use_ordered_collection", None) or \
-                self._use_ordered_collections:
+        if self._is_ordered(node):
             return juliaAst.OrderedSet(
                 elts = node.elts,
                 annotation = node.annotation
@@ -926,7 +940,9 @@ class JuliaOrderedCollectionRewriter(ast.NodeTransformer):
         return node
 
 
-class JuliaMainRewriter(ast.NodeTransformer):
+class JuliaMainRewriter(NodeTransformer):
+    interests = Interests(nodes=[ast.If], prune=True)
+
     def __init__(self):
         super().__init__()
 
@@ -951,7 +967,395 @@ class JuliaMainRewriter(ast.NodeTransformer):
             ast.fix_missing_locations(node.test)
         return node
 
-class JuliaArbitraryPrecisionRewriter(ast.NodeTransformer):
+
+class JuliaGlobalScopeRewriter(NodeTransformer):
+    """Julia can't infer the types of non-constant globals, so code
+    running in the global scope is slow. This moves the statements of
+    Python's main block (or the loops ending a script) into a main
+    function, declares the globals that are bound once as const, and
+    turns rebound globals of a primitive type into a const Ref. Each of
+    these is only done where the Python semantics stay the same"""
+    REF_TYPES = {"int", "float", "bool", "str", "complex"}
+    DYNAMIC_SCOPE_FUNCS = {"globals", "locals", "vars", "exec", "eval"}
+    UNSUPPORTED_MAIN_NODES = (ast.FunctionDef, ast.AsyncFunctionDef,
+        ast.ClassDef, ast.Lambda, ast.Import, ast.ImportFrom, ast.Global,
+        ast.Nonlocal, ast.Delete, ast.Yield, ast.YieldFrom, ast.Await)
+
+    def __init__(self) -> None:
+        super().__init__()
+
+    def visit_Module(self, node: ast.Module) -> Any:
+        if not getattr(node, OPTIMIZE_GLOBAL_SCOPE,
+                FLAG_DEFAULTS[OPTIMIZE_GLOBAL_SCOPE]) or \
+                self._uses_dynamic_scope(node):
+            return node
+        main_if, block = self._find_main_block(node)
+        in_block = {id(n) for stmt in block for n in ast.walk(stmt)}
+        bindings = self._find_bindings(node)
+        mentions_outside = self._global_mentions(node.body, in_block)
+
+        refs = {}
+        for name, stmts in bindings.items():
+            # The first binding at module level defines the global
+            first = next((s for s in stmts
+                if id(s) not in self._function_bindings), None)
+            if first is None or first not in node.body or id(first) in in_block:
+                continue
+            if len(stmts) == 1:
+                if self._is_assign(first):
+                    first.use_constant = True
+            elif self._is_assign(first) and \
+                    not self._has_calls_before(node, first) and \
+                    (ann := self._ref_type(node, name, stmts)):
+                refs[name] = ann
+
+        if refs:
+            _JuliaRefRewriter(refs).visit(node)
+        if block:
+            shared = set()
+            for name, stmts in bindings.items():
+                if name in refs or not any(id(s) in in_block for s in stmts):
+                    continue
+                if name in mentions_outside or \
+                        any(id(s) not in in_block for s in stmts):
+                    shared.add(name)
+            self._wrap_in_main(node, main_if, block, shared)
+        return node
+
+    def _find_main_block(self, node: ast.Module):
+        main_if = next((n for n in node.body
+            if getattr(n, "python_main", False)), None)
+        if main_if:
+            block = main_if.body
+        else:
+            # Python scripts without a main block: the statements
+            # starting with the first loop after all definitions
+            start = len(node.body)
+            for i in reversed(range(len(node.body))):
+                stmt = node.body[i]
+                if isinstance(stmt, (ast.FunctionDef, ast.ClassDef,
+                        ast.Import, ast.ImportFrom)):
+                    break
+                if isinstance(stmt, (ast.For, ast.While)):
+                    start = i
+            block = node.body[start:]
+        # Moving the block only pays off when it binds variables or loops
+        if not any(isinstance(n, (ast.For, ast.While, ast.Assign,
+                    ast.AnnAssign, ast.AugAssign, ast.With))
+                for stmt in block for n in ast.walk(stmt)) or \
+                any(isinstance(n, self.UNSUPPORTED_MAIN_NODES)
+                    for stmt in block for n in ast.walk(stmt)):
+            return None, []
+        return main_if, block
+
+    def _wrap_in_main(self, node: ast.Module, main_if, block, shared):
+        taken = {get_id(n) for n in ast.walk(node)
+            if isinstance(n, ast.Name)} | \
+            {n.name for n in node.body if isinstance(n, (ast.FunctionDef, ast.ClassDef))}
+        name = "main"
+        while name in taken:
+            name = f"{name}_"
+        body = []
+        if shared:
+            body.append(ast.Global(names=sorted(shared)))
+        for stmt in block:
+            # Julia doesn't support annotating global variables
+            if isinstance(stmt, ast.AnnAssign) and stmt.value and \
+                    get_id(stmt.target) in shared:
+                assign = ast.Assign(targets=[stmt.target], value=stmt.value)
+                copy_attributes(stmt, assign)
+                stmt = assign
+            body.append(stmt)
+        main_func = ast.FunctionDef(
+            name = name,
+            args = ast.arguments(args=[], defaults=[]),
+            body = body,
+            returns = None,
+            decorator_list = [],
+            parsed_decorators = {},
+            scopes = ScopeList(),
+            lineno = block[0].lineno,
+            col_offset = block[0].col_offset)
+        main_call = ast.Expr(
+            value = ast.Call(
+                func = ast.Name(id=name),
+                args = [],
+                keywords = [],
+                scopes = ScopeList()),
+            lineno = block[-1].lineno,
+            col_offset = block[0].col_offset)
+        ast.fix_missing_locations(main_func)
+        ast.fix_missing_locations(main_call)
+        if main_if:
+            main_if.body = [main_call]
+            node.body.insert(node.body.index(main_if), main_func)
+        else:
+            node.body[node.body.index(block[0]):] = [main_func, main_call]
+
+    def _find_bindings(self, node: ast.Module) -> Dict[str, list]:
+        """Maps the global names to the statements binding them,
+        in the order of the source"""
+        bindings = {}
+        self._function_bindings = set()
+        def add(name, stmt, global_names):
+            bindings.setdefault(name, []).append(stmt)
+            if global_names is not None:
+                self._function_bindings.add(id(stmt))
+
+        def visit_body(body, global_names):
+            for stmt in body:
+                for name in self._bound_names(stmt):
+                    if global_names is None or name in global_names:
+                        add(name, stmt, global_names)
+                if isinstance(stmt, (ast.FunctionDef, ast.AsyncFunctionDef)):
+                    declared = {name for n in ast.walk(stmt)
+                        if isinstance(n, ast.Global) for name in n.names}
+                    visit_body(stmt.body, declared)
+                elif isinstance(stmt, ast.ClassDef):
+                    visit_body(stmt.body, set())
+                else:
+                    for field in ("body", "orelse", "finalbody"):
+                        visit_body(getattr(stmt, field, []), global_names)
+                    for handler in getattr(stmt, "handlers", []):
+                        if handler.name and (global_names is None or
+                                handler.name in global_names):
+                            add(handler.name, handler, global_names)
+                        visit_body(handler.body, global_names)
+        visit_body(node.body, None)
+        return bindings
+
+    def _global_mentions(self, body, in_block, local_names=frozenset()):
+        """Finds the globals used outside of the moved block"""
+        mentions = set()
+        for stmt in body:
+            if id(stmt) in in_block:
+                continue
+            for n in self._walk_statement(stmt):
+                names = ast.walk(n) if isinstance(n, ast.Lambda) else [n]
+                mentions.update(get_id(m) for m in names
+                    if isinstance(m, ast.Name) and get_id(m) not in local_names)
+            if isinstance(stmt, (ast.FunctionDef, ast.AsyncFunctionDef)):
+                declared = {name for n in ast.walk(stmt)
+                    if isinstance(n, ast.Global) for name in n.names}
+                args = stmt.args
+                scope = {a.arg for a in args.posonlyargs + args.args + args.kwonlyargs}
+                scope.update(a.arg for a in (args.vararg, args.kwarg) if a)
+                scope.update(name for n in self._function_statements(stmt.body)
+                    for name in self._bound_names(n))
+                mentions |= self._global_mentions(stmt.body, in_block,
+                    (local_names | scope) - declared)
+            elif not isinstance(stmt, ast.ClassDef):
+                for field in ("body", "orelse", "finalbody"):
+                    mentions |= self._global_mentions(getattr(stmt, field, []),
+                        in_block, local_names)
+                for handler in getattr(stmt, "handlers", []):
+                    mentions |= self._global_mentions(handler.body, in_block,
+                        local_names)
+            else:
+                mentions |= self._global_mentions(stmt.body, in_block, local_names)
+        return mentions
+
+    def _function_statements(self, body):
+        """Statements of a function, without those of nested functions
+        and classes"""
+        for stmt in body:
+            yield stmt
+            if not isinstance(stmt, (ast.FunctionDef, ast.AsyncFunctionDef,
+                    ast.ClassDef)):
+                for field in ("body", "orelse", "finalbody"):
+                    yield from self._function_statements(getattr(stmt, field, []))
+                for handler in getattr(stmt, "handlers", []):
+                    yield handler
+                    yield from self._function_statements(handler.body)
+
+    def _bound_names(self, stmt):
+        targets = []
+        if isinstance(stmt, ast.Assign):
+            targets = stmt.targets
+        elif isinstance(stmt, (ast.AugAssign, ast.For, ast.AsyncFor)) or \
+                (isinstance(stmt, ast.AnnAssign) and stmt.value):
+            targets = [stmt.target]
+        elif isinstance(stmt, ast.Delete):
+            targets = stmt.targets
+        elif isinstance(stmt, (ast.With, ast.AsyncWith)):
+            targets = [it.optional_vars for it in stmt.items if it.optional_vars]
+        elif isinstance(stmt, (ast.Import, ast.ImportFrom)):
+            return [(a.asname or a.name).split(".")[0] for a in stmt.names]
+        elif isinstance(stmt, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+            return [stmt.name]
+        elif isinstance(stmt, ast.ExceptHandler):
+            return [stmt.name] if stmt.name else []
+        names = []
+        for target in targets:
+            if isinstance(target, ast.Starred):
+                target = target.value
+            if isinstance(target, (ast.Tuple, ast.List)):
+                names.extend(get_id(e.value if isinstance(e, ast.Starred) else e)
+                    for e in target.elts)
+            elif isinstance(target, ast.Name):
+                names.append(get_id(target))
+        # Walrus operators bind in the enclosing function
+        if not isinstance(stmt, (ast.FunctionDef, ast.ClassDef)):
+            names.extend(get_id(n.target) for n in self._walk_statement(stmt)
+                if isinstance(n, ast.NamedExpr))
+        return [name for name in names if name]
+
+    def _ref_type(self, node: ast.Module, name, stmts):
+        # All bindings have to be plain assignments of the same primitive type
+        if not all(self._is_assign(s) or
+                    (isinstance(s, ast.AugAssign) and isinstance(s.target, ast.Name))
+                for s in stmts):
+            return None
+        first = next(s for s in stmts if id(s) not in self._function_bindings)
+        ann = get_id(first.annotation) if isinstance(first, ast.AnnAssign) \
+            else get_id(get_inferred_type(first.targets[0])) or \
+                get_id(get_inferred_type(first.value))
+        if ann not in self.REF_TYPES:
+            return None
+        # Assuming the global has this type, no binding may change it
+        for s in stmts:
+            if isinstance(s, ast.AnnAssign) and get_id(s.annotation) != ann:
+                return None
+            value = ast.BinOp(left=s.target, op=s.op, right=s.value) \
+                if isinstance(s, ast.AugAssign) else s.value
+            if self._value_type(value, name, ann) != ann:
+                return None
+        # Names bound by lambdas, comprehensions or class bodies can't be
+        # told apart from the global
+        for n in ast.walk(node):
+            if isinstance(n, ast.ClassDef) and \
+                    any(get_id(m) == name for m in ast.walk(n)):
+                return None
+            if isinstance(n, ast.Lambda) and \
+                    any(a.arg == name for a in n.args.args):
+                return None
+            if isinstance(n, ast.comprehension) and \
+                    any(get_id(m) == name for m in ast.walk(n.target)):
+                return None
+        return ann
+
+    def _value_type(self, node, name, ann):
+        if get_id(node) == name:
+            return ann
+        if isinstance(node, ast.BinOp):
+            types = {self._value_type(node.left, name, ann),
+                self._value_type(node.right, name, ann)}
+            if types <= {"int", "float"} and (isinstance(node.op, ast.Div)
+                    or "float" in types):
+                return "float"
+            return types.pop() if len(types) == 1 else None
+        if isinstance(node, ast.UnaryOp):
+            if isinstance(node.op, ast.Not):
+                return "bool"
+            return self._value_type(node.operand, name, ann)
+        return get_id(get_inferred_type(node))
+
+    def _has_calls_before(self, node: ast.Module, stmt):
+        # A function called earlier could bind the global before the Ref exists
+        for n in node.body[:node.body.index(stmt)]:
+            exprs = n.decorator_list \
+                if isinstance(n, (ast.FunctionDef, ast.ClassDef)) else [n]
+            if any(isinstance(m, ast.Call) for e in exprs for m in ast.walk(e)):
+                return True
+        return False
+
+    def _is_assign(self, stmt):
+        if isinstance(stmt, ast.Assign):
+            return len(stmt.targets) == 1 and isinstance(stmt.targets[0], ast.Name)
+        return isinstance(stmt, ast.AnnAssign) and stmt.value is not None and \
+            isinstance(stmt.target, ast.Name)
+
+    def _uses_dynamic_scope(self, node: ast.Module):
+        return any(isinstance(n, ast.Call) and
+            get_id(n.func) in self.DYNAMIC_SCOPE_FUNCS for n in ast.walk(node))
+
+    def _walk_statement(self, stmt):
+        """Walks the expressions of a statement, without
+        its nested statements"""
+        nodes = [v for field, v in ast.iter_fields(stmt)
+            if field not in ("body", "orelse", "finalbody", "handlers")]
+        while nodes:
+            n = nodes.pop()
+            if isinstance(n, list):
+                nodes.extend(n)
+            elif isinstance(n, ast.AST):
+                yield n
+                if not isinstance(n, ast.Lambda):
+                    nodes.extend(ast.iter_child_nodes(n))
+
+
+class _JuliaRefRewriter(NodeTransformer):
+    """Wraps globals into a const Ref and dereferences their uses"""
+    def __init__(self, refs: Dict[str, str]) -> None:
+        super().__init__()
+        self._refs = refs
+        self._created = set()
+        self._shadowed = set()
+        self._in_function = False
+
+    def visit_FunctionDef(self, node: ast.FunctionDef) -> Any:
+        shadowed = self._shadowed
+        declared = {name for n in ast.walk(node)
+            if isinstance(n, ast.Global) for name in n.names}
+        local_names = {a.arg for a in node.args.args + node.args.kwonlyargs}
+        for n in ast.walk(node):
+            if isinstance(n, ast.Name) and \
+                    isinstance(getattr(n, "ctx", None), ast.Store):
+                local_names.add(n.id)
+        in_function = self._in_function
+        self._shadowed = shadowed | (local_names - declared)
+        self._in_function = True
+        self.generic_visit(node)
+        self._shadowed, self._in_function = shadowed, in_function
+        return node
+
+    def visit_Global(self, node: ast.Global) -> Any:
+        node.names = [n for n in node.names if n not in self._refs]
+        return node if node.names else None
+
+    def visit_Assign(self, node: ast.Assign) -> Any:
+        return self._visit_ref_assign(node, node.targets[0])
+
+    def visit_AnnAssign(self, node: ast.AnnAssign) -> Any:
+        return self._visit_ref_assign(node, node.target)
+
+    def _visit_ref_assign(self, node, target):
+        name = get_id(target)
+        if name in self._refs and name not in self._created and \
+                not self._in_function:
+            # First assignment at module level creates the Ref
+            self._created.add(name)
+            ref_type = ast.Subscript(
+                value = ast.Name(id="Ref"),
+                slice = ast.Name(id=self._refs[name]),
+                is_annotation = True)
+            ref = ast.Assign(
+                targets = [ast.Name(id=name, ctx=ast.Store())],
+                value = ast.Call(
+                    func = ref_type,
+                    args = [self.visit(node.value)],
+                    keywords = [],
+                    scopes = getattr(node, "scopes", ScopeList())),
+                use_constant = True,
+                scopes = getattr(node, "scopes", ScopeList()),
+                lineno = node.lineno,
+                col_offset = node.col_offset)
+            ast.fix_missing_locations(ref)
+            return ref
+        self.generic_visit(node)
+        return node
+
+    def visit_Name(self, node: ast.Name) -> Any:
+        if node.id in self._refs and node.id not in self._shadowed:
+            ref = ast.Name(id=f"{node.id}[]")
+            copy_attributes(node, ref)
+            return ref
+        return node
+
+class JuliaArbitraryPrecisionRewriter(NodeTransformer):
+    """Uses BigInt for variables annotated as BigInt. With the
+    use_arbitrary_precision flag, also for the int variables that the
+    value range analysis finds can exceed 64 bits"""
     def __init__(self) -> None:
         super().__init__()
         self._use_arbitrary_precision = False
@@ -960,9 +1364,30 @@ class JuliaArbitraryPrecisionRewriter(ast.NodeTransformer):
     def visit_Module(self, node: ast.Module) -> Any:
         self._use_arbitrary_precision = getattr(node, "use_arbitrary_precision", False)
         self._arbitrary_precision_vars = set()
+        if self._use_arbitrary_precision:
+            node.arbitrary_precision_report = find_arbitrary_precision_vars(node)
+            filename = getattr(node, "__file__", "<module>")
+            for promotion in node.arbitrary_precision_report:
+                # Warnings reach stderr even without a configured handler
+                logger.warning(f"{filename}: using BigInt for {promotion}")
         self.generic_visit(node)
         return node
 
+    def visit_FunctionDef(self, node: ast.FunctionDef) -> Any:
+        self.generic_visit(node)
+        if getattr(node, "needs_arbitrary_precision", False):
+            node.returns = self._big_int_annotation(node.returns)
+        for arg in node.args.args:
+            if getattr(arg, "needs_arbitrary_precision", False):
+                arg.annotation = self._big_int_annotation(arg.annotation)
+        return node
+
+    def _big_int_annotation(self, annotation):
+        # Annotation nodes are shared between variables, so create a new one
+        if get_id(annotation) == "int":
+            return ast.Name(id="BigInt", ctx=ast.Load())
+        return annotation
+
     def visit_Name(self, node: ast.Name) -> Any:
         ann = get_id(getattr(node, "annotation", None)) == "int"
         if get_id(node) in self._arbitrary_precision_vars:
@@ -997,12 +1422,16 @@ class JuliaArbitraryPrecisionRewriter(ast.NodeTransformer):
         self.generic_visit(node)
         annotation = get_id(getattr(target, "annotation", None))
         if annotation:
+            needs_big_int = annotation == "int" and \
+                getattr(target, "needs_arbitrary_precision", False)
             if (annotation == "BigInt" or annotation == "BigFloat" or
                         (self._use_arbitrary_precision and 
-                        (annotation == "int" or annotation == "float")))\
+                        (needs_big_int or annotation == "float")))\
                     and not getattr(node.value, "ignore_wrap", None):
+                if needs_big_int and isinstance(node, ast.AnnAssign):
+                    node.annotation = self._big_int_annotation(node.annotation)
                 self._arbitrary_precision_vars.add(get_id(target))
-                func_name = "BigInt" if annotation == "int" else "BigFloat"
+                func_name = "BigInt" if annotation in ("int", "BigInt") else "BigFloat"
                 lineno = getattr(node, "lineno", 0)
                 col_offset = getattr(node, "col_offset", 0)
                 node.value = ast.Call(
@@ -1026,7 +1455,7 @@ class JuliaArbitraryPrecisionRewriter(ast.NodeTransformer):
 ############### Removing nested constructs ################
 ###########################################################
 
-class JuliaNestingRemoval(ast.NodeTransformer):
+class JuliaNestingRemoval(NodeTransformer):
     def __init__(self) -> None:
         super().__init__()
         self._remove_nested = False
@@ -1100,7 +1529,7 @@ class JuliaNestingRemoval(ast.NodeTransformer):
         return node
 
 
-class JuliaImportRewriter(ast.NodeTransformer):
+class JuliaImportRewriter(NodeTransformer):
     """Removes nested imports and rewrites calls to 
     the __init__ module"""
     def __init__(self) -> None:
@@ -1237,7 +1666,7 @@ class JuliaImportRewriter(ast.NodeTransformer):
 ##################### Class Rewriters #####################
 ###########################################################
 
-class JuliaClassWrapper(ast.NodeTransformer):
+class JuliaClassWrapper(NodeTransformer):
     # A hack to support two alternatives of translating 
     # Python classes to Julia
     def __init__(self) -> None:
@@ -1407,7 +1836,7 @@ class JuliaClassWrapper(ast.NodeTransformer):
             ast.fix_missing_locations(node.slice)
         return node
 
-class JuliaClassOOPRewriter(ast.NodeTransformer):
+class JuliaClassOOPRewriter(NodeTransformer):
     """Adds decorators to OOP classes and differentiate 
     functions within OOP classes"""
     def __init__(self) -> None:
@@ -1454,7 +1883,7 @@ class JuliaClassOOPRewriter(ast.NodeTransformer):
             self._is_oop = False
         return node
 
-class JuliaClassSubtypingRewriter(ast.NodeTransformer):
+class JuliaClassSubtypingRewriter(NodeTransformer):
     """Simple Rewriter that transforms Python classes using Julia's subtyping"""
 
     IGNORE_EXTENDS_SET = set([
@@ -1579,7 +2008,7 @@ class JuliaClassSubtypingRewriter(ast.NodeTransformer):
 ################## Conditional Rewriters ##################
 ###########################################################
 
-class VariableScopeRewriter(ast.NodeTransformer):
+class VariableScopeRewriter(NodeTransformer):
     """Rewrites variables in case they are defined within one 
     of Julia's local hard/soft scopes but used outside of their scopes. 
     This has to be executed after the JuliaVariableScopeAnalysis transformer"""
@@ -1714,7 +2143,7 @@ class VariableScopeRewriter(ast.NodeTransformer):
         return assign_nodes
 
 
-class JuliaOffsetArrayRewriter(ast.NodeTransformer):
+class JuliaOffsetArrayRewriter(NodeTransformer):
     """Converts array calls to OffsetArray calls. It is still
     a preliminary feature"""
 
@@ -1795,8 +2224,8 @@ class JuliaOffsetArrayRewriter(ast.NodeTransformer):
         let_assignments = []
         for arg in node.args.args:
             arg_id = arg.arg
-            annotation_id = get_ann_repr(arg.annotation, sep=SEP)
-            is_list = re.match(r"^List|^list", annotation_id)
+            ann = from_annotation(getattr(arg, "annotation", None))
+            is_list = ann is not None and ann.name == "list"
             if not hasattr(arg, "annotation") or \
                     (hasattr(arg, "annotation") and not is_list) or \
                     arg_id not in self._subscript_vals:
@@ -1931,7 +2360,8 @@ class JuliaOffsetArrayRewriter(ast.NodeTransformer):
             node.using_offset_arrays = getattr(node.value, "using_offset_arrays", False)
 
         container_type = getattr(node, "container_type", None)
-        is_list = container_type and re.match(r"^list|List", container_type[0])
+        is_list = container_type and \
+            getattr(from_annotation(container_type[0]), "name", None) == "list"
         if self._use_offset_array and (id := get_id(node.value)) and \
                 is_list:
             self._subscript_vals.append(id)
@@ -1990,7 +2420,7 @@ class JuliaOffsetArrayRewriter(ast.NodeTransformer):
             scopes = self._current_scope)
 
 
-class JuliaModuleRewriter(ast.NodeTransformer):
+class JuliaModuleRewriter(NodeTransformer):
     """Wraps Python's modules into Julia Modules."""
     def __init__(self) -> None:
         super().__init__()
@@ -2021,7 +2451,7 @@ class JuliaModuleRewriter(ast.NodeTransformer):
 ######################### ctypes ##########################
 ###########################################################
 
-class JuliaCtypesRewriter(ast.NodeTransformer):
+class JuliaCtypesRewriter(NodeTransformer):
     """Translate ctypes to Julia. Must run before JuliaClassWrapper and 
     JuliaMethodCallRewriter"""
 
@@ -2507,7 +2937,9 @@ class JuliaCtypesRewriter(ast.NodeTransformer):
         node.names = list(filter(remove_del_funcs, node.names))
 
 
-class JuliaCtypesCallbackRewriter(ast.NodeTransformer):
+class JuliaCtypesCallbackRewriter(NodeTransformer):
+    interests = Interests(imports=["ctypes"])
+
     CONVERSION_MAP = {
         "BOOL": "Clong",
     }
@@ -2581,7 +3013,9 @@ class JuliaCtypesCallbackRewriter(ast.NodeTransformer):
 ##################### Argument Parser #####################
 ###########################################################
 
-class JuliaArgumentParserRewriter(ast.NodeTransformer):
+class JuliaArgumentParserRewriter(NodeTransformer):
+    interests = Interests(calls=["ArgumentParser", "add_argument"], prune=True)
+
     def __init__(self) -> None:
         super().__init__()
         # Maps {arg_settings_inst: {
@@ -2664,9 +3098,11 @@ class JuliaArgumentParserRewriter(ast.NodeTransformer):
 #################### Context Managers #####################
 ###########################################################
 
-class JuliaContextManagerRewriter(ast.NodeTransformer):
+class JuliaContextManagerRewriter(NodeTransformer):
     """Rewrites calls to context manager nodes. This rewriter 
     assumes the use of the DataTypesBasic package """
+    interests = Interests(imports=["contextlib"])
+
     def __init__(self) -> None:
         super().__init__()
 
@@ -2687,7 +3123,7 @@ class JuliaContextManagerRewriter(ast.NodeTransformer):
         ast.fix_missing_locations(run_call)
         return run_call
 
-class JuliaExceptionRewriter(ast.NodeTransformer):
+class JuliaExceptionRewriter(NodeTransformer):
     ERROR_FUNCTIONS = {
         "WindowsError": ["function", "winerror"] # "strerror"
     }
@@ -2769,7 +3205,9 @@ class JuliaExceptionRewriter(ast.NodeTransformer):
         self.generic_visit(node)
         return node
 
-class JuliaUnittestRewriter(ast.NodeTransformer):
+class JuliaUnittestRewriter(NodeTransformer):
+    interests = Interests(calls=["raises", "mock", "parametrize"])
+
     def __init__(self) -> None:
         super().__init__()
         self._is_pytest = False
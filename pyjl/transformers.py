@@ -3,17 +3,19 @@ from typing import Any
 
 from py2many.ast_helpers import get_id
 from py2many.tracer import find_node_by_name_and_type
+from py2many.visitor import NodeTransformer, NodeVisitor
 
 
 def find_ordered_collections(node, extension=False):
     visitor = JuliaOrderedCollectionTransformer()
     visitor.visit(node)
+    JuliaOrderObservationAnalysis().visit(node)
 
 def parse_decorators(node, extension=False):
     visitor = JuliaDecoratorTransformer()
     visitor.visit(node)
 
-class JuliaOrderedCollectionTransformer(ast.NodeTransformer):
+class JuliaOrderedCollectionTransformer(NodeTransformer):
 
     SPECIAL_FUNC_CALLS = set([
         "items",
@@ -61,7 +63,119 @@ class JuliaOrderedCollectionTransformer(ast.NodeTransformer):
         return node
 
 
-class JuliaDecoratorTransformer(ast.NodeTransformer):
+class JuliaOrderObservationAnalysis(NodeVisitor):
+    """Finds the dict and set literals whose insertion order can be
+    observed. A collection assigned to a variable is only order sensitive
+    if the variable is iterated, printed, converted, returned, passed to
+    a function or aliased. Lookups, membership tests, updates and len()
+    don't depend on the order. Sets `order_observed` on the literals, so
+    that use_ordered_collections can keep plain Dict/Set for lookup
+    tables"""
+
+    COLLECTION_TYPES = (ast.Dict, ast.DictComp, ast.Set)
+
+    # Methods that don't depend on the order of the receiver
+    UNORDERED_METHODS = set([
+        "add",
+        "clear",
+        "discard",
+        "get",
+        "remove",
+        "setdefault",
+        "update",
+    ])
+
+    # Functions whose result doesn't depend on the order of their argument
+    UNORDERED_FUNCS = set([
+        "all",
+        "any",
+        "bool",
+        "frozenset",
+        "len",
+        "set",
+        "sorted",
+    ])
+
+    def __init__(self) -> None:
+        super().__init__()
+        self._parents = []
+        # variable definition -> collection literals assigned to it
+        self._collections = {}
+        # variable definition -> uses of the variable
+        self._uses = {}
+
+    def visit(self, node):
+        self._parents.append(node)
+        try:
+            return super().visit(node)
+        finally:
+            self._parents.pop()
+
+    def visit_Module(self, node: ast.Module) -> Any:
+        self._collections = {}
+        self._uses = {}
+        self.generic_visit(node)
+        for definition, literals in self._collections.items():
+            observed = any(
+                self._observes_order(*use) for use in self._uses.get(definition, [])
+            )
+            for literal in literals:
+                literal.order_observed = observed
+
+    def visit_Assign(self, node: ast.Assign) -> Any:
+        if len(node.targets) == 1:
+            self._add_collection(node.targets[0], node.value)
+        self.generic_visit(node)
+
+    def visit_AnnAssign(self, node: ast.AnnAssign) -> Any:
+        self._add_collection(node.target, node.value)
+        self.generic_visit(node)
+
+    def _add_collection(self, target, value):
+        if not isinstance(value, self.COLLECTION_TYPES):
+            return
+        # Core transformers run more than once
+        value.order_observed = True
+        if isinstance(target, ast.Name) and hasattr(target, "scopes"):
+            definition = target.scopes.find(get_id(target))
+            if definition is not None:
+                self._collections.setdefault(definition, []).append(value)
+
+    def visit_Name(self, node: ast.Name) -> Any:
+        if hasattr(node, "scopes") and \
+                not isinstance(getattr(node, "ctx", None), (ast.Store, ast.Del)):
+            definition = node.scopes.find(get_id(node))
+            if definition is not None:
+                parents = (self._parents[-2], self._parents[-3])
+                self._uses.setdefault(definition, []).append((node, *parents))
+
+    def _observes_order(self, node, parent, grandparent) -> bool:
+        if isinstance(parent, ast.Subscript):
+            return parent.value is not node
+        if isinstance(parent, ast.Compare):
+            # Membership tests
+            return not (
+                node in parent.comparators
+                and all(isinstance(op, (ast.In, ast.NotIn)) for op in parent.ops)
+            )
+        if isinstance(parent, ast.Attribute):
+            method = None
+            if isinstance(grandparent, ast.Call) and grandparent.func is parent:
+                method = grandparent
+            if parent.attr == "pop" and method is not None:
+                # dict.pop(key) is a lookup, set.pop() takes an arbitrary element
+                return not method.args
+            return parent.attr not in self.UNORDERED_METHODS or method is None
+        if isinstance(parent, ast.Call):
+            return not (
+                get_id(parent.func) in self.UNORDERED_FUNCS
+                and parent.args == [node]
+                and not parent.keywords
+            )
+        return True
+
+
+class JuliaDecoratorTransformer(NodeTransformer):
     """Parses decorators and adds them to functions 
     and class scopes"""
     def __init__(self):
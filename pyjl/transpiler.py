@@ -24,6 +24,7 @@ from .plugins import (
 
 from py2many.analysis import get_id, is_void_function
 from py2many.declaration_extractor import DeclarationExtractor
+from py2many.buffered_io import OUTPUT_BUFFER
 from py2many.clike import _AUTO_INVOKED
 from py2many.tracer import find_in_body, find_node_by_name_and_type, find_node_by_type, find_parent_of_type, get_class_scope, is_class_or_module, is_class_type
 
@@ -105,6 +106,8 @@ class JuliaTranspiler(CLikeTranspiler):
 
     def visit_Name(self, node: ast.Name) -> str:
         node_id = get_id(node)
+        if getattr(node, "string_builder", False):
+            return f"String(take!({node_id}))"
         if getattr(node, "is_annotation", False) or \
                 (not getattr(node, "lhs", False) and
                     hasattr(node, "scopes") and
@@ -388,6 +391,8 @@ class JuliaTranspiler(CLikeTranspiler):
         return vargs, kwargs
 
     def visit_For(self, node) -> str:
+        if self._starts_output_buffer(node):
+            return self._visit_buffered_loop(node)
         target = self.visit(node.target)
         it = self.visit(node.iter)
         buf = []
@@ -471,12 +476,26 @@ class JuliaTranspiler(CLikeTranspiler):
         return "\n".join(buf)
 
     def visit_While(self, node) -> str:
+        if self._starts_output_buffer(node):
+            return self._visit_buffered_loop(node)
         buf = []
         buf.append(f"while {self.visit(node.test)}")
         buf.extend([self.visit(n) for n in node.body])
         buf.append("end")
         return "\n".join(buf)
 
+    def _wrap_output_buffer(self, node, loop: str) -> str:
+        buf = [f"{OUTPUT_BUFFER} = IOBuffer()"]
+        flush = f"write(stdout, take!({OUTPUT_BUFFER}))"
+        if find_node_by_type(ast.FunctionDef, node.scopes):
+            # Covers returns from inside the loop
+            buf.extend(["try", loop, "finally", flush, "end"])
+        else:
+            # try introduces a new scope, which would make the
+            # assignments to globals in the loop local
+            buf.extend([loop, flush])
+        return "\n".join(buf)
+
     def visit_BinOp(self, node: ast.BinOp) -> str:
         # Attempts to find node annotations
         left_jl_ann: str = self._typename_from_type_node(
@@ -1065,6 +1084,10 @@ class JuliaTranspiler(CLikeTranspiler):
                 not self._allow_annotations_on_globals:
             type_str = None
 
+        # Optimization to use global constants
+        if val and getattr(node, "use_constant", None):
+            return f"const {target} = {val}"
+
         if val:
             if not type_str or type_str == self._default_type:
                 return f"{target} = {val}"
@@ -1079,6 +1102,9 @@ class JuliaTranspiler(CLikeTranspiler):
         op = self.visit(node.op)
         val = self.visit(node.value)
 
+        if getattr(node, "string_builder", False):
+            return f"print({target}, {val})"
+
         # Use special methods if it is a class instance
         if class_node := get_class_scope(target, node.scopes):
             op_type = type(node.op)
@@ -1098,6 +1124,11 @@ class JuliaTranspiler(CLikeTranspiler):
             return val
 
         value = self.visit(node.value)
+        if getattr(node, "string_builder", False):
+            target = self.visit(node.targets[0])
+            if isinstance(node.value, ast.Constant) and not node.value.value:
+                return f"{target} = IOBuffer()"
+            return f"{target} = IOBuffer()\nprint({target}, {value})"
         if len(node.targets) == 1:
             if (target := self.visit(node.targets[0])) in JULIA_SPECIAL_ASSIGNMENT_DISPATCH_TABLE:
                 return JULIA_SPECIAL_ASSIGNMENT_DISPATCH_TABLE[target](self, node, value)
@@ -7,6 +7,7 @@ from py2many.inference import get_inferred_type, InferTypesTransformer
 from py2many.clike import class_for_typename
 from py2many.exceptions import AstUnrecognisedBinOp
 from py2many.analysis import get_id
+from py2many.capacity import get_repeated_list
 
 KT_TYPE_MAP = {
     bool: "Boolean",
@@ -120,6 +121,12 @@ class InferKotlinTypesTransformer(InferTypesTransformer):
         left = lvar.annotation if lvar and hasattr(lvar, "annotation") else None
         right = rvar.annotation if rvar and hasattr(rvar, "annotation") else None
 
+        repeated = get_repeated_list(node)
+        if repeated is not None and hasattr(repeated, "annotation"):
+            # [x] * n
+            node.annotation = repeated.annotation
+            return node
+
         if left is None and right is not None:
             node.kotlin_annotation = get_inferred_kotlin_type(right)
             return node
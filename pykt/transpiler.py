@@ -3,7 +3,7 @@ import ast
 from typing import List, Tuple
 
 from .clike import CLikeTranspiler
-from .inference import get_inferred_kotlin_type
+from .inference import get_inferred_kotlin_type, map_type
 from .plugins import (
     ATTR_DISPATCH_TABLE,
     CLASS_DISPATCH_TABLE,
@@ -16,12 +16,15 @@ from .plugins import (
 
 from py2many.analysis import get_id, is_mutable, is_void_function
 from py2many.ast_helpers import create_ast_block
+from py2many.capacity import get_fixed_length_element_type, get_repeated_list
 from py2many.clike import class_for_typename
+from py2many.code_writer import CodeWriter
 from py2many.declaration_extractor import DeclarationExtractor
 from py2many.tracer import is_list, defined_before, is_class_or_module, is_self_arg
+from py2many.visitor import NodeTransformer
 
 
-class KotlinPrintRewriter(ast.NodeTransformer):
+class KotlinPrintRewriter(NodeTransformer):
     def __init__(self):
         super().__init__()
         self._temp = 0
@@ -56,7 +59,7 @@ class KotlinPrintRewriter(ast.NodeTransformer):
         return node
 
 
-class KotlinBitOpRewriter(ast.NodeTransformer):
+class KotlinBitOpRewriter(NodeTransformer):
     BITOPS_DICT = {ast.BitAnd: "and", ast.BitOr: "or", ast.BitXor: "xor"}
     BITOPS = tuple(BITOPS_DICT.keys())
 
@@ -79,6 +82,17 @@ class KotlinBitOpRewriter(ast.NodeTransformer):
         return node
 
 
+# Unboxed arrays of the kotlin primitive types
+PRIMITIVE_ARRAY_TYPES = {
+    "Boolean": "BooleanArray",
+    "Byte": "ByteArray",
+    "Short": "ShortArray",
+    "Int": "IntArray",
+    "Long": "LongArray",
+    "Double": "DoubleArray",
+}
+
+
 class KotlinTranspiler(CLikeTranspiler):
     NAME = "kotlin"
 
@@ -108,8 +122,9 @@ class KotlinTranspiler(CLikeTranspiler):
     def globals(self):
         return "\n".join(self._globals)
 
-    def visit_FunctionDef(self, node) -> str:
-        body = "\n".join([self.visit(n) for n in node.body])
+    def emit_FunctionDef(self, node, writer: CodeWriter):
+        body = CodeWriter()
+        self.emit_body(node.body, body)
         typenames, args = self.visit_arguments(node.args)
 
         args_list = []
@@ -150,7 +165,9 @@ class KotlinTranspiler(CLikeTranspiler):
 
         args = ", ".join(args_list)
         funcdef = f"fun {node.name}{template}({args}){return_type} {{"
-        return funcdef + "\n" + body + "}\n\n"
+        writer.write(funcdef)
+        writer.write(body)
+        writer.append("}\n\n")
 
     def visit_Return(self, node) -> str:
         if node.value:
@@ -233,14 +250,12 @@ class KotlinTranspiler(CLikeTranspiler):
 
         return f"{fname}({args})"
 
-    def visit_For(self, node) -> str:
+    def emit_For(self, node, writer: CodeWriter):
         target = self.visit(node.target)
         it = self.visit(node.iter)
-        buf = []
-        buf.append("for ({0} in {1}) {{".format(target, it))
-        buf.extend([self.visit(c) for c in node.body])
-        buf.append("}")
-        return "\n".join(buf)
+        writer.write("for ({0} in {1}) {{".format(target, it))
+        self.emit_body(node.body, writer)
+        writer.write("}")
 
     def visit_Str(self, node) -> str:
         return "" + super().visit_Str(node) + ""
@@ -252,6 +267,8 @@ class KotlinTranspiler(CLikeTranspiler):
     def visit_Name(self, node) -> str:
         if node.id == "None":
             return "None"
+        elif getattr(node, "string_builder", False):
+            return f"{node.id}.toString()"
         else:
             return super().visit_Name(node)
 
@@ -268,11 +285,11 @@ class KotlinTranspiler(CLikeTranspiler):
         buf.append("}")
         return "\n".join(buf)
 
-    def visit_If(self, node) -> str:
+    def emit_If(self, node, writer: CodeWriter, use_parens=True):
         body_vars = set([get_id(v) for v in node.scopes[-1].body_vars])
         orelse_vars = set([get_id(v) for v in node.scopes[-1].orelse_vars])
         node.common_vars = body_vars.intersection(orelse_vars)
-        return super().visit_If(node)
+        super().emit_If(node, writer, use_parens)
 
     def visit_UnaryOp(self, node) -> str:
         if isinstance(node.op, ast.USub):
@@ -285,6 +302,16 @@ class KotlinTranspiler(CLikeTranspiler):
             return super().visit_UnaryOp(node)
 
     def visit_BinOp(self, node) -> str:
+        array_type = self._primitive_array_type(node)
+        if array_type is not None:
+            lst = get_repeated_list(node)
+            count = node.right if lst is node.left else node.left
+            num = self.visit(count)
+            elt = lst.elts[0]
+            if isinstance(elt, ast.Constant) and not elt.value:
+                # Already zero initialized
+                return f"{array_type}({num})"
+            return f"{array_type}({num}) {{ {self.visit(elt)} }}"
         if (
             isinstance(node.left, ast.List)
             and isinstance(node.op, ast.Mult)
@@ -296,6 +323,12 @@ class KotlinTranspiler(CLikeTranspiler):
         else:
             return super().visit_BinOp(node)
 
+    def _primitive_array_type(self, node):
+        elt_type = get_fixed_length_element_type(node)
+        if elt_type is None:
+            return None
+        return PRIMITIVE_ARRAY_TYPES.get(map_type(elt_type))
+
     def visit_ClassDef(self, node) -> str:
         extractor = DeclarationExtractor(KotlinTranspiler())
         extractor.visit(node)
@@ -391,7 +424,14 @@ class KotlinTranspiler(CLikeTranspiler):
     def visit_List(self, node) -> str:
         elements = [self.visit(e) for e in node.elts]
         elements_str = ", ".join(elements)
-        return f"arrayOf({elements_str})"
+        return f"{self._array_of(node)}({elements_str})"
+
+    def _array_of(self, node) -> str:
+        array_type = self._primitive_array_type(node)
+        if array_type is not None:
+            # IntArray -> intArrayOf
+            return f"{array_type[0].lower()}{array_type[1:]}Of"
+        return "arrayOf"
 
     def visit_Set(self, node) -> str:
         elements = [self.visit(e) for e in node.elts]
@@ -470,11 +510,25 @@ class KotlinTranspiler(CLikeTranspiler):
         target = self.visit(node.target)
         type_str = self._typename_from_annotation(node)
         val = self.visit(node.value) if node.value is not None else None
+        if node.value is not None:
+            type_str = self._primitive_array_type(node.value) or type_str
         if type_str == self._default_type:
             return f"var {target} = {val}"
         return f"var {target}: {type_str} = {val}"
 
+    def visit_AugAssign(self, node) -> str:
+        if getattr(node, "string_builder", False):
+            target = self.visit(node.target)
+            return f"{target}.append({self.visit(node.value)})"
+        return super().visit_AugAssign(node)
+
     def _visit_AssignOne(self, node, target) -> str:
+        if getattr(node, "string_builder", False):
+            target = self.visit(target)
+            if isinstance(node.value, ast.Constant) and not node.value.value:
+                return f"val {target} = StringBuilder()"
+            return f"val {target} = StringBuilder({self.visit(node.value)})"
+
         kw = "var" if is_mutable(node.scopes, get_id(target)) else "val"
 
         if isinstance(target, ast.Tuple):
@@ -509,7 +563,7 @@ class KotlinTranspiler(CLikeTranspiler):
             elements = ", ".join(elements)
             target = self.visit(target)
 
-            return f"{kw} {target} = arrayOf({elements})"
+            return f"{kw} {target} = {self._array_of(node.value)}({elements})"
         else:
             target = self.visit(target)
             value = self.visit(node.value)
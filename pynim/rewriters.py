@@ -1,7 +1,8 @@
 import ast
 from py2many.ast_helpers import create_ast_block
+from py2many.visitor import NodeTransformer
 
-class WithToBlockRewriter(ast.NodeTransformer):
+class WithToBlockRewriter(NodeTransformer):
     def __init__(self):
         super().__init__()
         self._temp = 0
@@ -20,9 +20,10 @@ from py2many.exceptions import AstClassUsedBeforeDeclaration
 from py2many.tracer import is_list, defined_before
 
 from typing import List
+from py2many.visitor import NodeTransformer
 
 
-class NimNoneCompareRewriter(ast.NodeTransformer):
+class NimNoneCompareRewriter(NodeTransformer):
     def visit_Compare(self, node):
         left = self.visit(node.left)
         right = self.visit(node.comparators[0])
@@ -1,5 +1,6 @@
 import ast
 
+from py2many.ast_helpers import get_id
 from py2many.clike import CLikeTranspiler as CommonCLikeTranspiler, LifeTime
 
 from .inference import (
@@ -47,6 +48,11 @@ class CLikeTranspiler(CommonCLikeTranspiler):
             return f"&'static {ret[1:]}"
         return ret
 
+    def _typename_from_type_node(self, node, parse_func=None, default=None):
+        if isinstance(node, ast.Name):
+            return self._map_type(get_id(node))
+        return super()._typename_from_type_node(node, parse_func, default)
+
     def visit_Name(self, node) -> str:
         if node.id in self._keywords:
             return node.id + "_"
@@ -168,6 +168,30 @@ class InferRustTypesTransformer(InferTypesTransformer):
 
         return node
 
+    def visit_For(self, node):
+        self.visit(node.iter)
+        if get_id(getattr(node.iter, "annotation", None)) == "bytes" and isinstance(
+            node.target, ast.Name
+        ):
+            # Iterating a &[u8] yields u8 values
+            node.target.annotation = ast.Name(id="c_uint8")
+        return super().visit_For(node)
+
+    def visit_AugAssign(self, node):
+        target = node.target
+        if isinstance(target, ast.Name) and not hasattr(target, "annotation"):
+            # Inside a loop the innermost scope finds the target itself,
+            # and it would take the type of the value
+            scopes = target.scopes
+            definition = target
+            while definition is target and len(scopes) > 1:
+                scopes = scopes.parent_scopes
+                definition = scopes.find(get_id(target))
+            annotation = getattr(definition, "annotation", None)
+            if definition is not target and annotation is not None:
+                target.annotation = annotation
+        return super().visit_AugAssign(node)
+
     def visit_FunctionDef(self, node):
         node.no_return = True
         node.rust_pyresult_type = self._extension
@@ -202,7 +226,7 @@ def infer_rust_types(node, extension=False):
 def extension_map_type(typename, return_type=False):
     if typename == "_":
         return "&PyAny"
-    if typename == None and return_type:
+    if typename in (None, "None") and return_type:
         return "PyResult<()>"
 
     typeclass = class_for_typename(typename, "&PyAny")
@@ -223,6 +247,42 @@ def extension_map_type(typename, return_type=False):
         return typename
 
 
+# Element types of list arguments that pyo3 can extract into a Vec
+RUST_EXTENSION_VEC_ELEMENT_TYPES = {
+    bool,
+    int,
+    float,
+    c_int8,
+    c_int16,
+    c_int32,
+    c_int64,
+    c_uint8,
+    c_uint16,
+    c_uint32,
+    c_uint64,
+}
+
+
+def extension_native_type(annotation):
+    """Rust type of an extension argument that pyo3 converts once at the
+    call boundary, so that the function body doesn't go through the
+    Python C API. bytes borrows the object's buffer without copying,
+    lists of primitives are extracted into a Vec."""
+    if get_id(annotation) == "bytes":
+        return RUST_TYPE_MAP[bytes]
+    if not isinstance(annotation, ast.Subscript):
+        return None
+    if get_id(annotation.value) not in ("List", "list"):
+        return None
+    elt = annotation.slice
+    if isinstance(elt, ast.Index):
+        elt = elt.value
+    typeclass = class_for_typename(get_id(elt), None)
+    if typeclass not in RUST_EXTENSION_VEC_ELEMENT_TYPES:
+        return None
+    return f"Vec<{RUST_TYPE_MAP[typeclass]}>"
+
+
 def map_type(typename, extension=False, return_type=False):
     if extension:
         return extension_map_type(typename, return_type)
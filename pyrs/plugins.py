@@ -127,6 +127,10 @@ class RustTranspilerPlugins:
         placeholders = []
         for n in node.args:
             placeholders.append("{}")
+        if self._buffers_output(node):
+            args = "".join(f", {arg}" for arg in vargs)
+            placeholders_str = " ".join(placeholders)
+            return f'writeln!({self._output_buffer}, "{placeholders_str}"{args}).unwrap();'
         return 'println!("{0}",{1});'.format(" ".join(placeholders), ", ".join(vargs))
 
     def visit_exit(self, node, vargs) -> str:
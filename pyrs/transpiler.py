@@ -3,7 +3,7 @@ from py2many.rewriters import camel_case
 import textwrap
 
 from .clike import CLikeTranspiler
-from .inference import get_inferred_rust_type, map_type
+from .inference import extension_native_type, get_inferred_rust_type, map_type
 from .plugins import (
     ATTR_DISPATCH_TABLE,
     CLASS_DISPATCH_TABLE,
@@ -22,7 +22,9 @@ from py2many.analysis import (
     is_mutable,
     is_void_function,
 )
+from py2many.buffered_io import OUTPUT_BUFFER
 from py2many.clike import class_for_typename
+from py2many.code_writer import CodeWriter
 from py2many.declaration_extractor import DeclarationExtractor
 from py2many.exceptions import AstClassUsedBeforeDeclaration
 from py2many.inference import is_reference
@@ -30,18 +32,22 @@ from py2many.tracer import is_list, defined_before, is_class_or_module
 
 from pathlib import Path
 from typing import List, Tuple, Union
+from py2many.visitor import NodeTransformer
 
 
-class RustLoopIndexRewriter(ast.NodeTransformer):
+class RustLoopIndexRewriter(NodeTransformer):
     def visit_For(self, node):
         if hasattr(node.iter, "id"):
             definition = node.scopes.find(node.iter.id)
             if is_reference(definition):
                 node.target.needs_dereference = True
+            elif get_id(getattr(definition, "annotation", None)) == "bytes":
+                # Iterating a &[u8] yields &u8
+                node.target.needs_dereference = True
         return node
 
 
-class RustNoneCompareRewriter(ast.NodeTransformer):
+class RustNoneCompareRewriter(NodeTransformer):
     def visit_Compare(self, node):
         right = self.visit(node.comparators[0])
         if isinstance(right, ast.Constant) and right.value is None:
@@ -54,7 +60,7 @@ class RustNoneCompareRewriter(ast.NodeTransformer):
         return node
 
 
-class RustStringJoinRewriter(ast.NodeTransformer):
+class RustStringJoinRewriter(NodeTransformer):
     def visit_Call(self, node):
         self.generic_visit(node)
         if isinstance(node.func, ast.Attribute) and node.func.attr == "join":
@@ -200,8 +206,9 @@ class RustTranspiler(CLikeTranspiler):
             self._allows.add("clippy::no_effect")
         return super().visit_Expr(node)
 
-    def visit_FunctionDef(self, node, async_prefix="") -> str:
-        body = "\n".join([self.visit(n) for n in node.body])
+    def emit_FunctionDef(self, node, writer: CodeWriter, async_prefix=""):
+        body = CodeWriter()
+        self.emit_body(node.body, body)
         typenames, args = self.visit(node.args)
 
         args_list = []
@@ -248,13 +255,45 @@ class RustTranspiler(CLikeTranspiler):
         if len(typedecls) > 0:
             template = "<{0}>".format(", ".join(typedecls))
 
+        releases_gil = self._releases_gil(node, typenames)
+        if releases_gil:
+            # Nothing in the body needs the interpreter
+            args_list.insert(0, "py: Python")
+
         extension = "#[pyfunction]\n" if self.extension else ""
         args_list = ", ".join(args_list)
         funcdef = f"{extension}pub {async_prefix}fn {node.name}{template}({args_list}) {return_type}"
         return_success = (
             "Ok(())" if is_python_main else ""
         )  # TODO: generalize this to functions that return Result<T, E>
-        return f"{funcdef} {{\n{body}\n {return_success}}}\n"
+        writer.write(f"{funcdef} {{")
+        if releases_gil:
+            writer.write("py.allow_threads(move || {")
+            writer.write(body)
+            writer.write("})")
+        else:
+            writer.write(body)
+        writer.write(f" {return_success}}}\n")
+
+    def _releases_gil(self, node, typenames) -> bool:
+        """Exported functions whose arguments were all converted to Rust
+        values can run without holding the GIL. Functions that are also
+        called from Rust code keep their signature."""
+        if not self._extension or getattr(node, "python_main", False):
+            return False
+        if node.name.startswith("_") or not isinstance(node.scopes[-2], ast.Module):
+            return False
+        if any(t is None or "Py" in t or t in ("_", "T") for t in typenames):
+            return False
+        return node.name not in self._called_functions(node.scopes[0])
+
+    def _called_functions(self, module):
+        if getattr(self, "_called_functions_module", None) is not module:
+            self._called_functions_module = module
+            self._called_function_names = {
+                get_id(n.func) for n in ast.walk(module) if isinstance(n, ast.Call)
+            }
+        return self._called_function_names
 
     def visit_arg(self, node):
         id = get_id(node)
@@ -262,12 +301,15 @@ class RustTranspiler(CLikeTranspiler):
             return (None, "self")
         typename = "T"
         if node.annotation:
+            mut = "mut " if is_mutable(node.scopes, id) else ""
             if not self._extension:
                 typename = self._typename_from_annotation(node)
             else:
+                native_type = extension_native_type(node.annotation)
+                if native_type and not mut:
+                    return (native_type, id)
                 typename = self._generic_typename_from_annotation(node)
                 typename = map_type(typename, extension=True)
-            mut = "mut " if is_mutable(node.scopes, id) else ""
             # TODO: Should we make this if not primitive instead of checking
             # for container types? That way we cover user defined structs too.
             if hasattr(node, "container_type"):
@@ -284,12 +326,6 @@ class RustTranspiler(CLikeTranspiler):
         if node.value:
             ret = self.visit(node.value)
             if fndef:
-                if getattr(fndef, "rust_pyresult_type", False):
-                    # TODO: Design a more robust solution for this
-                    # For now, PyResult and references don't mix
-                    if ret.startswith("&"):
-                        ret = ret[1:]
-                    ret = f"Ok({ret})"
                 return_type = self._typename_from_annotation(fndef, attr="returns")
                 value_type = get_inferred_rust_type(node.value)
                 if is_reference(node.value) and not getattr(
@@ -298,13 +334,31 @@ class RustTranspiler(CLikeTranspiler):
                     # TODO: Handle other container types
                     ret = f"{ret}.to_vec()"
                 if return_type != value_type and value_type is not None:
-                    return f"return {ret} as {return_type};"
+                    ret = f"{ret} as {return_type}"
+                if self._returns_pyresult(fndef):
+                    # TODO: Design a more robust solution for this
+                    # For now, PyResult and references don't mix
+                    if ret.startswith("&"):
+                        ret = ret[1:]
+                    ret = f"Ok({ret})"
             return f"return {ret};"
         if fndef:
             if getattr(fndef, "rust_pyresult_type", False):
                 return "return Ok(())"
         return "return;"
 
+    def _returns_pyresult(self, fndef) -> bool:
+        """Whether the extension function returns a PyResult, rather than a
+        primitive that pyo3 converts directly"""
+        if not getattr(fndef, "rust_pyresult_type", False):
+            return False
+        if fndef.returns is None:
+            return True
+        typename = self._generic_typename_from_type_node(fndef.returns)
+        return map_type(typename, extension=True, return_type=True).startswith(
+            "PyResult"
+        )
+
     def visit_Lambda(self, node) -> str:
         _, args = self.visit(node.args)
         args_string = ", ".join(args)
@@ -406,14 +460,15 @@ class RustTranspiler(CLikeTranspiler):
         unwrap = "?" if node_result_type or node_func_result_type else ""
         return f"{fname}({args}){unwrap}"
 
-    def visit_For(self, node) -> str:
+    def emit_For(self, node, writer: CodeWriter):
+        if self._starts_output_buffer(node):
+            writer.write(self._visit_buffered_loop(node))
+            return
         target = self.visit(node.target)
         it = self.visit(node.iter)
-        buf = []
-        buf.append("for {0} in {1} {{".format(target, it))
-        buf.extend([self.visit(c) for c in node.body])
-        buf.append("}")
-        return "\n".join(buf)
+        writer.write("for {0} in {1} {{".format(target, it))
+        self.emit_body(node.body, writer)
+        writer.write("}")
 
     def visit_Str(self, node) -> str:
         return "" + super().visit_Str(node) + ""
@@ -450,7 +505,9 @@ class RustTranspiler(CLikeTranspiler):
             return "None"
         else:
             ret = super().visit_Name(node)
-            definition = node.scopes.find(node.id)
+            # Names in inferred annotations are not in any scope
+            scopes = getattr(node, "scopes", None)
+            definition = scopes.find(node.id) if scopes else None
             if (
                 definition
                 and definition != node
@@ -469,18 +526,16 @@ class RustTranspiler(CLikeTranspiler):
         else:
             return super().visit_NameConstant(node)
 
-    def visit_If(self, node) -> str:
+    def emit_If(self, node, writer: CodeWriter, use_parens=False):
         body_vars = set([get_id(v) for v in node.scopes[-1].body_vars])
         orelse_vars = set([get_id(v) for v in node.scopes[-1].orelse_vars])
         node.common_vars = body_vars.intersection(orelse_vars)
 
         # TODO find out if this can be useful
-        var_definitions = []
         # for cv in node.common_vars:
         #     definition = node.scopes.find(cv)
         #     var_type = decltype(definition)
-        #     var_definitions.append("{0} {1};\n".format(var_type, cv))
-        ret = "".join(var_definitions) + super().visit_If(node, use_parens=False)
+        #     writer.write("{0} {1};".format(var_type, cv))
         # Sometimes if True: ... gets compiled into an expression, needing a semicolon
         make_block = (
             isinstance(node.test, ast.Constant)
@@ -488,15 +543,36 @@ class RustTranspiler(CLikeTranspiler):
             and node.orelse == []
         )
         if make_block:
-            return f"{ret};"
-        return ret
+            # Not through visit_If, which would dispatch back here
+            block = CodeWriter()
+            super().emit_If(node, block, use_parens=False)
+            writer.write(block)
+            writer.append(";")
+        else:
+            super().emit_If(node, writer, use_parens=False)
 
-    def visit_While(self, node) -> str:
+    def emit_While(self, node, writer: CodeWriter):
+        if self._starts_output_buffer(node):
+            writer.write(self._visit_buffered_loop(node))
+            return
         test = self.visit(node.test)
         if test == "true":
-            body = [self.visit(n) for n in node.body]
-            return "loop {{\n{}\n}}\n".format("\n".join(body))
-        return super().visit_While(node, use_parens=False)
+            writer.write("loop {")
+            self.emit_body(node.body, writer)
+            writer.write("}\n")
+            return
+        super().emit_While(node, writer, use_parens=False)
+
+    def _wrap_output_buffer(self, node, loop: str) -> str:
+        # The writer is flushed when it is dropped at the end of the block
+        self._usings.add("std::io::Write")
+        buf = [
+            "{",
+            f"let mut {OUTPUT_BUFFER} = std::io::BufWriter::new(std::io::stdout().lock());",
+            loop,
+            "}",
+        ]
+        return "\n".join(buf)
 
     def visit_UnaryOp(self, node) -> str:
         if isinstance(node.op, ast.USub):
@@ -704,13 +780,13 @@ class RustTranspiler(CLikeTranspiler):
             value_type = getattr(node.value.annotation, "generic_container_type", None)
             is_list = value_type is not None and value_type[0] == "List"
             if is_list:
-                index_typename = get_inferred_rust_type(self._slice_value(node))
+                index_typename = get_inferred_rust_type(_index_node(node))
                 if index_typename != "u64" or index_typename != "usize":
                     index = self._cast(index, "usize")
             is_dict = value_type is not None and value_type[0] == "Dict"
             if is_dict:
                 value_type = getattr(node.value.annotation, "container_type", None)
-                index_typename = get_inferred_rust_type(self._slice_value(node))
+                index_typename = get_inferred_rust_type(_index_node(node))
                 if index_typename == value_type[1][0]:
                     index = "&" + index
         return "{0}[{1}]".format(value, index)
@@ -799,15 +875,34 @@ class RustTranspiler(CLikeTranspiler):
         op = self.visit(node.op)
         value = self.visit(node.value)
 
+        if getattr(node, "string_builder", False):
+            return f"{target_str}.push_str({self._str_ref(node.value, value)});"
+
         needs_cast = self._needs_cast(target, node.value)
         if needs_cast:
             target_type = self._typename_from_annotation(target)
             value = self._assign_cast(
-                value, target_type, target.annotation, node.value.rust_annotation
+                value,
+                target_type,
+                target.annotation,
+                get_inferred_rust_type(node.value),
             )
         return f"{target_str} {op}= {value};"
 
+    @staticmethod
+    def _str_ref(node, value: str) -> str:
+        if isinstance(node, ast.Constant) or value.startswith("&"):
+            return value
+        return f"&{value}"
+
     def _visit_AssignOne(self, node, target) -> str:
+        if getattr(node, "string_builder", False):
+            target = self.visit(target)
+            if isinstance(node.value, ast.Constant) and not node.value.value:
+                return f"let mut {target} = String::new();"
+            value = self._str_ref(node.value, self.visit(node.value))
+            return f"let mut {target} = String::new();\n{target}.push_str({value});"
+
         kw = self._compute_kw(node, target)
 
         if isinstance(node.scopes[-1], ast.If):
@@ -909,8 +1004,8 @@ class RustTranspiler(CLikeTranspiler):
         value = self.visit(node.value)
         return f"{value}.await"
 
-    def visit_AsyncFunctionDef(self, node) -> str:
-        return self.visit_FunctionDef(node, async_prefix="async ")
+    def emit_AsyncFunctionDef(self, node, writer: CodeWriter):
+        self.emit_FunctionDef(node, writer, async_prefix="async ")
 
     def visit_Yield(self, node) -> str:
         self._features.add("generators")
@@ -981,3 +1076,10 @@ class RustTranspiler(CLikeTranspiler):
         orelse = self.visit(node.orelse)
         test = self.visit(node.test)
         return f"if {test} {{ {body} }} else {{ {orelse} }}"
+
+
+def _index_node(node: ast.Subscript):
+    # 3.8 wraps the index in ast.Index
+    if isinstance(node.slice, ast.Index):
+        return node.slice.value
+    return node.slice
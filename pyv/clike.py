@@ -120,10 +120,13 @@ class CLikeTranspiler(CommonCLikeTranspiler):
         left_rank: int = V_WIDTH_RANK.get(left_type, -1)
         right_rank: int = V_WIDTH_RANK.get(right_type, -1)
 
-        if left_rank > right_rank:
-            right = f"{left_type}({right})"
-        elif right_rank > left_rank:
-            left = f"{right_type}({left})"
+        # V infers the type of an operand that has no annotation, such as
+        # a literal, from the other one
+        if min(left_rank, right_rank) >= 0:
+            if left_rank > right_rank:
+                right = f"{left_type}({right})"
+            elif right_rank > left_rank:
+                left = f"{right_type}({left})"
         if "bool" in (left_type, right_type):
             op = {"&": "&&", "|": "||", "^": "!="}.get(op, op)
         return f"({left} {op} {right})"
@@ -7,6 +7,7 @@ from py2many.analysis import get_id
 from py2many.clike import class_for_typename
 from py2many.exceptions import AstUnrecognisedBinOp
 from py2many.inference import get_inferred_type, InferTypesTransformer
+from py2many.visitor import NodeTransformer
 
 
 V_TYPE_MAP: Dict[type, str] = {
@@ -69,7 +70,7 @@ def get_inferred_v_type(node: ast.AST) -> str:
 
 
 # Copy pasta from rust. Double check for correctness
-class InferVTypesTransformer(ast.NodeTransformer):
+class InferVTypesTransformer(NodeTransformer):
     """Implements v type inference logic as opposed to python type inference logic"""
 
     FIXED_WIDTH_INTS = InferTypesTransformer.FIXED_WIDTH_INTS
@@ -19,6 +19,7 @@ from .plugins import (
     SMALL_DISPATCH_MAP,
     SMALL_USINGS_MAP,
 )
+from py2many.visitor import NodeTransformer
 
 _is_mutable = is_mutable
 
@@ -58,7 +59,7 @@ def is_dict(node: ast.AST) -> bool:
         return False
 
 
-class VDictRewriter(ast.NodeTransformer):
+class VDictRewriter(NodeTransformer):
     def visit_Call(self, node: ast.Call) -> ast.Call:
         if (
             isinstance(node.func, ast.Attribute) and node.func.attr == "values"
@@ -70,7 +71,7 @@ class VDictRewriter(ast.NodeTransformer):
         return node
 
 
-class VComprehensionRewriter(ast.NodeTransformer):
+class VComprehensionRewriter(NodeTransformer):
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
         self.redirects: Dict[str, str] = {}
@@ -120,7 +121,7 @@ class VComprehensionRewriter(ast.NodeTransformer):
         return self.visit_GeneratorExp(node)
 
 
-class VNoneCompareRewriter(ast.NodeTransformer):
+class VNoneCompareRewriter(NodeTransformer):
     def visit_Compare(self, node: ast.Compare):
         left: ast.AST = self.visit(node.left)
         right: ast.AST = self.visit(node.comparators[0])
@@ -0,0 +1,165 @@
+#!/usr/bin/env python3
+"""Measure the analysis attributes the passes attach to ast nodes.
+
+    python scripts/measure_node_attributes.py [--lang python] [srcdir]
+
+Transpiles every module under srcdir (py2many/ by default) and, after each
+module is emitted, reports how much of the nodes' instance dicts the
+analysis attributes take, and what a slotted record per node or a side
+table keyed by node would cost instead. Peak memory of the whole run and
+the time to look an attribute up in either layout are reported as well.
+"""
+
+import argparse
+import ast
+import collections
+import contextlib
+import io
+import sys
+import time
+import timeit
+import tracemalloc
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import py2many.cli as cli  # noqa: E402
+
+# Attributes the analysis passes set on nodes
+ANALYSIS_ATTRS = [
+    "scopes",
+    "annotation",
+    "vars",
+    "body_vars",
+    "mutable_vars",
+    "lhs",
+    "is_annotation",
+    "range_optimization",
+    "broadcast",
+    "assigned_from",
+    "calls",
+    "parsed_decorators",
+]
+
+
+class _Record:
+    __slots__ = ANALYSIS_ATTRS
+
+
+class _Stats:
+    def __init__(self):
+        self.nodes = 0
+        self.dict_bytes = 0
+        self.attr_bytes = 0
+        self.record_bytes = 0
+        self.table_saving = 0
+        self.table_entries = 0
+        self.counts = collections.Counter()
+        self.annotations = collections.Counter()
+        self.lookup = [0.0, 0.0]
+
+    def add(self, tree):
+        record = sys.getsizeof(_Record())
+        table = {}
+        nodes = list(ast.walk(tree))
+        for node in nodes:
+            d = node.__dict__
+            size = sys.getsizeof(d)
+            listed = [k for k in ANALYSIS_ATTRS if k in d]
+            rest = {k: v for k, v in d.items() if k not in ANALYSIS_ATTRS}
+            self.nodes += 1
+            self.dict_bytes += size
+            self.attr_bytes += size - sys.getsizeof(rest)
+            self.record_bytes += record if listed else 0
+            self.counts.update(listed)
+            # A side table for everything but scopes, which every node has
+            moved = {k: v for k, v in d.items() if k in listed and k != "scopes"}
+            if moved:
+                kept = {k: v for k, v in d.items() if k not in moved}
+                self.table_saving += size - sys.getsizeof(kept)
+                self.table_entries += len(moved)
+                table[id(node)] = moved
+            if d.get("annotation") is not None:
+                self.annotations[ast.dump(d["annotation"])] += 1
+        self.lookup[0] += timeit.timeit(
+            lambda: [getattr(n, "annotation", None) for n in nodes], number=10
+        )
+        self.lookup[1] += timeit.timeit(
+            lambda: [table.get(id(n), {}).get("annotation") for n in nodes], number=10
+        )
+
+    def report(self):
+        mb = 1e6
+        print(f"nodes: {self.nodes}")
+        print(f"instance dicts: {self.dict_bytes / mb:.1f}MB")
+        print(f"  of which analysis attributes: {self.attr_bytes / mb:.1f}MB")
+        print(f"slotted record per node: {self.record_bytes / mb:.1f}MB")
+        print(
+            f"side table without scopes: frees {self.table_saving / mb:.2f}MB"
+            f" for {self.table_entries} entries"
+        )
+        distinct = len(self.annotations)
+        print(f"annotations: {sum(self.annotations.values())}, {distinct} distinct")
+        print(f"attribute counts: {dict(self.counts.most_common())}")
+        print(
+            f"annotation lookup x10: attribute {self.lookup[0]:.3f}s,"
+            f" side table {self.lookup[1]:.3f}s"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("srcdir", nargs="?", default=Path(cli.__file__).parent)
+    parser.add_argument("--lang", default="python")
+    args = parser.parse_args()
+
+    src = Path(args.srcdir)
+    files = sorted(p.relative_to(src) for p in src.rglob("*.py"))
+    sources = [(src / f).read_text() for f in files]
+    settings_args = argparse.Namespace(
+        pytype=False,
+        typpete=False,
+        import_basedir=None,
+        config=None,
+        extension=False,
+        no_prologue=False,
+        indent=4,
+        expected=None,
+    )
+    settings = getattr(cli, f"{args.lang}_settings")(settings_args)
+    settings.formatter = None
+
+    stats = _Stats()
+    emit_one = cli._emit_one
+    # Peak memory and time of the transpiler alone, without the measuring
+    peak = 0
+    excluded = 0.0
+
+    def measured_emit_one(trees, tree, *rest):
+        nonlocal peak, excluded
+        ret = emit_one(trees, tree, *rest)
+        peak = max(peak, tracemalloc.get_traced_memory()[1])
+        start = time.perf_counter()
+        stats.add(tree)
+        excluded += time.perf_counter() - start
+        tracemalloc.reset_peak()
+        return ret
+
+    cli._emit_one = measured_emit_one
+    tracemalloc.start()
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        _, successful = cli._transpile(
+            files, sources, settings, settings_args, basedir=src
+        )
+    elapsed = time.perf_counter() - start - excluded
+    peak = max(peak, tracemalloc.get_traced_memory()[1])
+    tracemalloc.stop()
+
+    print(f"transpiled {len(successful)}/{len(files)} modules to {args.lang}")
+    stats.report()
+    print(f"peak memory: {peak / 1e6:.1f}MB, time: {elapsed:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,441 @@
+"""Parallel runner for tests/cases against every language in LANGS.
+
+It performs the same checks as CodeGeneratorTests.test_generated, but:
+  * each worker process parses the arguments and performs the expensive
+    settings lookups (julia_settings spawns julia) once per language
+  * cases are transpiled, compiled and run in a process pool
+  * compiled binaries are cached in build/cache, keyed by the hash of
+    the code that was compiled, so unchanged cases are not rebuilt
+  * per language and per case timings are reported to spot slow backends
+
+Usage:
+    python corpus_runner.py [--lang cpp] [--case fib] [--jobs 8] [--no-compile]
+"""
+
+import argparse
+import hashlib
+import io
+import json
+import os
+import shutil
+import sys
+import time
+
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from contextlib import contextmanager, redirect_stdout
+from dataclasses import asdict, dataclass, field
+from distutils import spawn
+from pathlib import Path
+from subprocess import run
+from typing import Dict, List, Optional
+
+import py2many.cli
+
+from py2many.expected_output import ExpectedOutputs
+from py2many.cli import (
+    _create_cmd,
+    _create_parser,
+    _format_one,
+    _relative_to_cwd,
+    _transpile,
+)
+
+from test_cli import (
+    BUILD_DIR,
+    CASE_ARGS,
+    CASE_EXPECTED_EXITCODE,
+    COMPILERS,
+    ENV,
+    EXPECTED_COMPILE_FAILURES,
+    EXPECTED_LINT_FAILURES,
+    INVOKER,
+    LANGS,
+    TEST_CASES,
+    TESTS_DIR,
+    get_python_case_output,
+    is_declarative,
+    standardise_python,
+)
+
+EXPECTED = ExpectedOutputs(TESTS_DIR / "expected")
+CACHE_DIR = BUILD_DIR / "cache"
+RUN_DIR = BUILD_DIR / "corpus"
+
+PASSED = "passed"
+FAILED = "failed"
+SKIPPED = "skipped"
+
+
+@dataclass
+class CaseResult:
+    lang: str
+    case: str
+    status: str = PASSED
+    message: str = ""
+    cached: bool = False
+    # Set when tests/expected needs to be updated
+    generated: Optional[str] = None
+    timings: Dict[str, float] = field(default_factory=dict)
+    ext: str = ""
+
+    @property
+    def total(self) -> float:
+        return sum(self.timings.values())
+
+
+@dataclass
+class RunOptions:
+    compile: bool = True
+    keep_generated: bool = False
+    update_expected: bool = False
+
+
+class CaseFailure(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+# Parsing the arguments builds the settings of every language
+_parser = None
+_lang_args = {}
+
+
+def _get_env(lang):
+    env = os.environ.copy()
+    if ENV.get(lang):
+        env.update(ENV.get(lang))
+    return env
+
+
+def _get_settings(lang, env):
+    """Transpilers and rewriters collect per module state (headers,
+    usings, ...), so every case gets new settings. Building them is cheap
+    once the first call in a worker has warmed the cached lookups (e.g.
+    the julia Base functions)"""
+    global _parser
+    if lang not in _lang_args:
+        if _parser is None:
+            _parser = _create_parser()
+        lang_args = [f"--{lang}=1", "--comment-unsupported"]
+        _lang_args[lang] = _parser.parse_args(lang_args)
+    args = _lang_args[lang]
+    settings = getattr(py2many.cli, f"{lang}_settings")(args, env=env)
+    settings.transpiler._throw_on_unimplemented = False
+    return args, settings
+
+
+@contextmanager
+def _timed(timings, stage):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings[stage] = time.perf_counter() - start
+
+
+def _exe_filename(workdir, case, ext):
+    if ext == ".kt":
+        return workdir / (str(case.title()) + "Kt.class")
+    elif ext in [".dart", ".cpp"] or (ext == ".nim" and sys.platform == "win32"):
+        return workdir / f"{case}.exe"
+    return workdir / case
+
+
+def _cache_key(lang, compiler, generated):
+    h = hashlib.sha256()
+    h.update(lang.encode("utf-8"))
+    h.update("\0".join(compiler).encode("utf-8"))
+    h.update(generated.encode("utf-8"))
+    return h.hexdigest()
+
+
+def _python_output(case):
+    case_filename = TESTS_DIR / "cases" / f"{case}.py"
+    main_args = CASE_ARGS.get(case, tuple())
+    exit_code = CASE_EXPECTED_EXITCODE.get(case, 0)
+    try:
+        return get_python_case_output(case_filename, main_args, exit_code)
+    except (AssertionError, RuntimeError):
+        return None
+
+
+def _compile(lang, case_output, exe, generated, env, result):
+    """Compiles the generated code, unless the same code was compiled before"""
+    compiler = COMPILERS[lang]
+    key = _cache_key(lang, compiler, generated)
+    cache_entry = CACHE_DIR / lang / key
+    if cache_entry.is_dir():
+        cached_exe = cache_entry / exe.name
+        if cached_exe.exists():
+            shutil.copy2(cached_exe, exe)
+        result.cached = True
+        return
+
+    workdir = case_output.parent
+    cmd = _create_cmd(compiler, filename=case_output.name, exe=exe.name)
+    proc = run(cmd, env=env, cwd=workdir, capture_output=True)
+    if proc.returncode:
+        raise CaseFailure(SKIPPED, f"doesnt compile:\n{proc.stderr.decode()}")
+    if exe.suffix == ".exe" and not exe.exists() and (workdir / "a.out").exists():
+        os.rename(workdir / "a.out", exe)
+
+    # Write to a temporary directory first, concurrent workers may
+    # compile the same code
+    tmp_entry = cache_entry.with_name(f"{key}.{os.getpid()}")
+    tmp_entry.mkdir(parents=True, exist_ok=True)
+    if exe.exists():
+        shutil.copy2(exe, tmp_entry / exe.name)
+    try:
+        tmp_entry.rename(cache_entry)
+    except OSError:
+        shutil.rmtree(tmp_entry, ignore_errors=True)
+
+
+def _invoke(lang, case, case_output, exe, env):
+    main_args = list(CASE_ARGS.get(case, tuple()))
+    workdir = case_output.parent
+    invoker = INVOKER.get(lang)
+    if invoker:
+        if not os.path.exists(invoker[0]) and not spawn.find_executable(invoker[0]):
+            raise CaseFailure(SKIPPED, f"{invoker[0]} not available")
+        cmd = _create_cmd(invoker, filename=case_output.name, exe=exe.name)
+    elif exe.exists() and os.access(exe, os.X_OK):
+        cmd = [str(exe)]
+    else:
+        raise CaseFailure(FAILED, f"Compiled output {exe} not detected")
+    return run(cmd + main_args, env=env, cwd=workdir, capture_output=True)
+
+
+def run_case(lang, case, expected_output, options):
+    """Transpiles, formats, compiles and runs a single case"""
+    result = CaseResult(lang, case)
+    timings = result.timings
+    env = _get_env(lang)
+    workdir = RUN_DIR / lang / case
+    try:
+        with _timed(timings, "settings"):
+            args, settings = _get_settings(lang, env)
+        ext = result.ext = settings.ext
+        expected_name = f"{case}{ext}"
+        if not options.update_expected and expected_name not in EXPECTED:
+            raise CaseFailure(SKIPPED, f"{EXPECTED.path(expected_name)} not found")
+        if settings.formatter and not spawn.find_executable(settings.formatter[0]):
+            raise CaseFailure(SKIPPED, f"{settings.formatter[0]} not available")
+        if options.compile and not is_declarative(ext) and not expected_output:
+            raise CaseFailure(FAILED, "python case did not produce output")
+
+        workdir.mkdir(parents=True, exist_ok=True)
+        case_filename = TESTS_DIR / "cases" / f"{case}.py"
+        case_output = workdir / f"{case}{ext}"
+        if ext == ".kt":
+            # ktlint does not support absolute paths
+            case_output = _relative_to_cwd(case_output)
+        exe = _exe_filename(workdir, case, ext)
+
+        with _timed(timings, "transpile"):
+            source = case_filename.read_text(encoding="utf-8")
+            log = io.StringIO()
+            with redirect_stdout(log):
+                outputs, successful = _transpile(
+                    [case_filename], [source], settings, args, basedir=case_filename
+                )
+            if not successful:
+                raise CaseFailure(FAILED, f"transpile failed:\n{log.getvalue()}")
+            case_output.write_text(outputs[0], encoding="utf-8")
+
+        if settings.formatter:
+            with _timed(timings, "format"):
+                with redirect_stdout(io.StringIO()):
+                    formatted = _format_one(settings, case_output, env)
+            if not formatted:
+                status = SKIPPED if f"{case}{ext}" in EXPECTED_LINT_FAILURES else FAILED
+                raise CaseFailure(status, "formatting failed")
+
+        generated = case_output.read_text(encoding="utf-8")
+        if expected_name in EXPECTED and not options.update_expected:
+            diff = EXPECTED.compare(expected_name, generated)
+            if diff and ext == ".py":
+                expected = EXPECTED.read(expected_name)
+                if standardise_python(expected) == standardise_python(generated):
+                    diff = None
+            if diff:
+                raise CaseFailure(FAILED, diff)
+
+        if not options.compile:
+            return result
+
+        if lang in COMPILERS:
+            if not spawn.find_executable(COMPILERS[lang][0]):
+                raise CaseFailure(SKIPPED, f"{COMPILERS[lang][0]} not available")
+            if f"{case}{ext}" in EXPECTED_COMPILE_FAILURES:
+                return result
+            with _timed(timings, "compile"):
+                _compile(lang, workdir / case_output.name, exe, generated, env, result)
+
+        if not is_declarative(ext):
+            with _timed(timings, "run"):
+                proc = _invoke(lang, case, workdir / case_output.name, exe, env)
+            expected_exit_code = CASE_EXPECTED_EXITCODE.get(case, 0)
+            if proc.returncode != expected_exit_code:
+                raise CaseFailure(
+                    FAILED,
+                    f"Execution of {case}{ext} failed:\n{proc.stdout}{proc.stderr}",
+                )
+            if proc.stdout.splitlines() != expected_output.splitlines():
+                raise CaseFailure(FAILED, "output differs from python")
+
+        if options.update_expected or expected_name not in EXPECTED:
+            # Written by run_corpus, all at once
+            result.generated = generated
+    except CaseFailure as e:
+        result.status = e.status
+        result.message = str(e)
+    except Exception as e:
+        result.status = FAILED
+        result.message = f"{e.__class__.__name__}: {e}"
+    finally:
+        if not options.keep_generated:
+            shutil.rmtree(workdir, ignore_errors=True)
+    return result
+
+
+def run_corpus(langs, cases, jobs=None, options=None, progress=None):
+    """Runs all the cases for all the langs in a process pool"""
+    options = options or RunOptions()
+    os.makedirs(BUILD_DIR, exist_ok=True)
+    os.chdir(BUILD_DIR)
+    py2many.cli.CWD = BUILD_DIR
+    # Forked workers share the hashes
+    EXPECTED.load()
+
+    results = []
+    with ProcessPoolExecutor(max_workers=jobs) as pool:
+        expected_outputs = {}
+        if options.compile:
+            expected_outputs = dict(zip(cases, pool.map(_python_output, cases)))
+        futures = [
+            pool.submit(run_case, lang, case, expected_outputs.get(case), options)
+            for lang in langs
+            for case in cases
+        ]
+        for future in as_completed(futures):
+            result = future.result()
+            if progress:
+                progress(result)
+            results.append(result)
+    results.sort(key=lambda r: (r.lang, r.case))
+
+    updated = EXPECTED.update(
+        {f"{r.case}{r.ext}": r.generated for r in results if r.generated is not None}
+    )
+    if updated:
+        print(f"Updated {len(updated)} files in {EXPECTED.directory}")
+    return results
+
+
+def format_report(results, slowest=10):
+    lines = []
+    stages = ["settings", "transpile", "format", "compile", "run"]
+    header = f"{'lang':<8}{'passed':>8}{'failed':>8}{'skipped':>8}{'cached':>8}"
+    header += "".join(f"{s:>11}" for s in stages) + f"{'total':>11}"
+    lines.append(header)
+    for lang in sorted({r.lang for r in results}):
+        lang_results = [r for r in results if r.lang == lang]
+        counts = [
+            len([r for r in lang_results if r.status == status])
+            for status in (PASSED, FAILED, SKIPPED)
+        ]
+        cached = len([r for r in lang_results if r.cached])
+        row = f"{lang:<8}" + "".join(f"{c:>8}" for c in counts) + f"{cached:>8}"
+        for stage in stages:
+            total = sum(r.timings.get(stage, 0) for r in lang_results)
+            row += f"{total:>10.2f}s"
+        row += f"{sum(r.total for r in lang_results):>10.2f}s"
+        lines.append(row)
+
+    if slowest:
+        lines.append("")
+        lines.append(f"Slowest {slowest} cases:")
+        for r in sorted(results, key=lambda r: r.total, reverse=True)[:slowest]:
+            stages = ", ".join(f"{k} {v:.2f}s" for k, v in r.timings.items())
+            lines.append(f"  {r.total:>7.2f}s {r.lang}/{r.case} ({stages})")
+
+    failures = [r for r in results if r.status == FAILED]
+    if failures:
+        lines.append("")
+        lines.append("Failures:")
+        for r in failures:
+            lines.append(f"  {r.lang}/{r.case}: {r.message}")
+    return "\n".join(lines)
+
+
+def _print_progress(result: CaseResult):
+    print(f"{result.status.upper():<8} {result.lang}/{result.case} {result.total:.2f}s")
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "--lang", action="append", choices=sorted(LANGS), help="Languages to run"
+    )
+    parser.add_argument("--case", action="append", help="Cases to run")
+    parser.add_argument(
+        "-j", "--jobs", type=int, default=os.cpu_count(), help="Worker processes"
+    )
+    parser.add_argument(
+        "--no-compile",
+        action="store_true",
+        default=False,
+        help="Only transpile, format and compare with tests/expected",
+    )
+    parser.add_argument(
+        "--keep-generated",
+        action="store_true",
+        default=False,
+        help="Keep generated code in build/corpus for debug",
+    )
+    parser.add_argument(
+        "--update-expected",
+        action="store_true",
+        default=False,
+        help="Update tests/expected",
+    )
+    parser.add_argument(
+        "--clear-cache",
+        action="store_true",
+        default=False,
+        help="Remove cached binaries before running",
+    )
+    parser.add_argument(
+        "--slowest", type=int, default=10, help="Number of slowest cases to report"
+    )
+    parser.add_argument("--json", default=None, help="Write results to a json file")
+    args = parser.parse_args(argv)
+    # run_corpus changes the working directory
+    json_path = Path(args.json).absolute() if args.json else None
+
+    if args.clear_cache:
+        shutil.rmtree(CACHE_DIR, ignore_errors=True)
+
+    options = RunOptions(
+        compile=not args.no_compile,
+        keep_generated=args.keep_generated,
+        update_expected=args.update_expected,
+    )
+    langs = sorted(args.lang or LANGS)
+    cases = sorted(args.case or TEST_CASES)
+    start = time.perf_counter()
+    results = run_corpus(langs, cases, args.jobs, options, _print_progress)
+    print()
+    print(format_report(results, args.slowest))
+    print(f"\nFinished in {time.perf_counter() - start:.2f}s")
+
+    if json_path:
+        with open(json_path, "w") as f:
+            json.dump([asdict(r) for r in results], f, indent=2)
+    return 1 if any(r.status == FAILED for r in results) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,4 +1,4 @@
-if abspath(PROGRAM_FILE) == @__FILE__
+function main()
     (a, b, c) = [1, 2, 3]
     @assert(a == 1)
     @assert(b == 2)
@@ -17,3 +17,7 @@ if abspath(PROGRAM_FILE) == @__FILE__
         @assert(m2 == 11)
     end
 end
+
+if abspath(PROGRAM_FILE) == @__FILE__
+    main()
+end
@@ -4,7 +4,7 @@ function mult_int_and_int()::Int64
     return a * 2
 end
 
-function mult_float_and_int()
+function mult_float_and_int()::Float64
     a = 2.0
     return a * 2
 end
@@ -44,7 +44,7 @@ function mult_tuple_and_int()
     @assert(mul_1 == mul_2)
 end
 
-function add_two_lists()
+function add_two_lists()::Vector{Int64}
     a::Vector{Int64} = []
     b::Vector{Int64} = []
     for i = 0:9
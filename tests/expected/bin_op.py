@@ -47,7 +47,7 @@ def mult_tuple_and_int():
     assert mul_1 == mul_2
 
 
-def add_two_lists():
+def add_two_lists() -> list[int]:
     a: List[int] = []
     b: List[int] = []
     for i in range(0, 10):
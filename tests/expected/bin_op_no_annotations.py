@@ -21,8 +21,8 @@ def mult_int_and_string():
     return a * "test"
 
 
-def mult_list_and_int():
-    a = []
+def mult_list_and_int() -> list[int]:
+    a: list[int] = []
     for i in range(0, 10):
         a.append(i)
 
@@ -31,8 +31,8 @@ def mult_list_and_int():
 
 
 def add_two_lists():
-    a = []
-    b = []
+    a: list[int] = []
+    b: list[int] = []
     for i in range(0, 10):
         a.append(i)
         b.append(i)
@@ -2,7 +2,7 @@
 #include <iostream>  // NOLINT(build/include_order)
 #include <vector>    // NOLINT(build/include_order)
 
-inline int bisect_right(std::vector<int>& data, int item) {
+inline int bisect_right(const std::vector<int>& data, int item) {
   int low = 0;
   int high = static_cast<int>(static_cast<int>(data.size()));
   while (low < high) {
@@ -16,8 +16,8 @@ inline int bisect_right(std::vector<int>& data, int item) {
   return low;
 }
 
-inline std::vector<int> bin_it(std::vector<int>& limits,
-                               std::vector<int>& data) {
+inline std::vector<int> bin_it(const std::vector<int>& limits,
+                               const std::vector<int>& data) {
   std::vector<int> bins = {0};
   for (auto _x : limits) {
     bins.push_back(0);
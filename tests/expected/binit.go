@@ -2,7 +2,7 @@ package main
 
 import (
 	"fmt"
-	"github.com/google/go-cmp/cmp"
+	"slices"
 )
 
 func BisectRight(data []int, item int) int {
@@ -20,7 +20,7 @@ func BisectRight(data []int, item int) int {
 }
 
 func BinIt(limits []int, data []int) []int {
-	var bins []int = []int{0}
+	var bins []int = append(make([]int, 0, 1+len(limits)), 0)
 	for _, _x := range limits {
 		_ = _x
 		bins = append(bins, 0)
@@ -34,7 +34,7 @@ func BinIt(limits []int, data []int) []int {
 func main() {
 	var limits []int = []int{23, 37, 43, 53, 67, 83}
 	var data []int = []int{95, 21, 94, 12, 99, 4, 70, 75, 83, 93, 52, 80, 57, 5, 53, 86, 65, 17, 92, 83, 71, 61, 54, 58, 47, 16, 8, 9, 32, 84, 7, 87, 46, 19, 30, 37, 96, 6, 98, 40, 79, 97, 45, 64, 60, 29, 49, 36, 43, 55}
-	if !(cmp.Equal(BinIt(limits, data), []int{11, 4, 2, 6, 9, 5, 13})) {
+	if !(slices.Equal(BinIt(limits, data), []int{11, 4, 2, 6, 9, 5, 13})) {
 		panic("assert")
 	}
 	fmt.Printf("%v\n", "OK")
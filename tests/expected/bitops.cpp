@@ -4,8 +4,11 @@
 
 inline void main_func() {
   std::vector<bool> ands = {};
+  ands.reserve(4);
   std::vector<bool> ors = {};
+  ors.reserve(4);
   std::vector<bool> xors = {};
+  xors.reserve(4);
   for (auto a : {false, true}) {
     for (auto b : {false, true}) {
       ands.push_back(a & b);
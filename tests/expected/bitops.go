@@ -2,13 +2,13 @@ package main
 
 import (
 	"fmt"
-	"github.com/google/go-cmp/cmp"
+	"slices"
 )
 
 func MainFunc() {
-	var ands []bool = []bool{}
-	var ors []bool = []bool{}
-	var xors []bool = []bool{}
+	var ands []bool = make([]bool, 0, 4)
+	var ors []bool = make([]bool, 0, 4)
+	var xors []bool = make([]bool, 0, 4)
 	for _, a := range []bool{false, true} {
 		for _, b := range []bool{false, true} {
 			ands = append(ands, (a && b))
@@ -16,13 +16,13 @@ func MainFunc() {
 			xors = append(xors, (a != b))
 		}
 	}
-	if !(cmp.Equal(ands, []bool{false, false, false, true})) {
+	if !(slices.Equal(ands, []bool{false, false, false, true})) {
 		panic("assert")
 	}
-	if !(cmp.Equal(ors, []bool{false, true, true, true})) {
+	if !(slices.Equal(ors, []bool{false, true, true, true})) {
 		panic("assert")
 	}
-	if !(cmp.Equal(xors, []bool{false, true, true, false})) {
+	if !(slices.Equal(xors, []bool{false, true, true, false})) {
 		panic("assert")
 	}
 	fmt.Printf("%v\n", "OK")
@@ -2,8 +2,8 @@ package main
 
 import (
 	"fmt"
-	"github.com/google/go-cmp/cmp"
 	iter "github.com/hgfischer/go-iter"
+	"slices"
 )
 
 func BubbleSort(seq []int) []int {
@@ -25,7 +25,7 @@ func BubbleSort(seq []int) []int {
 func main() {
 	var unsorted []int = []int{14, 11, 19, 5, 16, 10, 19, 12, 5, 12}
 	var expected []int = []int{5, 5, 10, 11, 12, 12, 14, 16, 19, 19}
-	if !(cmp.Equal(BubbleSort(unsorted), expected)) {
+	if !(slices.Equal(BubbleSort(unsorted), expected)) {
 		panic("assert")
 	}
 	fmt.Printf("%v\n", "OK")
@@ -11,9 +11,13 @@ function bubble_sort(seq::Vector{Int64})::Vector{Int64}
     return seq
 end
 
-if abspath(PROGRAM_FILE) == @__FILE__
+function main()
     unsorted = [14, 11, 19, 5, 16, 10, 19, 12, 5, 12]
     expected = [5, 5, 10, 11, 12, 12, 14, 16, 19, 19]
     @assert(bubble_sort(unsorted) == expected)
     println("OK")
 end
+
+if abspath(PROGRAM_FILE) == @__FILE__
+    main()
+end
@@ -9,7 +9,7 @@ function default_builtins()
     @assert(d == 0.0)
 end
 
-if abspath(PROGRAM_FILE) == @__FILE__
+function main()
     default_builtins()
     a = max(1, 2)
     @assert(a == 2)
@@ -17,3 +17,7 @@ if abspath(PROGRAM_FILE) == @__FILE__
     @assert(b == 1)
     println("OK")
 end
+
+if abspath(PROGRAM_FILE) == @__FILE__
+    main()
+end
@@ -1,4 +1,8 @@
-if abspath(PROGRAM_FILE) == @__FILE__
+function main()
     values_ = Vector{UInt8}()
     @assert(isa(values_, Vector{UInt8}) == true)
 end
+
+if abspath(PROGRAM_FILE) == @__FILE__
+    main()
+end
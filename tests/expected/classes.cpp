@@ -1,16 +1,109 @@
 #include <cassert>   // NOLINT(build/include_order)
 #include <iostream>  // NOLINT(build/include_order)
+#include <utility>   // NOLINT(build/include_order)
+#include <vector>    // NOLINT(build/include_order)
 class Foo {
  public:
-  inline int bar() { return this->baz(); }
+  inline auto bar() { return this->baz(); }
 
   inline int baz() { return 10; }
+
+  inline str bar_str() { return std::string{"a"}; }
+};
+
+class Shape {
+ public:
+  auto x;
+  auto y;
+
+  template <typename T0, typename T1>
+  void __init__(T0 x, T1 y) {
+    auto this->x = x;
+    auto this->y = y;
+  }
+
+  inline auto position() {
+    return std::string{""}.join({std::string{"("}, std::to_string(this->x),
+                                 std::string{", "}, std::to_string(this->y),
+                                 std::string{")"}});
+  }
+};
+
+class Square {
+ public:
+  auto side;
+
+  template <typename T0, typename T1, typename T2>
+  void __init__(T0 x, T1 y, T2 side) {
+    super().__init__(x, y);
+    auto this->side = side;
+  }
+
+  inline void area() { (this->x) * (this->y); }
+};
+
+class Person {
+ public:
+  str name;
+
+  inline void __init__(str name) { str this->name = std::move(name); }
+
+  inline str get_id() { return this->name; }
+};
+
+class Student {
+ public:
+  str name;
+  int student_number;
+  str domain;
+
+  inline void __init__(str name, int student_number, str domain) {
+    str this->name = std::move(name);
+    int this->student_number = student_number;
+    str this->domain = std::move(domain);
+  }
+
+  inline auto get_id() {
+    return std::string{""}.join({std::to_string(this->name), std::string{" - "},
+                                 std::to_string(this->student_number)});
+  }
+};
+
+class Worker {
+ public:
+  str name;
+  str company_name;
+  int hours_per_week;
+
+  inline void __init__(str name, str company_name, int hours_per_week) {
+    str this->name = std::move(name);
+    str this->company_name = std::move(company_name);
+    int this->hours_per_week = hours_per_week;
+  }
 };
 
 int main(int argc, char** argv) {
   Foo f = Foo();
   auto b = f.bar();
-  std::cout << b;
-  std::cout << std::endl;
   assert(b == 10);
+  auto c = f.bar_str();
+  assert(c == std::string{"a"});
+  Shape shape = Shape(1, 3);
+  Square square = Square(2, 4, 5);
+  assert(square.position() == std::string{"(2, 4)"});
+  Person p = Person(std::string{"P"});
+  assert(p.name == std::string{"P"});
+  assert(p.get_id() == std::string{"P"});
+  Student s = Student(std::string{"S"}, 111111);
+  assert(s.name == std::string{"S"});
+  assert(s.student_number == 111111);
+  assert(s.domain == std::string{"school.student.pt"});
+  assert(s.get_id() == std::string{"S - 111111"});
+  Worker w = Worker(std::string{"John"}, std::string{"Siemens"}, 35);
+  assert(w.name == std::string{"John"});
+  assert(w.company_name == std::string{"Siemens"});
+  assert(w.hours_per_week == 35);
+  assert(w.get_id() == std::string{"John"});
+  std::cout << std::string{"OK"};
+  std::cout << std::endl;
 }
@@ -7,7 +7,7 @@ import (
 type Foo struct {
 }
 
-func bar(self Foo) int {
+func bar(self Foo) interface{} {
 	return baz(self)
 }
 
@@ -15,11 +15,124 @@ func baz(self Foo) int {
 	return 10
 }
 
+func bar_str(self Foo) str {
+	return str("a")
+}
+
+type Shape struct {
+	x ST0
+	y ST1
+}
+
+func __init__[T0 any, T1 any](self Shape, x T0, y T1) {
+	self.x = x
+	self.y = y
+}
+
+func position(self Shape) interface{} {
+	return join("", []str{"(", String(self.x), ", ", String(self.y), ")"})
+}
+
+type Square struct {
+	side ST0
+}
+
+func __init__[T0 any, T1 any, T2 any](self Square, x T0, y T1, side T2) {
+	__init__(super(), x, y)
+	self.side = side
+}
+
+func area(self Square) {
+	(self.x * self.y)
+}
+
+type Person struct {
+	name str
+}
+
+func __init__(self Person, name str) {
+	self.name = name
+}
+
+func get_id(self Person) str {
+	return str(self.name)
+}
+
+type Student struct {
+	name           str
+	student_number int
+	domain         str
+}
+
+func __init__(self Student, name str, student_number int, domain str) {
+	self.name = name
+	self.student_number = student_number
+	self.domain = domain
+}
+
+func get_id(self Student) interface{} {
+	return join("", []str{String(self.name), " - ", String(self.student_number)})
+}
+
+type Worker struct {
+	name           str
+	company_name   str
+	hours_per_week int
+}
+
+func __init__(self Worker, name str, company_name str, hours_per_week int) {
+	self.name = name
+	self.company_name = company_name
+	self.hours_per_week = hours_per_week
+}
+
 func main() {
 	var f Foo = Foo{}
 	b := bar(f)
-	fmt.Printf("%v\n", b)
 	if !(b == 10) {
 		panic("assert")
 	}
+	c := bar_str(f)
+	if !(c == "a") {
+		panic("assert")
+	}
+	var shape Shape = Shape{x: 1, y: 3}
+	var square Square = Square{side: 2}
+	if !(position(square) == "(2, 4)") {
+		panic("assert")
+	}
+	var p Person = Person{name: "P"}
+	if !(p.name == "P") {
+		panic("assert")
+	}
+	if !(get_id(p) == "P") {
+		panic("assert")
+	}
+	var s Student = Student{name: "S", student_number: 111111}
+	if !(s.name == "S") {
+		panic("assert")
+	}
+	if !(s.student_number == 111111) {
+		panic("assert")
+	}
+	if !(s.domain == "school.student.pt") {
+		panic("assert")
+	}
+	if !(get_id(s) == "S - 111111") {
+		panic("assert")
+	}
+	var w Worker = Worker{name: "John", company_name: "Siemens", hours_per_week: 35}
+	if !(w.name == "John") {
+		panic("assert")
+	}
+	if !(w.company_name == "Siemens") {
+		panic("assert")
+	}
+	if !(w.hours_per_week == 35) {
+		panic("assert")
+	}
+	if !(get_id(w) == "John") {
+		panic("assert")
+	}
+	fmt.Printf("%v\n", "OK")
 }
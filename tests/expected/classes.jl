@@ -64,7 +64,7 @@ mutable struct Worker <: AbstractWorker
     hours_per_week::Int64
 end
 
-if abspath(PROGRAM_FILE) == @__FILE__
+function main()
     f = Foo()
     b = bar(f)
     @assert(b == 10)
@@ -88,3 +88,7 @@ if abspath(PROGRAM_FILE) == @__FILE__
     @assert(get_id(w) == "John")
     println("OK")
 end
+
+if abspath(PROGRAM_FILE) == @__FILE__
+    main()
+end
@@ -100,7 +100,7 @@ function __key(self::AbstractValueHolder)
     (self.val, self.strVal)
 end
 
-if abspath(PROGRAM_FILE) == @__FILE__
+function main()
     c1 = ValueHolder(10, "10")
     @assert(__eq__(c1, ValueHolder(10, "10")))
     c2 = ValueHolder(10, "10")
@@ -126,3 +126,7 @@ if abspath(PROGRAM_FILE) == @__FILE__
     @assert(__lt__(c6, c5))
     @assert(__gt__(c5, c6))
 end
+
+if abspath(PROGRAM_FILE) == @__FILE__
+    main()
+end
@@ -24,9 +24,13 @@ function test()
     @assert(inner_test_2(4) == "testtesttesttest")
 end
 
-if abspath(PROGRAM_FILE) == @__FILE__
+function main()
     @assert(func() == "test")
     testClass = TestClass()
     @assert(func(testClass) == "test2")
     test()
 end
+
+if abspath(PROGRAM_FILE) == @__FILE__
+    main()
+end
@@ -2,9 +2,9 @@ package main
 
 import (
 	"fmt"
-	"github.com/google/go-cmp/cmp"
 	iter "github.com/hgfischer/go-iter"
 	"math"
+	"slices"
 )
 
 func CombSort(seq []int) []int {
@@ -30,7 +30,7 @@ func CombSort(seq []int) []int {
 func main() {
 	var unsorted []int = []int{14, 11, 19, 5, 16, 10, 19, 12, 5, 12}
 	var expected []int = []int{5, 5, 10, 11, 12, 12, 14, 16, 19, 19}
-	if !(cmp.Equal(CombSort(unsorted), expected)) {
+	if !(slices.Equal(CombSort(unsorted), expected)) {
 		panic("assert")
 	}
 	fmt.Printf("%v\n", "OK")
@@ -1,4 +1,5 @@
 // @dart=2.9
+import 'dart:typed_data';
 import 'package:sprintf/sprintf.dart';
 
 inline_pass() {
@@ -47,7 +48,7 @@ show() {
   assert(t1 == 10);
   final int sum1 = indexing();
   print(sprintf("%s", [sum1]));
-  final List<int> a5 = [1, 2, 3];
+  final List<int> a5 = Int64List.fromList([1, 2, 3]);
   print(sprintf("%s", [a5.length]));
   List<String> a9 = ["a", "b", "c", "d"];
   print(sprintf("%s", [a9.length]));
@@ -45,7 +45,7 @@ fun show() {
     assert(t1 == 10)
     val sum1 = indexing()
     println("$sum1")
-    val a5 = arrayOf(1, 2, 3)
+    val a5 = intArrayOf(1, 2, 3)
     if (true) {
         val __tmp1 = a5.size
         println("$__tmp1")
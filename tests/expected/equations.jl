@@ -1,8 +1,12 @@
 
-if abspath(PROGRAM_FILE) == @__FILE__
-    x = 0
-    y = 0
+function main()
+    x::Int = 0
+    y::Int = 0
     @assert(!(x > 2))
     @assert(y < 10)
     @assert((x + 2 * y) == 0)
 end
+
+if abspath(PROGRAM_FILE) == @__FILE__
+    main()
+end
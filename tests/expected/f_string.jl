@@ -1,4 +1,4 @@
-if abspath(PROGRAM_FILE) == @__FILE__
+function main()
     a = 10
     b = "test"
     c = 2 + 4
@@ -16,3 +16,7 @@ if abspath(PROGRAM_FILE) == @__FILE__
     @assert(str4 == "hello 2 world 0.444")
     println("OK")
 end
+
+if abspath(PROGRAM_FILE) == @__FILE__
+    main()
+end
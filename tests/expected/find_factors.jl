@@ -1,16 +1,21 @@
-function find_factors(n)
-    for i = 2:n-1
-        has_break = false
-        for j = 2:i-1
-            if (i % j) == 0
-                println("$(i) equals $(j) * $(i / j)")
-                has_break = true
-                break
+function find_factors(n::Int64)
+    __stdout = IOBuffer()
+    try
+        for i = 2:n-1
+            has_break = false
+            for j = 2:i-1
+                if (i % j) == 0
+                    println(__stdout, "$(i) equals $(j) * $(i / j)")
+                    has_break = true
+                    break
+                end
+            end
+            if has_break != true
+                println(__stdout, "$(i) is a prime number")
             end
         end
-        if has_break != true
-            println("$(i) is a prime number")
-        end
+    finally
+        write(stdout, take!(__stdout))
     end
 end
 
@@ -1,4 +1,4 @@
-if abspath(PROGRAM_FILE) == @__FILE__
+function main()
     value = join((string(x) for x in 0:9 if x > 4 && x < 8), " ")
     @assert(value == "5 6 7")
     value2 = join((string(x) * " " * string(y) for x in 0:4 if x > 1 for y = 0:1), " ")
@@ -6,3 +6,7 @@ if abspath(PROGRAM_FILE) == @__FILE__
     value3 = join((string(x + y) for x in 0:4 if x > 1 for y = 0:3), " ")
     @assert(value3 == "2 3 4 5 3 4 5 6 4 5 6 7")
 end
+
+if abspath(PROGRAM_FILE) == @__FILE__
+    main()
+end
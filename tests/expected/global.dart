@@ -1,9 +1,10 @@
 // @dart=2.9
+import 'dart:typed_data';
 import 'package:sprintf/sprintf.dart';
 
 final int code_0 = 0;
 final int code_1 = 1;
-final List<int> l_a = [code_0, code_1];
+final List<int> l_a = Int64List.fromList([code_0, code_1]);
 final String code_a = "a";
 final String code_b = "b";
 final List<String> l_b = [code_a, code_b];
@@ -1,23 +1,33 @@
 package main
 
 import (
+	"bufio"
 	"fmt"
 	"github.com/electrious/refutil"
+	"os"
 )
 
 var Code0 int = 0
 var Code1 int = 1
-var LA []int = []int{Code0, Code1}
+var LA [2]int = [2]int{Code0, Code1}
 var CodeA string = "a"
 var CodeB string = "b"
-var LB []string = []string{CodeA, CodeB}
+var LB [2]string = [2]string{CodeA, CodeB}
 
 func main() {
-	for _, i := range LA {
-		fmt.Printf("%v\n", i)
+	{
+		__stdout := bufio.NewWriter(os.Stdout)
+		for _, i := range LA {
+			fmt.Fprintf(__stdout, "%v\n", i)
+		}
+		__stdout.Flush()
 	}
-	for _, j := range LB {
-		fmt.Printf("%v\n", j)
+	{
+		__stdout := bufio.NewWriter(os.Stdout)
+		for _, j := range LB {
+			fmt.Fprintf(__stdout, "%v\n", j)
+		}
+		__stdout.Flush()
 	}
 	if refutil.Contains([]string{"a", "b"}, "a") {
 		fmt.Printf("%v\n", "OK")
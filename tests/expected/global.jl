@@ -1,17 +1,31 @@
-code_0 = 0
-code_1 = 1
-l_a = [code_0, code_1]
-code_a = "a"
-code_b = "b"
-l_b = [code_a, code_b]
-if abspath(PROGRAM_FILE) == @__FILE__
-    for i in l_a
-        println(i)
+const code_0 = 0
+const code_1 = 1
+const l_a = [code_0, code_1]
+const code_a = "a"
+const code_b = "b"
+const l_b = [code_a, code_b]
+function main()
+    __stdout = IOBuffer()
+    try
+        for i in l_a
+            println(__stdout, i)
+        end
+    finally
+        write(stdout, take!(__stdout))
     end
-    for j in l_b
-        println(j)
+    __stdout = IOBuffer()
+    try
+        for j in l_b
+            println(__stdout, j)
+        end
+    finally
+        write(stdout, take!(__stdout))
     end
     if "a" ∈ ["a", "b"]
         println("OK")
     end
 end
+
+if abspath(PROGRAM_FILE) == @__FILE__
+    main()
+end
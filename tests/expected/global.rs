@@ -25,6 +25,7 @@
 extern crate anyhow;
 use anyhow::Result;
 use std::collections;
+use std::io::Write;
 
 pub const code_0: i32 = 0;
 pub const code_1: i32 = 1;
@@ -33,11 +34,17 @@ pub const code_a: &'static str = "a";
 pub const code_b: &'static str = "b";
 pub const l_b: &[&str; 2] = &[code_a, code_b];
 pub fn main() -> Result<()> {
-    for i in l_a {
-        println!("{}", *i);
+    {
+        let mut __stdout = std::io::BufWriter::new(std::io::stdout().lock());
+        for i in l_a {
+            writeln!(__stdout, "{}", *i).unwrap();
+        }
     }
-    for j in l_b {
-        println!("{}", *j);
+    {
+        let mut __stdout = std::io::BufWriter::new(std::io::stdout().lock());
+        for j in l_b {
+            writeln!(__stdout, "{}", *j).unwrap();
+        }
     }
     if vec!["a", "b"].iter().any(|&x| x == "a") {
         println!("{}", "OK");
@@ -1,9 +1,9 @@
-code_0 = 0
-code_1 = 1
-code_a = "a"
-code_b = "b"
-l_b = Set([code_a])
-l_c = Dict(code_b => code_0)
+const code_0 = 0
+const code_1 = 1
+const code_a = "a"
+const code_b = "b"
+const l_b = Set([code_a])
+const l_c = Dict(code_b => code_0)
 if abspath(PROGRAM_FILE) == @__FILE__
     @assert("a" ∈ l_b)
     println("OK")
@@ -4,7 +4,7 @@ function foo()
     @assert(b == 10)
 end
 
-function fibonacci(n)::Int64
+function fibonacci(n::Int64)::Int64
     if n == 0
         return 0
     elseif n == 1
@@ -39,15 +39,15 @@ function mul_recvd_list(a::Vector)
     return repeat(a, 2)
 end
 
-function plus_test(x, y)
-    return x + y
+function plus_test(x::String, y::String)::String
+    return x * y
 end
 
 function plus_test(x::String, y::String)::String
     return x * y
 end
 
-if abspath(PROGRAM_FILE) == @__FILE__
+function main()
     foo()
     @assert(fibonacci(10) == 55)
     @assert((repeat("test", fibonacci(3))) == "testtest")
@@ -60,3 +60,7 @@ if abspath(PROGRAM_FILE) == @__FILE__
     @assert(res == "sszz")
     println("OK")
 end
+
+if abspath(PROGRAM_FILE) == @__FILE__
+    main()
+end
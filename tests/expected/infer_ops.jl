@@ -60,7 +60,7 @@ function mul(x::Cuint, y::Cuint)::Cshort
     return x * y
 end
 
-function fadd1(x::Cuint, y::Float64)
+function fadd1(x::Cuint, y::Float64)::Float64
     return x + y
 end
 
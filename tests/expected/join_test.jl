@@ -5,7 +5,7 @@ function test(self::AbstractHello)::String
     return "ola"
 end
 
-if abspath(PROGRAM_FILE) == @__FILE__
+function main()
     a = "a"
     b = "ab"
     @assert(join(b, a) == "aab")
@@ -19,3 +19,7 @@ if abspath(PROGRAM_FILE) == @__FILE__
     @assert(join([test(Hello()), "adeus"], "\n") == "ola\nadeus")
     println("OK")
 end
+
+if abspath(PROGRAM_FILE) == @__FILE__
+    main()
+end
@@ -1,5 +1,5 @@
 def for_with_break():
-    arr = []
+    arr: list[int] = []
     for i in range(4):
         if i == 2:
             break
@@ -9,7 +9,7 @@ def for_with_break():
 
 
 def for_with_continue():
-    arr = []
+    arr: list[int] = []
     for i in range(4):
         if i == 2:
             continue
@@ -19,7 +19,7 @@ def for_with_continue():
 
 
 def for_with_else():
-    arr = []
+    arr: list[int] = []
     for i in range(4):
         arr.append(i)
     else:
@@ -29,7 +29,7 @@ def for_with_else():
 
 
 def while_with_break():
-    arr = []
+    arr: list[int] = []
     i = 0
     while True:
         if i == 2:
@@ -41,7 +41,7 @@ def while_with_break():
 
 
 def while_with_continue():
-    arr = []
+    arr: list[int] = []
     i = 0
     while i < 5:
         i += 1
@@ -53,7 +53,7 @@ def while_with_continue():
 
 
 def loop_range_test():
-    arr1 = []
+    arr1: list[int] = []
     for i in range(1, 10):
         arr1.append(i)
     arr2 = []
@@ -68,7 +68,7 @@ def loop_range_test():
 def loop_element_test():
     # 1
     arr = [1, 2]
-    res_1 = []
+    res_1: list[int] = []
     for e in arr:
         e[1]
         res_1.append(e)
@@ -77,7 +77,7 @@ def loop_element_test():
 
     # 2
     arr_c = [2, 3, 4]
-    res_2 = []
+    res_2: list[int] = []
     for e in arr:
         res_2.append(arr_c[e])
 
@@ -100,7 +100,7 @@ def for_cycle_vars():
         assert c == 4
 
         # Test nested loop
-        arr = []
+        arr: list[int] = []
         a = 1
         for j in range(0, 2):
             arr.append(a)
@@ -139,7 +139,7 @@ def inplace_ops():
 
 
 def list_ops():
-    a = list()
+    a: list[str] = list()
 
     # Append
     a.append("test")
@@ -179,7 +179,7 @@ def list_ops():
 
     # List Multiplication
     elems = ["1", "2", "3"]
-    new_elems = []
+    new_elems: list[str] = []
     for e in elems:
         new_elems.append(e * 2)
     assert new_elems == ["11", "22", "33"]
@@ -1,6 +1,6 @@
 using Xsum
 
-if abspath(PROGRAM_FILE) == @__FILE__
+function main()
     s1 = sum([0.1, 0.1, 0.1, 0.1, 0.1, 0.1, 0.1, 0.1, 0.1, 0.1])
     s2 = xsum([0.1, 0.1, 0.1, 0.1, 0.1, 0.1, 0.1, 0.1, 0.1, 0.1])
     a = [1, 2, 3, 4]
@@ -16,3 +16,7 @@ if abspath(PROGRAM_FILE) == @__FILE__
     @assert(tan(deg2rad(30)) == (sqrt(3) / 3))
     @assert(round(12.556, digits = 2) == 12.56)
 end
+
+if abspath(PROGRAM_FILE) == @__FILE__
+    main()
+end
@@ -1,6 +1,6 @@
 # Assuming m >= n.
-def bonacciseries(n: int, m: int):
-    a = [0] * m
+def bonacciseries(n: int, m: int) -> list[int]:
+    a: list[int] = [0] * m
     a[n - 1] = 1
     for i in range(n, m):
         for j in range(i - n, i):
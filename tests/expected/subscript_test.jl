@@ -1,4 +1,4 @@
-if abspath(PROGRAM_FILE) == @__FILE__
+function main()
     l = [1, 2, 3]
     b = ["a", "b", "c"]
     x = 0
@@ -13,3 +13,7 @@ if abspath(PROGRAM_FILE) == @__FILE__
     @assert(output[end] == 6)
     println("OK")
 end
+
+if abspath(PROGRAM_FILE) == @__FILE__
+    main()
+end
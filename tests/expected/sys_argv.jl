@@ -1,7 +1,7 @@
 
-if abspath(PROGRAM_FILE) == @__FILE__
-    a = append!([PROGRAM_FILE], ARGS)
-    cmd = a[1]
+function main()
+    a::Vector{String} = append!([PROGRAM_FILE], ARGS)
+    cmd::String = a[1]
     if cmd == "dart"
         #= pass =#
     else
@@ -13,3 +13,7 @@ if abspath(PROGRAM_FILE) == @__FILE__
         println("OK")
     end
 end
+
+if abspath(PROGRAM_FILE) == @__FILE__
+    main()
+end
@@ -1,8 +1,17 @@
-if abspath(PROGRAM_FILE) == @__FILE__
+function main()
     a = [1, 2, 3]
     i = -1
     println(a[end])
-    for i = -3:-1:-1
-        println(a[i+1])
+    __stdout = IOBuffer()
+    try
+        for i = -3:-1:-1
+            println(__stdout, a[i+1])
+        end
+    finally
+        write(stdout, take!(__stdout))
     end
 end
+
+if abspath(PROGRAM_FILE) == @__FILE__
+    main()
+end
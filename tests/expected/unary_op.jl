@@ -1,6 +1,10 @@
-if abspath(PROGRAM_FILE) == @__FILE__
-    a = 2
+function main()
+    a::Int = 2
     @assert(~a == -3)
     -1
     +1
 end
+
+if abspath(PROGRAM_FILE) == @__FILE__
+    main()
+end
@@ -1,8 +1,12 @@
 
-if abspath(PROGRAM_FILE) == @__FILE__
+function main()
     write_ = x -> write(stdout, x)
     write(stdout, stdout.buffer)
     write_(b"P4\n")
     flush_ = flush(stdout)
     flush(stdout.buffer)
 end
+
+if abspath(PROGRAM_FILE) == @__FILE__
+    main()
+end
@@ -23,10 +23,14 @@ function yield_from()
     end
 end
 
-if abspath(PROGRAM_FILE) == @__FILE__
+function main()
     arr = []
     for i in yield_from()
         push!(arr, i)
     end
     @assert(arr == [0, 1, 2, 3, 4])
 end
+
+if abspath(PROGRAM_FILE) == @__FILE__
+    main()
+end
@@ -82,7 +82,7 @@ function generator_func(self::AbstractTestClass)
     end
 end
 
-if abspath(PROGRAM_FILE) == @__FILE__
+function main()
     arr1 = []
     for i in generator_func()
         push!(arr1, i)
@@ -99,7 +99,7 @@ if abspath(PROGRAM_FILE) == @__FILE__
     end
     @assert(arr3 == [0, 1, 2])
     arr4 = []
-    testClass1 = TestClass()
+    testClass1::TestClass = TestClass()
     for i in generator_func(testClass1)
         push!(arr4, i)
     end
@@ -119,3 +119,7 @@ if abspath(PROGRAM_FILE) == @__FILE__
         println(i)
     end
 end
+
+if abspath(PROGRAM_FILE) == @__FILE__
+    main()
+end
@@ -0,0 +1,72 @@
+"""Benchmark for the argument conversion of the vector_ops extension.
+
+Build tests/ext_expected/vector_ops.rs and tests/ext_cases/vector_ops_pylist.rs
+as python modules first, for example with `maturin develop`. The first one
+converts list and bytes arguments at the call boundary and releases the
+GIL, the second one is the same code with the previous &PyList / &PyBytes
+arguments. Both are run once on a single thread and once on several
+threads. The python implementation only checks the results.
+"""
+
+import importlib.machinery
+import importlib.util
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import pytest
+
+
+def _load(name, path, loader=None):
+    spec = importlib.util.spec_from_file_location(name, path, loader=loader)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def _load_extension(name):
+    # The python source of the same name shadows it on sys.path
+    for path in sys.path:
+        for suffix in importlib.machinery.EXTENSION_SUFFIXES:
+            filename = Path(path or ".") / f"{name}{suffix}"
+            if filename.exists():
+                loader = importlib.machinery.ExtensionFileLoader(name, str(filename))
+                return _load(name, filename, loader)
+    pytest.skip(f"{name} extension is not built", allow_module_level=True)
+
+
+python_impl = _load("vector_ops_py", Path(__file__).with_name("vector_ops.py"))
+native_impl = _load_extension("vector_ops")
+pylist_impl = _load_extension("vector_ops_pylist")
+
+SIZE = 1_000_000
+THREADS = 4
+REPEAT = 8
+
+
+def _time(fn, *args, threads=1):
+    start = time.perf_counter()
+    with ThreadPoolExecutor(threads) as pool:
+        for _ in pool.map(lambda _: fn(*args), range(REPEAT * threads)):
+            pass
+    return (time.perf_counter() - start) / threads
+
+
+@pytest.mark.parametrize(
+    "name, args",
+    [
+        ("dot", ([1.5] * SIZE, [2.0] * SIZE)),
+        ("checksum", (bytes(range(256)) * (SIZE // 256),)),
+    ],
+)
+def test_bench(name, args):
+    expected = getattr(python_impl, name)(*args)
+    results = {}
+    for label, module in (("pylist", pylist_impl), ("native", native_impl)):
+        fn = getattr(module, name)
+        assert fn(*args) == expected
+        results[label] = (_time(fn, *args), _time(fn, *args, threads=THREADS))
+    for label, (single, threaded) in results.items():
+        print(f"{name} {label}: {single:.3f}s, {threaded:.3f}s/thread x{THREADS}")
+    assert results["native"][1] < results["pylist"][1]
@@ -0,0 +1,17 @@
+#!/usr/bin/env python3
+
+from typing import List
+
+
+def dot(xs: List[float], ys: List[float]) -> float:
+    total: float = 0.0
+    for i in range(len(xs)):
+        total += xs[i] * ys[i]
+    return total
+
+
+def checksum(data: bytes) -> int:
+    total: int = 0
+    for b in data:
+        total += b
+    return total
@@ -0,0 +1,42 @@
+//! vector_ops with the argument conversion the extension used before
+//! list and bytes arguments were converted at the call boundary. Lists
+//! stay &PyList, so every element goes through the Python C API, and the
+//! functions hold the GIL. test_vector_ops_bench.py compares it with the
+//! generated tests/ext_expected/vector_ops.rs.
+//!
+//! ```cargo
+//! [package]
+//! edition = "2018"
+//! [dependencies]
+//! pyo3 = "0.20"
+//! ```
+
+use pyo3::prelude::*;
+use pyo3::types::{PyBytes, PyList};
+use pyo3::wrap_pyfunction;
+
+#[pyfunction]
+pub fn dot(xs: &PyList, ys: &PyList) -> PyResult<f64> {
+    let mut total: f64 = 0.0;
+    for i in 0..xs.len() {
+        total += xs.get_item(i)?.extract::<f64>()? * ys.get_item(i)?.extract::<f64>()?;
+    }
+    Ok(total)
+}
+
+#[pyfunction]
+pub fn checksum(data: &PyBytes) -> i32 {
+    let mut total: i32 = 0;
+    for b in data.as_bytes() {
+        total += *b as i32;
+    }
+    total
+}
+
+#[pymodule]
+fn vector_ops_pylist(_py: Python, m: &PyModule) -> PyResult<()> {
+    m.add_function(wrap_pyfunction!(dot, m)?)?;
+    m.add_function(wrap_pyfunction!(checksum, m)?)?;
+
+    Ok(())
+}
@@ -1,2 +1,3 @@
 pub mod rect;
 pub mod string_sum;
+pub mod vector_ops;
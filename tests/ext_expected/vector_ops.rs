@@ -0,0 +1,57 @@
+//! ```cargo
+//! [package]
+//! edition = "2018"
+//! [dependencies]
+//! pyo3 = "*"
+//! ```
+
+#![allow(clippy::collapsible_else_if)]
+#![allow(clippy::double_parens)] // https://github.com/adsharma/py2many/issues/17
+#![allow(clippy::map_identity)]
+#![allow(clippy::needless_return)]
+#![allow(clippy::print_literal)]
+#![allow(clippy::ptr_arg)]
+#![allow(clippy::redundant_static_lifetimes)] // https://github.com/adsharma/py2many/issues/266
+#![allow(clippy::unnecessary_cast)]
+#![allow(clippy::upper_case_acronyms)]
+#![allow(clippy::useless_vec)]
+#![allow(non_camel_case_types)]
+#![allow(non_snake_case)]
+#![allow(non_upper_case_globals)]
+#![allow(unused_imports)]
+#![allow(unused_mut)]
+#![allow(unused_parens)]
+
+extern crate pyo3;
+use pyo3::prelude::*;
+use pyo3::wrap_pyfunction;
+
+#[pyfunction]
+pub fn dot(py: Python, xs: Vec<f64>, ys: Vec<f64>) -> f64 {
+    py.allow_threads(move || {
+        let mut total: f64 = 0.0;
+        for i in (0..xs.len() as i32) {
+            total += ((xs[i as usize] as f64) * (ys[i as usize] as f64));
+        }
+        return total;
+    })
+}
+
+#[pyfunction]
+pub fn checksum(py: Python, data: &[u8]) -> i32 {
+    py.allow_threads(move || {
+        let mut total: i32 = 0;
+        for b in data {
+            total += *b as i32;
+        }
+        return total;
+    })
+}
+
+#[pymodule]
+fn vector_ops(_py: Python, m: &PyModule) -> PyResult<()> {
+    m.add_function(wrap_pyfunction!(dot, m)?)?;
+    m.add_function(wrap_pyfunction!(checksum, m)?)?;
+
+    Ok(())
+}
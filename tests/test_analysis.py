@@ -8,6 +8,7 @@ from py2many.analysis import (
     AttributeCallTransformer,
     is_void_function,
 )
+from py2many.transformers import detect_mutable_vars
 
 
 def parse(*args):
@@ -90,3 +91,40 @@ class TestImportTransformer:
 
         assert len(module.imports) == 1
         assert isinstance(bar_import.imported_from, ast.ImportFrom)
+
+
+class TestMutabilityTransformer:
+    def test_mutable_args(self):
+        source = parse(
+            "def foo(a, b, c, d, e):",
+            "   a.append(1)",
+            "   b[0] = 1",
+            "   c.x = 1",
+            "   d = 2",
+            "   print(e)",
+        )
+        detect_mutable_vars(source)
+        foo = source.body[0]
+        assert foo.mutable_args == ["a", "b", "c"]
+        assert foo.rebound_args == ["d"]
+
+    def test_args_mutated_by_callee(self):
+        source = parse(
+            "def foo(a):",
+            "   a.sort()",
+            "def bar(b):",
+            "   foo(b)",
+        )
+        detect_mutable_vars(source)
+        assert source.body[1].mutable_args == ["b"]
+
+    def test_args_mutated_through_attributes(self):
+        source = parse(
+            "def foo(a, b, c, d):",
+            "   a.items.append(1)",
+            "   b.items[0] = 1",
+            "   c.x.y = 1",
+            "   print(d.items)",
+        )
+        detect_mutable_vars(source)
+        assert source.body[0].mutable_args == ["a", "b", "c"]
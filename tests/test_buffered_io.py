@@ -0,0 +1,63 @@
+import ast
+
+from py2many.buffered_io import detect_buffered_output
+
+
+def buffered(*args):
+    source = ast.parse("\n".join(args))
+    detect_buffered_output(source)
+    return sorted(
+        (node.lineno, type(node).__name__)
+        for node in ast.walk(source)
+        if getattr(node, "buffered_output", False)
+    )
+
+
+class TestBufferedOutput:
+    def test_outermost_loop(self):
+        assert buffered(
+            "for i in range(3):",
+            "    print(i)",
+            "    for j in range(i):",
+            "        sys.stdout.write(str(j))",
+            "print('done')",
+        ) == [(1, "For"), (2, "Call"), (4, "Call")]
+
+    def test_flushing_loops(self):
+        assert (
+            buffered(
+                "while True:",
+                "    line = input()",
+                "    print(line)",
+                "for i in range(3):",
+                "    print(i, flush=True)",
+                "for i in range(3):",
+                "    print(i, file=sys.stderr)",
+                "    print(i)",
+                "for i in range(3):",
+                "    print(i)",
+                "    if i > 1:",
+                "        sys.exit(1)",
+            )
+            == []
+        )
+
+    def test_called_functions(self):
+        assert buffered(
+            "def square(x):",
+            "    return x * x",
+            "def show(x):",
+            "    print(x)",
+            "def show_twice(x):",
+            "    show(x)",
+            "    show(x)",
+            "for i in range(3):",
+            "    print(square(i))",
+            "for i in range(3):",
+            "    print(i)",
+            "    show_twice(i)",
+            "for i in range(3):",
+            "    for j in range(3):",
+            "        print(j)",
+            "    show(i)",
+        ) == [(8, "For"), (9, "Call"), (14, "For"), (15, "Call")]
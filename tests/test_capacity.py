@@ -0,0 +1,135 @@
+import ast
+from py2many.analysis import add_imports
+from py2many.capacity import (
+    LenFactor,
+    RangeFactor,
+    add_list_capacity,
+    get_fixed_length_element_type,
+)
+from py2many.context import add_variable_context, add_list_calls
+from py2many.inference import infer_types
+from py2many.scope import add_scope_context
+from py2many.transformers import detect_mutable_vars
+
+
+def parse(*args):
+    source = ast.parse("\n".join(args))
+    add_scope_context(source)
+    add_variable_context(source, (source,))
+    add_list_calls(source)
+    add_imports(source)
+    infer_types(source)
+    detect_mutable_vars(source)
+    add_list_capacity(source)
+    return source
+
+
+def get_list(source, lineno):
+    return next(
+        n for n in ast.walk(source) if isinstance(n, ast.List) and n.lineno == lineno
+    )
+
+
+class TestListCapacityAnalysis:
+    def test_nested_loops(self):
+        source = parse(
+            "def foo(n: int, xs):",
+            "   results = [0]",
+            "   for x in xs:",
+            "       for i in range(n):",
+            "           results.append(i)",
+            "       results.extend([x, x])",
+            "   return results",
+        )
+        capacity = get_list(source, 2).capacity
+        assert capacity.constant == 1
+        assert len(capacity.terms) == 2
+        (coef, (xs, n)), (coef2, (xs2,)) = capacity.terms
+        assert (coef, coef2) == (1, 2)
+        assert isinstance(xs, LenFactor) and xs.seq.id == "xs"
+        assert isinstance(n, RangeFactor) and n.stop.id == "n"
+        assert xs2 == xs
+        assert not capacity.is_non_negative
+
+    def test_constant(self):
+        source = parse(
+            "results = []",
+            "for i in range(1, 7, 2):",
+            "   for j in [1, 2]:",
+            "       results.append(i + j)",
+        )
+        capacity = get_list(source, 1).capacity
+        assert capacity.is_constant
+        assert capacity.constant == 6
+
+    def test_range_of_len(self):
+        source = parse(
+            "def foo(xs):",
+            "   results = []",
+            "   for i in range(len(xs)):",
+            "       results.insert(0, i)",
+            "   return results",
+        )
+        capacity = get_list(source, 2).capacity
+        ((_, (factor,)),) = capacity.terms
+        assert isinstance(factor, LenFactor) and factor.seq.id == "xs"
+        assert capacity.is_non_negative
+
+    def test_unknown_trip_count(self):
+        source = parse(
+            "def foo(n: int, xs):",
+            "   a = []",
+            "   for i in range(n):",
+            "       if i % 2:",
+            "           a.append(i)",
+            "   b = []",
+            "   while n:",
+            "       b.append(n)",
+            "   c = []",
+            "   for x in xs:",
+            "       c.append(x)",
+            "       if x:",
+            "           break",
+            "   d = []",
+            "   for i in range(n):",
+            "       m = i",
+            "       for j in range(m):",
+            "           d.append(j)",
+        )
+        for lineno in (2, 6, 9, 14):
+            assert get_list(source, lineno).capacity is None
+
+    def test_fixed_size(self):
+        source = parse(
+            "def foo():",
+            "   a = [1, 2, 3]",
+            "   b = [1, 2]",
+            "   c = [1, 2]",
+            "   d = [1, 2]",
+            "   for x in a:",
+            "       print(a[x], len(a))",
+            "   b.append(3)",
+            "   bar(c)",
+            "   d = d[1:]",
+        )
+        assert get_list(source, 2).fixed_size == 3
+        for lineno in (3, 4, 5):
+            assert not get_list(source, lineno).fixed_size
+
+    def test_fixed_length_element_type(self):
+        source = parse(
+            "def foo(n: int):",
+            "   a = [True] * n",
+            "   b = [1.0, 2.5]",
+            "   c = [1, 2.5]",
+            "   d = [0] * n",
+            "   for i in range(n):",
+            "       a[i] = b[0] < c[1]",
+            "   d.append(1)",
+        )
+        a = source.body[0].body[0].value
+        assert a.fixed_length
+        assert get_fixed_length_element_type(a) == "bool"
+        assert get_fixed_length_element_type(get_list(source, 3)) == "float"
+        assert get_fixed_length_element_type(get_list(source, 4)) is None
+        assert not source.body[0].body[3].value.fixed_length
@@ -1,8 +1,16 @@
 import ast
-from py2many.clike import c_symbol
+from py2many.buffered_io import detect_buffered_output
+from py2many.clike import CLikeTranspiler, c_symbol
 
 
 def test_c_symbol():
     source = ast.parse("x == y")
     equals_symbol = source.body[0].value.ops[0]
     assert c_symbol(equals_symbol) == "=="
+
+
+def test_unbuffered_backend_keeps_loop():
+    source = ast.parse("for i in range(3):\n    print(i)")
+    detect_buffered_output(source)
+    loop = source.body[0]
+    assert CLikeTranspiler()._wrap_output_buffer(loop, "loop") == "loop"
@@ -0,0 +1,32 @@
+import io
+
+import pytest
+
+from py2many.code_writer import CodeWriter
+
+
+class TestCodeWriter:
+    def test_nested_writers(self):
+        body = CodeWriter()
+        body.write("a = 1;\nb = 2;")
+        body.write("")
+        writer = CodeWriter()
+        writer.write("{")
+        writer.write(body)
+        writer.append("}")
+        assert writer.getvalue() == "{\na = 1;\nb = 2;\n}"
+        stream = io.StringIO()
+        writer.write_to(stream)
+        assert stream.getvalue() == writer.getvalue()
+        with pytest.raises(TypeError):
+            writer.write(None)
+
+    def test_indent(self):
+        writer = CodeWriter(indent="  ")
+        writer.write("for x in xs:")
+        with writer.indent():
+            writer.write("if x:\n\n    pass")
+            inner = CodeWriter()
+            inner.write("y")
+            writer.write(inner)
+        assert writer.getvalue() == "for x in xs:\n  if x:\n\n      pass\n  y"
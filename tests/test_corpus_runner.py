@@ -0,0 +1,29 @@
+from corpus_runner import (
+    FAILED,
+    PASSED,
+    SKIPPED,
+    CaseResult,
+    _cache_key,
+    format_report,
+)
+
+
+class TestCorpusRunner:
+    def test_cache_key_depends_on_code(self):
+        compiler = ["g++", "-std=c++17"]
+        key = _cache_key("cpp", compiler, "int main() {}")
+        assert key == _cache_key("cpp", compiler, "int main() {}")
+        assert key != _cache_key("cpp", compiler, "int main() { return 1; }")
+        assert key != _cache_key("cpp", ["clang++"], "int main() {}")
+
+    def test_report(self):
+        results = [
+            CaseResult("cpp", "fib", PASSED, timings={"transpile": 0.5, "run": 2}),
+            CaseResult("cpp", "dict", FAILED, "output differs", timings={"run": 1}),
+            CaseResult("go", "fib", SKIPPED, "go not available"),
+        ]
+        report = format_report(results, slowest=1).splitlines()
+        assert report[1].split()[:4] == ["cpp", "1", "1", "0"]
+        assert report[2].split()[:4] == ["go", "0", "0", "1"]
+        assert "2.50s cpp/fib" in report[5]
+        assert report[-1] == "  cpp/dict: output differs"
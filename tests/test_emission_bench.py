@@ -0,0 +1,74 @@
+"""Benchmark for code emission.
+
+Transpiles functions with the same number of statements nested at
+increasing depths and times the emission of the final tree. Visitors
+that write into a CodeWriter copy each line once, so the time should
+not grow with the depth as it did when every block joined its
+children's strings.
+"""
+
+import argparse
+import ast
+import time
+from pathlib import Path
+
+import pytest
+
+from py2many.cli import _transpile, cpp_settings, go_settings, rust_settings
+from py2many.code_writer import CodeWriter
+
+STATEMENTS = 1000
+DEPTHS = [1, 16, 64]
+REPEAT = 5
+
+
+def _source(depth):
+    per_level = STATEMENTS // depth
+    lines = ["def f(x: int) -> int:"]
+    for level in range(depth):
+        indent = "    " * (level + 1)
+        lines.append(f"{indent}if x > {level}:")
+        lines.extend([f"{indent}    x = x + {i}" for i in range(per_level)])
+    lines.append("    return x")
+    return "\n".join(lines)
+
+
+def _emission_time(settings, source):
+    """Best time out of REPEAT emissions of the transpiled module"""
+    args = argparse.Namespace(
+        pytype=False,
+        typpete=False,
+        import_basedir=None,
+        config=None,
+        extension=False,
+        no_prologue=True,
+        indent=4,
+        expected=None,
+    )
+    settings = settings(args)
+    transpiler = settings.transpiler
+    emit = transpiler.emit
+    times = []
+
+    def timed_emit(node, writer, *args):
+        if not isinstance(node, ast.Module):
+            return emit(node, writer, *args)
+        for _ in range(REPEAT):
+            start = time.perf_counter()
+            emit(node, CodeWriter())
+            times.append(time.perf_counter() - start)
+        emit(node, writer, *args)
+
+    transpiler.emit = timed_emit
+    filename = Path("bench.py")
+    _, successful = _transpile([filename], [source], settings, args, basedir=Path("."))
+    assert successful == [filename]
+    return min(times)
+
+
+@pytest.mark.parametrize("settings", [cpp_settings, go_settings, rust_settings])
+def test_bench(settings):
+    results = {depth: _emission_time(settings, _source(depth)) for depth in DEPTHS}
+    for depth, seconds in results.items():
+        print(f"{settings.__name__} depth {depth}: {seconds * 1000:.1f}ms")
+    assert results[DEPTHS[-1]] < 3 * results[DEPTHS[0]]
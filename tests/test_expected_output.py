@@ -0,0 +1,66 @@
+import pytest
+
+from py2many.cli import _compare_file_contents
+from py2many.expected_output import ExpectedOutputs
+
+
+@pytest.fixture
+def expected_dir(tmp_path):
+    (tmp_path / "fib.rs").write_text("fn main() {\n    fib(3);\n}\n")
+    (tmp_path / "fib.go").write_text("package main\n")
+    return tmp_path
+
+
+class TestExpectedOutputs:
+    def test_match(self, expected_dir):
+        expected = ExpectedOutputs(expected_dir)
+        assert "fib.rs" in expected
+        assert expected.compare("fib.rs", "fn main() {\n    fib(3);\n}\n") is None
+
+    def test_mismatch_diff(self, expected_dir):
+        expected = ExpectedOutputs(expected_dir)
+        diff = expected.compare("fib.rs", "fn main() {\n    fib(4);\n}\n")
+        assert "-    fib(3);\n+    fib(4);\n" in diff
+        assert diff.startswith("--- expected/fib.rs\n+++ generated/fib.rs\n")
+
+    def test_ignore_whitespace(self, expected_dir):
+        expected = ExpectedOutputs(expected_dir, ignore_whitespace=True)
+        assert expected.matches("fib.rs", "fn main() { fib(3); }")
+        assert not ExpectedOutputs(expected_dir).matches(
+            "fib.rs", "fn main() { fib(3); }"
+        )
+
+    def test_missing(self, expected_dir):
+        expected = ExpectedOutputs(expected_dir)
+        assert "fib.kt" not in expected
+        with pytest.raises(FileNotFoundError):
+            expected.compare("fib.kt", "")
+
+    def test_update(self, expected_dir):
+        expected = ExpectedOutputs(expected_dir)
+        expected.load()
+        changed = expected.update(
+            {"fib.go": "package main\n", "fib.rs": "fn main() {}\n", "fib.kt": "x"}
+        )
+        assert changed == ["fib.kt", "fib.rs"]
+        assert expected.compare("fib.rs", "fn main() {}\n") is None
+        assert "fib.kt" in expected
+        assert sorted(p.name for p in expected_dir.iterdir()) == [
+            "fib.go",
+            "fib.kt",
+            "fib.rs",
+        ]
+
+    def test_update_is_atomic(self, expected_dir):
+        expected = ExpectedOutputs(expected_dir)
+        with pytest.raises(TypeError):
+            expected.update({"fib.rs": "fn main() {}\n", "fib.go": None})
+        assert expected.compare("fib.rs", "fn main() {\n    fib(3);\n}\n") is None
+        assert sorted(p.name for p in expected_dir.iterdir()) == ["fib.go", "fib.rs"]
+
+    def test_compare_after_update(self, expected_dir, tmp_path_factory):
+        generated = tmp_path_factory.mktemp("generated") / "fib.kt"
+        generated.write_text("fun main() {}\n")
+        assert _compare_file_contents(expected_dir / "fib.rs", expected_dir / "fib.rs")
+        ExpectedOutputs(expected_dir).update({"fib.kt": "fun main() {}\n"})
+        assert _compare_file_contents(expected_dir / "fib.kt", generated)
@@ -0,0 +1,91 @@
+import ast
+
+from py2many.analysis import add_imports
+from py2many.context import add_variable_context
+from py2many.inference import infer_types
+from py2many.scope import add_scope_context
+from pyjl.rewriters import JuliaGlobalScopeRewriter, JuliaMainRewriter
+
+
+def rewrite(*args):
+    source = ast.parse("\n".join(args))
+    add_scope_context(source)
+    add_variable_context(source, (source,))
+    add_imports(source)
+    infer_types(source)
+    JuliaMainRewriter().visit(source)
+    JuliaGlobalScopeRewriter().visit(source)
+    return source
+
+
+def constants(source):
+    return [
+        ast.unparse(n.targets[0] if isinstance(n, ast.Assign) else n.target)
+        for n in source.body
+        if getattr(n, "use_constant", False)
+    ]
+
+
+class TestGlobalScopeRewriter:
+    def test_main_block(self):
+        source = rewrite(
+            "N = 10",
+            "counter = 0",
+            "names = {'a': 1}",
+            "def bump(k: int):",
+            "    global counter",
+            "    counter = counter + k",
+            "def show(total):",
+            "    print(N, counter, names, total)",
+            "if __name__ == '__main__':",
+            "    total = 0",
+            "    for i in range(N):",
+            "        total += i",
+            "        bump(i)",
+            "    counter += 1",
+            "    show(total)",
+        )
+        assert constants(source) == ["N", "counter", "names"]
+        assert ast.unparse(source.body[1].value) == "Ref[int](0)"
+        bump, show, main, main_if = source.body[3:]
+        assert ast.unparse(bump.body) == "counter[] = counter[] + k"
+        assert "print(N, counter[], names, total)" in ast.unparse(show)
+        assert main.name == "main"
+        assert ast.unparse(main.body[-2]) == "counter[] += 1"
+        assert ast.unparse(main_if.body) == "main()"
+
+    def test_shared_and_unsafe_globals(self):
+        source = rewrite(
+            "xs = []",
+            "scale = 2.0",
+            "def f():",
+            "    return [x * scale for x in xs] + [total]",
+            "scale = 'big'",
+            "total = 0",
+            "for x in range(3):",
+            "    total += x",
+            "    xs.append(x)",
+        )
+        assert constants(source) == ["xs", "total"]
+        main = source.body[-2]
+        assert ast.unparse(main.body[0]) == "global x"
+        assert ast.unparse(main.body[1].body[0]) == "total[] += x"
+        assert ast.unparse(source.body[-1]) == "main()"
+
+    def test_unchanged(self):
+        source = rewrite(
+            "def f():",
+            "    global count",
+            "    count = 1",
+            "f()",
+            "count = count + 1",
+            "if __name__ == '__main__':",
+            "    class A:",
+            "        pass",
+            "    count += 1",
+        )
+        assert constants(source) == []
+        assert source.body[-1].body[0].name == "A"
+        assert ast.unparse(source.body[-1].body[1]) == "count += 1"
+        source = rewrite("i = 0", "while i < 3:", "    i += 1", "print(eval('i'))")
+        assert not any(isinstance(n, ast.FunctionDef) for n in source.body)
@@ -0,0 +1,180 @@
+import argparse
+import ast
+import gc
+import weakref
+
+from pathlib import Path
+
+import py2many.cli
+
+from py2many.analysis import add_imports
+from py2many.cli import _transpile_streaming, python_settings
+from py2many.context import add_variable_context
+from py2many.inference import infer_types
+from py2many.module_summary import (
+    SummaryLoader,
+    load_summary,
+    summarize_module,
+    summary_key,
+    summary_path,
+    write_summary,
+)
+from py2many.scope import add_scope_context
+
+
+def parse(*args, filename="mod.py"):
+    source = ast.parse("\n".join(args))
+    source.__file__ = Path(filename)
+    source.__basedir__ = Path(".")
+    add_scope_context(source)
+    add_variable_context(source, (source,))
+    add_imports(source)
+    return source
+
+
+class TestModuleSummary:
+    def test_function_stub(self):
+        source = parse("def foo(x: int) -> int:", "    y = x + 1", "    return y")
+        summary = summarize_module(source)
+        foo = summary.scopes.find("foo")
+        assert isinstance(foo, ast.FunctionDef)
+        assert get_arg_names(foo) == ["x"]
+        assert ast.unparse(foo.returns) == "int"
+        assert len(foo.body) == 1
+
+    def test_uninferred_return_is_not_void(self):
+        source = parse("def foo(x):", "    return bar(x)")
+        summary = summarize_module(source)
+        foo = summary.scopes.find("foo")
+        assert isinstance(foo.body[0], ast.Return)
+
+    def test_global_annotation(self):
+        source = parse("X = 3", "Y = [1, 2]")
+        infer_types(source)
+        summary = summarize_module(source)
+        x = summary.scopes.find("X")
+        assert ast.unparse(x.annotation) == "int"
+        assert x.assigned_from.value.value == 3
+        y = summary.scopes.find("Y")
+        assert isinstance(y.assigned_from.value.value, type(...))
+
+    def test_class_vars(self):
+        source = parse(
+            "class Foo:",
+            "    def __init__(self, x: int):",
+            "        self.x = x",
+            "    def bar(self):",
+            "        pass",
+        )
+        summary = summarize_module(source)
+        foo = summary.scopes.find("Foo")
+        assert isinstance(foo, ast.ClassDef)
+        assert {get_id(v) for v in foo.vars} == {"__init__", "bar", "x"}
+
+    def test_does_not_keep_tree_alive(self):
+        source = parse("def foo(x: int) -> int:", "    return x", "X = 3")
+        infer_types(source)
+        ref = weakref.ref(source)
+        summary = summarize_module(source)
+        del source
+        gc.collect()
+        assert ref() is None
+        assert summary.scopes.find("foo") is not None
+
+
+class TestSummaryFiles:
+    def test_write_load(self, tmp_path):
+        source = parse("def foo(x: int) -> int:", "    return x")
+        path = summary_path(tmp_path / "mod.rs")
+        assert path.name == "mod.rs.summary"
+        key = summary_key("def foo(x: int) -> int: ...")
+        interface_hash = write_summary(
+            path, summarize_module(source), key, {"dep": "h1"}
+        )
+        loaded = load_summary(path, key)
+        assert loaded.dep_hashes == {"dep": "h1"}
+        assert loaded.interface_hash == interface_hash
+        foo = loaded.summary.scopes.find("foo")
+        assert ast.unparse(foo.returns) == "int"
+        assert load_summary(path, summary_key("changed")) is None
+        assert load_summary(tmp_path / "missing.summary", key) is None
+
+    def test_loader(self, tmp_path):
+        src_dir, out_dir = tmp_path / "src", tmp_path / "out"
+        (src_dir / "pkg").mkdir(parents=True)
+        (out_dir / "pkg").mkdir(parents=True)
+        sources = {
+            "pkg.a": "def foo(x: int) -> int:\n    return x\n",
+            "pkg.b": "from pkg.a import foo\nY: int = 1\n",
+        }
+        hashes = {}
+        for module, code in sources.items():
+            path = Path(*module.split("."))
+            (src_dir / f"{path}.py").write_text(code)
+            deps = {d: hashes[d] for d in hashes}
+            tree = parse(code, filename=f"{path}.py")
+            hashes[module] = write_summary(
+                summary_path(out_dir / f"{path}.rs"),
+                summarize_module(tree),
+                summary_key(code),
+                deps,
+            )
+        main = parse("from pkg.b import Y", filename="main.py")
+        deps = SummaryLoader(src_dir, out_dir, ".rs").dependencies(main)
+        assert list(deps) == ["pkg.b"]
+        assert deps["pkg.b"].summary.scopes.find("Y") is not None
+        # A summary is stale when one of its dependencies changed
+        (src_dir / "pkg" / "a.py").write_text("def bar(): pass\n")
+        assert SummaryLoader(src_dir, out_dir, ".rs").dependencies(main) == {}
+
+
+class TestStreaming:
+    def test_summaries_dropped_after_last_import(self, tmp_path, monkeypatch):
+        sources = {
+            "a": "def foo(x: int) -> int:\n    return x\n",
+            # Names imported with from would be re-exported by b
+            "b": "import a\ndef bar() -> int:\n    return a.foo(1)\n",
+            "c": "from b import bar\nY = bar()\n",
+        }
+        for module, code in sources.items():
+            (tmp_path / f"{module}.py").write_text(code)
+        summarize, emit_one = py2many.cli.summarize_module, py2many.cli._emit_one
+        summaries = {}
+        # module -> (summaries it is transpiled with, summaries still alive)
+        seen = {}
+
+        def track_summary(tree):
+            summary = summarize(tree)
+            summaries[tree.__file__.stem] = weakref.ref(summary)
+            return summary
+
+        def record_trees(trees, tree, *args):
+            gc.collect()
+            alive = [m for m, ref in summaries.items() if ref() is not None]
+            seen[tree.__file__.stem] = ([t.__file__.stem for t in trees[:-1]], alive)
+            return emit_one(trees, tree, *args)
+
+        monkeypatch.setattr(py2many.cli, "summarize_module", track_summary)
+        monkeypatch.setattr(py2many.cli, "_emit_one", record_trees)
+        args = argparse.Namespace(
+            pytype=False, typpete=False, import_basedir=None, config=None
+        )
+        filenames = [Path(f"{module}.py") for module in sources]
+        successful = _transpile_streaming(
+            filenames,
+            [tmp_path / f"{module}_out.py" for module in sources],
+            python_settings(args),
+            args,
+            basedir=tmp_path,
+        )
+        assert successful == filenames
+        # a is not needed once b, its only importer, is transpiled
+        assert seen == {"a": ([], []), "b": (["a"], ["a"]), "c": (["b"], ["b"])}
+
+
+def get_arg_names(node):
+    return [a.arg for a in node.args.args]
+
+
+def get_id(node):
+    return getattr(node, "name", getattr(node, "id", None))
@@ -0,0 +1,73 @@
+import ast
+
+from py2many.node_index import Interests, NodeIndex
+from py2many.visitor import NodeTransformer
+
+
+class Counter(NodeTransformer):
+    def __init__(self):
+        super().__init__()
+        self.visited = []
+
+    def visit_Call(self, node):
+        self.visited.append(ast.unparse(node))
+        self.generic_visit(node)
+        return node
+
+
+class PrintCounter(Counter):
+    interests = Interests(calls=["print"])
+
+
+class PrunedPrintCounter(Counter):
+    interests = Interests(calls=["print"], prune=True)
+
+
+SOURCE = "\n".join(
+    [
+        "import os.path",
+        "def f(x):",
+        "    g(x)",
+        "    if x:",
+        "        print(h(x))",
+        "def k():",
+        "    return g(1)",
+    ]
+)
+
+
+class TestNodeIndex:
+    def test_lookup(self):
+        tree = ast.parse(SOURCE)
+        index = NodeIndex(tree)
+        assert len(index.nodes(Interests(nodes=[ast.FunctionDef]))) == 2
+        assert len(index.nodes(Interests(nodes=[ast.stmt]))) == 7
+        (call,) = index.nodes(Interests(calls=["print"]))
+        assert [type(n).__name__ for n in index.ancestors(call)] == [
+            "Expr",
+            "If",
+            "FunctionDef",
+            "Module",
+        ]
+        assert index.nodes(Interests(imports=["os"])) == [tree.body[0]]
+        assert index.nodes(Interests(imports=["path"])) == []
+
+    def test_skip(self):
+        tree = ast.parse("def k():\n    return g(1)")
+        rewriter = PrintCounter()
+        assert NodeIndex(tree).run(rewriter, tree) is tree
+        assert rewriter.visited == []
+        rewriter = Counter()
+        NodeIndex(tree).run(rewriter, tree)
+        assert rewriter.visited == ["g(1)"]
+
+    def test_prune(self):
+        tree = ast.parse(SOURCE)
+        index = NodeIndex(tree)
+        rewriter = PrintCounter()
+        index.run(rewriter, tree)
+        assert rewriter.visited == ["g(x)", "print(h(x))", "h(x)", "g(1)"]
+        rewriter = PrunedPrintCounter()
+        index.run(rewriter, tree)
+        assert rewriter.visited == ["print(h(x))"]
+        assert rewriter.prune is None
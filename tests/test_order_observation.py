@@ -0,0 +1,66 @@
+import ast
+
+from py2many.context import add_variable_context
+from py2many.scope import add_scope_context
+from pyjl.transformers import JuliaOrderObservationAnalysis
+
+
+def parse(*args):
+    source = ast.parse("\n".join(args))
+    add_scope_context(source)
+    add_variable_context(source, (source,))
+    JuliaOrderObservationAnalysis().visit(source)
+    return source
+
+
+def get_literal(source, name):
+    for node in ast.walk(source):
+        if isinstance(node, ast.Assign) and ast.unparse(node.targets[0]) == name:
+            return node.value
+
+
+class TestOrderObservationAnalysis:
+    def test_lookup_tables(self):
+        source = parse(
+            "table = {'a': 1}",
+            "seen = {1, 2}",
+            "counts = {}",
+            "def count(words):",
+            "   for w in words:",
+            "       if w not in seen and table.get(w) is not None:",
+            "           seen.add(w)",
+            "           counts[w] = counts.pop(w, 0) + table[w]",
+            "       del counts[w]",
+            "   return len(counts) + len(sorted(seen))",
+        )
+        for name in ("table", "seen", "counts"):
+            assert not get_literal(source, name).order_observed
+
+    def test_order_observed(self):
+        source = parse(
+            "iterated = {1: 2}",
+            "printed = {1, 2}",
+            "popped = {1, 2}",
+            "returned = {1: 2}",
+            "items = {1: 2}",
+            "aliased = {1: 2}",
+            "passed = {1: 2}",
+            "for k in iterated:",
+            "   print(printed)",
+            "x = popped.pop()",
+            "y = list(items.items())",
+            "other = aliased",
+            "foo(passed)",
+            "def bar():",
+            "   return returned",
+        )
+        for name in (
+            "iterated",
+            "printed",
+            "popped",
+            "returned",
+            "items",
+            "aliased",
+            "passed",
+        ):
+            assert get_literal(source, name).order_observed, name
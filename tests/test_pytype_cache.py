@@ -0,0 +1,39 @@
+from pathlib import Path
+
+from py2many.pytype_inference import PyiCache, _cache_key, _get_module_graph
+
+
+class TestPyiCache:
+    def test_put_get(self, tmp_path):
+        cache = PyiCache(str(tmp_path / "cache.sqlite"))
+        assert cache.get("pkg.a", "k1") is None
+        interface_hash = cache.put("pkg.a", "k1", "def f() -> int: ...\n")
+        assert cache.get("pkg.a", "k1") == ("def f() -> int: ...\n", interface_hash)
+        cache.close()
+        # Persisted across connections
+        cache = PyiCache(str(tmp_path / "cache.sqlite"))
+        assert cache.get("pkg.a", "k1")[1] == interface_hash
+        cache.close()
+
+    def test_stale_entries_are_removed(self, tmp_path):
+        cache = PyiCache(str(tmp_path / "cache.sqlite"))
+        cache.put("pkg.a", "k1", "def f() -> int: ...\n")
+        cache.put("pkg.b", "k1", "def g() -> int: ...\n")
+        cache.put("pkg.a", "k2", "def f() -> str: ...\n")
+        assert cache.get("pkg.a", "k1") is None
+        assert cache.get("pkg.a", "k2") is not None
+        assert cache.get("pkg.b", "k1") is not None
+        cache.close()
+
+    def test_key_depends_on_dependency_interfaces(self):
+        src = "from pkg.a import f\n"
+        key = _cache_key(src, {"pkg.a"}, {"pkg.a": "h1"})
+        assert key == _cache_key(src, {"pkg.a"}, {"pkg.a": "h1"})
+        assert key != _cache_key(src, {"pkg.a"}, {"pkg.a": "h2"})
+        assert key != _cache_key(src + "\n", {"pkg.a"}, {"pkg.a": "h1"})
+
+    def test_module_graph(self):
+        sources = ["def f(): pass", "from pkg.a import f", "import os"]
+        filenames = [Path("pkg/a.py"), Path("pkg/b.py"), Path("pkg/c.py")]
+        deps = _get_module_graph(sources, Path("proj"), filenames)
+        assert deps == {"pkg.a": set(), "pkg.b": {"pkg.a"}, "pkg.c": set()}
@@ -0,0 +1,113 @@
+import ast
+import json
+
+from py2many.analysis import add_imports
+from py2many.capacity import add_list_capacity
+from py2many.context import add_list_calls, add_variable_context
+from py2many.inference import infer_types
+from py2many.input_configuration import AnnotationRewriter, ParseAnnotations
+from py2many.runtime_profile import record, runtime_type
+from py2many.scope import add_scope_context
+from py2many.transformers import detect_mutable_vars
+
+LIB = """\
+def build(n):
+    out = [0]
+    k = 0
+    while k < n:
+        out.append(k * 2)
+        k += 1
+    return out
+
+
+def total(xs, scale: float):
+    s = 0.0
+    for x in xs:
+        if x > 2:
+            break
+        s += x * scale
+    return s
+
+
+class Counter:
+    def add(self, counts, key):
+        counts[key] = counts.get(key, 0) + 1
+        return counts
+"""
+
+SCRIPT = """\
+import sys
+from lib import Counter, build, total
+
+for i in range(int(sys.argv[1])):
+    total(build(i), 0.5)
+Counter().add({"a": 1}, "a")
+"""
+
+
+def record_lib(tmp_path, output="profile.json"):
+    (tmp_path / "lib.py").write_text(LIB)
+    (tmp_path / "main.py").write_text(SCRIPT)
+    output = tmp_path / output
+    record(tmp_path / "main.py", ["4"], output, [tmp_path / "lib.py"])
+    return output
+
+
+def parse(source, filename):
+    tree = ast.parse(source)
+    add_scope_context(tree)
+    AnnotationRewriter(ParseAnnotations(filename, "lib")).visit(tree)
+    add_variable_context(tree, (tree,))
+    add_list_calls(tree)
+    add_imports(tree)
+    infer_types(tree)
+    detect_mutable_vars(tree)
+    add_list_capacity(tree)
+    return tree
+
+
+class TestRuntimeProfile:
+    def test_runtime_type(self):
+        assert str(runtime_type([1, 2.0])) == "list[float]"
+        assert str(runtime_type({"a": None, "b": 1})) == "dict[str, Optional[int]]"
+        assert str(runtime_type((1, "a"))) == "tuple[int, str]"
+        assert str(runtime_type(tuple(range(20)))) == "tuple[int, ...]"
+        assert str(runtime_type([1, "a"])) == "list"
+        assert runtime_type([]) is None
+
+    def test_record(self, tmp_path):
+        profile = json.loads(record_lib(tmp_path).read_text())
+        functions = profile["modules"]["lib"]["functions"]
+        assert functions["build"] == {
+            "args": {"n": "int"},
+            "returns": "list[int]",
+            "hotness": {
+                "calls": 4,
+                "loops": {"3": {"iterations": 6, "max_trips": 3}},
+            },
+        }
+        # Annotated arguments are left alone. The last run of the loop
+        # breaks out of its fourth iteration
+        assert functions["total"] == {
+            "args": {"xs": "list[int]"},
+            "returns": "float",
+            "hotness": {
+                "calls": 4,
+                "loops": {"2": {"iterations": 10, "max_trips": 4}},
+            },
+        }
+        add = profile["modules"]["lib"]["classes"]["Counter"]["functions"]["add"]
+        assert add["args"] == {"counts": "dict[str, int]", "key": "str"}
+
+    def test_annotations(self, tmp_path):
+        tree = parse(LIB, record_lib(tmp_path, "profile.yaml"))
+        build, total = tree.body[:2]
+        assert ast.unparse(build.args) == "n: int"
+        assert ast.unparse(build.returns) == "list[int]"
+        assert ast.unparse(total.args) == "xs: list[int], scale: float"
+        assert build.call_count == 4
+        loop = build.body[2]
+        assert (loop.iterations, loop.trip_count) == (6, 3)
+        # The while loop ran at most 3 times after the initial element
+        capacity = build.body[0].value.capacity
+        assert (capacity.constant, capacity.terms) == (4, [])
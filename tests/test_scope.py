@@ -1,5 +1,8 @@
 import ast
-from py2many.scope import add_scope_context
+
+import pytest
+
+from py2many.scope import ScopeTransformer, add_scope_context
 from py2many.context import add_variable_context
 
 
@@ -16,6 +19,18 @@ class TestScopeTransformer:
         assert isinstance(source.body[0].scopes[-1], ast.FunctionDef)
         assert isinstance(source.body[0].body[0].scopes[-1], ast.FunctionDef)
 
+    def test_failed_visit_leaves_no_scopes(self):
+        class Failing(ScopeTransformer):
+            def visit_Return(self, node):
+                raise ValueError
+
+        source = ast.parse("def foo():\n   return 10")
+        with pytest.raises(ValueError):
+            Failing().visit(source)
+        assert ScopeTransformer().scopes == []
+        add_scope_context(source)
+        assert source.body[0].scopes == [source, source.body[0]]
+
 
 class TestScopeList:
     def test_find_returns_most_upper_definition(self):
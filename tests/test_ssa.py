@@ -0,0 +1,123 @@
+import ast
+
+from py2many.analysis import add_imports
+from py2many.context import add_variable_context
+from py2many.inference import infer_types
+from py2many.scope import add_scope_context
+from py2many.ssa import build_ssa
+from py2many.ssa_optimizations import optimize_ssa
+
+
+def parse(*args):
+    source = ast.parse("\n".join(args))
+    add_scope_context(source)
+    add_variable_context(source, (source,))
+    add_imports(source)
+    infer_types(source)
+    return source
+
+
+def optimize(*args):
+    source = parse(*args)
+    optimize_ssa(source)
+    return ast.unparse(source).splitlines()
+
+
+def reads(func, var):
+    return [
+        n.ssa_definition
+        for n in ast.walk(func)
+        if isinstance(n, ast.Name) and n.id == var and isinstance(n.ctx, ast.Load)
+    ]
+
+
+class TestSSA:
+    def test_phi_at_join(self):
+        func = parse(
+            "def f(c: bool):",
+            "    x = 1",
+            "    if c:",
+            "        x = 2",
+            "    return x",
+        ).body[0]
+        ssa = build_ssa(func)
+        (phi,) = reads(func, "x")
+        assert phi.is_phi
+        assert [o.value.value for o in phi.operands] == [2, 1]
+        assert [d.kind for d in ssa.definitions_of("x")] == ["assign", "assign", "phi"]
+
+    def test_loop_phi(self):
+        func = parse(
+            "def f(n: int):",
+            "    i = 0",
+            "    while i < n:",
+            "        i += 1",
+            "    return i",
+        ).body[0]
+        build_ssa(func)
+        test, ret = reads(func, "i")
+        assert test is ret
+        assert [o.kind for o in test.operands] == ["assign", "augassign"]
+        assert test.operands[1].operands == [test]
+        assert ast.unparse(test.annotation) == "int"
+
+    def test_unsupported(self):
+        func = parse("def f():", "    x = 1", "    return locals()").body[0]
+        assert build_ssa(func) is None
+
+
+class TestSSAOptimizations:
+    def test_constant_branches(self):
+        assert optimize(
+            "def f(n: int):",
+            "    debug = False",
+            "    step = 2",
+            "    if debug or step * 2 != 4:",
+            "        print(n)",
+            "    else:",
+            "        n += step",
+            "    while step > 3:",
+            "        n -= 1",
+            "    return n",
+        )[3:] == ["    n += step", "    return n"]
+
+    def test_dead_stores(self):
+        assert optimize(
+            "def f(c: bool):",
+            "    x = 0",
+            "    y = 1",
+            "    y = x + 1",
+            "    if c:",
+            "        y = 2",
+            "    y = 3",
+            "    y += g(c)",
+            "    return y",
+        )[1:] == [
+            "    x = 0",
+            "    y = 1",
+            "    if c:",
+            "        pass",
+            "    y = 3",
+            "    y += g(c)",
+            "    return y",
+        ]
+
+    def test_copies(self):
+        assert optimize(
+            "def f(a: int, b: str, c: bool):",
+            "    x = a",
+            "    s = b",
+            "    y = a",
+            "    print(x + 1, s)",
+            "    if c:",
+            "        a = 2",
+            "    print(y)",
+        ) == [
+            "def f(a: int, b: str, c: bool):",
+            "    s = b",
+            "    y = a",
+            "    print(a + 1, s)",
+            "    if c:",
+            "        a = 2",
+            "    print(y)",
+        ]
@@ -0,0 +1,85 @@
+import ast
+
+from py2many.analysis import add_imports
+from py2many.context import add_variable_context
+from py2many.inference import infer_types
+from py2many.rewriters import StringBuilderRewriter
+from py2many.scope import add_scope_context
+
+
+def rewrite(*args, language="go"):
+    source = ast.parse("\n".join(args))
+    add_scope_context(source)
+    add_variable_context(source, (source,))
+    add_imports(source)
+    infer_types(source)
+    StringBuilderRewriter(language).visit(source)
+    return source
+
+
+class TestStringBuilderRewriter:
+    def test_loop_appends(self):
+        source = rewrite(
+            "def join(xs, n: int):",
+            "    s = ''",
+            "    for x in xs:",
+            "        for i in range(n):",
+            "            s += x",
+            "    s += '.'",
+            "    print(s)",
+            "    return s",
+        )
+        init, loop, end, read, _, _ = source.body[0].body
+        assert init.string_builder
+        assert ast.unparse(init) == "s_builder = ''"
+        assert loop.body[0].body[0].string_builder
+        assert ast.unparse(loop.body[0].body[0]) == "s_builder += x"
+        assert end.string_builder
+        assert ast.unparse(read) == "s = s_builder"
+        assert read.value.string_builder
+
+    def test_unchanged(self):
+        source = rewrite(
+            "def f(xs):",
+            "    a = ''",
+            "    for x in xs:",
+            "        a += x",
+            "        print(a)",
+            "    b = ''",
+            "    for x in xs:",
+            "        b = b + x",
+            "    c = ''",
+            "    c += 'x'",
+            "    d = ''",
+            "    for x in xs:",
+            "        d += d",
+            "    e = 0",
+            "    for x in xs:",
+            "        e += x",
+            "    return a + b + c + d",
+        )
+        assert not any(getattr(n, "string_builder", False) for n in ast.walk(source))
+
+    def test_languages(self):
+        lines = ("s = ''", "for x in ['a']:", "    s += x")
+        assert not hasattr(rewrite(*lines, language="cpp").body[0], "string_builder")
+        assert rewrite(*lines, language="julia").body[0].string_builder
+
+    def test_read_outside_block(self):
+        source = rewrite(
+            "def f(cond: bool, xs: list[str]) -> str:",
+            "    s: str = 'x'",
+            "    if cond:",
+            "        s = ''",
+            "        for x in xs:",
+            "            s += x",
+            "    return s",
+            "def g(xs: list[str], n: int):",
+            "    t = ''",
+            "    for i in range(n):",
+            "        print(t)",
+            "        t = ''",
+            "        for x in xs:",
+            "            t += x",
+        )
+        assert not any(getattr(n, "string_builder", False) for n in ast.walk(source))
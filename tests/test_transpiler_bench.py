@@ -0,0 +1,68 @@
+import ast
+import math
+
+from transpiler_bench import (
+    SYNTHETIC_KINDS,
+    TOTAL,
+    BenchResult,
+    find_regressions,
+    fit_exponent,
+    measure,
+    scaling_exponents,
+    superlinear_passes,
+    synthetic_corpus,
+    synthetic_source,
+)
+
+
+def run(key, lines, passes, peak_memory=None):
+    result = {"lines": lines, "passes": passes, "peak_memory": peak_memory}
+    return {"results": {key: result}}
+
+
+class TestTranspilerBench:
+    def test_synthetic_sources(self):
+        for kind in SYNTHETIC_KINDS:
+            small, large = synthetic_source(kind, 200), synthetic_source(kind, 800)
+            ast.parse(small)
+            assert 100 < small.count("\n") < 200 < large.count("\n") / 3
+
+    def test_measure(self):
+        result = measure("cpp", synthetic_corpus("functions", 60), repeat=1)
+        assert result.key == "cpp/functions-60"
+        assert result.failures == 0
+        assert result.peak_memory > 0
+        assert {"parse", "inference", "emit", "add_scope_context"} <= set(result.passes)
+        assert math.isclose(sum(result.passes.values()), 2 * result.passes[TOTAL])
+
+    def test_fit_exponent(self):
+        sizes = [100, 200, 400, 800]
+        assert math.isclose(fit_exponent(sizes, [s * 1e-3 for s in sizes]), 1)
+        assert math.isclose(fit_exponent(sizes, [s * s * 1e-6 for s in sizes]), 2)
+
+    def test_superlinear(self):
+        results = [
+            BenchResult(
+                "cpp", f"nesting-{n}", n, passes={TOTAL: n * 1e-3, "a": n * n * 1e-6}
+            )
+            for n in (100, 200, 400)
+        ]
+        exponents = scaling_exponents(results)
+        assert math.isclose(exponents["cpp/nesting"][TOTAL], 1)
+        assert superlinear_passes(exponents) == ["cpp/nesting a: time ~ lines ** 2.00"]
+
+    def test_regressions(self):
+        history = [run("cpp/cases", 1000, {"parse": 0.1, "emit": 0.002}, 2**20)] * 3
+        history.append(run("go/cases", 1000, {"parse": 0.01}))
+        result = BenchResult(
+            "cpp",
+            "cases",
+            2000,
+            peak_memory=2**21,
+            passes={"parse": 0.3, "emit": 0.004, "inference": 1.0},
+        )
+        assert find_regressions(history, [result], threshold=0.25) == [
+            "cpp/cases parse: 150.0us per line, was 100.0us (+50%)",
+            "cpp/cases peak memory: 2.0MiB, was 1.0MiB (+100%)",
+        ]
+        assert find_regressions(history, [result], threshold=1.0) == []
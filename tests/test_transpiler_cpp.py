@@ -1,7 +1,17 @@
+import ast
 import sys
 import textwrap
 
-from pycpp.transpiler import transpile
+from py2many.context import add_variable_context
+from py2many.scope import add_scope_context
+from py2many.transformers import detect_mutable_vars
+from pycpp.transpiler import (
+    PASS_BY_CONST_REF,
+    PASS_BY_REF,
+    PASS_BY_VALUE,
+    _analyse_arg_passing,
+    transpile,
+)
 
 
 def parse(*args):
@@ -168,3 +178,30 @@ def test_map_function():
         return results;}
     """
     assert cpp == textwrap.dedent(expected)
+
+
+def test_arg_passing():
+    source = ast.parse(
+        "\n".join(
+            [
+                "def foo(a: List[int], b: List[int], s: str, t: str, n: int):",
+                "   a.append(n)",
+                "   x = t",
+                "   return len(b) + len(s) + len(x)",
+            ]
+        )
+    )
+    add_scope_context(source)
+    add_variable_context(source, (source,))
+    detect_mutable_vars(source)
+    foo = source.body[0]
+    _analyse_arg_passing(foo)
+    passing = {arg.arg: getattr(arg, "cpp_passing", None) for arg in foo.args.args}
+    assert passing == {
+        "a": PASS_BY_REF,
+        "b": PASS_BY_CONST_REF,
+        "s": PASS_BY_CONST_REF,
+        "t": PASS_BY_VALUE,
+        "n": None,
+    }
+    assert foo.body[1].value.cpp_move
@@ -0,0 +1,128 @@
+import argparse
+from pathlib import Path
+
+from py2many.cli import _transpile, go_settings
+
+CASES_DIR = Path(__file__).parent / "cases"
+
+
+def transpile(*lines):
+    args = argparse.Namespace(
+        pytype=False,
+        typpete=False,
+        import_basedir=None,
+        config=None,
+        extension=False,
+        no_prologue=True,
+        indent=4,
+        expected=None,
+    )
+    settings = go_settings(args)
+    settings.formatter = None
+    filename = Path("test_go.py")
+    outputs, successful = _transpile(
+        [filename], ["\n".join(lines)], settings, args, basedir=Path(".")
+    )
+    assert successful == [filename]
+    return outputs[0]
+
+
+class TestGoTranspiler:
+    def test_monomorphized_args(self):
+        go = transpile(
+            "async def double(x):",
+            "    return x",
+            "",
+            "async def main():",
+            "    print(await double(2))",
+            "    print(await double(3))",
+        )
+        assert "func double(x int)" in go
+        assert "any" not in go
+
+    def test_exported_args_stay_generic(self):
+        go = transpile(
+            "def double(x):",
+            "    return x",
+            "",
+            "def main():",
+            "    print(double(2))",
+            "    print(double(3))",
+        )
+        assert "func Double[T0 any](x T0) T0 {" in go
+
+    def test_generic_args(self):
+        go = transpile(
+            "def show(x):",
+            "    print(x)",
+            "",
+            "def main():",
+            "    show(2)",
+            '    show("a")',
+        )
+        assert "func Show[T0 any](x T0) {" in go
+
+    def test_list_capacity(self):
+        go = transpile(
+            "def collect(n: int, m: int, xs: List[int]) -> List[int]:",
+            "    results = [0]",
+            "    for x in xs:",
+            "        for i in range(m, n):",
+            "            results.append(i)",
+            "    return results",
+        )
+        assert "append(make([]int, 0, 1 + len(xs) * max(0, n - m)), 0)" in go
+
+    def test_container_equality(self):
+        go = transpile(
+            "def main():",
+            "    a: List[int] = [1, 2]",
+            "    b: List[int] = [1, 2]",
+            "    assert a == b",
+        )
+        assert "slices.Equal(a, b)" in go
+        assert '"slices"' in go
+        assert "cmp.Equal" not in go
+
+    def test_string_builder(self):
+        go = transpile(
+            "def main():",
+            "    s = ''",
+            "    for i in range(3):",
+            "        s += 'ab'",
+            "    print(s)",
+        )
+        assert "var s_builder strings.Builder" in go
+        assert 's_builder.WriteString("ab")' in go
+        assert "s_builder.String()" in go
+        assert '"strings"' in go
+
+    def test_buffered_output(self):
+        go = transpile(
+            "def main():",
+            "    for i in range(3):",
+            "        print(i)",
+            "    print('done')",
+        )
+        assert "__stdout := bufio.NewWriter(os.Stdout)" in go
+        assert 'fmt.Fprintf(__stdout, "%v\\n",i)' in go
+        assert '"bufio"' in go
+        assert 'fmt.Printf("%v\\n","done")' in go
+
+    def test_buffered_output_return(self):
+        go = transpile(
+            "def find(n: int, m: int) -> int:",
+            "    for j in range(m):",
+            "        for i in range(n):",
+            "            if i == j:",
+            "                return i",
+            "            print(i)",
+            "    return -1",
+        )
+        assert "defer" not in go
+        assert "__stdout.Flush()\nreturn i" in go
+        assert go.count("__stdout.Flush()") == 2
+
+    def test_async_functions(self):
+        go = transpile((CASES_DIR / "asyncio_test.py").read_text())
+        assert "func nested() int {" in go
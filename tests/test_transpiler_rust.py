@@ -0,0 +1,65 @@
+import argparse
+from pathlib import Path
+
+from py2many.cli import _transpile, rust_settings
+
+
+def transpile(*lines, extension=False):
+    args = argparse.Namespace(
+        pytype=False,
+        typpete=False,
+        import_basedir=None,
+        config=None,
+        extension=extension,
+        no_prologue=True,
+        indent=4,
+        expected=None,
+    )
+    settings = rust_settings(args)
+    settings.formatter = None
+    filename = Path("test_rust.py")
+    outputs, successful = _transpile(
+        [filename], ["\n".join(lines)], settings, args, basedir=Path(".")
+    )
+    assert successful == [filename]
+    return outputs[0]
+
+
+class TestRustTranspiler:
+    def test_block_if(self):
+        rs = transpile(
+            "def main():",
+            "    if True:",
+            "        x = 1",
+            "        print(x)",
+        )
+        assert "if true {" in rs
+        assert "};" in rs
+
+    def test_bytes_iteration(self):
+        rs = transpile(
+            "def checksum(data: bytes) -> int:",
+            "    total: int = 0",
+            "    for b in data:",
+            "        total += b",
+            "    return total",
+        )
+        assert "pub fn checksum(data: &[u8]) -> i32 {" in rs
+        assert "let mut total: i32 = 0;" in rs
+        assert "total += *b as i32;" in rs
+
+    def test_extension_primitive_return(self):
+        rs = transpile(
+            "from typing import List",
+            "",
+            "def dot(xs: List[float], ys: List[float]) -> float:",
+            "    total: float = 0.0",
+            "    for i in range(len(xs)):",
+            "        total += xs[i] * ys[i]",
+            "    return total",
+            extension=True,
+        )
+        assert "pub fn dot(py: Python, xs: Vec<f64>, ys: Vec<f64>) -> f64 {" in rs
+        assert "let mut total: f64 = 0.0;" in rs
+        assert "return total;" in rs
+        assert "Ok(total)" not in rs
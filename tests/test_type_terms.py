@@ -0,0 +1,66 @@
+import ast
+import copy
+import pickle
+
+from py2many.type_terms import (
+    ANY,
+    BOOL,
+    FLOAT,
+    INT,
+    NONE,
+    STR,
+    from_annotation,
+    is_subtype,
+    join,
+    type_term,
+)
+from pynim.transpiler import NimTranspiler
+
+
+def term(annotation):
+    return from_annotation(ast.parse(annotation, mode="eval").body)
+
+
+class TestTypeTerms:
+    def test_interned(self):
+        assert term("List[int]") is type_term("list", INT)
+        assert term("typing.Dict[str, List[int]]") is term("dict[str, list[int]]")
+        assert from_annotation("Optional[int]") is type_term("Optional", INT)
+        assert term("list[int]") is not term("list[float]")
+        assert copy.deepcopy(term("set[str]")) is term("set[str]")
+        assert pickle.loads(pickle.dumps(term("tuple[int, str]"))) is term(
+            "tuple[int, str]"
+        )
+        assert str(term("Callable[[int], Tuple[str, None]]")) == (
+            "Callable[[int], tuple[str, None]]"
+        )
+        assert term("f(x)") is None
+
+    def test_subtype(self):
+        assert is_subtype(BOOL, FLOAT)
+        assert is_subtype(type_term("c_int8"), INT)
+        assert not is_subtype(type_term("c_int16"), type_term("c_int8"))
+        assert not is_subtype(FLOAT, INT)
+        assert is_subtype(term("list[int]"), term("list"))
+        assert is_subtype(term("list[bool]"), term("list[int]"))
+        assert not is_subtype(term("list[int]"), term("set[int]"))
+        assert is_subtype(NONE, term("Optional[int]"))
+        assert is_subtype(INT, term("Union[str, float]"))
+        assert is_subtype(STR, ANY)
+
+    def test_join(self):
+        assert join(INT, FLOAT) is FLOAT
+        assert join(type_term("c_int8"), type_term("u8")) is INT
+        assert join(STR, NONE) is term("Optional[str]")
+        assert join(term("dict[str, int]"), term("dict[str, float]")) is term(
+            "dict[str, float]"
+        )
+        assert join(STR, INT) is ANY
+
+    def test_render(self):
+        transpiler = NimTranspiler()
+        assert term("Dict[str, List[float]]").render(transpiler) == (
+            "Table[string, seq[float64]]"
+        )
+        assert term("list[Any]").render(transpiler) == transpiler._default_type
+        assert term("List[int]").render(NimTranspiler()) == "seq[int]"
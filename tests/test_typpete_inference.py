@@ -0,0 +1,77 @@
+import ast
+
+from pathlib import Path
+
+from py2many.typpete_inference import (
+    TyppeteSession,
+    apply_signatures,
+    signature_stubs,
+)
+
+SOURCES = {
+    "a": "def f(x):\n    return x\n",
+    "b": "from a import f\n\ndef g(y):\n    return f(y)\n",
+}
+
+
+def parse(module, source, basedir):
+    tree = ast.parse(source)
+    tree.__file__ = Path(f"{module}.py")
+    tree.__basedir__ = basedir
+    return tree
+
+
+class RecordingSession(TyppeteSession):
+    """Annotates every function with ints instead of solving"""
+
+    solved = []
+
+    @staticmethod
+    def available():
+        return True
+
+    def _solve(self, node, deps):
+        self.solved.append((ast.unparse(node.body[-1].args), sorted(deps)))
+        for stmt in node.body:
+            if isinstance(stmt, ast.FunctionDef):
+                stmt.returns = ast.Name(id="int")
+                for arg in stmt.args.args:
+                    arg.annotation = ast.Name(id="int")
+        return True
+
+
+def infer_all(sources, basedir):
+    RecordingSession.solved = []
+    session = RecordingSession(sources, basedir)
+    trees = [parse(m, src, basedir) for m, src in sources.items()]
+    for tree in trees:
+        session.infer(tree)
+    session.close()
+    return [ast.unparse(tree.body[-1]).splitlines()[0] for tree in trees]
+
+
+class TestTyppeteInference:
+    def test_signatures(self):
+        tree = ast.parse("def f(x: int, y) -> str:\n    return ''\ndef g(z): pass")
+        stubs = signature_stubs(tree)
+        assert stubs == "def f(x: int) -> str:\n    ..."
+        target = ast.parse("def f(x, y):\n    return ''\ndef g(z): pass")
+        apply_signatures(target, stubs)
+        assert ast.unparse(target.body[0].args) == "x: int, y"
+        assert ast.unparse(target.body[0].returns) == "str"
+
+    def test_cache(self, tmp_path, monkeypatch):
+        # The cache is next to the pyi directory of pytype
+        monkeypatch.chdir(tmp_path)
+        basedir = Path("proj")
+        basedir.mkdir()
+        signatures = ["def f(x: int) -> int:", "def g(y: int) -> int:"]
+        assert infer_all(SOURCES, basedir) == signatures
+        assert RecordingSession.solved == [("x", []), ("y", ["a"])]
+        # Unchanged modules are not solved again
+        assert infer_all(SOURCES, basedir) == signatures
+        assert RecordingSession.solved == []
+        # The signatures of a didn't change, so b is still up to date
+        sources = dict(SOURCES, a="def f(x):\n    y = x\n    return y\n")
+        assert infer_all(sources, basedir) == signatures
+        assert RecordingSession.solved == [("x", [])]
@@ -0,0 +1,122 @@
+import ast
+import logging
+
+from py2many.scope import add_scope_context
+from py2many.value_range import (
+    INT64,
+    Interval,
+    IntegerRangeAnalysis,
+    find_arbitrary_precision_vars,
+)
+from pyjl.rewriters import JuliaArbitraryPrecisionRewriter
+
+
+def parse(*args):
+    return ast.parse("\n".join(args))
+
+
+def promoted(source):
+    return {p.name: p.reason for p in find_arbitrary_precision_vars(source)}
+
+
+class TestIntegerRangeAnalysis:
+    def test_counters_fit(self):
+        source = parse(
+            "def count(xs, n: int):",
+            "   total = 0",
+            "   i = 0",
+            "   while i < len(xs):",
+            "       total += xs[i] * n",
+            "       i += 1",
+            "   for j in range(n):",
+            "       total = total + j % 7",
+            "   return total",
+        )
+        assert promoted(source) == {}
+
+    def test_geometric_growth(self):
+        source = parse(
+            "def fact(n: int) -> int:",
+            "   result = 1",
+            "   for i in range(1, n + 1):",
+            "       result *= i",
+            "   return result",
+            "def digits():",
+            "   acc = 0",
+            "   for k in range(10):",
+            "       acc = acc * 10 + k",
+            "   x = fact(5) + 1",
+            "   return acc",
+        )
+        reasons = promoted(source)
+        assert set(reasons) == {
+            "fact.result",
+            "fact()",
+            "digits.acc",
+            "digits()",
+            "digits.x",
+        }
+        assert reasons["fact.result"].startswith("grows geometrically")
+        assert reasons["digits.x"] == "assigned from fact()"
+        fact = source.body[0]
+        assert fact.needs_arbitrary_precision
+        assert fact.body[0].targets[0].needs_arbitrary_precision
+        # the loop variable stays 64 bits
+        assert not hasattr(fact.body[1].target, "needs_arbitrary_precision")
+
+    def test_constants_and_masks(self):
+        source = parse(
+            "big = 2 ** 70",
+            "small = 2 ** 40 + 3",
+            "h = 0",
+            "for c in range(100):",
+            "   h = (h * 31 + c) & 0xFFFFFFFF",
+            "m = (big * 3) % 1000",
+        )
+        reasons = promoted(source)
+        assert reasons == {"big": f"can reach {2 ** 70}"}
+
+    def test_globals_and_arguments(self):
+        source = parse(
+            "def step(k):",
+            "   global num",
+            "   num = num * k",
+            "def show(d: int):",
+            "   print(d)",
+            "num = 1",
+            "for k in range(5):",
+            "   step(k)",
+            "   show(num)",
+        )
+        reasons = promoted(source)
+        assert set(reasons) == {"num", "show.d"}
+        assert reasons["show.d"] == "assigned from num"
+        assert source.body[1].args.args[0].needs_arbitrary_precision
+
+    def test_intervals(self):
+        analysis = IntegerRangeAnalysis()
+        source = parse("x = 3", "y = -x - 1", "z = y // 2", "w = len(y)")
+        analysis.analyse(source)
+        env = {key[1]: value for key, value in analysis._env.items()}
+        assert env["y"] == Interval(-4, -4)
+        assert env["z"] == Interval(-4, 4)
+        assert env["w"] == Interval(0, INT64.hi, assumed=True)
+
+
+class TestArbitraryPrecisionRewriter:
+    def test_report(self, caplog):
+        source = parse(
+            "def fact(n: int) -> int:",
+            "   result = 1",
+            "   for i in range(1, n + 1):",
+            "       result *= i",
+            "   return result",
+        )
+        source.__file__ = "fact.py"
+        source.use_arbitrary_precision = True
+        add_scope_context(source)
+        with caplog.at_level(logging.WARNING, logger="pyjl.rewriters"):
+            JuliaArbitraryPrecisionRewriter().visit(source)
+        messages = [r.getMessage() for r in caplog.records]
+        assert len(messages) == 2
+        assert messages[0].startswith("fact.py: using BigInt for fact.result (line 2)")
@@ -0,0 +1,79 @@
+import ast
+
+from py2many.visitor import NodeTransformer, NodeVisitor
+
+
+def _recorder(base):
+    class Recorder(base):
+        def __init__(self):
+            self.names = []
+
+        def visit_Name(self, node):
+            self.names.append(node.id)
+            return node
+
+        def visit_Call(self, node):
+            self.names.append("call")
+            self.generic_visit(node)
+            return node
+
+    return Recorder
+
+
+SOURCE = "\n".join(
+    [
+        "def f(a, b):",
+        "    x = g(a, h(b)) + a",
+        "    return [y for y in x if y > b]",
+    ]
+)
+
+
+class TestVisitor:
+    def test_same_order_as_ast(self):
+        tree = ast.parse(SOURCE)
+        for base, ours in [
+            (ast.NodeVisitor, NodeVisitor),
+            (ast.NodeTransformer, NodeTransformer),
+        ]:
+            expected, visitor = _recorder(base)(), _recorder(ours)()
+            expected.visit(tree)
+            visitor.visit(tree)
+            assert visitor.names == expected.names
+
+    def test_transform(self):
+        class Rewriter(NodeTransformer):
+            def visit_Assign(self, node):
+                self.generic_visit(node)
+                return [node, ast.Expr(value=node.targets[0])]
+
+            def visit_Return(self, node):
+                return None
+
+            def visit_Constant(self, node):
+                return ast.Constant(value=node.value + 1)
+
+        tree = Rewriter().visit(ast.parse("x = 1\nfor i in y:\n    z = 2\n    return"))
+        assert ast.unparse(tree) == "x = 2\nx\nfor i in y:\n    z = 3\n    z"
+
+    def test_overridden_visit(self):
+        class Counter(NodeVisitor):
+            def __init__(self):
+                self.count = 0
+
+            def visit(self, node):
+                self.count += 1
+                return super().visit(node)
+
+        tree = ast.parse(SOURCE)
+        counter = Counter()
+        counter.visit(tree)
+        assert counter.count == sum(1 for _ in ast.walk(tree))
+
+    def test_deep_nesting(self):
+        tree = ast.Constant(value=0)
+        for _ in range(10000):
+            tree = ast.BinOp(left=tree, op=ast.Add(), right=ast.Constant(value=1))
+        names = _recorder(NodeVisitor)()
+        names.visit(tree)
+        assert NodeTransformer().visit(tree) is tree
@@ -0,0 +1,53 @@
+"""Benchmark for the visitor base classes.
+
+Times a visitor and a transformer that only handle Name nodes on the
+modules of py2many, with the ast base classes and with the ones of
+py2many.visitor, and prints the time spent per node.
+"""
+
+import ast
+import time
+from pathlib import Path
+
+import pytest
+
+from py2many.visitor import NodeTransformer, NodeVisitor
+
+REPEAT = 10
+SOURCES = sorted((Path(__file__).parent.parent / "py2many").glob("*.py"))
+
+
+def _visitor(base):
+    class NameCounter(base):
+        def __init__(self):
+            self.count = 0
+
+        def visit_Name(self, node):
+            self.count += 1
+            return node
+
+    return NameCounter
+
+
+def _time_per_node(base, trees):
+    nodes = sum(1 for tree in trees for _ in ast.walk(tree))
+    visitor = _visitor(base)
+    times = []
+    for _ in range(REPEAT):
+        start = time.perf_counter()
+        for tree in trees:
+            visitor().visit(tree)
+        times.append(time.perf_counter() - start)
+    return min(times) / nodes
+
+
+@pytest.mark.parametrize(
+    "before, after",
+    [(ast.NodeVisitor, NodeVisitor), (ast.NodeTransformer, NodeTransformer)],
+)
+def test_bench(before, after):
+    trees = [ast.parse(path.read_text()) for path in SOURCES]
+    results = {base: _time_per_node(base, trees) for base in (before, after)}
+    for base, seconds in results.items():
+        print(f"{base.__module__}.{base.__name__}: {seconds * 1e9:.0f}ns per node")
+    assert results[after] < results[before]
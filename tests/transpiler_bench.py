@@ -0,0 +1,578 @@
+"""Throughput and scalability benchmark for the transpiler.
+
+For every language in LANGS it transpiles:
+  * tests/cases, one case at a time
+  * py2many/ in directory mode, as test_transpile_self.py does
+  * synthetic modules of growing size with many functions, deep
+    nesting, long expressions or many classes
+
+and reports lines per second, peak memory and the time spent in each
+pass of the pipeline (rewriters, inference, transformers, emission...).
+Times of the synthetic modules are fitted against their number of lines,
+t ~ lines ** k, to flag passes whose time grows super-linearly.
+
+Results are appended to a json history, and the run fails when the time
+per line of a pass, or the peak memory, regressed by more than a
+threshold compared to the median of the previous runs.
+
+Usage:
+    python transpiler_bench.py [--lang cpp] [--corpus synthetic] [--sizes 250 500]
+"""
+
+import argparse
+import ast
+import functools
+import gc
+import io
+import json
+import math
+import statistics
+import subprocess
+import sys
+import time
+import tracemalloc
+
+from collections import defaultdict
+from contextlib import ExitStack, redirect_stdout
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+from unittest.mock import patch
+
+import py2many.cli
+
+from py2many.cli import _create_parser, _transpile, infer_types
+from py2many.node_index import NodeIndex
+
+from test_cli import BUILD_DIR, LANGS, ROOT_DIR, TESTS_DIR
+
+CASES_DIR = TESTS_DIR / "cases"
+PY2MANY_MODULE = ROOT_DIR / "py2many"
+HISTORY_FILE = BUILD_DIR / "bench" / "history.json"
+
+CORPORA = ["cases", "self", "synthetic"]
+SYNTHETIC_KINDS = ["functions", "nesting", "expressions", "classes"]
+SIZES = [250, 500, 1000, 2000]
+
+# Passes faster than this are too noisy to compare or fit
+MIN_SECONDS = 0.02
+# Exponent of lines above which a pass is reported as super-linear
+SUPERLINEAR = 1.5
+# Number of previous runs the baseline is the median of
+WINDOW = 5
+
+# Analyses core_transformers runs, timed one by one
+CORE_PASSES = [
+    "add_variable_context",
+    "add_scope_context",
+    "add_assignment_context",
+    "add_list_calls",
+    "detect_mutable_vars",
+    "add_list_capacity",
+    "detect_buffered_output",
+    "detect_nesting_levels",
+    "add_annotation_flags",
+    "add_imports",
+    "correct_node_attributes",
+    "add_is_annotation",
+]
+
+NESTING_DEPTH = 16
+EXPRESSION_TERMS = 24
+TOTAL = "total"
+
+
+@dataclass
+class Unit:
+    """Modules transpiled together, as in directory mode"""
+
+    basedir: Path
+    filenames: List[Path]
+    sources: List[str]
+
+    @property
+    def lines(self) -> int:
+        return sum(source.count("\n") + 1 for source in self.sources)
+
+
+@dataclass
+class Corpus:
+    name: str
+    units: List[Unit]
+
+    @property
+    def lines(self) -> int:
+        return sum(unit.lines for unit in self.units)
+
+
+@dataclass
+class BenchResult:
+    lang: str
+    corpus: str
+    lines: int
+    failures: int = 0
+    peak_memory: Optional[int] = None
+    # Seconds spent in each pass, and in total
+    passes: Dict[str, float] = field(default_factory=dict)
+
+    @property
+    def key(self) -> str:
+        return f"{self.lang}/{self.corpus}"
+
+    @property
+    def lines_per_second(self) -> float:
+        return self.lines / self.passes[TOTAL]
+
+
+def cases_corpus() -> Corpus:
+    units = []
+    for path in sorted(CASES_DIR.glob("*.py")):
+        units.append(Unit(path, [path], [path.read_text(encoding="utf-8")]))
+    return Corpus("cases", units)
+
+
+def self_corpus() -> Corpus:
+    filenames = sorted(
+        path.relative_to(PY2MANY_MODULE) for path in PY2MANY_MODULE.rglob("*.py")
+    )
+    sources = [(PY2MANY_MODULE / f).read_text(encoding="utf-8") for f in filenames]
+    return Corpus("self", [Unit(PY2MANY_MODULE, filenames, sources)])
+
+
+def synthetic_corpus(kind: str, size: int) -> Corpus:
+    source = synthetic_source(kind, size)
+    name = f"{kind}-{size}"
+    return Corpus(name, [Unit(Path("."), [Path(f"{kind}_{size}.py")], [source])])
+
+
+def synthetic_source(kind: str, size: int) -> str:
+    """A module of about size lines that stresses one dimension"""
+    return "\n".join(_GENERATORS[kind](size))
+
+
+def _functions(size):
+    # Each calls the previous one, so inference follows a chain
+    for i in range(max(1, size // 6)):
+        yield f"def f{i}(x: int, y: int) -> int:"
+        yield f"    z = x * {i} + y"
+        yield f"    if z > {i}:"
+        yield "        return z - y"
+        yield f"    return z + f{i - 1}(y, x)" if i else "    return z"
+        yield ""
+
+
+def _nesting(size):
+    lines_per_function = 2 * NESTING_DEPTH + 4
+    for i in range(max(1, size // lines_per_function)):
+        yield f"def nested{i}(n: int) -> int:"
+        yield "    total = 0"
+        for level in range(NESTING_DEPTH):
+            indent = "    " * (level + 1)
+            if level % 4 == 3:
+                yield f"{indent}for i{level} in range(n):"
+            else:
+                yield f"{indent}if n > {level}:"
+            yield f"{indent}    total = total + {level}"
+        yield "    return total"
+        yield ""
+
+
+def _expressions(size):
+    statements = 8
+    operators = ["+", "-", "*"]
+    for i in range(max(1, size // (statements + 3))):
+        yield f"def expr{i}(a: int, b: int, c: int) -> int:"
+        names = ["a", "b", "c"]
+        for s in range(statements):
+            terms = []
+            for t in range(EXPRESSION_TERMS):
+                term = names[(s + t) % len(names)] if t % 3 else str(t + 1)
+                op = operators[(s + t) % len(operators)]
+                terms.append(f"({term} {op} {t % 7 + 1})" if t % 4 == 0 else term)
+            expr = terms[0]
+            for t, term in enumerate(terms[1:]):
+                expr += f" {operators[t % len(operators)]} {term}"
+            yield f"    r{s} = {expr}"
+            names.append(f"r{s}")
+        yield f"    return r{statements - 1}"
+        yield ""
+
+
+def _classes(size):
+    for i in range(max(1, size // 12)):
+        yield f"class C{i}:"
+        yield "    def __init__(self, x: int, y: int):"
+        yield "        self.x = x"
+        yield "        self.y = y"
+        yield ""
+        yield "    def scaled(self, k: int) -> int:"
+        yield "        return self.x * k + self.y"
+        yield ""
+        yield f"def use{i}() -> int:"
+        yield f"    c = C{i}({i}, 2)"
+        yield "    return c.scaled(3)"
+        yield ""
+
+
+_GENERATORS = {
+    "functions": _functions,
+    "nesting": _nesting,
+    "expressions": _expressions,
+    "classes": _classes,
+}
+
+
+class PassTimer:
+    """Accumulates the time spent in each pass, excluding the time of
+    the passes nested in it (e.g. building the node index lazily from
+    a rewriter)"""
+
+    def __init__(self):
+        self.timings: Dict[str, float] = defaultdict(float)
+        self._nested: List[float] = []
+
+    def wrap(self, func, name: Callable[..., Optional[str]]):
+        """Times the calls of func for which name returns a pass name"""
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            pass_name = name(*args, **kwargs)
+            if pass_name is None:
+                return func(*args, **kwargs)
+            self._nested.append(0.0)
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                elapsed = time.perf_counter() - start
+                self.timings[pass_name] += elapsed - self._nested.pop()
+                if self._nested:
+                    self._nested[-1] += elapsed
+
+        return wrapper
+
+    def instrument(self, settings, stack: ExitStack):
+        """Times the passes _emit_one runs with settings"""
+
+        def named(pass_name):
+            return lambda *args, **kwargs: pass_name
+
+        for attr, pass_name in [
+            ("_parse_one", "parse"),
+            ("infer_constraint_types", "constraint_inference"),
+            ("add_ssa_context", "ssa"),
+        ] + [(attr, attr) for attr in CORE_PASSES]:
+            func = getattr(py2many.cli, attr)
+            stack.enter_context(
+                patch.object(py2many.cli, attr, self.wrap(func, named(pass_name)))
+            )
+        stack.enter_context(
+            patch.object(
+                NodeIndex,
+                "run",
+                self.wrap(
+                    NodeIndex.run,
+                    lambda index, rewriter, tree: type(rewriter).__name__,
+                ),
+            )
+        )
+        stack.enter_context(
+            patch.object(
+                NodeIndex, "_build", self.wrap(NodeIndex._build, named("index"))
+            )
+        )
+        settings.inference = self.wrap(
+            settings.inference or infer_types, named("inference")
+        )
+        settings.transformers = [
+            self.wrap(tx, named(getattr(tx, "__name__", type(tx).__name__)))
+            for tx in settings.transformers
+        ]
+        # Only the module, the transpiler emits nested nodes recursively
+        transpiler = settings.transpiler
+        transpiler.emit = self.wrap(
+            transpiler.emit,
+            lambda node, *args: "emit" if isinstance(node, ast.Module) else None,
+        )
+
+
+# Parsing the arguments builds the settings of every language
+_lang_args = {}
+
+
+def _get_settings(lang):
+    """Transpilers collect per module state, so every unit gets new settings"""
+    if lang not in _lang_args:
+        _lang_args[lang] = _create_parser().parse_args([f"--{lang}=1"])
+    args = _lang_args[lang]
+    settings = getattr(py2many.cli, f"{lang}_settings")(args)
+    settings.transpiler._throw_on_unimplemented = False
+    return args, settings
+
+
+def _run_corpus(lang, corpus: Corpus) -> Tuple[Dict[str, float], int]:
+    """Transpiles every unit of the corpus once. Returns the time per
+    pass and the number of modules that failed"""
+    timer = PassTimer()
+    failures = 0
+    total = 0.0
+    for unit in corpus.units:
+        args, settings = _get_settings(lang)
+        with ExitStack() as stack:
+            timer.instrument(settings, stack)
+            # Garbage of the previous unit is not collected on its time
+            gc.collect()
+            start = time.perf_counter()
+            with redirect_stdout(io.StringIO()):
+                _, successful = _transpile(
+                    unit.filenames,
+                    unit.sources,
+                    settings,
+                    args,
+                    _suppress_exceptions=Exception,
+                    basedir=unit.basedir,
+                )
+            total += time.perf_counter() - start
+        failures += len(unit.filenames) - len(successful)
+    passes = dict(timer.timings)
+    passes["other"] = max(0.0, total - sum(passes.values()))
+    passes[TOTAL] = total
+    return passes, failures
+
+
+def measure(lang, corpus: Corpus, repeat=3, memory=True) -> BenchResult:
+    """Best time per pass out of repeat runs, and the peak memory
+    of a separate run since tracing allocations slows it down"""
+    result = BenchResult(lang, corpus.name, corpus.lines)
+    for _ in range(repeat):
+        passes, result.failures = _run_corpus(lang, corpus)
+        for name, seconds in passes.items():
+            result.passes[name] = min(result.passes.get(name, seconds), seconds)
+    if memory:
+        tracemalloc.start()
+        try:
+            _run_corpus(lang, corpus)
+            result.peak_memory = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+    return result
+
+
+def fit_exponent(sizes: List[float], times: List[float]) -> float:
+    """Least squares fit of log(time) = k * log(size) + c, returns k"""
+    xs = [math.log(s) for s in sizes]
+    ys = [math.log(max(t, 1e-9)) for t in times]
+    mean_x, mean_y = statistics.fmean(xs), statistics.fmean(ys)
+    var = sum((x - mean_x) ** 2 for x in xs)
+    if not var:
+        return 0.0
+    return sum((x - mean_x) * (y - mean_y) for x, y in zip(xs, ys)) / var
+
+
+def scaling_exponents(results: List[BenchResult]) -> Dict[str, Dict[str, float]]:
+    """Exponents of the time of each pass against the lines of the
+    synthetic modules of the same kind, keyed by lang/kind"""
+    series = defaultdict(list)
+    for r in results:
+        kind, _, size = r.corpus.rpartition("-")
+        if kind in SYNTHETIC_KINDS and size.isdigit():
+            series[f"{r.lang}/{kind}"].append(r)
+    exponents = {}
+    for key, rs in sorted(series.items()):
+        if len(rs) < 2:
+            continue
+        rs.sort(key=lambda r: r.lines)
+        exponents[key] = {}
+        for name in rs[-1].passes:
+            times = [r.passes.get(name, 0.0) for r in rs]
+            # Too fast to fit reliably
+            if times[-1] < MIN_SECONDS:
+                continue
+            exponents[key][name] = fit_exponent([r.lines for r in rs], times)
+    return exponents
+
+
+def superlinear_passes(exponents, limit=SUPERLINEAR) -> List[str]:
+    return [
+        f"{key} {name}: time ~ lines ** {k:.2f}"
+        for key, passes in exponents.items()
+        for name, k in sorted(passes.items())
+        if k > limit
+    ]
+
+
+def find_regressions(history, results, threshold, window=WINDOW) -> List[str]:
+    """Passes whose time per line, and results whose peak memory, grew
+    by more than threshold compared to the median of the last runs"""
+    regressions = []
+    for r in results:
+        previous = [run["results"][r.key] for run in history if r.key in run["results"]]
+        previous = previous[-window:]
+        if not previous:
+            continue
+        for name, seconds in sorted(r.passes.items()):
+            times = [p["passes"][name] for p in previous if name in p["passes"]]
+            if not times or max(seconds, statistics.median(times)) < MIN_SECONDS:
+                continue
+            baseline = statistics.median(
+                p["passes"][name] / p["lines"] for p in previous if name in p["passes"]
+            )
+            current = seconds / r.lines
+            if current > baseline * (1 + threshold):
+                regressions.append(
+                    f"{r.key} {name}: {current * 1e6:.1f}us per line, "
+                    f"was {baseline * 1e6:.1f}us (+{current / baseline - 1:.0%})"
+                )
+        memory = [p["peak_memory"] for p in previous if p.get("peak_memory")]
+        if r.peak_memory and memory:
+            baseline = statistics.median(memory)
+            if r.peak_memory > baseline * (1 + threshold):
+                regressions.append(
+                    f"{r.key} peak memory: {r.peak_memory / 2**20:.1f}MiB, "
+                    f"was {baseline / 2**20:.1f}MiB "
+                    f"(+{r.peak_memory / baseline - 1:.0%})"
+                )
+    return regressions
+
+
+def load_history(path: Path) -> List[dict]:
+    if not path.is_file():
+        return []
+    with open(path) as f:
+        return json.load(f)
+
+
+def save_history(path: Path, history: List[dict], results, exponents):
+    run = {
+        "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "commit": _git_commit(),
+        "results": {r.key: asdict(r) for r in results},
+        "exponents": exponents,
+    }
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, "w") as f:
+        json.dump(history + [run], f, indent=2)
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        proc = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=ROOT_DIR,
+            capture_output=True,
+            text=True,
+        )
+    except OSError:
+        return None
+    return proc.stdout.strip() or None
+
+
+def format_report(results: List[BenchResult], slowest=3) -> str:
+    lines = [
+        f"{'lang':<8}{'corpus':<20}{'lines':>8}{'failed':>8}"
+        f"{'lines/s':>10}{'memory':>10}  slowest passes"
+    ]
+    for r in results:
+        memory = f"{r.peak_memory / 2**20:.1f}M" if r.peak_memory else "-"
+        passes = sorted(
+            ((s, n) for n, s in r.passes.items() if n != TOTAL), reverse=True
+        )
+        slow = ", ".join(f"{n} {s:.2f}s" for s, n in passes[:slowest])
+        lines.append(
+            f"{r.lang:<8}{r.corpus:<20}{r.lines:>8}{r.failures:>8}"
+            f"{r.lines_per_second:>10.0f}{memory:>10}  {slow}"
+        )
+    return "\n".join(lines)
+
+
+def _corpora(names, sizes) -> List[Corpus]:
+    corpora = []
+    if "cases" in names:
+        corpora.append(cases_corpus())
+    if "self" in names:
+        corpora.append(self_corpus())
+    if "synthetic" in names:
+        for kind in SYNTHETIC_KINDS:
+            corpora.extend(synthetic_corpus(kind, size) for size in sizes)
+    return corpora
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "--lang", action="append", choices=sorted(LANGS), help="Languages to run"
+    )
+    parser.add_argument(
+        "--corpus", action="append", choices=CORPORA, help="Corpora to run"
+    )
+    parser.add_argument(
+        "--sizes",
+        type=int,
+        nargs="+",
+        default=SIZES,
+        help="Lines of the synthetic modules",
+    )
+    parser.add_argument(
+        "--repeat", type=int, default=3, help="Runs to take the best time of"
+    )
+    parser.add_argument(
+        "--no-memory",
+        action="store_true",
+        default=False,
+        help="Do not measure the peak memory",
+    )
+    parser.add_argument(
+        "--history", default=str(HISTORY_FILE), help="Json file of previous results"
+    )
+    parser.add_argument(
+        "--no-save",
+        action="store_true",
+        default=False,
+        help="Compare with the history without adding this run to it",
+    )
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=0.25,
+        help="Relative slowdown of a pass that fails the run",
+    )
+    parser.add_argument(
+        "--superlinear",
+        type=float,
+        default=SUPERLINEAR,
+        help="Exponent of lines above which a pass is reported",
+    )
+    args = parser.parse_args(argv)
+    history_path = Path(args.history)
+
+    langs = sorted(args.lang or LANGS)
+    corpora = _corpora(args.corpus or CORPORA, sorted(args.sizes))
+    results = []
+    for lang in langs:
+        for corpus in corpora:
+            result = measure(lang, corpus, args.repeat, not args.no_memory)
+            print(f"{result.key}: {result.lines_per_second:.0f} lines/s")
+            results.append(result)
+    print()
+    print(format_report(results))
+
+    exponents = scaling_exponents(results)
+    superlinear = superlinear_passes(exponents, args.superlinear)
+    if superlinear:
+        print("\nSuper-linear passes:")
+        for line in superlinear:
+            print(f"  {line}")
+
+    history = load_history(history_path)
+    regressions = find_regressions(history, results, args.threshold)
+    if regressions:
+        print("\nRegressions:")
+        for line in regressions:
+            print(f"  {line}")
+    if not args.no_save:
+        save_history(history_path, history, results, exponents)
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())